@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark POST /api/batch against the equivalent sequential calls
+
+Both variants run against a file-backed SQLite database so every commit
+pays for a real fsync, like production.
+
+Usage:
+    python -m benchmarks.bench_batch [--operations N] [--rounds N]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from internal.app import create_app
+from internal.db.database import db
+
+def build_operations(count, existing_ids):
+    """Mixed create/update/status/delete burst like a mobile client sync"""
+    operations = []
+    for i in range(count):
+        kind = i % 4
+        task_id = existing_ids[i % len(existing_ids)]
+        if kind == 0:
+            operations.append({"op": "create", "data": {"title": f"Task {i}", "priority": "high"}})
+        elif kind == 1:
+            operations.append({"op": "update", "id": task_id, "data": {"title": f"Renamed {i}"}})
+        elif kind == 2:
+            operations.append({"op": "update_status", "id": task_id, "data": {"status": "completed"}})
+        else:
+            operations.append({"op": "create", "data": {"title": f"Extra {i}"}})
+    return operations
+
+def run_sequential(client, operations):
+    for operation in operations:
+        body = json.dumps(operation.get("data", {}))
+        if operation["op"] == "create":
+            client.post("/api/tasks", data=body, content_type="application/json")
+        elif operation["op"] == "update":
+            client.put(f"/api/tasks/{operation['id']}", data=body, content_type="application/json")
+        elif operation["op"] == "update_status":
+            client.patch(f"/api/tasks/{operation['id']}/status", data=body, content_type="application/json")
+        else:
+            client.delete(f"/api/tasks/{operation['id']}")
+
+def run_batch(client, operations):
+    response = client.post(
+        "/api/batch", data=json.dumps({"operations": operations}), content_type="application/json"
+    )
+    assert response.status_code == 200, response.data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(
+            "testing",
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        )
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            seeded = [
+                json.loads(client.post(
+                    "/api/tasks", data=json.dumps({"title": f"Seed {i}"}),
+                    content_type="application/json"
+                ).data)["id"]
+                for i in range(10)
+            ]
+
+            results = {}
+            for name, runner in (("sequential", run_sequential), ("batch", run_batch)):
+                timings = []
+                for _ in range(args.rounds):
+                    operations = build_operations(args.operations, seeded)
+                    started = time.perf_counter()
+                    runner(client, operations)
+                    timings.append(time.perf_counter() - started)
+                results[name] = statistics.median(timings) * 1000
+
+    print(f"{args.operations} operations, median of {args.rounds} rounds")
+    print(f"  sequential calls: {results['sequential']:8.1f} ms")
+    print(f"  one batch call:   {results['batch']:8.1f} ms")
+    print(f"  speedup:          {results['sequential'] / results['batch']:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Cost of request deadlines, and how fast a runaway query is stopped
+
+Ordinary requests (a lookup by id and a filtered list page) are timed
+with deadlines disabled and enabled, against a file-backed SQLite
+database holding ``--tasks`` tasks. The progress handler and the checks
+before each statement are the overhead.
+
+Then a list request runs a query that would take minutes, with
+``X-Request-Timeout`` set to each of ``--budgets``: reported is the time
+until the ``504`` answer.
+
+Usage:
+    python -m benchmarks.bench_deadlines [--tasks N] [--requests N] [--budgets 0.1,0.5,1]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task
+
+REQUESTS = (
+    ("get by id", "/api/tasks/{id}"),
+    ("list, status filter", "/api/tasks?status=pending&page=3"),
+)
+
+# A pathological query: counts to a billion
+RUNAWAY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT COUNT(*) FROM c"
+)
+
+def make_app(directory, tasks, **overrides):
+    app = create_app(
+        "testing",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        **overrides
+    )
+    with app.app_context():
+        db.create_all()
+        if not Task.query.count():
+            db.session.add_all(
+                Task(title=f"Task {i}", status=("pending", "in_progress", "completed")[i % 3])
+                for i in range(tasks)
+            )
+            db.session.commit()
+    return app
+
+def overhead(app, tasks, requests):
+    """Median latency per request kind, in microseconds"""
+    client = app.test_client()
+    results = {}
+    for label, path in REQUESTS:
+        # Warm the page cache and the statement caches first
+        for i in range(requests // 10):
+            client.get(path.format(id=i % tasks + 1))
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            response = client.get(path.format(id=i % tasks + 1))
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200
+        results[label] = statistics.median(timings) * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--budgets", default="0.1,0.5,1")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        disabled = make_app(directory, args.tasks, DEADLINES_ENABLED=False)
+        app = make_app(directory, args.tasks)
+        # Alternate the variants and keep the best round of each, the
+        # difference is small next to the noise of a single run
+        off, on = {}, {}
+        for _ in range(3):
+            for variant, best in ((disabled, off), (app, on)):
+                for label, value in overhead(variant, args.tasks, args.requests).items():
+                    best[label] = min(best.get(label, value), value)
+        print(f"  {'request':<22}{'no deadline':>14}{'deadline':>12}{'overhead':>10}")
+        for label in off:
+            print(f"  {label:<22}{off[label]:12.1f}us{on[label]:10.1f}us{on[label] / off[label] - 1:10.1%}")
+
+        def runaway(**filters):
+            db.session.execute(RUNAWAY)
+            return [], 0, 0
+        TaskService.list_tasks = staticmethod(runaway)
+        client = app.test_client()
+        print(f"  {'budget':<22}{'answered after':>14}")
+        for budget in args.budgets.split(","):
+            started = time.perf_counter()
+            response = client.get("/api/tasks", headers={"X-Request-Timeout": budget})
+            elapsed = time.perf_counter() - started
+            assert response.status_code == 504
+            print(f"  {budget + 's':<22}{elapsed * 1000:12.1f}ms")
+
+if __name__ == "__main__":
+    main()
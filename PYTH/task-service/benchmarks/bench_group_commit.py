@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput of concurrent task creation with and without
+group commit
+
+Each writer thread behaves like a request worker: it pushes its own app
+context and calls TaskService.create_task in a loop against a file-backed
+SQLite database.
+
+Usage:
+    python -m benchmarks.bench_group_commit [--writes N] [--writers 1,2,4,...]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+
+def run(group_commit, writers, writes_per_writer, directory):
+    app = create_app(
+        "testing",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, f'gc-{group_commit}-{writers}.db')}",
+        SQLALCHEMY_ENGINE_OPTIONS={"pool_size": writers + 1, "connect_args": {"timeout": 60}},
+        GROUP_COMMIT_ENABLED=group_commit,
+    )
+    with app.app_context():
+        db.create_all()
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(writers + 1)
+
+    def writer(index):
+        local = []
+        with app.app_context():
+            barrier.wait()
+            for i in range(writes_per_writer):
+                started = time.perf_counter()
+                try:
+                    TaskService.create_task({"title": f"Writer {index} task {i}"})
+                except Exception as e:
+                    errors.append(e)
+                    db.session.rollback()
+                local.append(time.perf_counter() - started)
+                db.session.remove()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if group_commit:
+        app.extensions["group_commit"].stop()
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": len(errors),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=50, help="Writes per writer")
+    parser.add_argument("--writers", default="1,2,4,8,16,32,64")
+    args = parser.parse_args()
+
+    print(f"{'writers':>7} | {'mode':<12} | {'ops/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | errors")
+    with tempfile.TemporaryDirectory() as directory:
+        for writers in (int(value) for value in args.writers.split(",")):
+            for group_commit in (False, True):
+                result = run(group_commit, writers, args.writes, directory)
+                mode = "group commit" if group_commit else "per request"
+                print(f"{writers:>7} | {mode:<12} | {result['throughput']:>8.0f} | "
+                      f"{result['p50']:>8.2f} | {result['p99']:>8.2f} | {result['errors']}")
+
+if __name__ == "__main__":
+    main()
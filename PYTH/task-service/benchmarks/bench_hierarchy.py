@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark subtree, ancestor and progress queries on large task trees
+
+Two forests of ``--tasks`` tasks each are loaded into a file-backed
+SQLite database:
+
+* wide: trees with ``--fanout`` children per task
+* deep: chains of ``--depth`` tasks
+
+Each query is timed through the closure table (what the API uses),
+through a recursive CTE on ``parent_id`` and through the naive approach
+of fetching one level at a time.
+
+Usage:
+    python -m benchmarks.bench_hierarchy [--tasks N] [--fanout N] [--depth N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task, TaskPriority, TaskStatus
+
+# Raw inserts store the codes the model maps status and priority to
+STATUS_CODES = [Task.status.type.code(status.value) for status in TaskStatus]
+MEDIUM = Task.priority.type.code(TaskPriority.MEDIUM.value)
+
+def load_forest(connection, first_id, count, parent_of):
+    """
+    Bulk insert tasks and their closure rows
+
+    Args:
+        connection: Raw DBAPI connection
+        first_id (int): Id of the first task
+        count (int): Number of tasks
+        parent_of (callable): Maps a task offset to its parent offset, or None
+
+    Returns:
+        int: Number of closure rows
+    """
+    now = datetime.utcnow().isoformat(sep=" ")
+    cursor = connection.cursor()
+    ancestors = {}
+    tasks, closure = [], []
+    closure_rows = 0
+
+    def flush():
+        cursor.executemany(
+            "INSERT INTO tasks (id, parent_id, title, status, priority, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", tasks
+        )
+        cursor.executemany(
+            "INSERT INTO task_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, ?)", closure
+        )
+        tasks.clear()
+        closure.clear()
+
+    for offset in range(count):
+        task_id = first_id + offset
+        parent = parent_of(offset)
+        parent_id = None if parent is None else first_id + parent
+        chain = () if parent_id is None else ancestors[parent_id] + (parent_id,)
+        ancestors[task_id] = chain
+        tasks.append((task_id, parent_id, f"Task {task_id}", STATUS_CODES[task_id % 3], MEDIUM, now, now))
+        closure.append((task_id, task_id, 0))
+        closure.extend((ancestor, task_id, len(chain) - i) for i, ancestor in enumerate(chain))
+        closure_rows += len(chain) + 1
+        if len(tasks) == 50_000:
+            flush()
+    flush()
+    connection.commit()
+    return closure_rows
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+def naive_subtree(task_id):
+    """One query per level, the way a plain parent_id column is read"""
+    tasks = [db.session.get(Task, task_id)]
+    level = [task_id]
+    while level:
+        children = Task.query.filter(Task.parent_id.in_(level)).all()
+        tasks.extend(children)
+        level = [child.id for child in children]
+    return tasks
+
+def cte_subtree(task_id):
+    """Recursive CTE on parent_id, one query"""
+    return db.session.query(Task).from_statement(text(
+        "WITH RECURSIVE subtree(id) AS (SELECT :id UNION ALL "
+        "SELECT tasks.id FROM tasks JOIN subtree ON tasks.parent_id = subtree.id) "
+        "SELECT tasks.* FROM tasks JOIN subtree ON tasks.id = subtree.id"
+    )).params(id=task_id).all()
+
+def report(name, measurements):
+    print(f"  {name}")
+    for label, (elapsed, size) in measurements.items():
+        print(f"    {label:<14} {elapsed:10.2f} ms  ({size} rows)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(
+            "testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        )
+        with app.app_context():
+            db.create_all()
+            raw = db.engine.raw_connection()
+            started = time.perf_counter()
+            wide_rows = load_forest(
+                raw, 1, args.tasks, lambda offset: (offset - 1) // args.fanout if offset else None
+            )
+            deep_first = args.tasks + 1
+            deep_rows = load_forest(
+                raw, deep_first, args.tasks,
+                lambda offset: None if offset % args.depth == 0 else offset - 1
+            )
+            raw.execute("ANALYZE")
+            raw.close()
+            print(
+                f"Loaded 2 x {args.tasks} tasks, {wide_rows + deep_rows} closure rows "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            # A node two levels below the wide root, and the top of a chain
+            wide_node = 1 + args.fanout + 1
+            deep_root = deep_first
+            deep_leaf = deep_first + args.depth - 1
+
+            for name, node in (("wide subtree", wide_node), ("deep subtree", deep_root)):
+                measurements = {}
+                for label, func in (
+                    ("closure", lambda: TaskService.get_subtree(node)),
+                    ("recursive cte", lambda: cte_subtree(node)),
+                    ("per level", lambda: naive_subtree(node)),
+                ):
+                    elapsed, result = timed(func, args.repeat)
+                    measurements[label] = (elapsed, len(result))
+                report(f"{name} of task {node}", measurements)
+
+            elapsed, result = timed(lambda: TaskService.get_ancestors(deep_leaf), args.repeat)
+            report(f"ancestors of task {deep_leaf}", {"closure": (elapsed, len(result))})
+
+            for name, node in (("wide root", 1), ("deep chain", deep_root)):
+                elapsed, result = timed(lambda: TaskService.get_progress(node), args.repeat)
+                report(f"progress of {name}", {"closure": (elapsed, result["total"])})
+
+if __name__ == "__main__":
+    main()
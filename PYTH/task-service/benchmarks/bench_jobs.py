@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Request latency and throughput of background jobs
+
+Request latency: ``--tasks`` tasks are exported, imported and bulk
+deleted, once inline in the request that asks for it (the job is run
+before the response) and once queued, answering 202 while the runner
+does the work. Reported are the latency of that request and the time
+until the job was seen finished, polling its status every 100ms.
+
+Throughput: an import of ``--tasks`` tasks is run for several batch
+sizes, reporting tasks per second. Smaller chunks mean finer checkpoints
+and shorter write transactions, at the cost of more commits.
+
+Usage:
+    python -m benchmarks.bench_jobs [--tasks N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.job import JOB_QUEUED, JOB_RUNNING
+from internal.models.task import Task
+
+def make_app(directory, name, **overrides):
+    app = create_app(
+        "testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, name)}",
+        JOBS_ENABLED=True, JOB_OUTPUT_DIR=os.path.join(directory, "jobs"), **overrides
+    )
+    with app.app_context():
+        db.create_all()
+    return app
+
+def submit(client, job_type, params):
+    response = client.post("/api/jobs", data=json.dumps({"type": job_type, "params": params}),
+                           content_type="application/json")
+    assert response.status_code == 202
+    return response.headers["Location"]
+
+def wait(client, location):
+    while True:
+        job = json.loads(client.get(location).data)
+        if job["status"] not in (JOB_QUEUED, JOB_RUNNING):
+            assert job["status"] == "succeeded", job
+            return
+        time.sleep(0.1)
+
+def latency(directory, count, queued):
+    """Request and completion time, in milliseconds, of each job type"""
+    app = make_app(directory, f"latency-{queued}.db", JOB_RUNNER_EMBEDDED=queued, JOB_POLL_SECONDS=0.01)
+    runner = app.extensions["jobs"]
+    client = app.test_client()
+    tasks = [{"title": f"Task {i}", "priority": "low"} for i in range(count)]
+    timings = {}
+    for job_type, params in (("import", {"tasks": tasks}), ("export", {}), ("bulk_delete", {"priority": "low"})):
+        started = time.perf_counter()
+        location = submit(client, job_type, params)
+        if not queued:
+            with app.app_context():
+                runner.run_once()
+        answered = time.perf_counter()
+        wait(client, location)
+        timings[job_type] = ((answered - started) * 1e3, (time.perf_counter() - started) * 1e3)
+    runner.stop()
+    return timings
+
+def throughput(directory, count, batch_size):
+    """Seconds to import ``count`` tasks in chunks of ``batch_size``"""
+    app = make_app(directory, f"throughput-{batch_size}.db", JOB_RUNNER_EMBEDDED=False, JOB_BATCH_SIZE=batch_size)
+    submit(app.test_client(), "import", {"tasks": [{"title": f"Task {i}"} for i in range(count)]})
+    with app.app_context():
+        started = time.perf_counter()
+        app.extensions["jobs"].run_once()
+        elapsed = time.perf_counter() - started
+        assert Task.query.count() == count
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        inline, queued = latency(directory, args.tasks, False), latency(directory, args.tasks, True)
+        print(f"{args.tasks} tasks per job, milliseconds")
+        print(f"  {'job':<14}{'inline':>10}{'queued':>10}{'done':>10}")
+        for job_type, (answered, done) in queued.items():
+            print(f"  {job_type:<14}{inline[job_type][0]:10.1f}{answered:10.1f}{done:10.1f}")
+
+        print(f"import of {args.tasks} tasks")
+        print(f"  {'batch size':<12}{'seconds':>10}{'tasks/s':>10}")
+        for batch_size in (50, 500, 5000):
+            elapsed = throughput(directory, args.tasks, batch_size)
+            print(f"  {batch_size:<12}{elapsed:10.2f}{args.tasks / elapsed:10.0f}")
+
+if __name__ == "__main__":
+    main()
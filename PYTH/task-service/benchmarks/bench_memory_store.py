@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compare the database and the memory store behind TaskService
+
+The same ``--tasks`` tasks are loaded into a SQLite file (the default
+storage) and into the memory store, then the same TaskService calls are
+timed on both: a lookup by id, list pages with and without filters in
+every ordering, and single writes. The memory store runs without its log
+and with one (not synced), which is what a write costs when persisted.
+
+Reported per operation: median latency on each backend and the speedup.
+
+Usage:
+    python -m benchmarks.bench_memory_store [--tasks N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.memory_store import MemoryTaskStore
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task, TaskPriority, TaskStatus
+
+TAGS = ("backend", "frontend", "urgent", "review", "ops")
+
+def generate(count):
+    """
+    Yield task data in creation order
+
+    Args:
+        count (int): Number of tasks
+
+    Yields:
+        dict: Validated task data
+    """
+    rng = random.Random(0)
+    statuses = [status.value for status in TaskStatus]
+    priorities = [priority.value for priority in TaskPriority]
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        created_at = start + timedelta(seconds=i)
+        yield {
+            "title": f"Task {i}",
+            "description": "Collect the numbers and summarise them." if i % 2 else None,
+            "status": rng.choice(statuses),
+            "priority": rng.choice(priorities),
+            "due_date": created_at + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.6 else None,
+            "created_at": created_at,
+            "tags": rng.sample(TAGS, rng.randint(0, 2)),
+        }
+
+def load_database(count):
+    """Bulk insert the tasks, their tags and closure rows"""
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.executemany("INSERT INTO tags (id, name) VALUES (?, ?)", list(enumerate(TAGS, 1)))
+    tag_ids = {name: tag_id for tag_id, name in enumerate(TAGS, 1)}
+    tasks, links, closure = [], [], []
+    for task_id, data in enumerate(generate(count), 1):
+        created = data["created_at"].isoformat(sep=" ")
+        tasks.append((
+            task_id, data["title"], data["description"], Task.status.type.code(data["status"]),
+            Task.priority.type.code(data["priority"]),
+            data["due_date"] and data["due_date"].isoformat(sep=" "), created, created
+        ))
+        links.extend((task_id, tag_ids[name]) for name in data["tags"])
+        closure.append((task_id, task_id, 0))
+    cursor.executemany(
+        "INSERT INTO tasks (id, title, description, status, priority, due_date, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", tasks
+    )
+    cursor.executemany("INSERT INTO task_tags (task_id, tag_id) VALUES (?, ?)", links)
+    cursor.executemany("INSERT INTO task_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, ?)", closure)
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+
+def load_memory(store, count):
+    for data in generate(count):
+        store.create_task(data)
+
+def median_us(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+def operations(count):
+    """(label, call) pairs timed on each backend"""
+    ids = random.Random(1)
+    middle = count // 2
+    return [
+        ("get by id", lambda: TaskService.get_task_by_id(ids.randint(1, count))),
+        ("list, newest first", lambda: TaskService.list_tasks()),
+        ("list, page 50", lambda: TaskService.list_tasks(page=50)),
+        ("list, status filter", lambda: TaskService.list_tasks(status=TaskStatus.PENDING.value)),
+        ("list, status + priority", lambda: TaskService.list_tasks(
+            status=TaskStatus.PENDING.value, priority=TaskPriority.HIGH.value)),
+        ("list, by priority", lambda: TaskService.list_tasks(sort="priority")),
+        ("list, by due date", lambda: TaskService.list_tasks(sort="due_date", order="asc")),
+        ("list, tag filter", lambda: TaskService.list_tasks(tags=("urgent",))),
+        ("tag counts", lambda: TaskService.get_tag_counts()),
+        ("update status", lambda: TaskService.update_task_status(
+            ids.randint(1, middle), random.choice([status.value for status in TaskStatus]))),
+        ("create", lambda: TaskService.create_task({"title": "New task", "tags": ["ops"]})),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        backends = (
+            ("database", {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'tasks.db')}"}),
+            ("memory", {"STORAGE_BACKEND": "memory"}),
+            ("memory + log", {"STORAGE_BACKEND": "memory",
+                              "MEMORY_STORE_LOG_PATH": os.path.join(directory, "tasks.log")}),
+        )
+        for name, overrides in backends:
+            app = create_app("testing", **overrides)
+            with app.app_context():
+                started = time.perf_counter()
+                store = app.extensions.get("task_store")
+                if isinstance(store, MemoryTaskStore):
+                    load_memory(store, args.tasks)
+                else:
+                    db.create_all()
+                    load_database(args.tasks)
+                print(f"{name:<14} loaded {args.tasks} tasks in {time.perf_counter() - started:.1f}s")
+                results[name] = {
+                    label: median_us(call, args.repeat) for label, call in operations(args.tasks)
+                }
+                if store:
+                    store.close()
+
+    names = list(results)
+    print(f"  {'operation':<26}" + "".join(f"{name:>14}" for name in names) + f"{'speedup':>9}")
+    for label in results["database"]:
+        row = [results[name][label] for name in names]
+        print(f"  {label:<26}" + "".join(f"{value:12.1f}us" for value in row) + f"{row[0] / row[1]:8.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare JSON, MessagePack and CBOR list responses
+
+A page of ``--per-page`` tasks (the list endpoint's maximum is 100, a
+larger page shows the trend) is encoded with each format the way the
+API encodes it, and decoded the way a client that needs the dates
+decodes it: JSON clients also parse the ISO timestamps, binary clients
+get native timestamps from the decoder.
+
+Reported per format: median encode and decode time and body size.
+
+Usage:
+    python -m benchmarks.bench_negotiation [--per-page N] [--repeat N]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from internal.api.negotiation import CBOR_MIMETYPE, JSON_MIMETYPE, MSGPACK_MIMETYPE, encode_response
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.tag import Tag
+from internal.models.task import Task, TaskPriority, TaskStatus
+
+DATE_FIELDS = ("due_date", "created_at", "updated_at")
+
+def decode_json(body):
+    import json
+    payload = json.loads(body)
+    for task in payload["tasks"]:
+        for field in DATE_FIELDS:
+            if task[field] is not None:
+                task[field] = datetime.fromisoformat(task[field])
+    return payload
+
+def decode_msgpack(body):
+    import msgpack
+    return msgpack.unpackb(body, timestamp=3)
+
+def decode_cbor(body):
+    import cbor2
+    return cbor2.loads(body)
+
+FORMATS = (
+    ("JSON", JSON_MIMETYPE, decode_json),
+    ("MessagePack", MSGPACK_MIMETYPE, decode_msgpack),
+    ("CBOR", CBOR_MIMETYPE, decode_cbor),
+)
+
+def seed(count):
+    tags = [Tag(name=name) for name in ("backend", "frontend", "urgent", "review")]
+    now = datetime.utcnow()
+    db.session.add_all(
+        Task(
+            title=f"Task {i}: prepare the quarterly report",
+            description="Collect the numbers from every team and summarise them." if i % 2 else None,
+            status=list(TaskStatus)[i % 3].value,
+            priority=list(TaskPriority)[i % 3].value,
+            due_date=now + timedelta(days=i % 30) if i % 3 else None,
+            tags=tags[: i % 4],
+        )
+        for i in range(count)
+    )
+    db.session.commit()
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # Compact JSON, as served outside debug mode
+    app = create_app("testing", DEBUG=False)
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        seed(args.per_page)
+        tasks, _, total = TaskService.list_tasks(per_page=args.per_page)
+        payload = {
+            "tasks": [task.to_dict() for task in tasks],
+            "pagination": {"page": 1, "per_page": args.per_page, "total_pages": 1, "total_items": total},
+        }
+
+        print(f"List page of {len(tasks)} tasks")
+        print(f"  {'format':<12} {'encode':>10} {'decode':>10} {'bytes':>9} {'vs JSON':>8}")
+        json_size = None
+        for name, mimetype, decode in FORMATS:
+            body = encode_response(payload, mimetype).get_data()
+            # Every format round-trips the timestamps (binary ones as aware UTC)
+            assert decode(body)["tasks"][0]["created_at"].replace(tzinfo=None) == tasks[0].created_at
+            encode_ms = median_ms(lambda: encode_response(payload, mimetype).get_data(), args.repeat)
+            decode_ms = median_ms(lambda: decode(body), args.repeat)
+            json_size = json_size or len(body)
+            print(
+                f"  {name:<12} {encode_ms:8.3f}ms {decode_ms:8.3f}ms {len(body):9d} "
+                f"{len(body) / json_size:8.0%}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Write stalls during a backfill, in one statement and chunked
+
+``--tasks`` tasks are loaded into a SQLite file, then a column is filled
+in, once with a single UPDATE as a plain revision would, and once with
+``backfill``. A writer thread keeps creating tasks meanwhile, as requests
+would. Reported: how long the backfill took and the writer's p50, p99 and
+worst latency. The single UPDATE holds the write lock until it commits,
+so the writer waits for all of it.
+
+Usage:
+    python -m benchmarks.bench_online_migrations [--tasks N] [--batch-size N]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.online_migrations import backfill
+
+def load(count):
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("ALTER TABLE tasks ADD COLUMN title_length INTEGER"))
+        connection.execute(sa.text(
+            "INSERT INTO tasks (title, status, priority, created_at, updated_at) "
+            "VALUES (:title, 1, 2, '2025-01-01 00:00:00', '2025-01-01 00:00:00')"
+        ), [{"title": f"Task {i}"} for i in range(count)])
+
+def writer(engine, stop, latencies):
+    """Create tasks until stopped, recording each commit's latency"""
+    statement = sa.text(
+        "INSERT INTO tasks (title, status, priority, created_at, updated_at) "
+        "VALUES ('Concurrent', 1, 2, '2025-01-01 00:00:00', '2025-01-01 00:00:00')"
+    )
+    while not stop.is_set():
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            connection.execute(statement)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.002)
+
+def single_statement():
+    with db.engine.begin() as connection:
+        connection.execute(sa.text("UPDATE tasks SET title_length = LENGTH(title)"))
+
+def chunked(batch_size):
+    with db.engine.connect() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            backfill("bench_title_length", "tasks", "title_length = LENGTH(title)", batch_size=batch_size)
+
+def measure(directory, name, migration, tasks):
+    app = create_app(
+        "testing",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, name)}.db",
+        SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 60}},
+    )
+    with app.app_context():
+        db.create_all()
+        load(tasks)
+        stop, latencies = threading.Event(), []
+        thread = threading.Thread(target=writer, args=(db.engine, stop, latencies))
+        thread.start()
+        time.sleep(0.2)
+        started = time.perf_counter()
+        migration()
+        elapsed = time.perf_counter() - started
+        time.sleep(0.2)
+        stop.set()
+        thread.join()
+        db.engine.dispose()
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+    return elapsed, percentile(0.5), percentile(0.99), latencies[-1] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"backfill of {args.tasks} tasks with a concurrent writer")
+    print(f"  {'method':<18}{'duration':>10}{'write p50':>12}{'write p99':>12}{'write max':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, migration in (
+            ("single UPDATE", single_statement),
+            (f"chunks of {args.batch_size}", lambda: chunked(args.batch_size)),
+        ):
+            elapsed, p50, p99, worst = measure(directory, label.replace(" ", "_"), migration, args.tasks)
+            print(f"  {label:<18}{elapsed:9.2f}s{p50:10.1f}ms{p99:10.1f}ms{worst:10.1f}ms")
+
+if __name__ == "__main__":
+    main()
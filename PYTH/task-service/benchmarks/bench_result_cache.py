@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/tasks with and without the result cache
+
+Each variant requests the same few list pages over and over, the way
+dashboards poll, against a file-backed SQLite database.
+
+Usage:
+    python -m benchmarks.bench_result_cache [--tasks N] [--requests N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.task import Task
+
+PAGES = [
+    "/api/tasks?page=1",
+    "/api/tasks?status=pending&page=1",
+    "/api/tasks?status=completed&page=1",
+    "/api/tasks?priority=high&page=1",
+]
+
+def measure(directory, tasks, requests, **overrides):
+    app = create_app(
+        "testing",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        **overrides
+    )
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        if not Task.query.count():
+            db.session.add_all(
+                Task(
+                    title=f"Task {i}",
+                    status=("pending", "in_progress", "completed")[i % 3],
+                    priority=("low", "medium", "high")[i % 3]
+                )
+                for i in range(tasks)
+            )
+            db.session.commit()
+
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            response = client.get(PAGES[i % len(PAGES)])
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    return statistics.median(timings) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        uncached = measure(directory, args.tasks, args.requests)
+        memory = measure(directory, args.tasks, args.requests, RESULT_CACHE_ENABLED=True)
+        shared = measure(
+            directory, args.tasks, args.requests,
+            RESULT_CACHE_ENABLED=True, RESULT_CACHE_BACKEND="sqlite",
+            RESULT_CACHE_PATH=os.path.join(directory, "cache.db")
+        )
+
+    print(f"{args.tasks} tasks, median of {args.requests} list requests over {len(PAGES)} pages")
+    print(f"  no cache:      {uncached:8.0f} us")
+    print(f"  memory cache:  {memory:8.0f} us  ({uncached / memory:.1f}x)")
+    print(f"  sqlite cache:  {shared:8.0f} us  ({uncached / shared:.1f}x)")
+
+if __name__ == "__main__":
+    main()
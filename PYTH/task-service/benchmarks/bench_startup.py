@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark with a committed budget
+
+Measures, in fresh interpreters, the wall time from process start to the
+first served request and the cumulative import time of the heaviest
+modules (``python -X importtime``). The run fails when the median
+time-to-first-request exceeds the budget in ``startup_budget.json`` or
+when a module the budget forbids at startup gets imported.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+
+FIRST_REQUEST = """
+import sys
+from internal.app import create_app
+from internal.db.database import db
+app = create_app("testing")
+with app.app_context():
+    db.create_all()
+    response = app.test_client().get("/api/tasks")
+assert response.status_code == 200, response.status_code
+print("MODULES " + " ".join(sorted(sys.modules)))
+"""
+
+def time_to_first_request():
+    """
+    Start a fresh interpreter and serve one request
+
+    Returns:
+        tuple: (seconds, set of imported module names)
+    """
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    elapsed = time.perf_counter() - started
+    modules = set()
+    for line in output.splitlines():
+        if line.startswith("MODULES "):
+            modules = set(line.split()[1:])
+    return elapsed, modules
+
+def import_profile():
+    """
+    Cumulative import time per top-level package
+
+    A package nested inside another (sqlalchemy under flask_sqlalchemy)
+    is reported under both, so the figures overlap.
+
+    Returns:
+        list: (microseconds, package) pairs, heaviest first
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", FIRST_REQUEST],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    ).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = max(totals.get(package, 0), int(cumulative))
+    return sorted(((us, name) for name, us in totals.items()), reverse=True)
+
+def load_budget():
+    """Read the committed startup budget"""
+    with open(BUDGET_FILE) as budget_file:
+        return json.load(budget_file)
+
+def budget_failures(budget, elapsed_ms, modules):
+    """
+    Compare one startup measurement with the budget
+
+    Args:
+        budget (dict): Contents of startup_budget.json
+        elapsed_ms (float): Time to first request, None to only check modules
+        modules (set): Modules imported by then
+
+    Returns:
+        list: Descriptions of the exceeded limits, empty when within budget
+    """
+    failures = []
+    if elapsed_ms is not None and elapsed_ms > budget["time_to_first_request_ms"]:
+        failures.append(
+            f"time to first request {elapsed_ms:.0f} ms exceeds budget "
+            f"{budget['time_to_first_request_ms']} ms"
+        )
+    if len(modules) > budget["max_modules"]:
+        failures.append(f"{len(modules)} modules loaded, budget is {budget['max_modules']}")
+    for name in budget["forbidden_modules"]:
+        if name in modules:
+            failures.append(f"{name} is imported at startup")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    budget = load_budget()
+    timings = []
+    modules = set()
+    for _ in range(args.runs):
+        elapsed, modules = time_to_first_request()
+        timings.append(elapsed)
+    median_ms = statistics.median(timings) * 1000
+
+    print(f"time to first request: median {median_ms:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms over {args.runs} runs")
+    print(f"modules loaded: {len(modules)}")
+    print("heaviest imports (cumulative):")
+    for us, name in import_profile()[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = budget_failures(budget, median_ms, modules)
+    for failure in failures:
+        print(f"BUDGET EXCEEDED: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
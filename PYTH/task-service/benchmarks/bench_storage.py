@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Measure the storage saved by SMALLINT status/priority codes
+
+The same ``--tasks`` tasks are loaded into two SQLite files: one with
+the current schema, one with the previous ``VARCHAR(20)`` status and
+priority columns and otherwise identical indexes. Table and index sizes
+are read from the ``dbstat`` virtual table.
+
+Sorting by priority is timed on both: the coded column sorts by rank
+straight off ``ix_tasks_priority_created_at``, while rank order over
+strings needs a CASE expression and a full sort.
+
+Usage:
+    python -m benchmarks.bench_storage [--tasks N]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, String, create_engine, text
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task, TaskPriority, TaskStatus
+
+def legacy_tasks_table():
+    """The tasks table with status and priority stored as strings"""
+    table = Task.__table__.to_metadata(MetaData())
+    table.c.status.type = String(20)
+    table.c.priority.type = String(20)
+    return table
+
+def generate(count):
+    """
+    Yield task rows with string status and priority
+
+    Args:
+        count (int): Number of tasks
+
+    Yields:
+        tuple: (id, title, status, priority, due_date, created_at)
+    """
+    rng = random.Random(0)
+    statuses = [status.value for status in TaskStatus]
+    priorities = [priority.value for priority in TaskPriority]
+    start = datetime(2025, 1, 1)
+    for task_id in range(1, count + 1):
+        created_at = start + timedelta(seconds=task_id)
+        due_date = created_at + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.6 else None
+        yield (
+            task_id, f"Task {task_id}", rng.choice(statuses), rng.choice(priorities),
+            due_date and due_date.isoformat(sep=" "), created_at.isoformat(sep=" ")
+        )
+
+def load(connection, rows, encode):
+    cursor = connection.cursor()
+    batch = []
+    for task_id, title, status, priority, due_date, created_at in rows:
+        status, priority = encode(status, priority)
+        batch.append((task_id, title, status, priority, due_date, created_at, created_at))
+        if len(batch) == 50_000:
+            insert(cursor, batch)
+    insert(cursor, batch)
+    connection.commit()
+    connection.execute("VACUUM")
+
+def insert(cursor, batch):
+    cursor.executemany(
+        "INSERT INTO tasks (id, title, status, priority, due_date, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", batch
+    )
+    batch.clear()
+
+def sizes(connection):
+    """Bytes per table and index of tasks"""
+    return dict(connection.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name = 'tasks' OR name LIKE 'ix_tasks%' "
+        "GROUP BY name ORDER BY name"
+    ).fetchall())
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    status_code, priority_code = Task.status.type.code, Task.priority.type.code
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_engine = create_engine(f"sqlite:///{os.path.join(directory, 'legacy.db')}")
+        legacy_tasks_table().metadata.create_all(legacy_engine)
+        legacy = legacy_engine.raw_connection()
+        load(legacy, generate(args.tasks), lambda status, priority: (status, priority))
+
+        app = create_app(
+            "testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'coded.db')}"
+        )
+        with app.app_context():
+            db.create_all()
+            coded = db.engine.raw_connection()
+            load(coded, generate(args.tasks), lambda status, priority: (
+                status_code(status), priority_code(priority)
+            ))
+
+            before, after = sizes(legacy), sizes(coded)
+            print(f"{args.tasks} tasks")
+            print(f"  {'':<30} {'VARCHAR(20)':>12} {'SMALLINT':>12} {'saved':>8}")
+            for name in list(before) + ["total"]:
+                old = sum(before.values()) if name == "total" else before[name]
+                new = sum(after.values()) if name == "total" else after[name]
+                print(f"  {name:<30} {old / 2**20:10.1f}MB {new / 2**20:10.1f}MB {1 - new / old:8.1%}")
+
+            rank = "CASE priority WHEN 'high' THEN 3 WHEN 'medium' THEN 2 WHEN 'low' THEN 1 END"
+            legacy_sort = (
+                f"SELECT * FROM tasks ORDER BY {rank} DESC, created_at DESC, id DESC LIMIT 20"
+            )
+            legacy_ms = timed(lambda: legacy.execute(legacy_sort).fetchall(), args.repeat)
+            coded_ms = timed(lambda: TaskService.list_tasks(sort="priority"), args.repeat)
+            plan = coded.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM tasks ORDER BY priority DESC, created_at DESC, "
+                "id DESC LIMIT 20"
+            ).fetchall()
+            print("  first page by priority, highest first")
+            print(f"    strings + CASE {legacy_ms:10.2f} ms")
+            print(f"    codes          {coded_ms:10.2f} ms  (incl. count)  plan: {plan[0][-1]}")
+            coded.close()
+        legacy.close()
+        legacy_engine.dispose()
+
+if __name__ == "__main__":
+    main()
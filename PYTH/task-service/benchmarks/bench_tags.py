@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark multi-tag filtering and tag counts on millions of task-tag pairs
+
+``--tasks`` tasks with ``--tags-per-task`` tags each are loaded into a
+file-backed SQLite database. Tags are drawn from a vocabulary of
+``--vocabulary`` names with a skewed distribution, so that common and
+rare tags are both measured.
+
+Each filter is timed through ``TaskService.list_tasks`` (what the API
+uses) and compared with the label-in-title approach it replaces, a
+``LIKE`` scan over every title. The query plan of each filter is printed
+to show that it is driven by ``ix_task_tags_tag_task``.
+
+Usage:
+    python -m benchmarks.bench_tags [--tasks N] [--tags-per-task N] [--vocabulary N]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.queries import count_tags
+from internal.handlers.task_service import TaskService
+from internal.models.tag import TAG_MODE_ALL, TAG_MODE_ANY, tagged_task_ids
+from internal.models.task import Task, TaskPriority, TaskStatus
+
+def load(connection, tasks, tags_per_task, vocabulary):
+    """
+    Bulk insert tags, tasks and their links
+
+    Tag names are also written into the titles, the way labels were
+    encoded before tags existed.
+
+    Args:
+        connection: Raw DBAPI connection
+        tasks (int): Number of tasks
+        tags_per_task (int): Tags per task
+        vocabulary (int): Number of distinct tags
+
+    Returns:
+        int: Number of task-tag pairs
+    """
+    rng = random.Random(0)
+    names = [f"tag{i}" for i in range(vocabulary)]
+    # Zipf-like weights: tag0 is by far the most common
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+    now = datetime.utcnow().isoformat(sep=" ")
+    pending = Task.status.type.code(TaskStatus.PENDING.value)
+    medium = Task.priority.type.code(TaskPriority.MEDIUM.value)
+    cursor = connection.cursor()
+    cursor.executemany("INSERT INTO tags (id, name) VALUES (?, ?)", enumerate(names, 1))
+
+    rows, links, pairs = [], [], 0
+
+    def flush():
+        cursor.executemany(
+            "INSERT INTO tasks (id, title, status, priority, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        cursor.executemany("INSERT INTO task_tags (task_id, tag_id) VALUES (?, ?)", links)
+        rows.clear()
+        links.clear()
+
+    population = range(vocabulary)
+    for task_id in range(1, tasks + 1):
+        chosen = set()
+        while len(chosen) < tags_per_task:
+            chosen.update(rng.choices(population, cum_weights=cumulative, k=tags_per_task - len(chosen)))
+        labels = " ".join(f"[{names[tag]}]" for tag in sorted(chosen))
+        rows.append((task_id, f"{labels} Task {task_id}", pending, medium, now, now))
+        links.extend((task_id, tag + 1) for tag in chosen)
+        pairs += len(chosen)
+        if len(rows) == 50_000:
+            flush()
+    flush()
+    connection.commit()
+    return pairs
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+def title_scan(names, mode):
+    """Labels encoded in titles: one LIKE per label over every row"""
+    likes = [Task.title.like(f"%[{name}]%") for name in names]
+    query = Task.query.filter(db.and_(*likes) if mode == TAG_MODE_ALL else db.or_(*likes))
+    return query.count(), query.order_by(Task.created_at.desc()).limit(20).all()
+
+def plan(names, mode):
+    statement = tagged_task_ids(names, mode).compile(db.engine, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--tags-per-task", type=int, default=3)
+    parser.add_argument("--vocabulary", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(
+            "testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        )
+        with app.app_context():
+            db.create_all()
+            raw = db.engine.raw_connection()
+            started = time.perf_counter()
+            pairs = load(raw, args.tasks, args.tags_per_task, args.vocabulary)
+            raw.execute("ANALYZE")
+            raw.close()
+            print(
+                f"Loaded {args.tasks} tasks, {pairs} task-tag pairs "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            rare = f"tag{args.vocabulary - 1}"
+            filters = (
+                ("common tag", ("tag0",), TAG_MODE_ALL),
+                ("rare tag", (rare,), TAG_MODE_ALL),
+                ("all of common+rare", ("tag0", rare), TAG_MODE_ALL),
+                ("all of 3 common", ("tag0", "tag1", "tag2"), TAG_MODE_ALL),
+                ("any of 3 rare", tuple(f"tag{args.vocabulary - i}" for i in (1, 2, 3)), TAG_MODE_ANY),
+            )
+            for label, names, mode in filters:
+                tags_ms, (_, _, total) = timed(
+                    lambda: TaskService.list_tasks(tags=names, tag_mode=mode), args.repeat
+                )
+                scan_ms, _ = timed(lambda: title_scan(names, mode), args.repeat)
+                print(f"  {label} ({mode}: {', '.join(names)}) - {total} matches")
+                print(f"    tags           {tags_ms:10.2f} ms")
+                print(f"    title LIKE     {scan_ms:10.2f} ms")
+                for step in plan(names, mode):
+                    print(f"      plan: {step}")
+
+            elapsed, counts = timed(lambda: count_tags(db.session), args.repeat)
+            print(f"  tag counts, all tasks   {elapsed:10.2f} ms  ({len(counts)} tags)")
+            elapsed, counts = timed(lambda: count_tags(db.session, tags=(rare,)), args.repeat)
+            print(f"  tag counts, rare facet  {elapsed:10.2f} ms  ({len(counts)} tags)")
+
+if __name__ == "__main__":
+    main()
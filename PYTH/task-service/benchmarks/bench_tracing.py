@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cost of request tracing, sampled and not
+
+Ordinary requests (a lookup by id, a filtered list page and a create) are
+timed against a file-backed SQLite database holding ``--tasks`` tasks,
+with tracing disabled, enabled with a sample rate of 0, and enabled with
+every request traced to a file. The variants alternate and the best of
+three rounds is kept, as in ``bench_deadlines``.
+
+The unsampled column is what tracing costs a deployment whose requests
+are not picked; the sampled column is the price of a traced request.
+
+Usage:
+    python -m benchmarks.bench_tracing [--tasks N] [--requests N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.task import Task
+
+REQUESTS = (
+    ("get by id", "GET", "/api/tasks/{id}"),
+    ("list, status filter", "GET", "/api/tasks?status=pending&page=3"),
+    ("create", "POST", "/api/tasks"),
+)
+
+def make_app(directory, tasks, **overrides):
+    app = create_app(
+        "testing",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        TRACE_FILE_PATH=os.path.join(directory, "traces.jsonl"),
+        **overrides
+    )
+    with app.app_context():
+        db.create_all()
+        if not Task.query.count():
+            db.session.add_all(
+                Task(title=f"Task {i}", status=("pending", "in_progress", "completed")[i % 3])
+                for i in range(tasks)
+            )
+            db.session.commit()
+    return app
+
+def latencies(app, tasks, requests):
+    """Median latency per request kind, in microseconds"""
+    client = app.test_client()
+    results = {}
+    for label, method, path in REQUESTS:
+        def call(i):
+            if method == "POST":
+                return client.post(path, json={"title": f"Bench {i}"})
+            return client.get(path.format(id=i % tasks + 1))
+        # Warm the page cache and the statement caches first
+        for i in range(requests // 10):
+            call(i)
+        timings = []
+        for i in range(requests):
+            started = time.perf_counter()
+            response = call(i)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code in (200, 201)
+        results[label] = statistics.median(timings) * 1e6
+    tracer = app.extensions.get("tracing")
+    if tracer is not None:
+        tracer.exporter.flush(60)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        variants = {
+            "disabled": make_app(directory, args.tasks),
+            "unsampled": make_app(directory, args.tasks, TRACING_ENABLED=True, TRACE_SAMPLE_RATE=0),
+            "sampled": make_app(directory, args.tasks, TRACING_ENABLED=True, TRACE_SAMPLE_RATE=1),
+        }
+        best = {name: {} for name in variants}
+        for _ in range(3):
+            for name, app in variants.items():
+                for label, value in latencies(app, args.tasks, args.requests).items():
+                    best[name][label] = min(best[name].get(label, value), value)
+
+        off = best["disabled"]
+        print(f"  {'request':<22}{'disabled':>12}{'unsampled':>20}{'sampled':>20}")
+        for label in off:
+            cells = [f"{off[label]:10.1f}us"]
+            for name in ("unsampled", "sampled"):
+                value = best[name][label]
+                cells.append(f"{value:10.1f}us ({value / off[label] - 1:+6.1%})")
+            print(f"  {label:<22}" + "".join(f"{cell:>20}" if i else f"{cell:>12}" for i, cell in enumerate(cells)))
+        stats = variants["sampled"].extensions["tracing"].stats()
+        print(f"  sampled: {stats['exported_traces']} traces, {stats['spans']} spans exported, "
+              f"{stats['dropped_traces']} dropped")
+
+if __name__ == "__main__":
+    main()
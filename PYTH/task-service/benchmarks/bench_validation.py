@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled schema loaders against marshmallow
+
+Usage:
+    python -m benchmarks.bench_validation [--iterations N]
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from internal.models.compiled import compile_schema
+from internal.models.schemas import TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema
+
+DUE = (datetime.utcnow() + timedelta(days=7)).isoformat()
+
+CASES = [
+    ("create", TaskCreateSchema, {
+        "title": "Write report", "description": "Quarterly numbers",
+        "due_date": DUE, "priority": "high"
+    }),
+    ("create (invalid)", TaskCreateSchema, {"title": "", "priority": "urgent"}),
+    ("update", TaskUpdateSchema, {"title": "Renamed", "status": "in_progress"}),
+    ("status", TaskStatusUpdateSchema, {"status": "completed"}),
+]
+
+def bench(loader, payload, iterations):
+    def run():
+        try:
+            loader.load(payload)
+        except Exception:
+            pass
+    return min(timeit.repeat(run, number=iterations, repeat=5)) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'case':<18} {'marshmallow us':>15} {'compiled us':>12} {'speedup':>8}")
+    for name, schema_cls, payload in CASES:
+        reference = bench(schema_cls(), payload, args.iterations)
+        compiled = bench(compile_schema(schema_cls()), payload, args.iterations)
+        print(f"{name:<18} {reference:>15.2f} {compiled:>12.2f} {reference / compiled:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Write latency and delivery throughput of webhooks
+
+Write latency: ``--writes`` tasks are created through the API with
+webhooks disabled, enabled without subscribers, and enabled with
+``--subscribers`` subscriptions to a local endpoint that takes
+``--delay-ms`` to answer. Delivery runs in the background, so only the
+outbox insert should show up in the request latency.
+
+Delivery throughput: the outbox is filled with ``--events`` events and
+drained by the dispatcher for several batch sizes, reporting requests
+and events per second.
+
+Usage:
+    python -m benchmarks.bench_webhooks [--writes N] [--events N] [--subscribers N] [--delay-ms N]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.handlers.webhook_service import WebhookService
+
+def start_receiver(delay):
+    """Local endpoint answering 200 after ``delay`` seconds"""
+    received = {"requests": 0, "events": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(delay)
+            with lock:
+                received["requests"] += 1
+                received["events"] += len(body["events"])
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/hook", received
+
+def make_app(directory, name, **overrides):
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, name)}", **overrides)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def write_latency(app, url, subscribers, writes):
+    """Median and p99 latency of POST /api/tasks, in microseconds"""
+    client = app.test_client()
+    with app.app_context():
+        for _ in range(subscribers):
+            WebhookService.create_subscription({"url": url})
+    timings = []
+    for i in range(writes):
+        started = time.perf_counter()
+        response = client.post("/api/tasks", data=json.dumps({"title": f"Task {i}"}),
+                               content_type="application/json")
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 201
+    timings.sort()
+    return statistics.median(timings) * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+
+def throughput(directory, url, received, events, batch_size):
+    """Seconds to deliver ``events`` outbox events to one subscription"""
+    app = make_app(directory, f"throughput-{batch_size}.db", WEBHOOKS_ENABLED=True, WEBHOOK_BATCH_SIZE=batch_size)
+    dispatcher = app.extensions["webhooks"]
+    with app.app_context():
+        WebhookService.create_subscription({"url": url})
+        for i in range(events):
+            TaskService.create_task({"title": f"Task {i}"})
+    received.update(requests=0, events=0)
+    started = time.perf_counter()
+    while dispatcher.run_once():
+        pass
+    elapsed = time.perf_counter() - started
+    assert received["events"] == events
+    return elapsed, received["requests"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--subscribers", type=int, default=3)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server, url, received = start_receiver(args.delay_ms / 1000)
+    with tempfile.TemporaryDirectory() as directory:
+        scenarios = (
+            ("webhooks off", {}, 0),
+            ("on, no subscribers", {"WEBHOOKS_ENABLED": True}, 0),
+            (f"on, {args.subscribers} subscribers", {"WEBHOOKS_ENABLED": True}, args.subscribers),
+        )
+        print(f"create latency, endpoint answering in {args.delay_ms:.0f}ms")
+        print(f"  {'scenario':<22}{'p50':>10}{'p99':>10}")
+        for index, (label, overrides, subscribers) in enumerate(scenarios):
+            app = make_app(directory, f"latency-{index}.db", **overrides)
+            p50, p99 = write_latency(app, url, subscribers, args.writes)
+            print(f"  {label:<22}{p50:8.0f}us{p99:8.0f}us")
+            if "webhooks" in app.extensions:
+                app.extensions["webhooks"].stop()
+
+        print(f"delivery of {args.events} events to one endpoint")
+        print(f"  {'batch size':<12}{'requests':>10}{'seconds':>10}{'events/s':>10}")
+        for batch_size in (1, 10, 100):
+            elapsed, requests = throughput(directory, url, received, args.events, batch_size)
+            print(f"  {batch_size:<12}{requests:>10}{elapsed:10.2f}{args.events / elapsed:10.0f}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
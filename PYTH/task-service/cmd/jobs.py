@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Background job runner and job listing
+
+Usage:
+    python -m cmd.jobs run
+    python -m cmd.jobs list [--status STATUS] [--type TYPE]
+
+``run`` runs jobs in a process of its own, next to the web workers. Set
+``JOB_RUNNER_EMBEDDED=false`` for the web workers to only queue jobs and
+leave them to such runners. On Ctrl-C, running jobs are handed back after
+their current chunk, so that another runner resumes them.
+``list`` prints the most recent jobs with their progress.
+"""
+import argparse
+import os
+import sys
+import threading
+
+from internal.app import create_app
+from internal.handlers.job_service import JobService
+from internal.models.job import JOB_STATUSES, JOB_TYPES
+
+def print_jobs(jobs):
+    if not jobs:
+        print("No jobs")
+        return
+    print(f"{'id':>6}  {'type':<12}{'status':<11}{'progress':>18}{'attempts':>10}  created")
+    for job in jobs:
+        total = job.progress_total
+        progress = f"{job.progress_done}/{total}" if total is not None else str(job.progress_done)
+        print(f"{job.id:>6}  {job.job_type:<12}{job.status:<11}{progress:>18}{job.attempts:>10}  "
+              f"{job.created_at:%Y-%m-%d %H:%M:%S}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and inspect background jobs")
+    parser.add_argument(
+        "--config", default=os.environ.get("FLASK_ENV", "production"),
+        help="Configuration name passed to create_app"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="Run queued jobs until interrupted")
+    list_parser = commands.add_parser("list", help="List recent jobs")
+    list_parser.add_argument("--status", choices=JOB_STATUSES)
+    list_parser.add_argument("--type", choices=JOB_TYPES)
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    runner = app.extensions.get("jobs")
+    if runner is None:
+        parser.error("JOBS_ENABLED is not set")
+
+    if args.command == "list":
+        with app.app_context():
+            print_jobs(JobService.list_jobs(status=args.status, job_type=args.type))
+        return
+
+    runner.ensure_started()
+    print(f"Running jobs as {runner.owner} with {runner.workers} workers", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("Stopping, running jobs are handed back after their current chunk", file=sys.stderr)
+        runner.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Progress of online backfills
+
+Usage:
+    python -m cmd.migrations status [--watch SECONDS]
+    python -m cmd.migrations reset NAME
+
+``status`` lists the checkpoints written by ``backfill`` in revision
+scripts, including the one of an upgrade running in another shell.
+``reset`` forgets a checkpoint so the backfill starts over the next time
+its revision runs.
+"""
+import argparse
+import os
+import sys
+import time
+
+import sqlalchemy as sa
+
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.online_migrations import checkpoints, list_checkpoints
+
+def print_status(rows):
+    if not rows:
+        print("No backfills recorded")
+        return
+    print(f"{'name':<40}{'table':<16}{'rows':>22}{'state':>12}  updated")
+    for row in rows:
+        done, total = row["rows_done"], row["rows_total"]
+        rows_text = f"{done}/{total} ({min(done / total, 1):.0%})" if total else str(done)
+        state = "completed" if row["completed_at"] else "running"
+        print(f"{row['name']:<40}{row['table_name']:<16}{rows_text:>22}{state:>12}  {row['updated_at']:%Y-%m-%d %H:%M:%S}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect online backfills")
+    parser.add_argument(
+        "--config", default=os.environ.get("FLASK_ENV", "production"),
+        help="Configuration name passed to create_app"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    status_parser = commands.add_parser("status", help="List backfill checkpoints")
+    status_parser.add_argument("--watch", type=float, help="Refresh every SECONDS until interrupted")
+    reset_parser = commands.add_parser("reset", help="Forget a backfill checkpoint")
+    reset_parser.add_argument("name")
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context(), db.engine.connect() as connection:
+        if args.command == "reset":
+            if not list_checkpoints(connection):
+                parser.error("No backfills recorded")
+            deleted = connection.execute(sa.delete(checkpoints).where(checkpoints.c.name == args.name)).rowcount
+            connection.commit()
+            if not deleted:
+                parser.error(f"No backfill named {args.name}")
+            print(f"Forgot backfill {args.name}", file=sys.stderr)
+            return
+
+        while True:
+            print_status(list_checkpoints(connection))
+            connection.rollback()
+            if not args.watch:
+                return
+            try:
+                time.sleep(args.watch)
+            except KeyboardInterrupt:
+                return
+            print()
+
+if __name__ == "__main__":
+    main()
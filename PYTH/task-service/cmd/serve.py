@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Production server entry point
+
+Usage:
+    python -m cmd.serve [--bind HOST:PORT] [--workers N] [--threads N]
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import os
+
+from internal.server import run
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the task service behind gunicorn")
+    parser.add_argument("--bind", help="Address to listen on, defaults to 0.0.0.0:$PORT")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to 2 * CPUs + 1")
+    parser.add_argument("--threads", type=int, help="Threads per worker")
+    parser.add_argument(
+        "--config", default=os.environ.get("FLASK_ENV", "production"),
+        help="Configuration name passed to create_app"
+    )
+    args = parser.parse_args()
+
+    options = {
+        key: value for key, value in
+        (("bind", args.bind), ("workers", args.workers), ("threads", args.threads))
+        if value is not None
+    }
+    if args.threads is not None:
+        options["worker_class"] = "gthread" if args.threads > 1 else "sync"
+    run(options, config_name=args.config, started=STARTED)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Shard maintenance
+
+Usage:
+    python -m cmd.shards init
+    python -m cmd.shards rebalance [--batch-size N] [--dry-run] [--mapping FILE]
+
+Both commands act on the shards listed in SHARD_DATABASE_URLS. After adding
+shards, run ``init`` to create their tables and ``rebalance`` to move tasks
+onto them. Moved tasks get new ids; the old to new id mapping is written
+as one JSON object per line so clients holding ids can be updated.
+"""
+import argparse
+import json
+import os
+import sys
+
+from internal.app import create_app
+from internal.db.sharding import rebalance
+from internal.handlers.result_cache import notify_tasks_changed
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain task shards")
+    parser.add_argument(
+        "--config", default=os.environ.get("FLASK_ENV", "production"),
+        help="Configuration name passed to create_app"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="Create the task tables on every shard")
+    rebalance_parser = commands.add_parser("rebalance", help="Even out tasks across shards")
+    rebalance_parser.add_argument("--batch-size", type=int, default=500, help="Tasks moved per transaction")
+    rebalance_parser.add_argument("--dry-run", action="store_true", help="Only print the planned moves")
+    rebalance_parser.add_argument("--mapping", help="File receiving the id mapping, defaults to stdout")
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    router = app.extensions.get("shards")
+    if router is None:
+        parser.error("SHARD_DATABASE_URLS is not configured")
+
+    if args.command == "init":
+        router.create_all()
+        print(f"Created task tables on {len(router)} shards", file=sys.stderr)
+        return
+
+    mapping = open(args.mapping, "a") if args.mapping else sys.stdout
+    try:
+        def record(old_id, new_id):
+            mapping.write(json.dumps({"old_id": old_id, "new_id": new_id}) + "\n")
+            mapping.flush()
+
+        print(f"Task counts per shard: {router.shard_counts()}", file=sys.stderr)
+        moves = rebalance(router, batch_size=args.batch_size, dry_run=args.dry_run, on_move=record)
+        for source, target, count in moves:
+            print(f"{'Would move' if args.dry_run else 'Moved'} {count} tasks from shard {source} to shard {target}", file=sys.stderr)
+        if not args.dry_run:
+            print(f"Task counts per shard: {router.shard_counts()}", file=sys.stderr)
+            with app.app_context():
+                notify_tasks_changed()
+    finally:
+        if mapping is not sys.stdout:
+            mapping.close()
+        router.dispose()
+
+if __name__ == "__main__":
+    main()
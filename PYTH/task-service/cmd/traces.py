@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Read request traces, and collect them without a tracing backend
+
+Usage:
+    python -m cmd.traces show FILE [--trace ID] [--last N] [--slowest N]
+    python -m cmd.traces collect [--host HOST] [--port 4318] [--output FILE]
+
+``show`` prints the span trees of the traces in FILE: lines of OTLP/JSON
+as written by ``TRACE_EXPORTER=file`` or by ``collect``. Each span shows
+its duration and, when it has children, its own time outside them.
+
+``collect`` stands in for an OpenTelemetry collector: it accepts OTLP/HTTP
+JSON posts on ``/v1/traces`` (``TRACE_EXPORTER=otlp``) and appends them
+to FILE, printing one line per trace received.
+"""
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def iter_spans(document):
+    """Spans of one OTLP/JSON export request"""
+    for resource_spans in document.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            yield from scope_spans.get("spans", [])
+
+def load_traces(lines):
+    """
+    Group the spans of OTLP/JSON lines by trace
+
+    Args:
+        lines (iterable): JSON documents, one per line
+
+    Returns:
+        dict: Trace id -> spans, in the order the traces were first seen
+    """
+    traces = {}
+    for line in lines:
+        if line.strip():
+            for span in iter_spans(json.loads(line)):
+                traces.setdefault(span["traceId"], []).append(span)
+    return traces
+
+def _duration_ms(span):
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+def _attributes(span):
+    return {item["key"]: next(iter(item["value"].values())) for item in span.get("attributes", [])}
+
+def format_trace(spans):
+    """
+    Render the span tree of one trace
+
+    Args:
+        spans (list): OTLP/JSON spans of the trace
+
+    Returns:
+        list: Lines, the root span first
+    """
+    ids = {span["spanId"] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span.get("parentSpanId") if span.get("parentSpanId") in ids else None
+        children.setdefault(parent, []).append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: int(span["startTimeUnixNano"]))
+
+    lines = []
+
+    def render(span, depth):
+        duration = _duration_ms(span)
+        nested = children.get(span["spanId"], [])
+        text = f"{'  ' * depth}{span['name']:<{max(40 - depth * 2, 1)}}{duration:9.2f}ms"
+        if nested:
+            text += f"  (self {duration - sum(_duration_ms(child) for child in nested):.2f}ms)"
+        attributes = _attributes(span)
+        statement = attributes.get("db.statement")
+        if statement:
+            text += "  " + " ".join(statement.split())[:80]
+        if span.get("status", {}).get("code") == 2:
+            text += f"  ERROR {span['status'].get('message', '')}"
+        lines.append(text)
+        for child in nested:
+            render(child, depth + 1)
+
+    for root in children.get(None, []):
+        render(root, 0)
+    return lines
+
+def make_collector(output, host="127.0.0.1", port=4318, echo=None):
+    """
+    HTTP server accepting OTLP/JSON trace exports
+
+    Args:
+        output (file): Receives each export request as one line
+        host (str): Interface to listen on
+        port (int): Port, 0 for any free one
+        echo (file, optional): Receives a summary line per trace
+
+    Returns:
+        ThreadingHTTPServer: Server, not yet serving
+    """
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/traces":
+                self.send_error(404)
+                return
+            if self.headers.get("Content-Type", "").split(";")[0].strip() != "application/json":
+                # The protobuf encoding is not understood by this stand-in
+                self.send_error(415)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                document = json.loads(body)
+            except ValueError:
+                self.send_error(400)
+                return
+            with lock:
+                output.write(json.dumps(document) + "\n")
+                output.flush()
+                if echo is not None:
+                    for trace_id, spans in load_traces([body]).items():
+                        root = next((span for span in spans if "parentSpanId" not in span), spans[0])
+                        print(f"{trace_id}  {root['name']:<40}{_duration_ms(root):9.2f}ms  {len(spans)} spans", file=echo)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and collect request traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_parser = commands.add_parser("show", help="Print the span trees of recorded traces")
+    show_parser.add_argument("file", help="OTLP/JSON lines, e.g. instance/traces.jsonl")
+    show_parser.add_argument("--trace", help="Only the trace with this id")
+    show_parser.add_argument("--last", type=int, default=10, help="Most recent traces shown")
+    show_parser.add_argument("--slowest", type=int, help="Show the N slowest traces instead")
+    collect_parser = commands.add_parser("collect", help="Receive traces over OTLP/HTTP")
+    collect_parser.add_argument("--host", default="127.0.0.1")
+    collect_parser.add_argument("--port", type=int, default=4318)
+    collect_parser.add_argument("--output", default="instance/traces.jsonl", help="File the traces are appended to")
+    args = parser.parse_args()
+
+    if args.command == "collect":
+        with open(args.output, "a", encoding="utf-8") as output:
+            server = make_collector(output, args.host, args.port, echo=sys.stdout)
+            print(f"Collecting traces on http://{args.host}:{args.port}/v1/traces into {args.output}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        return
+
+    with open(args.file, encoding="utf-8") as lines:
+        traces = load_traces(lines)
+    if args.trace:
+        if args.trace not in traces:
+            parser.error(f"No trace {args.trace} in {args.file}")
+        selected = [(args.trace, traces[args.trace])]
+    elif args.slowest:
+        selected = sorted(
+            traces.items(), key=lambda item: max(_duration_ms(span) for span in item[1]), reverse=True
+        )[:args.slowest]
+    else:
+        selected = list(traces.items())[-args.last:]
+    for trace_id, spans in selected:
+        print(f"trace {trace_id}")
+        for line in format_trace(spans):
+            print(f"  {line}")
+        print()
+
+if __name__ == "__main__":
+    main()
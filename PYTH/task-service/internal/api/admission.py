@@ -0,0 +1,441 @@
+"""
+Admission control and load shedding for the task API
+
+Requests to the guarded blueprints pass two gates before reaching a view:
+
+1. A per-client token bucket. Bucket state lives in a backend, either
+   in-process memory or a SQLite file that every worker on the host
+   shares, so a client cannot multiply its budget by the worker count.
+2. A per-worker concurrency limiter with a bounded priority queue. When
+   all slots are busy requests wait in the queue, cheap reads ahead of
+   writes ahead of expensive list/export calls. When the queue is full a
+   new request either evicts a queued request of lower priority or is
+   shed immediately.
+
+Rejected requests fail fast with ``429`` (rate limited) or ``503``
+(overloaded, or bucket state unavailable), both carrying a
+``Retry-After`` header.
+"""
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from internal.api.deadlines import remaining_time
+from internal.api.tracing import span
+
+# Request cost classes, lower values are admitted first
+PRIORITY_CHEAP = 0
+PRIORITY_NORMAL = 1
+PRIORITY_EXPENSIVE = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_CHEAP: "cheap",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_EXPENSIVE: "expensive",
+}
+
+# Endpoints whose cost grows with the size of the table
+EXPENSIVE_ENDPOINTS = {
+    "tasks.list_tasks",
+    "tasks.get_subtree",
+    "tasks.get_task_progress",
+    "tags.get_tag_counts",
+    "batch.execute_batch",
+}
+
+# Blueprints guarded by admission control
+GUARDED_BLUEPRINTS = {"tasks", "batch", "tags"}
+
+class BucketUnavailable(Exception):
+    """The bucket state could not be read or written in time"""
+
+class MemoryBucketBackend:
+    """Token buckets held in process memory"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, now=None):
+        """
+        Take one token from the bucket identified by key
+
+        Args:
+            key (str): Client key
+            rate (float): Refill rate in tokens per second
+            burst (int): Bucket capacity
+            now (float, optional): Current monotonic time
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens, allowed, retry_after = _refill_and_take(tokens, now - updated, rate, burst)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+class SQLiteBucketBackend:
+    """
+    Token buckets stored in a SQLite file shared by all local workers
+
+    Each consume runs in a ``BEGIN IMMEDIATE`` transaction so concurrent
+    workers serialise on the file lock instead of losing updates. Wall
+    clock time is used because monotonic clocks are not comparable
+    across processes.
+
+    Args:
+        path (str): SQLite file holding the buckets
+        timeout (float): Seconds to wait for the file lock
+    """
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, burst, now=None):
+        """
+        Take one token from the bucket identified by key
+
+        Args:
+            key (str): Client key
+            rate (float): Refill rate in tokens per second
+            burst (int): Bucket capacity
+            now (float, optional): Current wall clock time
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+
+        Raises:
+            BucketUnavailable: If the file stayed locked past the timeout
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM admission_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (float(burst), now)
+            tokens, allowed, retry_after = _refill_and_take(tokens, now - updated, rate, burst)
+            conn.execute(
+                "INSERT OR REPLACE INTO admission_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise BucketUnavailable(str(e)) from e
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+def _refill_and_take(tokens, elapsed, rate, burst):
+    """Refill a bucket for the elapsed time and try to take one token"""
+    tokens = min(float(burst), tokens + max(elapsed, 0.0) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, True, 0.0
+    retry_after = (1.0 - tokens) / rate if rate > 0 else float("inf")
+    return tokens, False, retry_after
+
+class _Waiter:
+    """A request parked in the concurrency queue"""
+
+    __slots__ = ("priority", "seq", "event", "outcome")
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.outcome = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class ConcurrencyLimiter:
+    """
+    Bounded-concurrency gate with a bounded priority queue
+
+    Slots are handed over directly from a finishing request to the best
+    queued waiter, so a freed slot is never raced for by newcomers.
+    """
+
+    ADMITTED = "admitted"
+    QUEUE_FULL = "queue_full"
+    TIMEOUT = "timeout"
+    EVICTED = "evicted"
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def acquire(self, priority=PRIORITY_NORMAL, timeout=None):
+        """
+        Wait for a slot
+
+        Args:
+            priority (int): Request cost class, lower is served first
+            timeout (float, optional): Override for the queue timeout
+
+        Returns:
+            str: One of ADMITTED, QUEUE_FULL, TIMEOUT or EVICTED
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return self.ADMITTED
+            if len(self._waiters) >= self.max_queue:
+                victim = max(self._waiters) if self._waiters else None
+                if victim is None or victim.priority <= priority:
+                    return self.QUEUE_FULL
+                self._waiters.remove(victim)
+                heapq.heapify(self._waiters)
+                victim.outcome = self.EVICTED
+                victim.event.set()
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.outcome is None:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                waiter.outcome = self.TIMEOUT
+        return waiter.outcome
+
+    def release(self):
+        """Free a slot, handing it to the best queued waiter if any"""
+        with self._lock:
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if waiter.outcome is None:
+                    waiter.outcome = self.ADMITTED
+                    waiter.event.set()
+                    return
+            self._active -= 1
+
+class AdmissionController:
+    """Token-bucket rate limiting plus concurrency limiting for one app"""
+
+    def __init__(self, backend, rate, burst, limiter, retry_after=1, client_header=None):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.limiter = limiter
+        self.retry_after = retry_after
+        self.client_header = client_header
+        self._stats_lock = threading.Lock()
+        self._counters = {
+            "admitted": 0,
+            "rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+            "shed_evicted": 0,
+            "bucket_unavailable": 0,
+            "queued_total": 0,
+            "queue_wait_seconds": 0.0,
+            "max_queue_depth": 0,
+        }
+        self._admitted_by_class = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._counters[name] += amount
+
+    def client_key(self):
+        """Identify the calling client"""
+        if self.client_header:
+            value = request.headers.get(self.client_header)
+            if value:
+                return value
+        return request.remote_addr or "unknown"
+
+    def admit(self, priority):
+        """
+        Run both admission gates for the current request
+
+        Args:
+            priority (int): Request cost class
+
+        Returns:
+            Response: Rejection response, or None if the request was admitted
+        """
+        try:
+            allowed, wait = self.backend.consume(self.client_key(), self.rate, self.burst)
+        except BucketUnavailable:
+            # Contended like the rest of the service: shed instead of failing
+            self._count("bucket_unavailable")
+            return _reject(503, "Service overloaded", self.retry_after)
+        if not allowed:
+            self._count("rate_limited")
+            return _reject(429, "Rate limit exceeded", max(1, math.ceil(wait)))
+
+        started = time.monotonic()
+        queued_before = self.limiter.queued
+        # Never queue past the request's deadline
+        left = remaining_time()
+        outcome = self.limiter.acquire(
+            priority, None if left is None else min(left, self.limiter.queue_timeout)
+        )
+        waited = time.monotonic() - started
+
+        with self._stats_lock:
+            self._counters["max_queue_depth"] = max(
+                self._counters["max_queue_depth"], self.limiter.queued, queued_before
+            )
+            if waited > 0.0005 or queued_before:
+                self._counters["queued_total"] += 1
+                self._counters["queue_wait_seconds"] += waited
+
+        if outcome == ConcurrencyLimiter.ADMITTED:
+            with self._stats_lock:
+                self._counters["admitted"] += 1
+                self._admitted_by_class[PRIORITY_NAMES[priority]] += 1
+            g.admission_slot = True
+            return None
+
+        self._count({
+            ConcurrencyLimiter.QUEUE_FULL: "shed_queue_full",
+            ConcurrencyLimiter.TIMEOUT: "shed_timeout",
+            ConcurrencyLimiter.EVICTED: "shed_evicted",
+        }[outcome])
+        return _reject(503, "Service overloaded", self.retry_after)
+
+    def release(self):
+        """Release the slot held by the current request, if any"""
+        if g.pop("admission_slot", False):
+            self.limiter.release()
+
+    def stats(self):
+        """
+        Snapshot of admission counters
+
+        Returns:
+            dict: Counters and current limiter state
+        """
+        with self._stats_lock:
+            snapshot = dict(self._counters)
+            snapshot["admitted_by_class"] = dict(self._admitted_by_class)
+        snapshot["queue_wait_seconds"] = round(snapshot["queue_wait_seconds"], 6)
+        snapshot["active"] = self.limiter.active
+        snapshot["queued"] = self.limiter.queued
+        snapshot["max_concurrency"] = self.limiter.max_concurrency
+        snapshot["max_queue"] = self.limiter.max_queue
+        return snapshot
+
+def _reject(status_code, message, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status_code
+    response.headers["Retry-After"] = str(int(retry_after))
+    return response
+
+def classify_request():
+    """
+    Work out the cost class of the current request
+
+    Returns:
+        int: PRIORITY_CHEAP, PRIORITY_NORMAL or PRIORITY_EXPENSIVE
+    """
+    if request.endpoint in EXPENSIVE_ENDPOINTS:
+        return PRIORITY_EXPENSIVE
+    if request.method in ("GET", "HEAD"):
+        return PRIORITY_CHEAP
+    return PRIORITY_NORMAL
+
+def create_backend(app):
+    """Build the token bucket backend selected by configuration"""
+    kind = app.config["ADMISSION_BACKEND"]
+    if kind == "memory":
+        return MemoryBucketBackend()
+    if kind == "sqlite":
+        path = app.config["ADMISSION_STATE_PATH"]
+        if not os.path.isabs(path):
+            path = os.path.join(app.root_path, "..", path)
+        return SQLiteBucketBackend(os.path.normpath(path))
+    raise ValueError(f"Unknown admission backend: {kind}")
+
+def init_admission(app):
+    """
+    Install admission control in front of the guarded blueprints
+
+    Args:
+        app: Flask application instance
+
+    Raises:
+        ValueError: If the rate limit cannot refill
+    """
+    if not app.config.get("ADMISSION_ENABLED"):
+        return
+    if app.config["RATE_LIMIT_PER_SECOND"] <= 0:
+        raise ValueError("RATE_LIMIT_PER_SECOND must be positive")
+    if app.config["RATE_LIMIT_BURST"] < 1:
+        raise ValueError("RATE_LIMIT_BURST must be at least 1")
+
+    limiter = ConcurrencyLimiter(
+        max_concurrency=app.config["MAX_CONCURRENT_REQUESTS"],
+        max_queue=app.config["MAX_QUEUED_REQUESTS"],
+        queue_timeout=app.config["QUEUE_TIMEOUT_SECONDS"],
+    )
+    controller = AdmissionController(
+        backend=create_backend(app),
+        rate=app.config["RATE_LIMIT_PER_SECOND"],
+        burst=app.config["RATE_LIMIT_BURST"],
+        limiter=limiter,
+        retry_after=app.config["ADMISSION_RETRY_AFTER"],
+        client_header=app.config.get("ADMISSION_CLIENT_HEADER"),
+    )
+    app.extensions["admission"] = controller
+    app.extensions.setdefault("stats", {})["admission"] = controller.stats
+
+    @app.before_request
+    def _admit():
+        if request.blueprint not in GUARDED_BLUEPRINTS:
+            return None
+        with span("admission"):
+            return controller.admit(classify_request())
+
+    @app.teardown_request
+    def _release(exc):
+        controller.release()
@@ -0,0 +1,310 @@
+"""
+Per-request deadlines propagated into database statement timeouts
+
+Every request to the API blueprints gets a time budget when it arrives:
+``REQUEST_DEADLINE_SECONDS``, or the endpoint's entry in
+``ROUTE_DEADLINES``. A client can ask for less, never more, with the
+``X-Request-Timeout`` header (seconds).
+
+The deadline bounds the work done for the request:
+
+- Admission control stops queueing the request when it expires.
+- Database statements run with what is left of it. On PostgreSQL every
+  transaction sets a transaction-local ``statement_timeout`` so the
+  server cancels the query; on SQLite a progress handler interrupts the
+  statement. A statement due to start after the deadline is not sent.
+
+The deadline lives in a context variable. Work the request hands to other
+threads through ``with_deadline`` (the shard fan-out) is bounded too. A
+request whose deadline was exceeded answers ``504``, whatever the view
+made of the failed query; the session is rolled back at teardown as
+for any other error. Counters are exported at ``GET /api/stats``.
+"""
+import contextvars
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from internal.api.negotiation import respond, vary_on_accept
+
+# Blueprints whose requests get a deadline
+DEADLINE_BLUEPRINTS = {"tasks", "batch", "tags", "webhooks", "jobs"}
+
+# SQLite virtual machine instructions between two deadline checks
+SQLITE_PROGRESS_INTERVAL = 1000
+
+# PostgreSQL SQLSTATE of a query cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+class DeadlineExceeded(Exception):
+    """Raised instead of running a statement after the request's deadline"""
+
+class Deadline:
+    """
+    Time budget of one request
+
+    Args:
+        budget (float): Seconds the request may take
+        endpoint (str): Endpoint of the request, for the counters
+        manager (DeadlineManager, optional): Manager counting what happens to it
+    """
+
+    __slots__ = ("expires_at", "budget", "endpoint", "manager", "exceeded")
+
+    def __init__(self, budget, endpoint=None, manager=None):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.endpoint = endpoint
+        self.manager = manager
+        self.exceeded = False
+
+    def expire(self, counter):
+        """Mark the deadline exceeded, counting how it was noticed"""
+        self.exceeded = True
+        if self.manager is not None:
+            self.manager.count(counter)
+
+    def remaining(self):
+        """Seconds left, negative once expired"""
+        return self.expires_at - time.monotonic()
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+def current_deadline():
+    """
+    Deadline of the request being served in this context
+
+    Returns:
+        Deadline: The deadline, or None outside requests with a deadline
+    """
+    return _current.get()
+
+def remaining_time():
+    """
+    Seconds left before the current request's deadline
+
+    Returns:
+        float: Seconds left (not below 0), or None without a deadline
+    """
+    deadline = _current.get()
+    return None if deadline is None else max(deadline.remaining(), 0.0)
+
+def with_deadline(func):
+    """
+    Carry the current deadline into calls made on other threads
+
+    Args:
+        func (callable): Function to run elsewhere
+
+    Returns:
+        callable: func, running under the caller's deadline
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+class DeadlineManager:
+    """
+    Assigns deadlines to requests and counts what becomes of them
+
+    Args:
+        default (float): Budget of endpoints without an override
+        routes (dict): Budget per endpoint name
+        header (str): Request header asking for a shorter budget
+    """
+
+    def __init__(self, default, routes=None, header="X-Request-Timeout"):
+        self.default = default
+        self.routes = dict(routes or {})
+        self.header = header
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "shortened_by_client": 0,
+            "exceeded": 0,
+            "cancelled_statements": 0,
+            "skipped_statements": 0,
+        }
+        self._exceeded_by_endpoint = {}
+
+    def count(self, name):
+        """Increment a counter"""
+        with self._lock:
+            self._stats[name] += 1
+
+    def budget(self, endpoint):
+        """
+        Time budget of an endpoint
+
+        Args:
+            endpoint (str): Endpoint name, e.g. ``tasks.list_tasks``
+
+        Returns:
+            float: Seconds
+        """
+        return self.routes.get(endpoint, self.default)
+
+    def begin(self):
+        """
+        Start the deadline of the current request
+
+        Returns:
+            Response: 400 for an invalid header, None otherwise
+        """
+        budget = self.budget(request.endpoint)
+        requested = request.headers.get(self.header)
+        if requested is not None:
+            try:
+                requested = float(requested)
+            except ValueError:
+                requested = None
+            if requested is None or not requested > 0:
+                return vary_on_accept(respond(
+                    {"error": f"Invalid {self.header} header, expected a positive number of seconds"}
+                )), 400
+            if requested < budget:
+                budget = requested
+                self.count("shortened_by_client")
+        self.count("requests")
+        g.deadline_token = _current.set(Deadline(budget, request.endpoint, self))
+        return None
+
+    def finish(self, response):
+        """Replace the response of a request that ran out of time, in the format the client asked for"""
+        deadline = _current.get()
+        if deadline is None or not deadline.exceeded:
+            return response
+        with self._lock:
+            self._stats["exceeded"] += 1
+            self._exceeded_by_endpoint[deadline.endpoint] = self._exceeded_by_endpoint.get(deadline.endpoint, 0) + 1
+        rejected = vary_on_accept(respond({"error": "Request deadline exceeded", "budget_seconds": deadline.budget}))
+        rejected.status_code = 504
+        return rejected
+
+    @staticmethod
+    def end(exc=None):
+        """Forget the deadline once the request is torn down"""
+        token = g.pop("deadline_token", None)
+        if token is not None:
+            _current.reset(token)
+
+    def stats(self):
+        """
+        Snapshot of deadline counters
+
+        Returns:
+            dict: Counters, and exceeded deadlines per endpoint
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["exceeded_by_endpoint"] = dict(self._exceeded_by_endpoint)
+        return snapshot
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    deadline = _current.get()
+    dialect = conn.dialect.name
+    if deadline is None:
+        holder = conn.info.get("progress_deadline")
+        if holder is not None:
+            holder[0] = None
+        return
+    left = deadline.remaining()
+    if left <= 0:
+        deadline.expire("skipped_statements")
+        raise DeadlineExceeded(f"Request deadline of {deadline.budget:g}s exceeded")
+    if dialect == "postgresql":
+        # Transaction-local, so set once per transaction and reset by its end
+        if conn.info.get("statement_deadline") is not deadline:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", (str(max(1, int(left * 1000))),))
+            conn.info["statement_deadline"] = deadline
+    elif dialect == "sqlite":
+        holder = conn.info.get("progress_deadline")
+        if holder is None:
+            # One handler per connection, reading the deadline of whoever uses it
+            holder = conn.info["progress_deadline"] = [None]
+            conn.connection.driver_connection.set_progress_handler(
+                lambda: holder[0] is not None and time.monotonic() > holder[0], SQLITE_PROGRESS_INTERVAL
+            )
+        holder[0] = deadline.expires_at
+
+def _handle_error(context):
+    deadline = _current.get()
+    if deadline is None:
+        return
+    original = context.original_exception
+    if context.dialect.name == "postgresql":
+        cancelled = getattr(original, "pgcode", None) == QUERY_CANCELED
+    else:
+        cancelled = "interrupted" in str(original)
+    if cancelled and deadline.remaining() <= 0:
+        deadline.expire("cancelled_statements")
+
+def _forget_statement_timeout(conn):
+    conn.info.pop("statement_deadline", None)
+
+def _clear_progress_deadline(dbapi_connection, connection_record):
+    holder = connection_record.info.get("progress_deadline")
+    if holder is not None:
+        holder[0] = None
+
+_installed = False
+_install_lock = threading.Lock()
+
+def install_statement_deadlines():
+    """
+    Enforce request deadlines on the statements of every engine
+
+    Installed once per process. Statements run outside a request with a
+    deadline are not affected.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        event.listen(Engine, "commit", _forget_statement_timeout)
+        event.listen(Engine, "rollback", _forget_statement_timeout)
+        event.listen(Pool, "checkin", _clear_progress_deadline)
+        _installed = True
+
+def init_deadlines(app):
+    """
+    Give API requests deadlines when enabled
+
+    Runs before admission control so that time spent queueing counts.
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get("DEADLINES_ENABLED"):
+        return
+    manager = DeadlineManager(
+        default=app.config["REQUEST_DEADLINE_SECONDS"],
+        routes=app.config.get("ROUTE_DEADLINES"),
+        header=app.config["DEADLINE_HEADER"],
+    )
+    app.extensions["deadlines"] = manager
+    app.extensions.setdefault("stats", {})["deadlines"] = manager.stats
+    install_statement_deadlines()
+
+    @app.before_request
+    def _begin_deadline():
+        if request.blueprint not in DEADLINE_BLUEPRINTS:
+            return None
+        return manager.begin()
+
+    app.after_request(manager.finish)
+    app.teardown_request(manager.end)
@@ -0,0 +1,177 @@
+"""
+Content negotiation for the task endpoints
+
+JSON stays the default. Clients can ask for MessagePack
+(``application/msgpack``) or CBOR (``application/cbor``) with ``Accept``
+and send request bodies in either format with ``Content-Type``.
+
+Payloads are built once, with ``datetime`` values, and each format
+encodes them natively:
+
+* JSON: ISO 8601 strings, as the API always returned
+* MessagePack: the timestamp extension type (-1)
+* CBOR: tag 1, seconds since the epoch
+
+Naive datetimes in the service are UTC. Timestamps in request bodies
+are turned back into naive UTC ISO strings, so the schemas validate
+every format alike.
+
+``msgpack`` and ``cbor2`` are imported the first time they are used.
+"""
+from datetime import datetime, timezone
+
+from flask import current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import ValidationError
+
+from internal.api.tracing import span
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+CBOR_MIMETYPE = "application/cbor"
+
+# Also understood, mapped to the registered type
+MIMETYPE_ALIASES = {"application/x-msgpack": MSGPACK_MIMETYPE}
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider writing datetimes as ISO 8601 instead of HTTP dates
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+def _msgpack_default(value):
+    import msgpack
+    if isinstance(value, datetime):
+        # Plain arithmetic, several times cheaper than Timestamp.from_datetime
+        delta = value - (_EPOCH if value.tzinfo is None else _EPOCH_UTC)
+        return msgpack.Timestamp(delta.days * 86400 + delta.seconds, delta.microseconds * 1000)
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+def encode_msgpack(payload):
+    import msgpack
+    return msgpack.packb(payload, default=_msgpack_default)
+
+def decode_msgpack(data):
+    import msgpack
+    return msgpack.unpackb(data, timestamp=3)
+
+def encode_cbor(payload):
+    import cbor2
+    return cbor2.dumps(payload, timezone=timezone.utc, datetime_as_timestamp=True)
+
+def decode_cbor(data):
+    import cbor2
+    return cbor2.loads(data)
+
+# Binary formats: mimetype -> (name, encoder, decoder)
+BINARY_FORMATS = {
+    MSGPACK_MIMETYPE: ("MessagePack", encode_msgpack, decode_msgpack),
+    CBOR_MIMETYPE: ("CBOR", encode_cbor, decode_cbor),
+}
+
+# In order of preference when the client accepts several equally
+OFFERED_MIMETYPES = [JSON_MIMETYPE, MSGPACK_MIMETYPE, CBOR_MIMETYPE, *MIMETYPE_ALIASES]
+
+def response_mimetype():
+    """
+    Pick the response format from the Accept header
+
+    Returns:
+        str: JSON_MIMETYPE, MSGPACK_MIMETYPE or CBOR_MIMETYPE
+    """
+    best = request.accept_mimetypes.best_match(OFFERED_MIMETYPES, default=JSON_MIMETYPE)
+    return MIMETYPE_ALIASES.get(best, best)
+
+def respond(payload):
+    """
+    Encode a payload in the format the client asked for
+
+    Args:
+        payload: JSON-compatible value, datetimes allowed
+
+    Returns:
+        Response: Encoded response
+    """
+    return encode_response(payload, response_mimetype())
+
+def encode_response(payload, mimetype):
+    """
+    Encode a payload in a given format
+
+    Args:
+        payload: JSON-compatible value, datetimes allowed
+        mimetype (str): JSON_MIMETYPE or a key of BINARY_FORMATS
+
+    Returns:
+        Response: Encoded response
+    """
+    with span("serialize", format=mimetype):
+        if mimetype not in BINARY_FORMATS:
+            return jsonify(payload)
+        _, encode, _ = BINARY_FORMATS[mimetype]
+        return current_app.response_class(encode(payload), mimetype=mimetype)
+
+def request_body():
+    """
+    Decode the request body according to its Content-Type
+
+    Bodies that are neither MessagePack nor CBOR are read with
+    ``request.get_json()``.
+
+    Returns:
+        The decoded body, timestamps as naive UTC ISO strings
+
+    Raises:
+        ValidationError: If a binary body cannot be decoded
+    """
+    mimetype = MIMETYPE_ALIASES.get(request.mimetype, request.mimetype)
+    with span("decode", format=mimetype):
+        if mimetype not in BINARY_FORMATS:
+            return request.get_json()
+        name, _, decode = BINARY_FORMATS[mimetype]
+        try:
+            data = decode(request.get_data())
+        except Exception:
+            raise ValidationError({"_schema": [f"Invalid {name} body."]})
+        return _iso_datetimes(data)
+
+def _iso_datetimes(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _iso_datetimes(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_iso_datetimes(item) for item in value]
+    return value
+
+def vary_on_accept(response):
+    """
+    Mark negotiated responses as depending on Accept, for HTTP caches
+
+    Args:
+        response (Response): Outgoing response
+
+    Returns:
+        Response: The same response
+    """
+    response.vary.add("Accept")
+    return response
+
+def init_negotiation(app):
+    """
+    Encode datetimes in JSON responses as ISO 8601
+
+    Args:
+        app: Flask application
+    """
+    app.json = ISOJSONProvider(app)
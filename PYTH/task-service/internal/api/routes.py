@@ -1,14 +1,37 @@
 """
 API routes for task management
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_file
 from marshmallow import ValidationError
 
 from internal.handlers.task_service import TaskService
-from internal.models.schemas import TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema
+from internal.handlers.batch_service import BatchService
+from internal.handlers.webhook_service import WebhookService
+from internal.handlers.webhooks import get_webhook_dispatcher
+from internal.handlers.job_service import JobService
+from internal.handlers.jobs import get_job_runner
+from internal.handlers.result_cache import cache_key, cached_response
+from internal.db.store import get_task_store
+from internal.api.negotiation import encode_response, request_body, respond, response_mimetype, vary_on_accept
+from internal.api.tracing import span
+from internal.models.schemas import (
+    TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema, BatchRequestSchema,
+    WebhookSubscriptionSchema, JobRequestSchema
+)
+from internal.models.compiled import compile_schema
+from internal.models.tag import TAG_MODE_ALL, TAG_MODES, normalize_tag_names
+from internal.models.task import DEFAULT_TASK_SORT, SORT_ORDERS, TASK_SORTS
 
 # Initialize blueprints
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/api/tasks')
+batch_bp = Blueprint('batch', __name__, url_prefix='/api/batch')
+stats_bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+tags_bp = Blueprint('tags', __name__, url_prefix='/api/tags')
+webhooks_bp = Blueprint('webhooks', __name__, url_prefix='/api/webhooks')
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+# Task endpoints answer in JSON, MessagePack or CBOR depending on Accept
+tasks_bp.after_request(vary_on_accept)
 
 def register_routes(app):
     """
@@ -18,11 +41,19 @@ def register_routes(app):
         app: Flask application instance
     """
     app.register_blueprint(tasks_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(tags_bp)
+    app.register_blueprint(webhooks_bp)
+    app.register_blueprint(jobs_bp)
 
-# Schema instances
-task_create_schema = TaskCreateSchema()
-task_update_schema = TaskUpdateSchema()
-task_status_schema = TaskStatusUpdateSchema()
+# Schema instances, compiled to fast-path loaders
+task_create_schema = compile_schema(TaskCreateSchema())
+task_update_schema = compile_schema(TaskUpdateSchema())
+task_status_schema = compile_schema(TaskStatusUpdateSchema())
+batch_request_schema = BatchRequestSchema()
+webhook_subscription_schema = WebhookSubscriptionSchema()
+job_request_schema = JobRequestSchema()
 
 @tasks_bp.route('', methods=['POST'])
 def create_task():
@@ -31,18 +62,18 @@ def create_task():
     """
     try:
         # Validate input data
-        data = request.get_json()
+        data = request_body()
         validated_data = task_create_schema.load(data)
         
         # Create task
         task = TaskService.create_task(validated_data)
         
-        return jsonify(task.to_dict()), 201
+        return respond(task.to_dict()), 201
     except ValidationError as err:
-        return jsonify({"error": "Validation error", "details": err.messages}), 400
+        return respond({"error": "Validation error", "details": err.messages}), 400
     except Exception as e:
         current_app.logger.error(f"Error creating task: {str(e)}")
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return respond({"error": "An unexpected error occurred"}), 500
 
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
 def get_task(task_id):
@@ -53,12 +84,12 @@ def get_task(task_id):
         task = TaskService.get_task_by_id(task_id)
         
         if not task:
-            return jsonify({"error": "Task not found"}), 404
+            return respond({"error": "Task not found"}), 404
             
-        return jsonify(task.to_dict()), 200
+        return respond(task.to_dict()), 200
     except Exception as e:
         current_app.logger.error(f"Error retrieving task: {str(e)}")
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return respond({"error": "An unexpected error occurred"}), 500
 
 @tasks_bp.route('', methods=['GET'])
 def list_tasks():
@@ -71,6 +102,8 @@ def list_tasks():
         per_page = int(request.args.get('per_page', 20))
         status = request.args.get('status')
         priority = request.args.get('priority')
+        tags, tag_mode = _tag_filter()
+        sort, order = _sort_order()
         
         # Validate page and per_page
         if page < 1:
@@ -78,29 +111,47 @@ def list_tasks():
         if per_page < 1 or per_page > 100:
             per_page = 20
             
-        # Get tasks
-        tasks, total_pages, total_items = TaskService.list_tasks(
-            page=page,
-            per_page=per_page,
-            status=status,
-            priority=priority
-        )
-        
-        # Format response
-        response = {
-            "tasks": [task.to_dict() for task in tasks],
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total_pages": total_pages,
-                "total_items": total_items
+        def build():
+            # Get tasks
+            tasks, total_pages, total_items = TaskService.list_tasks(
+                page=page,
+                per_page=per_page,
+                status=status,
+                priority=priority,
+                tags=tags,
+                tag_mode=tag_mode,
+                sort=sort,
+                order=order
+            )
+            
+            # Format response
+            with span("to_dict", tasks=len(tasks)):
+                items = [task.to_dict() for task in tasks]
+            return {
+                "tasks": items,
+                "pagination": {
+                    "page": page,
+                    "per_page": per_page,
+                    "total_pages": total_pages,
+                    "total_items": total_items
+                }
             }
-        }
         
-        return jsonify(response), 200
+        # Identical pages are served from the result cache when enabled,
+        # one entry per response format. Tag order does not change the
+        # match, so it does not change the key either
+        mimetype = response_mimetype()
+        key = cache_key(
+            "tasks", mimetype, page, per_page, status, priority, tags and sorted(tags), tag_mode, sort, order
+        )
+        return cached_response(
+            key, build, encode=lambda payload: encode_response(payload, mimetype), mimetype=mimetype
+        ), 200
+    except ValidationError as err:
+        return respond({"error": "Validation error", "details": err.messages}), 400
     except Exception as e:
         current_app.logger.error(f"Error listing tasks: {str(e)}")
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return respond({"error": "An unexpected error occurred"}), 500
 
 @tasks_bp.route('/<int:task_id>', methods=['PUT'])
 def update_task(task_id):
@@ -109,21 +160,21 @@ def update_task(task_id):
     """
     try:
         # Validate input data
-        data = request.get_json()
+        data = request_body()
         validated_data = task_update_schema.load(data)
         
         # Update task
         task = TaskService.update_task(task_id, validated_data)
         
         if not task:
-            return jsonify({"error": "Task not found"}), 404
+            return respond({"error": "Task not found"}), 404
             
-        return jsonify(task.to_dict()), 200
+        return respond(task.to_dict()), 200
     except ValidationError as err:
-        return jsonify({"error": "Validation error", "details": err.messages}), 400
+        return respond({"error": "Validation error", "details": err.messages}), 400
     except Exception as e:
         current_app.logger.error(f"Error updating task: {str(e)}")
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return respond({"error": "An unexpected error occurred"}), 500
 
 @tasks_bp.route('/<int:task_id>/status', methods=['PATCH'])
 def update_task_status(task_id):
@@ -132,21 +183,21 @@ def update_task_status(task_id):
     """
     try:
         # Validate input data
-        data = request.get_json()
+        data = request_body()
         validated_data = task_status_schema.load(data)
         
         # Update task status
         task = TaskService.update_task_status(task_id, validated_data['status'])
         
         if not task:
-            return jsonify({"error": "Task not found"}), 404
+            return respond({"error": "Task not found"}), 404
             
-        return jsonify(task.to_dict()), 200
+        return respond(task.to_dict()), 200
     except ValidationError as err:
-        return jsonify({"error": "Validation error", "details": err.messages}), 400
+        return respond({"error": "Validation error", "details": err.messages}), 400
     except Exception as e:
         current_app.logger.error(f"Error updating task status: {str(e)}")
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return respond({"error": "An unexpected error occurred"}), 500
 
 @tasks_bp.route('/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
@@ -157,9 +208,355 @@ def delete_task(task_id):
         success = TaskService.delete_task(task_id)
         
         if not success:
-            return jsonify({"error": "Task not found"}), 404
+            return respond({"error": "Task not found"}), 404
             
-        return jsonify({"message": "Task deleted successfully"}), 200
+        return respond({"message": "Task deleted successfully"}), 200
     except Exception as e:
         current_app.logger.error(f"Error deleting task: {str(e)}")
+        return respond({"error": "An unexpected error occurred"}), 500
+
+def _tag_filter():
+    """
+    Parse ``?tags=a,b&tag_mode=all|any``
+    
+    Returns:
+        tuple: (normalised tag names or None, tag mode)
+    """
+    tags = normalize_tag_names(request.args.get('tags', '').split(',')) or None
+    tag_mode = request.args.get('tag_mode', TAG_MODE_ALL)
+    if tag_mode not in TAG_MODES:
+        raise ValidationError({"tag_mode": [f"Must be one of: {', '.join(TAG_MODES)}."]})
+    return tags, tag_mode
+
+def _sort_order():
+    """
+    Parse ``?sort=created_at|priority|due_date&order=asc|desc``
+    
+    Returns:
+        tuple: (sort key, order), the order defaulting per sort key
+    """
+    sort = request.args.get('sort', DEFAULT_TASK_SORT)
+    if sort not in TASK_SORTS:
+        raise ValidationError({"sort": [f"Must be one of: {', '.join(TASK_SORTS)}."]})
+    order = request.args.get('order', TASK_SORTS[sort])
+    if order not in SORT_ORDERS:
+        raise ValidationError({"order": [f"Must be one of: {', '.join(SORT_ORDERS)}."]})
+    return sort, order
+
+def _subtasks_unavailable():
+    """
+    Response for hierarchy endpoints when the task store has no subtasks
+    
+    Returns:
+        tuple: 501 response, or None when subtasks are available
+    """
+    store = get_task_store()
+    if store and not store.supports_subtasks:
+        return respond({"error": f"Subtasks are not available with {store.name}"}), 501
+    return None
+
+@tasks_bp.route('/<int:task_id>/subtree', methods=['GET'])
+def get_subtree(task_id):
+    """
+    Get a task with all of its subtasks
+    """
+    try:
+        unavailable = _subtasks_unavailable()
+        if unavailable:
+            return unavailable
+        
+        max_depth = request.args.get('max_depth')
+        if max_depth is not None:
+            try:
+                max_depth = int(max_depth)
+                if max_depth < 0:
+                    raise ValueError(max_depth)
+            except ValueError:
+                return respond(
+                    {"error": "Validation error", "details": {"max_depth": ["Must be a non-negative integer."]}}
+                ), 400
+        
+        subtree = TaskService.get_subtree(task_id, max_depth=max_depth)
+        
+        if not subtree:
+            return respond({"error": "Task not found"}), 404
+        
+        # Each task carries parent_id and depth so clients can rebuild the tree
+        tasks = []
+        with span("to_dict", tasks=len(subtree)):
+            for task, depth in subtree:
+                item = task.to_dict()
+                item["depth"] = depth
+                tasks.append(item)
+        
+        return respond({"task_id": task_id, "tasks": tasks}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving subtree: {str(e)}")
+        return respond({"error": "An unexpected error occurred"}), 500
+
+@tasks_bp.route('/<int:task_id>/ancestors', methods=['GET'])
+def get_ancestors(task_id):
+    """
+    Get the parent chain of a task, root first
+    """
+    try:
+        unavailable = _subtasks_unavailable()
+        if unavailable:
+            return unavailable
+        
+        ancestors = TaskService.get_ancestors(task_id)
+        
+        if ancestors is None:
+            return respond({"error": "Task not found"}), 404
+        
+        with span("to_dict", tasks=len(ancestors)):
+            items = [task.to_dict() for task in ancestors]
+        return respond({"task_id": task_id, "ancestors": items}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving ancestors: {str(e)}")
+        return respond({"error": "An unexpected error occurred"}), 500
+
+@tasks_bp.route('/<int:task_id>/progress', methods=['GET'])
+def get_task_progress(task_id):
+    """
+    Get the completion of a task rolled up over its subtasks
+    """
+    try:
+        unavailable = _subtasks_unavailable()
+        if unavailable:
+            return unavailable
+        
+        progress = TaskService.get_progress(task_id)
+        
+        if not progress:
+            return respond({"error": "Task not found"}), 404
+        
+        return respond(progress), 200
+    except Exception as e:
+        current_app.logger.error(f"Error computing task progress: {str(e)}")
+        return respond({"error": "An unexpected error occurred"}), 500
+
+@batch_bp.route('', methods=['POST'])
+def execute_batch():
+    """
+    Execute an ordered list of task operations in one transaction
+    """
+    try:
+        # Validate input data
+        data = request.get_json()
+        with span("validation", schema="BatchRequestSchema"):
+            batch = batch_request_schema.load(data)
+        
+        store = get_task_store()
+        if store and not store.supports_batches:
+            # A batch is one database transaction, which stores cannot offer
+            return jsonify({"error": f"Batch operations are not available with {store.name}"}), 501
+        
+        max_operations = current_app.config['BATCH_MAX_OPERATIONS']
+        if len(batch['operations']) > max_operations:
+            raise ValidationError(
+                {"operations": [f"Longer than maximum length {max_operations}."]}
+            )
+        
+        # Execute operations
+        committed, results = BatchService.execute(batch['operations'], batch['mode'])
+        
+        # Format response
+        response = {
+            "mode": batch['mode'],
+            "committed": committed,
+            "results": [
+                {"index": index, "status": status, "body": body}
+                for index, (status, body) in enumerate(results)
+            ]
+        }
+        
+        status_code = 200
+        if not committed:
+            # Report the failure that aborted the batch
+            status_code = next(
+                (status for status, _ in results if status >= 400 and status != 424), 500
+            )
+        return jsonify(response), status_code
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error executing batch: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@tags_bp.route('', methods=['GET'])
+def get_tag_counts():
+    """
+    Count tasks per tag, optionally over the tasks matching list filters
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+        if limit < 1 or limit > 500:
+            limit = 50
+        tags, tag_mode = _tag_filter()
+        
+        counts = TaskService.get_tag_counts(
+            status=request.args.get('status'),
+            priority=request.args.get('priority'),
+            tags=tags,
+            tag_mode=tag_mode
+        )
+        
+        return jsonify({
+            "tags": [{"name": name, "count": count} for name, count in counts[:limit]]
+        }), 200
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error counting tags: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
+
+@webhooks_bp.before_request
+def _webhooks_enabled():
+    """Answer 501 while webhooks are disabled"""
+    if get_webhook_dispatcher() is None:
+        return jsonify({"error": "Webhooks are not enabled"}), 501
+
+@webhooks_bp.route('', methods=['POST'])
+def create_webhook():
+    """
+    Subscribe an endpoint to task events
+    """
+    try:
+        # Validate input data
+        data = request.get_json()
+        validated_data = webhook_subscription_schema.load(data)
+        
+        subscription = WebhookService.create_subscription(validated_data)
+        
+        return jsonify(subscription.to_dict()), 201
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error creating webhook: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@webhooks_bp.route('', methods=['GET'])
+def list_webhooks():
+    """
+    List webhook subscriptions
+    """
+    try:
+        subscriptions = WebhookService.list_subscriptions()
+        
+        return jsonify({"webhooks": [subscription.to_dict() for subscription in subscriptions]}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error listing webhooks: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@webhooks_bp.route('/<int:subscription_id>', methods=['GET'])
+def get_webhook(subscription_id):
+    """
+    Get a webhook subscription with its delivery backlog
+    """
+    try:
+        subscription = WebhookService.get_subscription(subscription_id)
+        
+        if not subscription:
+            return jsonify({"error": "Webhook not found"}), 404
+        
+        response = subscription.to_dict()
+        response["pending_events"] = WebhookService.pending_events(subscription)
+        return jsonify(response), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving webhook: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@webhooks_bp.route('/<int:subscription_id>', methods=['DELETE'])
+def delete_webhook(subscription_id):
+    """
+    Unsubscribe an endpoint
+    """
+    try:
+        if not WebhookService.delete_subscription(subscription_id):
+            return jsonify({"error": "Webhook not found"}), 404
+        
+        return jsonify({"message": "Webhook deleted successfully"}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error deleting webhook: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@jobs_bp.before_request
+def _jobs_enabled():
+    """Answer 501 while background jobs are disabled"""
+    if get_job_runner() is None:
+        return jsonify({"error": "Background jobs are not enabled"}), 501
+
+@jobs_bp.route('', methods=['POST'])
+def create_job():
+    """
+    Queue a background job
+    """
+    try:
+        # Validate input data
+        data = request.get_json()
+        validated_data = job_request_schema.load(data)
+        
+        job = JobService.create_job(validated_data["type"], validated_data["params"])
+        
+        return jsonify(job.to_dict()), 202, {"Location": f"/api/jobs/{job.id}"}
+    except ValidationError as err:
+        return jsonify({"error": "Validation error", "details": err.messages}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error creating job: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """
+    List recent jobs, optionally by status and type
+    """
+    try:
+        jobs = JobService.list_jobs(status=request.args.get('status'), job_type=request.args.get('type'))
+        
+        return jsonify({"jobs": [job.to_dict() for job in jobs]}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error listing jobs: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get a job with its progress and result
+    """
+    try:
+        job = JobService.get_job(job_id)
+        
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        return jsonify(job.to_dict()), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving job: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@jobs_bp.route('/<int:job_id>/output', methods=['GET'])
+def get_job_output(job_id):
+    """
+    Download the JSON lines written by a finished export or archive job
+    """
+    try:
+        job = JobService.get_job(job_id)
+        path = JobService.output_path(job) if job else None
+        
+        if not path:
+            return jsonify({"error": "Job output not found"}), 404
+        
+        return send_file(path, mimetype="application/x-ndjson", as_attachment=True,
+                         download_name=f"{job.job_type}-{job.id}.jsonl")
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving job output: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@stats_bp.route('', methods=['GET'])
+def get_stats():
+    """
+    Export runtime statistics of the installed middleware
+    """
+    providers = current_app.extensions.get('stats', {})
+    return jsonify({name: provider() for name, provider in providers.items()}), 200
@@ -0,0 +1,642 @@
+"""
+Request tracing: where the time of a request goes, as a tree of spans
+
+A sampled request records one span per step, nested under a root span
+opened by a WSGI middleware as soon as the request reaches the app:
+
+- ``routing``: from arrival until the first ``before_request`` hook,
+  which covers URL matching and pushing the request context
+- ``admission``: admission control, including any queueing
+- ``decode`` and ``validation``: reading the body and loading it with a
+  schema
+- ``TaskService.*``: the service call. SQL statements are its children;
+  its own time is spent in the ORM, building queries, fetching rows and
+  hydrating them into objects
+- ``sql SELECT`` and friends: each statement with its text, never its
+  parameters
+- ``to_dict``: turning task lists into dicts
+- ``serialize``: encoding the response as JSON, MessagePack or CBOR
+
+Requests are sampled at ``TRACE_SAMPLE_RATE``. A request carrying a W3C
+``traceparent`` header follows its caller's decision and joins its
+trace. Sampled responses carry ``X-Trace-Id``.
+
+Finished traces are handed to a background exporter which writes them
+as OTLP JSON, one trace per line, to ``TRACE_FILE_PATH``, or posts them
+in batches to an OTLP/HTTP collector at ``TRACE_OTLP_ENDPOINT``. When the
+exporter falls behind traces are dropped, never requests slowed down.
+``python -m cmd.traces`` prints the recorded trees and runs a stand-in
+collector.
+
+A request that is not sampled costs a random draw in the middleware and
+one context variable lookup per instrumentation point. Spans follow work
+handed to other threads through ``with_span`` (the shard fan-out).
+``urllib.request`` is imported by the first export to a collector.
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request header continuing a caller's trace, and response header naming the trace
+TRACEPARENT_HEADER = "HTTP_TRACEPARENT"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# Longest statement text kept on a SQL span
+MAX_STATEMENT_LENGTH = 2000
+
+# Spans kept per trace, the rest are counted on the root span
+MAX_SPANS_PER_TRACE = 1000
+
+# Traces posted to a collector in one request
+EXPORT_BATCH_SIZE = 100
+
+class Trace:
+    """
+    Spans recorded for one sampled request
+
+    Args:
+        trace_id (str): 32 hex digits
+    """
+
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, span):
+        """Keep a finished span, up to MAX_SPANS_PER_TRACE"""
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+class Span:
+    """
+    One timed step of a traced request, used as a context manager
+
+    While open the span is the current one, parent of the spans started
+    inside it.
+
+    Args:
+        trace (Trace): Trace the span belongs to
+        name (str): What the step is
+        parent_id (str, optional): Span id of the parent, None for the root
+        attributes (dict, optional): Details of the step
+        kind (int): OTLP span kind
+    """
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes", "kind", "start", "end", "error", "_token")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None, kind=SPAN_KIND_INTERNAL):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+        self._token = None
+
+    def set(self, key, value):
+        """Set an attribute"""
+        self.attributes[key] = value
+
+    def child(self, name, attributes=None, kind=SPAN_KIND_INTERNAL):
+        """Start a span nested in this one"""
+        return Span(self.trace, name, self.span_id, attributes, kind)
+
+    def finish(self, error=None):
+        """End the span and add it to its trace"""
+        self.end = time.time_ns()
+        if error is not None:
+            self.error = error
+        self.trace.add(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.finish(None if exc_type is None else f"{exc_type.__name__}: {exc}")
+        return False
+
+class _NoopSpan:
+    """Stands in for a span when the request is not traced"""
+
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+_current = contextvars.ContextVar("span", default=None)
+
+def current_span():
+    """
+    Innermost open span of the current context
+
+    Returns:
+        Span: The span, or None when the request is not traced
+    """
+    return _current.get()
+
+def span(name, **attributes):
+    """
+    Time a step of the current request
+
+    Args:
+        name (str): What the step is
+        **attributes: Details of the step
+
+    Returns:
+        Span: Context manager, a shared no-op when the request is not traced
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, attributes)
+
+def traced(func):
+    """
+    Decorator timing every call of a function as a span named after it
+
+    Args:
+        func (callable): Function to trace
+
+    Returns:
+        callable: Wrapped function
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        parent = _current.get()
+        if parent is None:
+            return func(*args, **kwargs)
+        with parent.child(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def with_span(func):
+    """
+    Carry the current span into calls made on other threads
+
+    Args:
+        func (callable): Function to run elsewhere
+
+    Returns:
+        callable: func, recording its spans under the caller's
+    """
+    parent = _current.get()
+    if parent is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+def parse_traceparent(value):
+    """
+    Read a W3C traceparent header
+
+    Args:
+        value (str): Header value, ``00-<trace id>-<parent id>-<flags>``
+
+    Returns:
+        tuple: (trace_id, parent_id, sampled), or None if malformed
+    """
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        trace_id, parent_id, flags = int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    if not trace_id or not parent_id:
+        return None
+    return parts[1].lower(), parts[2].lower(), bool(flags & 1)
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _encode_span(span):
+    encoded = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start),
+        "endTimeUnixNano": str(span.end),
+        "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in span.attributes.items()],
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    if span.error:
+        encoded["status"] = {"code": 2, "message": span.error}
+    return encoded
+
+def otlp_payload(traces, service_name):
+    """
+    Encode traces as an OTLP/JSON export request
+
+    Args:
+        traces (list): Finished Trace objects
+        service_name (str): service.name of the resource
+
+    Returns:
+        dict: ``{"resourceSpans": [...]}``
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "task-service.tracing"},
+                "spans": [_encode_span(span) for trace in traces for span in trace.spans],
+            }],
+        }]
+    }
+
+class SpanExporter:
+    """
+    Background export of finished traces
+
+    Traces wait in a bounded queue for the exporter thread. ``export``
+    is implemented by subclasses.
+
+    Args:
+        service_name (str): service.name of the exported spans
+        queue_size (int): Traces waiting at most, further ones are dropped
+        logger (Logger, optional): Where export failures are reported
+    """
+
+    def __init__(self, service_name, queue_size=1000, logger=None):
+        self.service_name = service_name
+        self.logger = logger
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            "exported_traces": 0,
+            "dropped_traces": 0,
+            "export_errors": 0,
+        }
+
+    def submit(self, trace):
+        """Queue a finished trace without waiting"""
+        self.ensure_started()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped_traces"] += 1
+
+    def ensure_started(self):
+        """Start the exporter thread, again after a fork"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=5):
+        """
+        Wait until every queued trace is exported
+
+        Args:
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            bool: True if the queue was drained
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(left)
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+                with self._lock:
+                    self._stats["exported_traces"] += len(batch)
+            except Exception as e:
+                with self._lock:
+                    self._stats["export_errors"] += 1
+                if self.logger is not None:
+                    self.logger.error(f"Trace export failed: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def export(self, traces):
+        """
+        Send finished traces
+
+        Args:
+            traces (list): Trace objects
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        Snapshot of export counters
+
+        Returns:
+            dict: Counters, and the traces waiting
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["queued_traces"] = self._queue.qsize()
+        return snapshot
+
+class FileExporter(SpanExporter):
+    """
+    Appends traces to a file, one OTLP/JSON export request per line
+
+    Args:
+        path (str): File written to, its directory is created
+        **kwargs: See SpanExporter
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def export(self, traces):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = "".join(json.dumps(otlp_payload([trace], self.service_name)) + "\n" for trace in traces)
+        with open(self.path, "a", encoding="utf-8") as output:
+            output.write(lines)
+
+class OTLPExporter(SpanExporter):
+    """
+    Posts traces to an OTLP/HTTP collector in the JSON encoding
+
+    Args:
+        endpoint (str): Collector URL, usually ending in ``/v1/traces``
+        timeout (float): Seconds to wait for the collector
+        **kwargs: See SpanExporter
+    """
+
+    def __init__(self, endpoint, timeout=5, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, traces):
+        import urllib.request
+
+        body = json.dumps(otlp_payload(traces, self.service_name)).encode()
+        post = urllib.request.Request(
+            self.endpoint, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(post, timeout=self.timeout) as response:
+            response.read()
+
+class Tracer:
+    """
+    Decides which requests are traced and hands finished traces to an exporter
+
+    Args:
+        exporter (SpanExporter): Where finished traces go
+        sample_rate (float): Share of requests traced, 0 to 1
+    """
+
+    def __init__(self, exporter, sample_rate):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._stats = {
+            "sampled_requests": 0,
+            "spans": 0,
+        }
+
+    def start(self, environ):
+        """
+        Open the root span of a request if it is sampled
+
+        Args:
+            environ (dict): WSGI environment
+
+        Returns:
+            Span: Root span, or None when the request is not traced
+        """
+        parent_id = parsed = None
+        traceparent = environ.get(TRACEPARENT_HEADER)
+        if traceparent is not None:
+            parsed = parse_traceparent(traceparent)
+        if parsed is not None:
+            trace_id, parent_id, sampled = parsed
+            if not sampled:
+                return None
+        elif self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        else:
+            trace_id = f"{random.getrandbits(128):032x}"
+        method = environ.get("REQUEST_METHOD", "GET")
+        path = environ.get("PATH_INFO", "/")
+        return Span(Trace(trace_id), f"{method} {path}", parent_id, {
+            "http.method": method,
+            "http.target": path,
+        }, kind=SPAN_KIND_SERVER)
+
+    def finish(self, root):
+        """
+        Close a request's root span and export its trace
+
+        Args:
+            root (Span): Root span returned by start
+        """
+        trace = root.trace
+        if trace.dropped:
+            root.set("tracing.dropped_spans", trace.dropped)
+        root.finish()
+        with self._lock:
+            self._stats["sampled_requests"] += 1
+            self._stats["spans"] += len(trace.spans)
+        self.exporter.submit(trace)
+
+    def stats(self):
+        """
+        Snapshot of tracing counters
+
+        Returns:
+            dict: Sampling and export counters
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["sample_rate"] = self.sample_rate
+        snapshot.update(self.exporter.stats())
+        return snapshot
+
+class TracingMiddleware:
+    """
+    WSGI middleware opening the root span of sampled requests
+
+    Args:
+        wsgi_app (callable): Application wrapped
+        tracer (Tracer): Tracer sampling the requests
+    """
+
+    def __init__(self, wsgi_app, tracer):
+        self.wsgi_app = wsgi_app
+        self.tracer = tracer
+
+    def __call__(self, environ, start_response):
+        root = self.tracer.start(environ)
+        if root is None:
+            return self.wsgi_app(environ, start_response)
+
+        def traced_start_response(status, headers, exc_info=None):
+            root.set("http.status_code", int(status.split(" ", 1)[0]))
+            if status[0] == "5":
+                root.error = status
+            headers.append((TRACE_ID_HEADER, root.trace.trace_id))
+            return start_response(status, headers, exc_info)
+
+        token = _current.set(root)
+        try:
+            return self.wsgi_app(environ, traced_start_response)
+        except Exception as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            self.tracer.finish(root)
+
+def _record_routing():
+    """Name the root span after the matched route and time the routing"""
+    root = _current.get()
+    if root is None or root.kind != SPAN_KIND_SERVER:
+        return None
+    routed = root.child("routing", {"flask.endpoint": request.endpoint})
+    routed.start = root.start
+    routed.finish()
+    if request.url_rule is not None:
+        root.name = f"{request.method} {request.url_rule.rule}"
+        root.set("http.route", request.url_rule.rule)
+    return None
+
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None:
+        return
+    words = statement.split(None, 1)
+    conn.info["trace_span"] = parent.child(
+        f"sql {words[0].upper() if words else ''}".rstrip(),
+        {"db.system": conn.dialect.name, "db.statement": statement[:MAX_STATEMENT_LENGTH]},
+        SPAN_KIND_CLIENT,
+    )
+
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    statement_span = conn.info.pop("trace_span", None)
+    if statement_span is not None:
+        if executemany:
+            statement_span.set("db.executemany", True)
+        statement_span.finish()
+
+def _fail_statement(context):
+    statement_span = context.connection.info.pop("trace_span", None) if context.connection is not None else None
+    if statement_span is not None:
+        statement_span.finish(f"{type(context.original_exception).__name__}: {context.original_exception}")
+
+_installed = False
+_install_lock = threading.Lock()
+
+def install_statement_spans():
+    """
+    Record a span for every statement run inside a traced request
+
+    Installed once per process. Statements outside traced requests only
+    pay for a context variable lookup.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _start_statement)
+        event.listen(Engine, "after_cursor_execute", _finish_statement)
+        event.listen(Engine, "handle_error", _fail_statement)
+        _installed = True
+
+def init_tracing(app):
+    """
+    Trace a sample of requests when enabled
+
+    Runs before the other request hooks so that routing is measured up
+    to them.
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get("TRACING_ENABLED"):
+        return
+    kind = app.config["TRACE_EXPORTER"]
+    options = {
+        "service_name": app.config["TRACE_SERVICE_NAME"],
+        "queue_size": app.config["TRACE_QUEUE_SIZE"],
+        "logger": app.logger,
+    }
+    if kind == "file":
+        exporter = FileExporter(app.config["TRACE_FILE_PATH"], **options)
+    elif kind == "otlp":
+        exporter = OTLPExporter(app.config["TRACE_OTLP_ENDPOINT"], **options)
+    else:
+        raise ValueError(f"Unknown trace exporter: {kind}")
+    tracer = Tracer(exporter, app.config["TRACE_SAMPLE_RATE"])
+    app.extensions["tracing"] = tracer
+    app.extensions.setdefault("stats", {})["tracing"] = tracer.stats
+    install_statement_spans()
+    app.wsgi_app = TracingMiddleware(app.wsgi_app, tracer)
+    app.before_request(_record_routing)
@@ -1,20 +1,25 @@
 """
 Application factory module for Task Management Service
+
+Only what is needed to serve requests is imported here. Migration tooling
+and optional extensions are loaded when they are used, see
+``benchmarks/bench_startup.py`` for the startup budget this protects.
 """
 import os
 from flask import Flask
-from flask_cors import CORS
-from flask_migrate import Migrate
 from internal.config import config
 from internal.db.database import db
+from internal.db.migrations import register_migrations_cli
 from internal.api.routes import register_routes
+from internal.api.negotiation import init_negotiation
 
-def create_app(config_name=None):
+def create_app(config_name=None, **overrides):
     """
     Application factory function
     
     Args:
         config_name: Configuration name to use (development, testing, production)
+        **overrides: Individual configuration values to override
         
     Returns:
         Flask application instance
@@ -24,11 +29,45 @@ def create_app(config_name=None):
         
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.config.update(overrides)
     
     # Initialize extensions
     db.init_app(app)
-    migrate = Migrate(app, db)
-    CORS(app)
+    register_migrations_cli(app)
+    init_negotiation(app)
+    if app.config.get("CORS_ENABLED"):
+        from flask_cors import CORS
+        CORS(app, origins=app.config["CORS_ORIGINS"])
+    if app.config.get("TRACING_ENABLED"):
+        from internal.api.tracing import init_tracing
+        init_tracing(app)
+    if app.config.get("DEADLINES_ENABLED"):
+        from internal.api.deadlines import init_deadlines
+        init_deadlines(app)
+    if app.config.get("ADMISSION_ENABLED"):
+        from internal.api.admission import init_admission
+        init_admission(app)
+    if app.config.get("SHARD_DATABASE_URLS"):
+        from internal.db.sharding import init_sharding
+        init_sharding(app)
+    if app.config.get("STORAGE_BACKEND", "database") != "database":
+        from internal.db.memory_store import init_memory_store
+        init_memory_store(app)
+    if app.config.get("GROUP_COMMIT_ENABLED"):
+        from internal.handlers.group_commit import init_group_commit
+        init_group_commit(app)
+    if app.config.get("RESULT_CACHE_ENABLED"):
+        from internal.handlers.result_cache import init_result_cache
+        init_result_cache(app)
+    if app.config.get("SINGLE_FLIGHT_ENABLED"):
+        from internal.handlers.single_flight import init_single_flight
+        init_single_flight(app)
+    if app.config.get("WEBHOOKS_ENABLED"):
+        from internal.handlers.webhooks import init_webhooks
+        init_webhooks(app)
+    if app.config.get("JOBS_ENABLED"):
+        from internal.handlers.jobs import init_jobs
+        init_jobs(app)
     
     # Register API routes
     register_routes(app)
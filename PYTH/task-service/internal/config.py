@@ -6,6 +6,23 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_bool(name, default):
+    """Read a boolean flag from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_seconds_map(name, default):
+    """Read ``key=seconds`` pairs, comma-separated, from the environment"""
+    pairs = [item.split("=", 1) for item in os.environ.get(name, default).split(",") if item.strip()]
+    return {key.strip(): float(seconds) for key, seconds in pairs}
+
+def _env_int_map(name, default):
+    """Read ``key=number`` pairs, comma-separated, from the environment"""
+    pairs = [item.split("=", 1) for item in os.environ.get(name, default).split(",") if item.strip()]
+    return {key.strip(): int(number) for key, number in pairs}
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-key-please-change-in-production")
@@ -15,6 +32,116 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL", "sqlite:///tasks.db"
     )
+    
+    # Where tasks live: "database" (SQLALCHEMY_DATABASE_URI or the shards)
+    # or "memory", in process with an optional append-only log. The memory
+    # store belongs to one process, run a single worker with it
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "database")
+    MEMORY_STORE_LOG_PATH = os.environ.get("MEMORY_STORE_LOG_PATH")
+    MEMORY_STORE_FSYNC = _env_bool("MEMORY_STORE_FSYNC", False)
+    
+    # Horizontal sharding: comma-separated database URLs, one per shard,
+    # in shard index order. Empty keeps every task in SQLALCHEMY_DATABASE_URI
+    SHARD_DATABASE_URLS = [
+        url.strip() for url in os.environ.get("SHARD_DATABASE_URLS", "").split(",") if url.strip()
+    ]
+    
+    # Cache of encoded list responses, invalidated by every task write
+    RESULT_CACHE_ENABLED = _env_bool("RESULT_CACHE_ENABLED", False)
+    RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "memory")
+    RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "instance/result_cache.db")
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024))
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    RESULT_CACHE_EVICTION = os.environ.get("RESULT_CACHE_EVICTION", "lru")
+    RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", 0))
+    
+    # Identical concurrent reads within a worker share one query
+    SINGLE_FLIGHT_ENABLED = _env_bool("SINGLE_FLIGHT_ENABLED", True)
+    
+    # Group commit: coalesce concurrent writes into shared transactions
+    GROUP_COMMIT_ENABLED = _env_bool("GROUP_COMMIT_ENABLED", False)
+    GROUP_COMMIT_WINDOW_MS = float(os.environ.get("GROUP_COMMIT_WINDOW_MS", 2))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", 64))
+    
+    # Webhooks: task events are written to an outbox with each change and
+    # posted to subscribers in batches by a background dispatcher
+    WEBHOOKS_ENABLED = _env_bool("WEBHOOKS_ENABLED", False)
+    WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", 100))
+    WEBHOOK_MAX_CONCURRENCY = int(os.environ.get("WEBHOOK_MAX_CONCURRENCY", 4))
+    WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get("WEBHOOK_TIMEOUT_SECONDS", 5))
+    WEBHOOK_RETRY_BASE_SECONDS = float(os.environ.get("WEBHOOK_RETRY_BASE_SECONDS", 1))
+    WEBHOOK_RETRY_MAX_SECONDS = float(os.environ.get("WEBHOOK_RETRY_MAX_SECONDS", 300))
+    WEBHOOK_POLL_SECONDS = float(os.environ.get("WEBHOOK_POLL_SECONDS", 1))
+    
+    # Background jobs (exports, imports, bulk deletes, archive runs) are
+    # queued in the jobs table and run by a thread pool in each worker, or
+    # only by `python -m cmd.jobs run` when JOB_RUNNER_EMBEDDED is off.
+    # JOB_CONCURRENCY caps the jobs of a type running at once, over every
+    # runner; a runner that stops renewing its leases for JOB_LEASE_SECONDS
+    # is presumed dead and its jobs resume elsewhere
+    JOBS_ENABLED = _env_bool("JOBS_ENABLED", False)
+    JOB_RUNNER_EMBEDDED = _env_bool("JOB_RUNNER_EMBEDDED", True)
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+    JOB_CONCURRENCY = _env_int_map("JOB_CONCURRENCY", "export=2,import=1,bulk_delete=1,archive=1")
+    JOB_BATCH_SIZE = int(os.environ.get("JOB_BATCH_SIZE", 500))
+    JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", 60))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", 5))
+    JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", 1))
+    JOB_OUTPUT_DIR = os.environ.get("JOB_OUTPUT_DIR", "instance/jobs")
+    JOB_IMPORT_MAX_TASKS = int(os.environ.get("JOB_IMPORT_MAX_TASKS", 10000))
+    
+    # Online backfills in migrations (internal/db/online_migrations.py):
+    # rows per chunk at most, pause between chunks, target chunk duration,
+    # lock wait on PostgreSQL and attempts per chunk
+    MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 1000))
+    MIGRATION_PAUSE_SECONDS = float(os.environ.get("MIGRATION_PAUSE_SECONDS", 0.05))
+    MIGRATION_CHUNK_SECONDS = float(os.environ.get("MIGRATION_CHUNK_SECONDS", 0.5))
+    MIGRATION_LOCK_TIMEOUT_SECONDS = float(os.environ.get("MIGRATION_LOCK_TIMEOUT_SECONDS", 2))
+    MIGRATION_RETRIES = int(os.environ.get("MIGRATION_RETRIES", 5))
+    
+    # Largest number of operations accepted by POST /api/batch
+    BATCH_MAX_OPERATIONS = int(os.environ.get("BATCH_MAX_OPERATIONS", 100))
+    
+    # Cross-origin requests, flask_cors is only imported when enabled
+    CORS_ENABLED = _env_bool("CORS_ENABLED", True)
+    CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*")
+    
+    # Deadlines: every API request gets a time budget, enforced on its
+    # database statements. ROUTE_DEADLINES overrides it per endpoint;
+    # clients may ask for less with DEADLINE_HEADER
+    DEADLINES_ENABLED = _env_bool("DEADLINES_ENABLED", True)
+    REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 30))
+    ROUTE_DEADLINES = _env_seconds_map(
+        "ROUTE_DEADLINES",
+        "tasks.list_tasks=10,tasks.get_subtree=10,tasks.get_task_progress=10,tags.get_tag_counts=10"
+    )
+    DEADLINE_HEADER = os.environ.get("DEADLINE_HEADER", "X-Request-Timeout")
+    
+    # Request tracing: a sample of requests records a span tree (routing,
+    # validation, ORM, SQL, to_dict, serialisation) exported as OTLP JSON,
+    # to TRACE_FILE_PATH ("file") or to the collector at TRACE_OTLP_ENDPOINT
+    # ("otlp"). Requests with a sampled traceparent header are always traced
+    TRACING_ENABLED = _env_bool("TRACING_ENABLED", False)
+    TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.01))
+    TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "file")
+    TRACE_FILE_PATH = os.environ.get("TRACE_FILE_PATH", "instance/traces.jsonl")
+    TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "task-service")
+    TRACE_QUEUE_SIZE = int(os.environ.get("TRACE_QUEUE_SIZE", 1000))
+    
+    # Admission control: per-client token buckets plus a per-worker
+    # concurrency limit with a bounded, prioritised wait queue
+    ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+    ADMISSION_BACKEND = os.environ.get("ADMISSION_BACKEND", "memory")
+    ADMISSION_STATE_PATH = os.environ.get("ADMISSION_STATE_PATH", "instance/admission.db")
+    ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER")
+    RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", 50))
+    RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", 100))
+    MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", 16))
+    MAX_QUEUED_REQUESTS = int(os.environ.get("MAX_QUEUED_REQUESTS", 64))
+    QUEUE_TIMEOUT_SECONDS = float(os.environ.get("QUEUE_TIMEOUT_SECONDS", 5))
+    ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 1))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -24,6 +151,7 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    ADMISSION_ENABLED = False
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -15,3 +15,22 @@ def init_db(app):
     """
     with app.app_context():
         db.create_all()
+
+def begin_write_transaction(session):
+    """
+    Open the session's transaction on the database right away
+    
+    The pysqlite driver defers BEGIN until the first DML statement, so a
+    SAVEPOINT issued first would start and, on RELEASE, commit a
+    transaction of its own. Starting the transaction eagerly (and taking
+    the write lock with BEGIN IMMEDIATE) keeps savepoints nested inside a
+    single commit. Other databases already behave this way.
+    
+    Args:
+        session: SQLAlchemy session
+    """
+    connection = session.connection()
+    if connection.dialect.name != "sqlite":
+        return
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
@@ -0,0 +1,748 @@
+"""
+In-memory task store with array-backed columns
+
+Tasks are kept column by column, one position per task: numbers in
+``array`` arrays, text in lists. Deleted positions are tombstoned and
+reclaimed once they outnumber the live ones. Secondary indexes mirror
+those of the tasks table:
+
+* created_at, (status, created_at) and (priority, created_at): arrays of
+  ids sorted by (created_at, id)
+* due_date: ids of dated tasks sorted by (due_date, id), then the undated
+  ones by id
+* tags and parent_id: sets of ids per tag name and per parent
+
+A list page without tag filter is read off the index matching its
+ordering and filters, and is a plain slice when no other filter remains.
+Timestamps are stored as integer microseconds since the epoch.
+
+Persistence is optional. With a log path every change is appended to a
+log of JSON lines, the full row after a write or the ids of a delete,
+and the log is replayed at startup and then rewritten with one line per
+live task. The store belongs to one process: run a single worker.
+"""
+import bisect
+import json
+import os
+import threading
+from array import array
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from marshmallow import ValidationError
+
+from internal.db.store import PARENT_CYCLE, PARENT_NOT_FOUND, TaskStore, register_task_store
+from internal.models.tag import TAG_MODE_ALL, normalize_tag_names
+from internal.models.task import (
+    DEFAULT_TASK_SORT, SORT_DESC, Task, TaskPriority, TaskStatus
+)
+
+STORAGE_DATABASE = "database"
+STORAGE_MEMORY = "memory"
+STORAGE_BACKENDS = (STORAGE_DATABASE, STORAGE_MEMORY)
+
+_EPOCH = datetime(1970, 1, 1)
+# NULL in the timestamp columns, below every real timestamp
+_NULL_TIME = -(2 ** 63)
+
+_STATUS = Task.status.type
+_PRIORITY = Task.priority.type
+
+# Columns of a stored row, as written to the log
+ROW_FIELDS = (
+    "id", "parent_id", "title", "description", "status", "priority",
+    "due_date", "created_at", "updated_at", "tags"
+)
+_TIME_FIELDS = ("due_date", "created_at", "updated_at")
+
+# Indexes to refresh when a field changes
+_INDEXED_BY = {
+    "status": ("status",),
+    "priority": ("priority",),
+    "created_at": ("created", "status", "priority"),
+    "due_date": ("due",),
+    "tags": ("tags",),
+    "parent_id": ("children",),
+}
+
+# How much cheaper checking an id while walking an index is than a sort key
+_WALK_FACTOR = 20
+
+# Reclaim tombstoned positions beyond this many
+_VACUUM_MIN_TOMBSTONES = 1024
+
+StoredTag = namedtuple("StoredTag", "name")
+
+class StoredTask:
+    """
+    Task read from the memory store
+
+    A snapshot with the attributes of Task, later writes do not change it.
+    """
+    __slots__ = ROW_FIELDS
+
+    to_dict = Task.to_dict
+
+def _to_micros(value):
+    """Datetime (naive UTC or aware) to microseconds since the epoch"""
+    if value is None:
+        return _NULL_TIME
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def _from_micros(value):
+    return None if value == _NULL_TIME else _EPOCH + timedelta(microseconds=value)
+
+def _utcnow():
+    return _to_micros(datetime.utcnow())
+
+class MemoryTaskStore(TaskStore):
+    """
+    Task store held in process memory
+
+    Every operation holds one lock, reads included, which keeps them
+    consistent and costs little next to a database round trip.
+
+    Args:
+        log_path (str, optional): Append-only log to persist tasks in
+        fsync (bool): Sync the log to disk after every change
+    """
+
+    name = "the memory store"
+    supports_subtasks = True
+
+    def __init__(self, log_path=None, fsync=False):
+        self.log_path = log_path
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._next_id = 1
+        self._log = None
+        self._log_records = 0
+        self._reset()
+        if log_path:
+            self._open_log()
+
+    def _reset(self):
+        # Columns
+        self._ids = array("q")
+        self._parent = array("q")
+        self._status = array("b")
+        self._priority = array("b")
+        self._due = array("q")
+        self._created = array("q")
+        self._updated = array("q")
+        self._title = []
+        self._description = []
+        self._tags = []
+        # id -> position, live tasks only
+        self._pos = {}
+        self._tombstones = 0
+        # Indexes
+        self._by_created = array("q")
+        self._by_status = {}
+        self._by_priority = {}
+        self._by_due = array("q")
+        self._undated = array("q")
+        self._by_tag = {}
+        self._children = {}
+        # Tasks per (status, priority) codes, the total of a list filtered by both
+        self._pair_counts = Counter()
+        # One record per tag name, shared by every task carrying it
+        self._tag_records = {}
+
+    # Reads
+
+    def get_task_by_id(self, task_id):
+        with self._lock:
+            position = self._pos.get(task_id)
+            return None if position is None else self._record(position)
+
+    def list_tasks(self, page=1, per_page=20, status=None, priority=None, tags=None,
+                   tag_mode=TAG_MODE_ALL, sort=DEFAULT_TASK_SORT, order=SORT_DESC):
+        start = (page - 1) * per_page
+        with self._lock:
+            runs, residual = self._plan(sort, order, status, priority)
+            if tags:
+                matches = self._filtered(self._tagged(tags, tag_mode), status, priority)
+                total = len(matches)
+                # Sorting costs about a key per match, walking the index about
+                # len(self._pos) / total ids per result, each far cheaper than a key
+                if (start + per_page) * len(self._pos) > _WALK_FACTOR * total * total:
+                    ordered = sorted(matches, key=self._sort_key(sort, order), reverse=order == SORT_DESC)
+                    page_ids = ordered[start:start + per_page]
+                else:
+                    page_ids = _collect(runs, matches.__contains__, start, per_page)
+            else:
+                total = self._count(status, priority)
+                if residual is None:
+                    page_ids = _window(runs, start, per_page)
+                else:
+                    page_ids = _collect(runs, residual, start, per_page)
+            tasks = [self._record(self._pos[task_id]) for task_id in page_ids]
+        total_pages = -(-total // per_page) if total else 0
+        return tasks, total_pages, total
+
+    def tag_counts(self, status=None, priority=None, tags=None, tag_mode=TAG_MODE_ALL):
+        with self._lock:
+            if not (status or priority or tags):
+                counts = {name: len(ids) for name, ids in self._by_tag.items() if ids}
+            else:
+                if tags:
+                    matching = self._filtered(self._tagged(tags, tag_mode), status, priority)
+                else:
+                    runs, residual = self._plan(DEFAULT_TASK_SORT, SORT_DESC, status, priority)
+                    matching = [task_id for task_id in _walk(runs) if residual is None or residual(task_id)]
+                counts = Counter(name for task_id in matching for name in self._tags[self._pos[task_id]])
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def get_subtree(self, task_id, max_depth=None):
+        with self._lock:
+            if task_id not in self._pos:
+                return None
+            return [(self._record(self._pos[node]), depth) for node, depth in self._subtree(task_id, max_depth)]
+
+    def get_ancestors(self, task_id):
+        with self._lock:
+            position = self._pos.get(task_id)
+            if position is None:
+                return None
+            chain = []
+            parent = self._parent[position]
+            while parent:
+                position = self._pos[parent]
+                chain.append(self._record(position))
+                parent = self._parent[position]
+            chain.reverse()
+            return chain
+
+    def get_progress(self, task_id):
+        with self._lock:
+            if task_id not in self._pos:
+                return None
+            codes = Counter(self._status[self._pos[node]] for node, _ in self._subtree(task_id))
+        total = sum(codes.values())
+        by_status = {status.value: codes[_STATUS.code(status.value)] for status in TaskStatus}
+        return {
+            "task_id": task_id,
+            "total": total,
+            "by_status": by_status,
+            "completion": round(100.0 * by_status[TaskStatus.COMPLETED.value] / total, 1)
+        }
+
+    def stats(self):
+        """
+        Snapshot of store counters
+
+        Returns:
+            dict: Tasks, tags, tombstones and log records
+        """
+        with self._lock:
+            return {
+                "tasks": len(self._pos),
+                "tags": sum(1 for ids in self._by_tag.values() if ids),
+                "tombstones": self._tombstones,
+                "log_records": self._log_records,
+            }
+
+    # Writes
+
+    def create_task(self, task_data):
+        with self._lock:
+            self._check_parent(None, task_data.get("parent_id"))
+            now = _utcnow()
+            row = {
+                "id": self._next_id,
+                "parent_id": None,
+                "title": None,
+                "description": None,
+                "status": TaskStatus.PENDING.value,
+                "priority": TaskPriority.MEDIUM.value,
+                "due_date": _NULL_TIME,
+                "created_at": now,
+                "updated_at": now,
+                "tags": (),
+            }
+            row.update(_stored_fields(task_data))
+            self._next_id += 1
+            self._insert(row)
+            self._append({"put": row})
+            return self._record(self._pos[row["id"]])
+
+    def update_task(self, task_id, task_data):
+        with self._lock:
+            position = self._pos.get(task_id)
+            if position is None:
+                return None
+            if "parent_id" in task_data:
+                self._check_parent(task_id, task_data["parent_id"])
+            current = self._row(position)
+            changes = {
+                key: value for key, value in _stored_fields(task_data).items() if current[key] != value
+            }
+            # Like the database, which only bumps updated_at on a real change
+            if changes:
+                changes.setdefault("updated_at", _utcnow())
+                self._change(task_id, changes)
+                current.update(changes)
+                self._append({"put": current})
+            return self._record(position)
+
+    def update_task_status(self, task_id, status):
+        return self.update_task(task_id, {"status": status})
+
+    def delete_task(self, task_id):
+        with self._lock:
+            if task_id not in self._pos:
+                return False
+            removed = [node for node, _ in self._subtree(task_id)]
+            for node in reversed(removed):
+                self._remove(node)
+            self._append({"delete": removed})
+            self._vacuum()
+            return True
+
+    # Persistence
+
+    def compact(self):
+        """
+        Rewrite the log with one record per live task
+
+        Written to a temporary file first, then swapped in, so a crash
+        leaves either log intact.
+        """
+        with self._lock:
+            if not self.log_path:
+                return
+            if self._log:
+                self._log.close()
+            temporary = f"{self.log_path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as log:
+                log.write(json.dumps({"next_id": self._next_id}) + "\n")
+                for task_id in sorted(self._pos):
+                    log.write(json.dumps({"put": self._row(self._pos[task_id])}) + "\n")
+                log.flush()
+                os.fsync(log.fileno())
+            os.replace(temporary, self.log_path)
+            self._log_records = len(self._pos) + 1
+            self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def close(self):
+        """Close the log"""
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def _open_log(self):
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.log_path):
+            self._replay()
+            self.compact()
+        else:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _replay(self):
+        with open(self.log_path, encoding="utf-8") as log:
+            for line in log:
+                # A line cut short by a crash is the last one, its change was never acknowledged
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                if "put" in record:
+                    row = record["put"]
+                    row["tags"] = tuple(row["tags"])
+                    if row["id"] in self._pos:
+                        self._change(row["id"], row)
+                    else:
+                        self._insert(row)
+                    self._next_id = max(self._next_id, row["id"] + 1)
+                elif "delete" in record:
+                    for task_id in reversed(record["delete"]):
+                        self._remove(task_id)
+                else:
+                    self._next_id = max(self._next_id, record["next_id"])
+        self._vacuum()
+
+    def _append(self, record):
+        if self._log is None:
+            return
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_records += 1
+
+    # Columns
+
+    def _insert(self, row):
+        """Append a row at a new position and index it"""
+        self._pos[row["id"]] = len(self._ids)
+        self._ids.append(row["id"])
+        self._parent.append(row["parent_id"] or 0)
+        self._status.append(_code(_STATUS, row["status"]))
+        self._priority.append(_code(_PRIORITY, row["priority"]))
+        self._due.append(row["due_date"])
+        self._created.append(row["created_at"])
+        self._updated.append(row["updated_at"])
+        self._title.append(row["title"])
+        self._description.append(row["description"])
+        self._tags.append(row["tags"])
+        self._index(row["id"], ("created", "status", "priority", "due", "tags", "children"))
+
+    def _change(self, task_id, changes):
+        """Change the columns of a task, refreshing the indexes they feed"""
+        indexes = {index for key in changes for index in _INDEXED_BY.get(key, ())}
+        self._unindex(task_id, indexes)
+        position = self._pos[task_id]
+        for key, value in changes.items():
+            if key == "parent_id":
+                self._parent[position] = value or 0
+            elif key == "status":
+                self._status[position] = _code(_STATUS, value)
+            elif key == "priority":
+                self._priority[position] = _code(_PRIORITY, value)
+            elif key == "due_date":
+                self._due[position] = value
+            elif key == "created_at":
+                self._created[position] = value
+            elif key == "updated_at":
+                self._updated[position] = value
+            elif key == "title":
+                self._title[position] = value
+            elif key == "description":
+                self._description[position] = value
+            elif key == "tags":
+                self._tags[position] = value
+        self._index(task_id, indexes)
+
+    def _remove(self, task_id):
+        """Unindex a task and tombstone its position"""
+        self._unindex(task_id, ("created", "status", "priority", "due", "tags", "children"))
+        position = self._pos.pop(task_id)
+        self._title[position] = self._description[position] = None
+        self._tags[position] = ()
+        self._children.pop(task_id, None)
+        self._tombstones += 1
+
+    def _vacuum(self):
+        """Drop tombstoned positions once they outnumber live tasks"""
+        if self._tombstones < max(_VACUUM_MIN_TOMBSTONES, len(self._pos)):
+            return
+        live = sorted(self._pos.values())
+        for name in ("_ids", "_parent", "_status", "_priority", "_due", "_created", "_updated"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[position] for position in live)))
+        for name in ("_title", "_description", "_tags"):
+            column = getattr(self, name)
+            setattr(self, name, [column[position] for position in live])
+        self._pos = {task_id: position for position, task_id in enumerate(self._ids)}
+        self._tombstones = 0
+
+    def _row(self, position):
+        """Stored values of a task, as written to the log"""
+        return {
+            "id": self._ids[position],
+            "parent_id": self._parent[position] or None,
+            "title": self._title[position],
+            "description": self._description[position],
+            "status": _value(_STATUS, self._status[position]),
+            "priority": _value(_PRIORITY, self._priority[position]),
+            "due_date": self._due[position],
+            "created_at": self._created[position],
+            "updated_at": self._updated[position],
+            "tags": self._tags[position],
+        }
+
+    def _record(self, position):
+        """Build the StoredTask at a position"""
+        task = StoredTask()
+        task.id = self._ids[position]
+        task.parent_id = self._parent[position] or None
+        task.title = self._title[position]
+        task.description = self._description[position]
+        task.status = _value(_STATUS, self._status[position])
+        task.priority = _value(_PRIORITY, self._priority[position])
+        task.due_date = _from_micros(self._due[position])
+        task.created_at = _from_micros(self._created[position])
+        task.updated_at = _from_micros(self._updated[position])
+        task.tags = [self._tag_records[name] for name in self._tags[position]]
+        return task
+
+    # Indexes
+
+    def _created_key(self, task_id):
+        return self._created[self._pos[task_id]], task_id
+
+    def _due_key(self, task_id):
+        return self._due[self._pos[task_id]], task_id
+
+    def _index(self, task_id, indexes):
+        position = self._pos[task_id]
+        if "created" in indexes:
+            _insort(self._by_created, task_id, self._created_key)
+        if "status" in indexes:
+            run = self._by_status.setdefault(self._status[position], array("q"))
+            _insort(run, task_id, self._created_key)
+        if "priority" in indexes:
+            run = self._by_priority.setdefault(self._priority[position], array("q"))
+            _insort(run, task_id, self._created_key)
+        if "status" in indexes or "priority" in indexes:
+            self._pair_counts[self._status[position], self._priority[position]] += 1
+        if "due" in indexes:
+            if self._due[position] == _NULL_TIME:
+                _insort(self._undated, task_id, None)
+            else:
+                _insort(self._by_due, task_id, self._due_key)
+        if "tags" in indexes:
+            for name in self._tags[position]:
+                self._by_tag.setdefault(name, set()).add(task_id)
+                self._tag_records.setdefault(name, StoredTag(name))
+        if "children" in indexes and self._parent[position]:
+            self._children.setdefault(self._parent[position], set()).add(task_id)
+
+    def _unindex(self, task_id, indexes):
+        position = self._pos[task_id]
+        if "created" in indexes:
+            _discard(self._by_created, task_id, self._created_key)
+        if "status" in indexes:
+            _discard(self._by_status[self._status[position]], task_id, self._created_key)
+        if "priority" in indexes:
+            _discard(self._by_priority[self._priority[position]], task_id, self._created_key)
+        if "status" in indexes or "priority" in indexes:
+            self._pair_counts[self._status[position], self._priority[position]] -= 1
+        if "due" in indexes:
+            if self._due[position] == _NULL_TIME:
+                _discard(self._undated, task_id, None)
+            else:
+                _discard(self._by_due, task_id, self._due_key)
+        if "tags" in indexes:
+            for name in self._tags[position]:
+                self._by_tag[name].discard(task_id)
+        if "children" in indexes and self._parent[position]:
+            self._children[self._parent[position]].discard(task_id)
+
+    # Queries
+
+    def _plan(self, sort, order, status, priority):
+        """
+        Pick the index runs that yield the tasks in the requested order
+
+        Returns:
+            tuple: (runs, residual) where runs are (ids, reverse) pairs to
+            walk in turn and residual filters them, None when every id matches
+        """
+        descending = order == SORT_DESC
+        status_code = _filter_code(_STATUS, status)
+        priority_code = _filter_code(_PRIORITY, priority)
+        empty = array("q")
+        if sort == "priority":
+            codes = sorted(self._by_priority, reverse=descending)
+            if priority_code is not None:
+                codes = [priority_code]
+            runs = [(self._by_priority.get(code, empty), descending) for code in codes]
+            return runs, self._column_filter(status_code, None)
+        if sort == "due_date":
+            runs = [(self._by_due, descending), (self._undated, descending)]
+            return runs, self._column_filter(status_code, priority_code)
+        # created_at: the smaller of the status and priority runs, checking the other
+        if status_code is not None and priority_code is not None:
+            by_status = self._by_status.get(status_code, empty)
+            by_priority = self._by_priority.get(priority_code, empty)
+            if len(by_status) <= len(by_priority):
+                return [(by_status, descending)], self._column_filter(None, priority_code)
+            return [(by_priority, descending)], self._column_filter(status_code, None)
+        if status_code is not None:
+            return [(self._by_status.get(status_code, empty), descending)], None
+        if priority_code is not None:
+            return [(self._by_priority.get(priority_code, empty), descending)], None
+        return [(self._by_created, descending)], None
+
+    def _column_filter(self, status_code, priority_code):
+        """Predicate on task ids checking the status and priority columns"""
+        if status_code is None and priority_code is None:
+            return None
+        position, status, priority = self._pos, self._status, self._priority
+        if priority_code is None:
+            return lambda task_id: status[position[task_id]] == status_code
+        if status_code is None:
+            return lambda task_id: priority[position[task_id]] == priority_code
+        return lambda task_id: (
+            status[position[task_id]] == status_code and priority[position[task_id]] == priority_code
+        )
+
+    def _count(self, status, priority):
+        """Number of tasks with a status and priority, None matching any"""
+        status_code = _filter_code(_STATUS, status)
+        priority_code = _filter_code(_PRIORITY, priority)
+        if status_code is None and priority_code is None:
+            return len(self._pos)
+        if priority_code is None:
+            return len(self._by_status.get(status_code, ()))
+        if status_code is None:
+            return len(self._by_priority.get(priority_code, ()))
+        return self._pair_counts[status_code, priority_code]
+
+    def _tagged(self, tags, tag_mode):
+        """Ids of the tasks carrying all (or any) of the tags, not to be modified"""
+        sets = [self._by_tag.get(name, set()) for name in tags]
+        if len(sets) == 1:
+            return sets[0]
+        if tag_mode == TAG_MODE_ALL:
+            sets.sort(key=len)
+            return set.intersection(*sets)
+        return set.union(*sets)
+
+    def _filtered(self, ids, status, priority):
+        """The set of ids with the status and priority, ids itself without filters"""
+        residual = self._column_filter(_filter_code(_STATUS, status), _filter_code(_PRIORITY, priority))
+        if residual is None:
+            return ids
+        return {task_id for task_id in ids if residual(task_id)}
+
+    def _sort_key(self, sort, order):
+        """Key ordering ids like ``task_ordering``, to be reversed for SORT_DESC"""
+        position, created = self._pos, self._created
+        if sort == "priority":
+            priority = self._priority
+            return lambda task_id: (priority[position[task_id]], created[position[task_id]], task_id)
+        if sort == "due_date":
+            due = self._due
+            # Undated last either way, like NULLS LAST, so the flag flips with the order
+            undated_last = order != SORT_DESC
+            return lambda task_id: (
+                (due[position[task_id]] == _NULL_TIME) == undated_last, due[position[task_id]], task_id
+            )
+        return lambda task_id: (created[position[task_id]], task_id)
+
+    def _subtree(self, task_id, max_depth=None):
+        """(id, depth) pairs of a task and its subtasks, by depth then id"""
+        nodes = []
+        level = [task_id]
+        depth = 0
+        while level and (max_depth is None or depth <= max_depth):
+            level.sort()
+            nodes.extend((node, depth) for node in level)
+            level = [child for node in level for child in self._children.get(node, ())]
+            depth += 1
+        return nodes
+
+    def _check_parent(self, task_id, parent_id):
+        """Make sure parent_id can become the parent of task_id"""
+        if parent_id is None:
+            return
+        if parent_id not in self._pos:
+            raise ValidationError({"parent_id": [PARENT_NOT_FOUND]})
+        node = parent_id
+        while node and task_id is not None:
+            if node == task_id:
+                raise ValidationError({"parent_id": [PARENT_CYCLE]})
+            node = self._parent[self._pos[node]]
+
+def _stored_fields(task_data):
+    """Task data in the stored representation, unknown keys left out"""
+    fields = {}
+    for key, value in task_data.items():
+        if key not in ROW_FIELDS or key == "id":
+            continue
+        if key in _TIME_FIELDS:
+            value = _to_micros(value)
+        elif key == "tags":
+            value = tuple(sorted(normalize_tag_names(value)))
+        fields[key] = value
+    return fields
+
+def _code(enum_type, value):
+    """Code of an enum value, 0 for NULL"""
+    return 0 if value is None else enum_type.code(value)
+
+def _value(enum_type, code):
+    return None if code == 0 else enum_type.value_of(code)
+
+def _filter_code(enum_type, value):
+    """Code to filter on: None for no filter, -1 for a value no task has"""
+    if not value:
+        return None
+    try:
+        return enum_type.code(value)
+    except KeyError:
+        return -1
+
+def _insort(ids, task_id, key):
+    """Insert an id into an index sorted by key"""
+    if key is None:
+        bisect.insort(ids, task_id)
+        return
+    value = key(task_id)
+    # Most tasks are the newest, they go at the end
+    if not ids or key(ids[-1]) < value:
+        ids.append(task_id)
+    else:
+        ids.insert(bisect.bisect_left(ids, value, key=key), task_id)
+
+def _discard(ids, task_id, key):
+    """Remove an id from an index sorted by key, before its key changes"""
+    if key is None:
+        index = bisect.bisect_left(ids, task_id)
+    else:
+        index = bisect.bisect_left(ids, key(task_id), key=key)
+    del ids[index]
+
+def _walk(runs):
+    """Ids of the runs, in walking order"""
+    for ids, reverse in runs:
+        yield from (reversed(ids) if reverse else ids)
+
+def _collect(runs, residual, start, count):
+    """Walk the runs for count ids passing residual, after skipping start of them"""
+    page_ids = []
+    for task_id in _walk(runs):
+        if residual(task_id):
+            if start:
+                start -= 1
+            else:
+                page_ids.append(task_id)
+                if len(page_ids) == count:
+                    break
+    return page_ids
+
+def _window(runs, start, count):
+    """Slice count ids from position start of the concatenated runs"""
+    page_ids = []
+    for ids, reverse in runs:
+        if count <= 0:
+            break
+        if start >= len(ids):
+            start -= len(ids)
+            continue
+        if reverse:
+            stop = len(ids) - start
+            taken = ids[max(stop - count, 0):stop][::-1]
+        else:
+            taken = ids[start:start + count]
+        page_ids.extend(taken)
+        count -= len(taken)
+        start = 0
+    return page_ids
+
+def init_memory_store(app):
+    """
+    Keep tasks in process memory when STORAGE_BACKEND is "memory"
+
+    Args:
+        app: Flask application instance
+    """
+    backend = app.config.get("STORAGE_BACKEND", STORAGE_DATABASE)
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if backend != STORAGE_MEMORY:
+        return
+    path = app.config.get("MEMORY_STORE_LOG_PATH")
+    if path and not os.path.isabs(path):
+        path = os.path.normpath(os.path.join(app.root_path, "..", path))
+    store = MemoryTaskStore(path, fsync=app.config.get("MEMORY_STORE_FSYNC", False))
+    register_task_store(app, store)
+    app.extensions.setdefault("stats", {})["memory_store"] = store.stats
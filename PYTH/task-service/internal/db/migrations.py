@@ -1,11 +1,58 @@
 """
 Database migrations initialization module
+
+Flask-Migrate pulls in Alembic and every SQLAlchemy dialect module it
+ships DDL support for, which more than doubles the import time of the
+service. The ``flask db`` command group is therefore registered as a lazy
+proxy: Flask-Migrate is imported and initialised only when a ``db``
+subcommand is actually resolved.
 """
-from flask_migrate import Migrate
+import click
 from internal.db.database import db
 
-migrate = Migrate()
+MIGRATIONS_DIRECTORY = "migrations"
 
 def init_migrations(app):
-    """Initialize migrations with the app"""
+    """
+    Initialize Flask-Migrate with the app
+
+    Args:
+        app: Flask application instance
+
+    Returns:
+        Migrate: The initialised extension
+    """
+    from flask_migrate import Migrate
+    migrate = Migrate(directory=MIGRATIONS_DIRECTORY)
     migrate.init_app(app, db)
+    return migrate
+
+class LazyMigrateGroup(click.MultiCommand):
+    """``flask db`` command group that loads Flask-Migrate on first use"""
+
+    def __init__(self, app, **kwargs):
+        super().__init__(name="db", help="Perform database migrations.", **kwargs)
+        self.app = app
+        self._group = None
+
+    def _load(self):
+        if self._group is None:
+            init_migrations(self.app)
+            from flask_migrate.cli import db as db_cli_group
+            self._group = db_cli_group
+        return self._group
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        return self._load().get_command(ctx, cmd_name)
+
+def register_migrations_cli(app):
+    """
+    Register the lazy ``flask db`` command group
+
+    Args:
+        app: Flask application instance
+    """
+    app.cli.add_command(LazyMigrateGroup(app))
@@ -0,0 +1,338 @@
+"""
+Online data migrations for Alembic revisions
+
+A plain ``op.execute("UPDATE tasks ...")`` runs in the transaction of the
+migration: its row locks (on SQLite the database write lock) are held
+until the whole upgrade commits, and ``op.create_index`` blocks writes to
+the table while the index builds. Revisions that must run against a live
+database use these helpers instead:
+
+``backfill`` updates a table in primary key order, one short statement per
+chunk, and pauses between chunks. It stops at the largest key present when
+it starts: the application must already write the new values, for rows
+inserted while it runs. The chunk size adapts so that a chunk
+takes about ``MIGRATION_CHUNK_SECONDS``. After every chunk the position is
+stored in the ``migration_checkpoints`` table, so an interrupted upgrade
+resumes where it stopped, and progress is logged.
+``python -m cmd.migrations status`` shows the checkpoints from another
+shell.
+
+``create_index_online`` and ``drop_index_online`` use ``CONCURRENTLY`` on
+PostgreSQL and can be run again after a failure.
+
+Both run in an Alembic autocommit block, which commits the work of the
+upgrade so far. Keep such operations in revisions of their own; env.py
+runs every revision in its own transaction. Backfill assignments must be
+idempotent, because a chunk interrupted before its checkpoint is written
+runs again.
+"""
+import logging
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+from flask import current_app, has_app_context
+
+logger = logging.getLogger("alembic.online")
+
+CHECKPOINT_TABLE = "migration_checkpoints"
+
+# Kept out of the models' metadata like alembic_version, env.py leaves it
+# alone when autogenerating
+checkpoints = sa.Table(
+    CHECKPOINT_TABLE, sa.MetaData(),
+    sa.Column("name", sa.String(255), primary_key=True),
+    sa.Column("table_name", sa.String(255), nullable=False),
+    sa.Column("last_key", sa.BigInteger(), nullable=True),
+    sa.Column("rows_done", sa.BigInteger(), nullable=False, default=0),
+    sa.Column("rows_total", sa.BigInteger(), nullable=True),
+    sa.Column("started_at", sa.DateTime(), nullable=False),
+    sa.Column("updated_at", sa.DateTime(), nullable=False),
+    sa.Column("completed_at", sa.DateTime(), nullable=True),
+)
+
+# Used outside an app context, the app config overrides them
+DEFAULTS = {
+    "MIGRATION_BATCH_SIZE": 1000,
+    "MIGRATION_PAUSE_SECONDS": 0.05,
+    "MIGRATION_CHUNK_SECONDS": 0.5,
+    "MIGRATION_LOCK_TIMEOUT_SECONDS": 2,
+    "MIGRATION_RETRIES": 5,
+}
+
+# Seconds between progress log lines
+REPORT_INTERVAL = 10
+
+# Below every key, where a backfill starts
+FIRST_KEY = -(2 ** 63)
+
+def _setting(name, value):
+    if value is not None:
+        return value
+    if has_app_context():
+        return current_app.config.get(name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+class Backfill:
+    """
+    Chunked, resumable update of a table in primary key order
+
+    Args:
+        connection: Connection in autocommit mode
+        name (str): Unique name of the backfill, the checkpoint key
+        table (str): Table to update
+        assignments (str): SQL after ``SET``
+        where (str, optional): SQL condition limiting the updated rows
+        params (dict, optional): Bind parameters of assignments and where
+        key (str): Integer primary key column walked in order
+        batch_size (int): Rows per chunk, the most the adaptive size grows to
+        pause (float): Seconds to sleep between chunks
+        chunk_seconds (float): Target duration of a chunk
+        lock_timeout (float): Longest wait for a row lock on PostgreSQL
+        retries (int): Attempts per chunk failing on a lock or timeout
+        progress (callable, optional): Called with the checkpoint after every chunk
+    """
+
+    def __init__(self, connection, name, table, assignments, where=None, params=None, key="id",
+                 batch_size=1000, pause=0.05, chunk_seconds=0.5, lock_timeout=2, retries=5, progress=None):
+        self.connection = connection
+        self.name = name
+        self.table = table
+        self.params = dict(params or {})
+        self.max_batch = batch_size
+        self.min_batch = max(1, batch_size // 64)
+        self.pause = pause
+        self.chunk_seconds = chunk_seconds
+        self.lock_timeout = lock_timeout
+        self.retries = retries
+        self.progress = progress
+        condition = f" AND ({where})" if where else ""
+        self._update = sa.text(
+            f"UPDATE {table} SET {assignments} WHERE {key} > :_low AND {key} <= :_high{condition}"
+        )
+        self._count = sa.text(f"SELECT COUNT(*) FROM {table} WHERE {key} > :_low{condition}")
+        self._next_key = sa.text(
+            f"SELECT {key} FROM {table} WHERE {key} > :_low ORDER BY {key} LIMIT 1 OFFSET :_offset"
+        )
+        self._last_key = sa.text(f"SELECT MAX({key}) FROM {table}")
+
+    def run(self):
+        """
+        Update every remaining chunk
+
+        Returns:
+            dict: Final checkpoint
+        """
+        checkpoints.create(self.connection, checkfirst=True)
+        state = self._load()
+        if state["completed_at"] is not None:
+            logger.info(f"Backfill {self.name} already completed, skipping")
+            return state
+        if state["last_key"] is not None:
+            logger.info(f"Resuming backfill {self.name} after {state['last_key']}, {state['rows_done']} rows done")
+
+        postgresql = self.connection.dialect.name == "postgresql"
+        if postgresql:
+            # Fail fast behind a long transaction instead of queueing writers behind the chunk
+            self.connection.execute(sa.text(f"SET lock_timeout = '{int(self.lock_timeout * 1000)}ms'"))
+        try:
+            self._run(state)
+        finally:
+            if postgresql:
+                self.connection.execute(sa.text("RESET lock_timeout"))
+        return state
+
+    def _run(self, state):
+        batch = self.max_batch
+        reported = started = time.monotonic()
+        rows_at_start = state["rows_done"]
+        end = self.connection.execute(self._last_key).scalar()
+        while end is not None and (state["last_key"] is None or state["last_key"] < end):
+            low = state["last_key"] if state["last_key"] is not None else FIRST_KEY
+            high = self.connection.execute(self._next_key, {"_low": low, "_offset": batch - 1}).scalar()
+            high = end if high is None else min(high, end)
+
+            chunk_started = time.monotonic()
+            updated = self._update_chunk(low, high)
+            elapsed = time.monotonic() - chunk_started
+
+            state["last_key"] = high
+            state["rows_done"] += updated
+            self._save(state)
+            if self.progress:
+                self.progress(dict(state))
+
+            now = time.monotonic()
+            if now - reported >= REPORT_INTERVAL:
+                reported = now
+                self._report(state, (state["rows_done"] - rows_at_start) / (now - started))
+
+            # Keep chunks, and so the locks they hold, near the target duration
+            if elapsed > self.chunk_seconds:
+                batch = max(self.min_batch, batch // 2)
+            elif elapsed < self.chunk_seconds / 4:
+                batch = min(self.max_batch, batch * 2)
+            if self.pause:
+                time.sleep(self.pause)
+
+        state["completed_at"] = datetime.utcnow()
+        self._save(state)
+        logger.info(f"Backfill {self.name} completed: {state['rows_done']} rows "
+                    f"in {time.monotonic() - started:.1f}s")
+
+    def _update_chunk(self, low, high):
+        """Update one key range, retrying lock timeouts and busy databases"""
+        for attempt in range(1, self.retries + 1):
+            try:
+                return self.connection.execute(self._update, {**self.params, "_low": low, "_high": high}).rowcount
+            except sa.exc.OperationalError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Backfill {self.name} chunk after {low} failed, retrying: {e.orig}")
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+
+    def _load(self):
+        row = self.connection.execute(
+            sa.select(checkpoints).where(checkpoints.c.name == self.name)
+        ).mappings().first()
+        if row is not None:
+            return dict(row)
+        now = datetime.utcnow()
+        state = {
+            "name": self.name, "table_name": self.table, "last_key": None, "rows_done": 0,
+            "rows_total": self.connection.execute(self._count, {**self.params, "_low": FIRST_KEY}).scalar(),
+            "started_at": now, "updated_at": now, "completed_at": None,
+        }
+        self.connection.execute(sa.insert(checkpoints).values(**state))
+        logger.info(f"Starting backfill {self.name} of {state['rows_total']} rows in {self.table}")
+        return state
+
+    def _save(self, state):
+        state["updated_at"] = datetime.utcnow()
+        self.connection.execute(
+            sa.update(checkpoints).where(checkpoints.c.name == self.name).values(
+                last_key=state["last_key"], rows_done=state["rows_done"],
+                updated_at=state["updated_at"], completed_at=state["completed_at"]
+            )
+        )
+
+    def _report(self, state, rate):
+        total = state["rows_total"]
+        if total:
+            remaining = max(total - state["rows_done"], 0)
+            eta = f", about {remaining / rate:.0f}s left" if rate else ""
+            logger.info(f"Backfill {self.name}: {state['rows_done']}/{total} rows "
+                        f"({min(state['rows_done'] / total, 1):.1%}), {rate:.0f} rows/s{eta}")
+        else:
+            logger.info(f"Backfill {self.name}: {state['rows_done']} rows, {rate:.0f} rows/s")
+
+def backfill(name, table, assignments, where=None, params=None, key="id", batch_size=None,
+             pause=None, chunk_seconds=None, progress=None):
+    """
+    Update a table in resumable, throttled chunks from a revision script
+
+    Settings left as None come from MIGRATION_BATCH_SIZE,
+    MIGRATION_PAUSE_SECONDS and MIGRATION_CHUNK_SECONDS, so a running
+    upgrade can be tuned from the environment. In offline (``--sql``) mode
+    a single UPDATE is emitted instead.
+
+    Args:
+        name (str): Unique name, e.g. ``"<revision>_<column>"``
+        table (str): Table to update
+        assignments (str): SQL after ``SET``, must be idempotent
+        where (str, optional): SQL condition limiting the updated rows
+        params (dict, optional): Bind parameters of assignments and where
+        key (str): Integer primary key column
+        batch_size (int, optional): Most rows per chunk
+        pause (float, optional): Seconds between chunks
+        chunk_seconds (float, optional): Target duration of a chunk
+        progress (callable, optional): Called with the checkpoint after every chunk
+
+    Returns:
+        dict: Final checkpoint, None in offline mode
+    """
+    context = op.get_context()
+    if context.as_sql:
+        condition = f" WHERE {where}" if where else ""
+        op.execute(sa.text(f"UPDATE {table} SET {assignments}{condition}").bindparams(**(params or {})))
+        return None
+    with context.autocommit_block():
+        return Backfill(
+            context.connection, name, table, assignments, where=where, params=params, key=key,
+            batch_size=_setting("MIGRATION_BATCH_SIZE", batch_size),
+            pause=_setting("MIGRATION_PAUSE_SECONDS", pause),
+            chunk_seconds=_setting("MIGRATION_CHUNK_SECONDS", chunk_seconds),
+            lock_timeout=_setting("MIGRATION_LOCK_TIMEOUT_SECONDS", None),
+            retries=_setting("MIGRATION_RETRIES", None),
+            progress=progress,
+        ).run()
+
+def _index_state(connection, name, table):
+    """'valid', 'invalid' (a failed concurrent build) or None if missing"""
+    if connection.dialect.name == "postgresql":
+        valid = connection.execute(sa.text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ), {"name": name}).scalar()
+        return None if valid is None else ("valid" if valid else "invalid")
+    names = {index["name"] for index in sa.inspect(connection).get_indexes(table)}
+    return "valid" if name in names else None
+
+def create_index_online(name, table, columns, unique=False):
+    """
+    Build an index without blocking writes, from a revision script
+
+    On PostgreSQL the index is built ``CONCURRENTLY``. An invalid index
+    left by a failed build is dropped and built again; an existing valid
+    index is kept. Other databases build it with a plain CREATE INDEX.
+
+    Args:
+        name (str): Index name
+        table (str): Table name
+        columns (list): Column names
+        unique (bool): Build a unique index
+    """
+    context = op.get_context()
+    postgresql = context.dialect.name == "postgresql"
+    with context.autocommit_block():
+        if not context.as_sql:
+            state = _index_state(context.connection, name, table)
+            if state == "valid":
+                logger.info(f"Index {name} already exists, skipping")
+                return
+            if state == "invalid":
+                logger.info(f"Dropping invalid index {name} left by an earlier build")
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        started = time.monotonic()
+        op.create_index(name, table, columns, unique=unique, postgresql_concurrently=postgresql, if_not_exists=True)
+        if not context.as_sql:
+            logger.info(f"Built index {name} in {time.monotonic() - started:.1f}s")
+
+def drop_index_online(name, table):
+    """
+    Drop an index without blocking writes, ``CONCURRENTLY`` on PostgreSQL
+
+    Args:
+        name (str): Index name
+        table (str): Table name
+    """
+    context = op.get_context()
+    with context.autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=context.dialect.name == "postgresql",
+                      if_exists=True)
+
+def list_checkpoints(connection):
+    """
+    Stored backfill checkpoints
+
+    Args:
+        connection: Database connection
+
+    Returns:
+        list: Checkpoint dicts, most recently updated first
+    """
+    if not sa.inspect(connection).has_table(CHECKPOINT_TABLE):
+        return []
+    rows = connection.execute(sa.select(checkpoints).order_by(checkpoints.c.updated_at.desc()))
+    return [dict(row) for row in rows.mappings()]
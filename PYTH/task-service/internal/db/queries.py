@@ -0,0 +1,78 @@
+"""
+List queries over tasks in one database
+
+Shared by ``TaskService`` and by every shard of the sharded store, so
+both paths filter, order and count tags the same way.
+"""
+from sqlalchemy import asc, desc, func, select
+
+from internal.models.tag import TAG_MODE_ALL, Tag, tagged_task_ids, task_tags
+from internal.models.task import DEFAULT_TASK_SORT, SORT_DESC, Task
+
+def apply_task_filters(query, status=None, priority=None, tags=None, tag_mode=TAG_MODE_ALL):
+    """
+    Apply the list filters shared by the single-database and sharded paths
+
+    Args:
+        query: Query over Task
+        status (str, optional): Filter by status
+        priority (str, optional): Filter by priority
+        tags (tuple, optional): Filter by normalised tag names
+        tag_mode (str): TAG_MODE_ALL or TAG_MODE_ANY
+
+    Returns:
+        Query: Filtered query
+    """
+    if status:
+        query = query.filter(Task.status == status)
+    if priority:
+        query = query.filter(Task.priority == priority)
+    if tags:
+        query = query.filter(Task.id.in_(tagged_task_ids(tags, tag_mode)))
+    return query
+
+def task_ordering(sort=DEFAULT_TASK_SORT, order=SORT_DESC):
+    """
+    ORDER BY clauses of a list ordering, matching the indexes on tasks
+
+    Priority sorts by rank, then by creation date. Tasks without a due
+    date come last in both directions.
+
+    Args:
+        sort (str): Key of TASK_SORTS
+        order (str): SORT_ASC or SORT_DESC
+
+    Returns:
+        list: ORDER BY clauses, ending with the id
+    """
+    direction = desc if order == SORT_DESC else asc
+    if sort == "priority":
+        clauses = [direction(Task.priority), direction(Task.created_at)]
+    elif sort == "due_date":
+        clauses = [direction(Task.due_date).nulls_last()]
+    else:
+        clauses = [direction(Task.created_at)]
+    return clauses + [direction(Task.id)]
+
+def count_tags(session, status=None, priority=None, tags=None, tag_mode=TAG_MODE_ALL):
+    """
+    Count the tasks carrying each tag, over the tasks matching the filters
+
+    Without filters only the association index is read.
+
+    Args:
+        session: Session to use
+        status (str, optional): Filter by status
+        priority (str, optional): Filter by priority
+        tags (tuple, optional): Filter by normalised tag names
+        tag_mode (str): TAG_MODE_ALL or TAG_MODE_ANY
+
+    Returns:
+        list: (name, count) pairs, most used first
+    """
+    count = func.count(task_tags.c.task_id)
+    query = session.query(Tag.name, count).join(task_tags, task_tags.c.tag_id == Tag.id)
+    if status or priority or tags:
+        matching = apply_task_filters(select(Task.id), status, priority, tags, tag_mode)
+        query = query.filter(task_tags.c.task_id.in_(matching))
+    return [tuple(row) for row in query.group_by(Tag.name).order_by(desc(count), Tag.name)]
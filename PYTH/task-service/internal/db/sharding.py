@@ -0,0 +1,500 @@
+"""
+Horizontal sharding of tasks across several databases
+
+Task ids handed to clients encode the shard that stores the task::
+
+    task_id = local_id * SHARD_ID_SPACE + shard_index
+
+so reads and writes by id go straight to one shard, and ids stay stable
+when shards are added. Listing fans out to every shard in parallel and
+k-way merges the per-shard pages on the requested ordering.
+
+Tasks returned by the router are detached from their shard session and
+carry the encoded id, so ``to_dict`` works unchanged.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import create_engine, desc, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from internal.api.deadlines import with_deadline
+from internal.api.tracing import with_span
+from internal.db.database import db
+from internal.db.queries import apply_task_filters, count_tags, task_ordering
+from internal.db.store import TaskStore, register_task_store
+from internal.models.tag import TAG_MODE_ALL, Tag, resolve_tags, task_tags
+from internal.models.task import DEFAULT_TASK_SORT, SORT_DESC, Task, TaskClosure
+
+# Upper bound on the number of shards, fixed so ids never change meaning
+SHARD_ID_SPACE = 1024
+
+# Tables every shard holds
+SHARDED_TABLES = [Task.__table__, TaskClosure.__table__, Tag.__table__, task_tags]
+
+def encode_task_id(shard_index, local_id):
+    """
+    Build the public id of a task
+
+    Args:
+        shard_index (int): Shard storing the task
+        local_id (int): Primary key inside that shard
+
+    Returns:
+        int: Public task id
+    """
+    return local_id * SHARD_ID_SPACE + shard_index
+
+def decode_task_id(task_id):
+    """
+    Split a public task id
+
+    Args:
+        task_id (int): Public task id
+
+    Returns:
+        tuple: (shard_index, local_id)
+    """
+    local_id, shard_index = divmod(task_id, SHARD_ID_SPACE)
+    return shard_index, local_id
+
+def task_sort_key(sort=DEFAULT_TASK_SORT, order=SORT_DESC):
+    """
+    Python sort key equivalent to ``task_ordering``, for merging sorted lists
+
+    Args:
+        sort (str): Key of TASK_SORTS
+        order (str): SORT_ASC or SORT_DESC
+
+    Returns:
+        callable: Key to use with ``reverse=(order == SORT_DESC)``
+    """
+    priority_code = Task.priority.type.code
+    descending = order == SORT_DESC
+
+    def key(task):
+        if sort == "priority":
+            # NULL sorts below every priority, as in SQLite
+            rank = priority_code(task.priority) if task.priority else 0
+            return rank, task.created_at, task.id
+        if sort == "due_date":
+            # Undated tasks sort after dated ones whatever the direction
+            dated = task.due_date is not None
+            return dated if descending else not dated, task.due_date, task.id
+        return task.created_at, task.id
+    return key
+
+def resolve_database_url(url, instance_path):
+    """
+    Resolve relative SQLite paths against the instance folder, like
+    Flask-SQLAlchemy does for SQLALCHEMY_DATABASE_URI
+
+    Args:
+        url (str): Database URL
+        instance_path (str): Flask instance folder
+
+    Returns:
+        str: Database URL
+    """
+    parsed = make_url(url)
+    if (
+        parsed.drivername.startswith("sqlite")
+        and parsed.database not in (None, "", ":memory:")
+        and not os.path.isabs(parsed.database)
+    ):
+        os.makedirs(instance_path, exist_ok=True)
+        parsed = parsed.set(database=os.path.join(instance_path, parsed.database))
+        return parsed.render_as_string(hide_password=False)
+    return url
+
+class ShardRouter(TaskStore):
+    """
+    Routes task operations to the shard owning each task
+
+    Subtasks and batches would need transactions spanning shards, so
+    they are not available.
+
+    Args:
+        urls (list): Database URL per shard, in shard index order
+        engine_options (dict, optional): Keyword arguments for create_engine
+    """
+
+    name = "sharding"
+
+    def __init__(self, urls, engine_options=None):
+        if not urls:
+            raise ValueError("At least one shard is required")
+        if len(urls) > SHARD_ID_SPACE:
+            raise ValueError(f"At most {SHARD_ID_SPACE} shards are supported")
+        self.urls = list(urls)
+        self.engines = [create_engine(url, **(engine_options or {})) for url in self.urls]
+        self._sessions = [
+            sessionmaker(bind=engine, expire_on_commit=False) for engine in self.engines
+        ]
+        self._next_shard = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self.engines)
+
+    def create_all(self):
+        """Create the task tables on every shard"""
+        for engine in self.engines:
+            db.metadata.create_all(engine, tables=SHARDED_TABLES)
+
+    def drop_all(self):
+        """Drop the task tables on every shard"""
+        for engine in self.engines:
+            db.metadata.drop_all(engine, tables=SHARDED_TABLES)
+
+    def dispose(self):
+        """Close pooled connections and the scatter-gather threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+        for engine in self.engines:
+            engine.dispose()
+
+    def _scatter(self, func):
+        """Run ``func(shard_index)`` on every shard in parallel"""
+        with self._lock:
+            # Created lazily and again after fork, threads do not survive it
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self.engines), thread_name_prefix="shard"
+                )
+            executor = self._executor
+        # The request's deadline bounds the queries on every shard, and
+        # their statements join the request's trace
+        return list(executor.map(with_span(with_deadline(func)), range(len(self.engines))))
+
+    def session(self, shard_index):
+        """
+        Open a session on one shard
+
+        Args:
+            shard_index (int): Shard index
+
+        Returns:
+            Session: New session, to be used as a context manager
+        """
+        return self._sessions[shard_index]()
+
+    def _pick_shard(self):
+        with self._lock:
+            return next(self._next_shard) % len(self.engines)
+
+    def _locate(self, task_id):
+        shard_index, local_id = decode_task_id(task_id)
+        if shard_index >= len(self.engines) or local_id < 1:
+            return None, None
+        return shard_index, local_id
+
+    @staticmethod
+    def _assign(session, task, task_data):
+        """Set task attributes, with tag names resolved on the task's shard"""
+        for key, value in task_data.items():
+            if key == "tags":
+                value = resolve_tags(session, value)
+            setattr(task, key, value)
+
+    @staticmethod
+    def _publish(session, task, shard_index):
+        """Detach a task and give it its public id"""
+        session.expunge(task)
+        set_committed_value(task, "id", encode_task_id(shard_index, task.id))
+        return task
+
+    def create_task(self, task_data):
+        """
+        Create a task on the next shard in round-robin order
+
+        Args:
+            task_data (dict): Task data
+
+        Returns:
+            Task: Created task
+        """
+        shard_index = self._pick_shard()
+        with self.session(shard_index) as session:
+            task = Task()
+            self._assign(session, task, task_data)
+            session.add(task)
+            session.commit()
+            return self._publish(session, task, shard_index)
+
+    def get_task_by_id(self, task_id):
+        """
+        Get task by public ID
+
+        Args:
+            task_id (int): Task ID
+
+        Returns:
+            Task: Task if found, None otherwise
+        """
+        shard_index, local_id = self._locate(task_id)
+        if shard_index is None:
+            return None
+        with self.session(shard_index) as session:
+            task = session.get(Task, local_id)
+            return self._publish(session, task, shard_index) if task else None
+
+    def update_task(self, task_id, task_data):
+        """
+        Update an existing task on its shard
+
+        Args:
+            task_id (int): Task ID
+            task_data (dict): Updated task data
+
+        Returns:
+            Task: Updated task or None if not found
+        """
+        return self._modify(
+            task_id, lambda session, task: self._assign(session, task, task_data)
+        )
+
+    def update_task_status(self, task_id, status):
+        """
+        Update task status on its shard
+
+        Args:
+            task_id (int): Task ID
+            status (str): New status
+
+        Returns:
+            Task: Updated task or None if not found
+        """
+        return self._modify(task_id, lambda session, task: setattr(task, "status", status))
+
+    def _modify(self, task_id, change):
+        shard_index, local_id = self._locate(task_id)
+        if shard_index is None:
+            return None
+        with self.session(shard_index) as session:
+            task = session.get(Task, local_id)
+            if not task:
+                return None
+            change(session, task)
+            session.commit()
+            return self._publish(session, task, shard_index)
+
+    def delete_task(self, task_id):
+        """
+        Delete a task from its shard
+
+        Args:
+            task_id (int): Task ID
+
+        Returns:
+            bool: True if task was deleted, False otherwise
+        """
+        shard_index, local_id = self._locate(task_id)
+        if shard_index is None:
+            return False
+        with self.session(shard_index) as session:
+            task = session.get(Task, local_id)
+            if not task:
+                return False
+            session.delete(task)
+            session.commit()
+            return True
+
+    def list_tasks(self, page=1, per_page=20, status=None, priority=None, tags=None,
+                   tag_mode=TAG_MODE_ALL, sort=DEFAULT_TASK_SORT, order=SORT_DESC):
+        """
+        List tasks across all shards
+
+        Every shard returns its first ``page * per_page`` matches and its
+        match count in parallel; the sorted per-shard lists are merged
+        lazily and the requested page is sliced out. Deep pages therefore
+        cost ``page * per_page`` rows per shard.
+
+        Args:
+            page (int): Page number
+            per_page (int): Items per page
+            status (str, optional): Filter by status
+            priority (str, optional): Filter by priority
+            tags (tuple, optional): Filter by normalised tag names
+            tag_mode (str): TAG_MODE_ALL or TAG_MODE_ANY
+            sort (str): Key of TASK_SORTS
+            order (str): SORT_ASC or SORT_DESC
+
+        Returns:
+            tuple: (tasks, total_pages, total_items)
+        """
+        limit = page * per_page
+        ordering = task_ordering(sort, order)
+
+        def fetch(shard_index):
+            with self.session(shard_index) as session:
+                query = apply_task_filters(session.query(Task), status, priority, tags, tag_mode)
+                total = query.order_by(None).with_entities(func.count(Task.id)).scalar()
+                tasks = query.order_by(*ordering).limit(limit).all()
+                return total, [self._publish(session, task, shard_index) for task in tasks]
+
+        results = self._scatter(fetch)
+        total_items = sum(total for total, _ in results)
+        merged = heapq.merge(
+            *(tasks for _, tasks in results),
+            key=task_sort_key(sort, order),
+            reverse=order == SORT_DESC
+        )
+        tasks = list(itertools.islice(merged, (page - 1) * per_page, limit))
+        total_pages = int(math.ceil(total_items / float(per_page))) if total_items else 0
+        return tasks, total_pages, total_items
+
+    def tag_counts(self, **filters):
+        """
+        Number of tasks per tag, summed over all shards
+
+        Args:
+            **filters: Filters accepted by count_tags
+
+        Returns:
+            list: (name, count) pairs, most used first
+        """
+        def count(shard_index):
+            with self.session(shard_index) as session:
+                return count_tags(session, **filters)
+
+        totals = {}
+        for counts in self._scatter(count):
+            for name, value in counts:
+                totals[name] = totals.get(name, 0) + value
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def shard_counts(self):
+        """
+        Number of tasks stored on each shard
+
+        Returns:
+            list: Task count per shard index
+        """
+        def count(shard_index):
+            with self.session(shard_index) as session:
+                return session.query(func.count(Task.id)).scalar()
+
+        return self._scatter(count)
+
+def plan_rebalance(counts):
+    """
+    Work out the moves that even out task counts
+
+    Args:
+        counts (list): Task count per shard
+
+    Returns:
+        list: (source_shard, target_shard, number_of_tasks) moves
+    """
+    total = sum(counts)
+    shards = len(counts)
+    # The first ``total % shards`` shards keep one task more than the rest
+    targets = [total // shards + (1 if i < total % shards else 0) for i in range(shards)]
+    surplus = [(i, counts[i] - targets[i]) for i in range(shards) if counts[i] > targets[i]]
+    deficit = [(i, targets[i] - counts[i]) for i in range(shards) if counts[i] < targets[i]]
+
+    moves = []
+    while surplus and deficit:
+        source, extra = surplus[0]
+        target, missing = deficit[0]
+        moved = min(extra, missing)
+        moves.append((source, target, moved))
+        surplus[0] = (source, extra - moved)
+        deficit[0] = (target, missing - moved)
+        if surplus[0][1] == 0:
+            surplus.pop(0)
+        if deficit[0][1] == 0:
+            deficit.pop(0)
+    return moves
+
+def rebalance(router, batch_size=500, dry_run=False, on_move=None):
+    """
+    Move tasks between shards until every shard holds a fair share
+
+    Typically run after adding shards to SHARD_DATABASE_URLS. Tasks are
+    copied in batches, newest first. Each batch is committed on the
+    target and reported to ``on_move`` before it is deleted from the
+    source, so an interrupted run never loses tasks: at worst the last
+    reported batch still exists on the source too, under the old ids of
+    the mapping. Moved tasks get new public ids; ``on_move`` receives
+    every (old_id, new_id) pair so callers can record the mapping.
+
+    Args:
+        router (ShardRouter): Shards to rebalance
+        batch_size (int): Tasks moved per transaction
+        dry_run (bool): Only compute the plan
+        on_move (callable, optional): Called with (old_id, new_id)
+
+    Returns:
+        list: The executed (or planned) moves
+    """
+    moves = plan_rebalance(router.shard_counts())
+    if dry_run:
+        return moves
+
+    # Subtasks are not available with sharding, so there are no parents to carry
+    columns = [column.key for column in Task.__table__.columns if column.key not in ("id", "parent_id")]
+    for source, target, count in moves:
+        remaining = count
+        while remaining:
+            with router.session(source) as source_session, router.session(target) as target_session:
+                batch = (
+                    source_session.query(Task)
+                    .order_by(desc(Task.created_at), desc(Task.id))
+                    .limit(min(batch_size, remaining))
+                    .all()
+                )
+                if not batch:
+                    break
+                copies = [Task(**{key: getattr(task, key) for key in columns}) for task in batch]
+                for task, copy in zip(batch, copies):
+                    copy.tags = resolve_tags(target_session, [tag.name for tag in task.tags])
+                target_session.add_all(copies)
+                target_session.commit()
+                if on_move:
+                    for task, copy in zip(batch, copies):
+                        on_move(encode_task_id(source, task.id), encode_task_id(target, copy.id))
+                for task in batch:
+                    source_session.delete(task)
+                source_session.commit()
+                remaining -= len(batch)
+    return moves
+
+def get_shard_router():
+    """
+    Shard router of the current app
+
+    Returns:
+        ShardRouter: The router, or None when sharding is disabled
+    """
+    return current_app.extensions.get("shards")
+
+def init_sharding(app):
+    """
+    Enable sharding when SHARD_DATABASE_URLS is configured
+
+    Args:
+        app: Flask application instance
+    """
+    urls = app.config.get("SHARD_DATABASE_URLS")
+    if not urls:
+        return
+    router = ShardRouter(
+        [resolve_database_url(url, app.instance_path) for url in urls],
+        engine_options=app.config.get("SHARD_ENGINE_OPTIONS")
+    )
+    app.extensions["shards"] = router
+    register_task_store(app, router)
@@ -0,0 +1,173 @@
+"""
+Storage interface of TaskService
+
+By default TaskService keeps tasks in the Flask-SQLAlchemy database, with
+group commit, batches in one transaction and the closure table. A task
+store replaces that storage as a whole: when one is registered in
+``app.extensions["task_store"]``, every TaskService operation is
+delegated to it. Two stores exist:
+
+* ShardRouter (``internal.db.sharding``), spreading tasks over several
+  databases
+* MemoryTaskStore (``internal.db.memory_store``), an in-process engine
+  with optional log persistence
+
+Stores return objects with the attributes of Task and its ``to_dict``.
+"""
+from flask import current_app
+
+# Shared by every storage with subtasks
+PARENT_NOT_FOUND = "Parent task not found."
+PARENT_CYCLE = "A task cannot be a subtask of itself or of its subtasks."
+
+class TaskStore:
+    """
+    Operations a task store implements
+
+    Filters and orderings have the meaning they have in
+    ``TaskService.list_tasks``. Methods a store cannot support raise
+    NotImplementedError and are announced by the class attributes below,
+    so the API can answer 501 instead.
+    """
+
+    # Shown in "not available with ..." messages
+    name = "task store"
+    # parent_id and the subtree, ancestors and progress queries
+    supports_subtasks = False
+    # POST /api/batch, which needs database transactions
+    supports_batches = False
+
+    def create_task(self, task_data):
+        """
+        Create a task
+
+        Args:
+            task_data (dict): Validated task data
+
+        Returns:
+            The created task
+        """
+        raise NotImplementedError
+
+    def get_task_by_id(self, task_id):
+        """
+        Get a task
+
+        Args:
+            task_id (int): Task ID
+
+        Returns:
+            The task, None if it does not exist
+        """
+        raise NotImplementedError
+
+    def list_tasks(self, page, per_page, status, priority, tags, tag_mode, sort, order):
+        """
+        List one page of the tasks matching the filters
+
+        Returns:
+            tuple: (tasks, total_pages, total_items)
+        """
+        raise NotImplementedError
+
+    def update_task(self, task_id, task_data):
+        """
+        Update a task
+
+        Args:
+            task_id (int): Task ID
+            task_data (dict): Validated task data
+
+        Returns:
+            The updated task, None if it does not exist
+        """
+        raise NotImplementedError
+
+    def update_task_status(self, task_id, status):
+        """
+        Update the status of a task
+
+        Args:
+            task_id (int): Task ID
+            status (str): New status
+
+        Returns:
+            The updated task, None if it does not exist
+        """
+        raise NotImplementedError
+
+    def delete_task(self, task_id):
+        """
+        Delete a task together with its subtasks
+
+        Args:
+            task_id (int): Task ID
+
+        Returns:
+            bool: True if the task was deleted, False if it does not exist
+        """
+        raise NotImplementedError
+
+    def tag_counts(self, status=None, priority=None, tags=None, tag_mode=None):
+        """
+        Count the tasks carrying each tag among the tasks matching the filters
+
+        Returns:
+            list: (name, count) pairs, most used first, then by name
+        """
+        raise NotImplementedError
+
+    def get_subtree(self, task_id, max_depth=None):
+        """
+        Get a task and its subtasks
+
+        Returns:
+            list: (task, depth) pairs ordered by depth then id, None if
+            the task does not exist
+        """
+        raise NotImplementedError
+
+    def get_ancestors(self, task_id):
+        """
+        Get the parents of a task
+
+        Returns:
+            list: Ancestors from the root down to the direct parent, None
+            if the task does not exist
+        """
+        raise NotImplementedError
+
+    def get_progress(self, task_id):
+        """
+        Roll up the status of a task and its subtasks
+
+        Returns:
+            dict: See ``TaskService.get_progress``, None if the task does
+            not exist
+        """
+        raise NotImplementedError
+
+def get_task_store():
+    """
+    Task store of the current app
+
+    Returns:
+        TaskStore: The store, or None when tasks live in the default database
+    """
+    return current_app.extensions.get("task_store")
+
+def register_task_store(app, store):
+    """
+    Make a store the storage of TaskService
+
+    Args:
+        app: Flask application instance
+        store (TaskStore): Store to use
+
+    Raises:
+        ValueError: If another store is already registered
+    """
+    current = app.extensions.get("task_store")
+    if current is not None:
+        raise ValueError(f"Cannot use {store.name} together with {current.name}")
+    app.extensions["task_store"] = store
@@ -0,0 +1,133 @@
+"""
+Batch service executing many task operations in one transaction
+"""
+from flask import current_app
+from marshmallow import ValidationError
+
+from internal.db.database import db, begin_write_transaction
+from internal.handlers.result_cache import notify_tasks_changed
+from internal.handlers.task_service import TaskService
+from internal.models.compiled import compile_schema
+from internal.models.schemas import TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema
+
+MODE_ATOMIC = "atomic"
+MODE_BEST_EFFORT = "best_effort"
+
+task_create_schema = compile_schema(TaskCreateSchema())
+task_update_schema = compile_schema(TaskUpdateSchema())
+task_status_schema = compile_schema(TaskStatusUpdateSchema())
+
+NOT_FOUND = (404, {"error": "Task not found"})
+UNEXPECTED = (500, {"error": "An unexpected error occurred"})
+
+class BatchService:
+    """Service executing batches of task operations"""
+    
+    @staticmethod
+    def execute(operations, mode=MODE_ATOMIC):
+        """
+        Execute operations in order inside a single transaction
+        
+        Every operation behaves like the matching ``/api/tasks`` endpoint and
+        reports the status code and body that endpoint would return. In
+        atomic mode the first failure rolls everything back and the
+        remaining operations are skipped. In best-effort mode each operation
+        runs in a savepoint, failures are rolled back individually and the
+        rest is committed together.
+        
+        Args:
+            operations (list): Validated operations, see BatchOperationSchema
+            mode (str): MODE_ATOMIC or MODE_BEST_EFFORT
+            
+        Returns:
+            tuple: (committed, results) where results holds one
+            (status_code, body) pair per operation
+        """
+        begin_write_transaction(db.session)
+        results = []
+        try:
+            for operation in operations:
+                if mode == MODE_BEST_EFFORT:
+                    results.append(BatchService._run_in_savepoint(operation))
+                    continue
+                
+                status, body = BatchService._run(operation)
+                results.append((status, body))
+                if status >= 400:
+                    db.session.rollback()
+                    return False, BatchService._abandon(results, len(operations))
+            
+            db.session.commit()
+            notify_tasks_changed()
+            return True, results
+        except Exception as e:
+            current_app.logger.error(f"Error executing batch: {str(e)}")
+            db.session.rollback()
+            if len(results) < len(operations):
+                results.append(UNEXPECTED)
+            return False, BatchService._abandon(results, len(operations))
+    
+    @staticmethod
+    def _run_in_savepoint(operation):
+        savepoint = db.session.begin_nested()
+        status, body = BatchService._run(operation)
+        if status >= 400:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+        return status, body
+    
+    @staticmethod
+    def _abandon(results, total):
+        """Mark executed operations as rolled back and the rest as skipped"""
+        abandoned = [
+            (424, {"error": "Rolled back"}) if status < 400 else (status, body)
+            for status, body in results
+        ]
+        abandoned += [(424, {"error": "Not executed"})] * (total - len(results))
+        return abandoned
+    
+    @staticmethod
+    def _run(operation):
+        """
+        Execute one operation without committing
+        
+        Args:
+            operation (dict): Validated operation
+            
+        Returns:
+            tuple: (status_code, body)
+        """
+        op = operation["op"]
+        task_id = operation.get("id")
+        data = operation.get("data", {})
+        
+        if op != "create" and task_id is None:
+            return 400, {
+                "error": "Validation error",
+                "details": {"id": ["Missing data for required field."]}
+            }
+        
+        try:
+            if op == "create":
+                task = TaskService.create_task(task_create_schema.load(data), commit=False)
+                return 201, task.to_dict()
+            
+            if op == "update":
+                task = TaskService.update_task(task_id, task_update_schema.load(data), commit=False)
+            elif op == "update_status":
+                validated_data = task_status_schema.load(data)
+                task = TaskService.update_task_status(task_id, validated_data["status"], commit=False)
+            else:
+                if not TaskService.delete_task(task_id, commit=False):
+                    return NOT_FOUND
+                return 200, {"message": "Task deleted successfully"}
+            
+            if not task:
+                return NOT_FOUND
+            return 200, task.to_dict()
+        except ValidationError as err:
+            return 400, {"error": "Validation error", "details": err.messages}
+        except Exception as e:
+            current_app.logger.error(f"Error in batch operation {op}: {str(e)}")
+            return UNEXPECTED
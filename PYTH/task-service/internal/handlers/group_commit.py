@@ -0,0 +1,201 @@
+"""
+Group commit for task writes
+
+With SQLite every commit takes the database write lock and waits for an
+fsync, so concurrent writers serialise on commits rather than on work.
+When group commit is enabled, ``TaskService`` hands create, update and
+status writes to a dedicated writer thread. The writer collects every
+operation that arrives within a short window (or until the batch is
+full), runs each one in its own savepoint and commits the batch once.
+Each caller still receives its own result or exception.
+
+The window is only waited for under concurrency, i.e. when the previous
+transaction was shared or more operations are already queued, so a lone
+writer does not pay it on every call.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from internal.db.database import db, begin_write_transaction
+
+_STOP = object()
+
+class GroupCommitter:
+    """
+    Dedicated writer coalescing concurrent writes into shared transactions
+
+    Args:
+        app: Flask application instance
+        window (float): Seconds to wait for more operations after the first
+        max_batch (int): Largest number of operations per transaction
+    """
+
+    def __init__(self, app, window, max_batch):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._last_batch_size = 0
+        self._stats = {
+            "transactions": 0,
+            "operations": 0,
+            "failed_operations": 0,
+            "failed_commits": 0,
+            "max_batch_size": 0,
+        }
+
+    def submit(self, func, *args):
+        """
+        Run ``func(*args, commit=False)`` on the writer and wait for it
+
+        Args:
+            func (callable): TaskService write method
+            *args: Arguments for func
+
+        Returns:
+            The value returned by func, detached from the writer's session
+        """
+        future = Future()
+        self._ensure_started().put((func, args, future))
+        return future.result()
+
+    def _ensure_started(self):
+        # Started lazily and restarted after fork, threads do not survive it
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name="group-commit", daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def stop(self):
+        """Stop the writer thread after it drains queued operations"""
+        with self._lock:
+            thread, pending = self._thread, self._queue
+            self._thread = None
+        if thread is not None and self._pid == os.getpid():
+            pending.put(_STOP)
+            thread.join()
+
+    def _run(self, pending):
+        with self.app.app_context():
+            # Results are handed to other threads, so they must stay loaded
+            db.session().expire_on_commit = False
+            while True:
+                item = pending.get()
+                if item is _STOP:
+                    return
+                batch = [item]
+                concurrent = self._last_batch_size > 1 or not pending.empty()
+                deadline = time.monotonic() + (self.window if concurrent else 0.0)
+                stopping = False
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        item = pending.get(timeout=timeout) if timeout > 0 else pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._last_batch_size = len(batch)
+                self._execute(batch)
+                if stopping:
+                    return
+
+    def _execute(self, batch):
+        """Run a batch of operations in one transaction"""
+        session = db.session
+        outcomes = []
+        failed = 0
+        try:
+            begin_write_transaction(session)
+            for func, args, future in batch:
+                savepoint = session.begin_nested()
+                try:
+                    result = func(*args, commit=False)
+                    savepoint.commit()
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    outcomes.append((future, None, e))
+                    failed += 1
+            session.commit()
+        except Exception as e:
+            current_app.logger.error(f"Group commit failed: {str(e)}")
+            session.rollback()
+            self._count(batch, len(batch), commit_failed=True)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            session.expunge_all()
+
+        self._count(batch, failed)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _count(self, batch, failed, commit_failed=False):
+        with self._lock:
+            self._stats["transactions"] += 1
+            self._stats["operations"] += len(batch)
+            self._stats["failed_operations"] += failed
+            self._stats["failed_commits"] += int(commit_failed)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+
+    def stats(self):
+        """
+        Snapshot of group commit counters
+
+        Returns:
+            dict: Counters and the average batch size
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+        transactions = snapshot["transactions"]
+        snapshot["average_batch_size"] = (
+            round(snapshot["operations"] / transactions, 2) if transactions else 0.0
+        )
+        return snapshot
+
+def get_group_committer():
+    """
+    Group committer of the current app
+
+    Returns:
+        GroupCommitter: The committer, or None when group commit is disabled
+    """
+    return current_app.extensions.get("group_commit")
+
+def init_group_commit(app):
+    """
+    Enable group commit when configured
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get("GROUP_COMMIT_ENABLED"):
+        return
+    committer = GroupCommitter(
+        app,
+        window=app.config["GROUP_COMMIT_WINDOW_MS"] / 1000.0,
+        max_batch=app.config["GROUP_COMMIT_MAX_BATCH"],
+    )
+    app.extensions["group_commit"] = committer
+    app.extensions.setdefault("stats", {})["group_commit"] = committer.stats
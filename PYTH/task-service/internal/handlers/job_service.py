@@ -0,0 +1,120 @@
+"""
+Job service queueing background jobs and reporting on them
+"""
+import json
+import os
+
+from flask import current_app
+from marshmallow import ValidationError
+
+from internal.db.database import db
+from internal.handlers.jobs import get_job_runner, job_output_path
+from internal.models.job import JOB_ARCHIVE, JOB_BULK_DELETE, JOB_EXPORT, JOB_IMPORT, JOB_SUCCEEDED, Job
+from internal.models.schemas import (
+    ArchiveJobSchema, BulkDeleteJobSchema, ImportJobSchema, TaskCreateSchema, TaskFilterSchema
+)
+
+# Parameters accepted by each job type
+JOB_PARAMS_SCHEMAS = {
+    JOB_EXPORT: TaskFilterSchema(),
+    JOB_IMPORT: ImportJobSchema(),
+    JOB_BULK_DELETE: BulkDeleteJobSchema(),
+    JOB_ARCHIVE: ArchiveJobSchema(),
+}
+
+# Job types writing an output file
+OUTPUT_JOB_TYPES = (JOB_EXPORT, JOB_ARCHIVE)
+
+task_create_schema = TaskCreateSchema()
+
+class JobService:
+    """Service for background job operations"""
+
+    @staticmethod
+    def create_job(job_type, params):
+        """
+        Queue a job and wake the runner
+
+        Args:
+            job_type (str): One of JOB_TYPES
+            params (dict): Parameters of the job type
+
+        Returns:
+            Job: Queued job
+
+        Raises:
+            ValidationError: If the parameters are invalid for the job type,
+                messages under ``params``
+        """
+        try:
+            validated = JOB_PARAMS_SCHEMAS[job_type].load(params)
+            if job_type == JOB_IMPORT:
+                JobService._check_import(validated["tasks"])
+        except ValidationError as err:
+            raise ValidationError({"params": err.messages})
+
+        job = Job(job_type=job_type, params=json.dumps(validated))
+        db.session.add(job)
+        db.session.commit()
+        get_job_runner().wake()
+        return job
+
+    @staticmethod
+    def _check_import(tasks):
+        """Validate every task of an import up front, as the create endpoint would"""
+        limit = current_app.config["JOB_IMPORT_MAX_TASKS"]
+        if len(tasks) > limit:
+            raise ValidationError({"tasks": [f"At most {limit} tasks per import."]})
+        try:
+            task_create_schema.load(tasks, many=True)
+        except ValidationError as err:
+            raise ValidationError({"tasks": err.messages})
+
+    @staticmethod
+    def get_job(job_id):
+        """
+        Get a job
+
+        Args:
+            job_id (int): Job ID
+
+        Returns:
+            Job: Job if found, None otherwise
+        """
+        return db.session.get(Job, job_id)
+
+    @staticmethod
+    def list_jobs(status=None, job_type=None, limit=50):
+        """
+        List the most recent jobs
+
+        Args:
+            status (str, optional): Filter by status
+            job_type (str, optional): Filter by type
+            limit (int): Most jobs returned
+
+        Returns:
+            list: Jobs, newest first
+        """
+        query = Job.query
+        if status:
+            query = query.filter(Job.status == status)
+        if job_type:
+            query = query.filter(Job.job_type == job_type)
+        return query.order_by(Job.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def output_path(job):
+        """
+        Output file of a finished export or archive job
+
+        Args:
+            job (Job): Job
+
+        Returns:
+            str: Absolute path, or None if the job has no output (yet)
+        """
+        if job.job_type not in OUTPUT_JOB_TYPES or job.status != JOB_SUCCEEDED:
+            return None
+        path = os.path.abspath(job_output_path(current_app.config["JOB_OUTPUT_DIR"], job.id))
+        return path if os.path.exists(path) else None
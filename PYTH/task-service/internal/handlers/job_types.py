@@ -0,0 +1,215 @@
+"""
+What each background job type does
+
+Every job type is a function taking a ``JobRun`` and returning the job's
+result. It works in chunks of ``run.batch_size`` tasks and ends each
+chunk with ``run.report``, which commits the chunk's changes together
+with the position reached. A job resumed after a crash starts from that
+checkpoint, so no chunk is applied twice:
+
+- ``export`` writes the tasks matching its filters to a JSON lines file.
+- ``import`` creates tasks, each in a savepoint. Tasks that fail (an
+  unknown parent) are reported and skipped.
+- ``bulk_delete`` deletes the tasks matching its filters. As with
+  ``DELETE /api/tasks/<id>``, subtasks go with their parent.
+- ``archive`` writes old tasks in a given status to a JSON lines file,
+  then deletes them. Tasks that still have subtasks are kept until their
+  subtasks are archived.
+
+Files are flushed to disk before the chunk commits. On resume they are
+truncated to the size recorded in the checkpoint, which drops whatever
+was written for a chunk that never committed. Jobs only see tasks up to
+the newest id at their start; later tasks are left alone.
+"""
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from marshmallow import ValidationError
+from sqlalchemy import exists, func
+
+from internal.db.database import db
+from internal.db.queries import apply_task_filters
+from internal.handlers.result_cache import notify_tasks_changed
+from internal.handlers.task_service import TaskService
+from internal.models.compiled import compile_schema
+from internal.models.job import JOB_ARCHIVE, JOB_BULK_DELETE, JOB_EXPORT, JOB_IMPORT
+from internal.models.schemas import TaskCreateSchema
+from internal.models.tag import TAG_MODE_ALL, normalize_tag_names
+from internal.models.task import Task, TaskClosure
+
+# Import failures kept in the result, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+task_create_schema = compile_schema(TaskCreateSchema())
+
+def _filtered(params):
+    """Tasks matching the filters of an export or bulk delete"""
+    tags = normalize_tag_names(params.get("tags") or []) or None
+    return apply_task_filters(
+        Task.query, params.get("status"), params.get("priority"), tags, params.get("tag_mode", TAG_MODE_ALL)
+    )
+
+def _start(run, checkpoint, query):
+    """Record the job's first checkpoint and total before its first chunk"""
+    if run.checkpoint is None:
+        run.report(0, checkpoint, query.filter(Task.id <= checkpoint["end_id"]).count())
+    return run.checkpoint
+
+def _open_output(run, offset):
+    """Output file of the job, cut back to what committed chunks wrote"""
+    output = open(run.output_path, "a+b")
+    output.truncate(offset)
+    return output
+
+def _write(output, tasks):
+    """Append tasks as JSON lines and flush them to disk"""
+    output.write(b"".join(current_app.json.dumps(task.to_dict()).encode() + b"\n" for task in tasks))
+    output.flush()
+    os.fsync(output.fileno())
+    return output.tell()
+
+def _newest_id():
+    return db.session.query(func.max(Task.id)).scalar() or 0
+
+def export_tasks(run):
+    """
+    Write the tasks matching the job's filters to its output file
+
+    Args:
+        run (JobRun): Job being run
+
+    Returns:
+        dict: Tasks written and size of the file
+    """
+    query = _filtered(run.params)
+    checkpoint = _start(run, run.checkpoint or {"last_id": 0, "end_id": _newest_id(), "offset": 0, "done": 0}, query)
+    with _open_output(run, checkpoint["offset"]) as output:
+        while True:
+            tasks = (
+                query.filter(Task.id > checkpoint["last_id"], Task.id <= checkpoint["end_id"])
+                .order_by(Task.id)
+                .limit(run.batch_size)
+                .all()
+            )
+            if not tasks:
+                break
+            checkpoint = dict(checkpoint, last_id=tasks[-1].id, offset=_write(output, tasks),
+                              done=checkpoint["done"] + len(tasks))
+            run.report(checkpoint["done"], checkpoint)
+    return {"tasks": checkpoint["done"], "bytes": checkpoint["offset"]}
+
+def import_tasks(run):
+    """
+    Create the tasks of the job's parameters, in order
+
+    Args:
+        run (JobRun): Job being run
+
+    Returns:
+        dict: Tasks created and failed, with the first failures
+    """
+    items = run.params["tasks"]
+    checkpoint = run.checkpoint
+    if checkpoint is None:
+        checkpoint = {"next": 0, "created": 0, "failed": 0, "errors": []}
+        run.report(0, checkpoint, len(items))
+    for start in range(checkpoint["next"], len(items), run.batch_size):
+        end = min(start + run.batch_size, len(items))
+        created, failed, errors = checkpoint["created"], checkpoint["failed"], list(checkpoint["errors"])
+        run.begin()
+        for index in range(start, end):
+            savepoint = db.session.begin_nested()
+            try:
+                TaskService.create_task(task_create_schema.load(items[index]), commit=False)
+                savepoint.commit()
+                created += 1
+            except ValidationError as err:
+                savepoint.rollback()
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": index, "details": err.messages})
+        checkpoint = {"next": end, "created": created, "failed": failed, "errors": errors}
+        run.report(end, checkpoint)
+        notify_tasks_changed()
+    return {"created": checkpoint["created"], "failed": checkpoint["failed"], "errors": checkpoint["errors"]}
+
+def bulk_delete_tasks(run):
+    """
+    Delete the tasks matching the job's filters
+
+    Args:
+        run (JobRun): Job being run
+
+    Returns:
+        dict: Tasks deleted, not counting subtasks deleted with their parent
+    """
+    query = _filtered(run.params)
+    checkpoint = _start(run, run.checkpoint or {"last_id": 0, "end_id": _newest_id(), "done": 0}, query)
+    while True:
+        run.begin()
+        ids = [
+            task_id for task_id, in
+            query.with_entities(Task.id)
+            .filter(Task.id > checkpoint["last_id"], Task.id <= checkpoint["end_id"])
+            .order_by(Task.id)
+            .limit(run.batch_size)
+        ]
+        if not ids:
+            db.session.rollback()
+            break
+        deleted = sum(1 for task_id in ids if TaskService.delete_task(task_id, commit=False))
+        checkpoint = dict(checkpoint, last_id=ids[-1], done=checkpoint["done"] + deleted)
+        run.report(checkpoint["done"], checkpoint)
+        notify_tasks_changed()
+    return {"deleted": checkpoint["done"]}
+
+def archive_tasks(run):
+    """
+    Move old tasks in a status from the database to the job's output file
+
+    Args:
+        run (JobRun): Job being run
+
+    Returns:
+        dict: Tasks archived and size of the file
+    """
+    checkpoint = run.checkpoint or {
+        "last_id": 0, "end_id": _newest_id(), "offset": 0, "done": 0,
+        "cutoff": (datetime.utcnow() - timedelta(days=run.params["older_than_days"])).isoformat()
+    }
+    has_subtasks = exists().where(TaskClosure.ancestor_id == Task.id, TaskClosure.depth > 0)
+    query = Task.query.filter(
+        Task.status == run.params["status"],
+        Task.updated_at < datetime.fromisoformat(checkpoint["cutoff"]),
+        ~has_subtasks
+    )
+    checkpoint = _start(run, checkpoint, query)
+    with _open_output(run, checkpoint["offset"]) as output:
+        while True:
+            run.begin()
+            tasks = (
+                query.filter(Task.id > checkpoint["last_id"], Task.id <= checkpoint["end_id"])
+                .order_by(Task.id)
+                .limit(run.batch_size)
+                .all()
+            )
+            if not tasks:
+                db.session.rollback()
+                break
+            # On disk before the deletes commit
+            offset = _write(output, tasks)
+            for task in tasks:
+                TaskService.delete_task(task.id, commit=False)
+            checkpoint = dict(checkpoint, last_id=tasks[-1].id, offset=offset, done=checkpoint["done"] + len(tasks))
+            run.report(checkpoint["done"], checkpoint)
+            notify_tasks_changed()
+    return {"archived": checkpoint["done"], "bytes": checkpoint["offset"]}
+
+# Job type -> function running it
+JOB_HANDLERS = {
+    JOB_EXPORT: export_tasks,
+    JOB_IMPORT: import_tasks,
+    JOB_BULK_DELETE: bulk_delete_tasks,
+    JOB_ARCHIVE: archive_tasks,
+}
@@ -0,0 +1,447 @@
+"""
+Background jobs queued in the database
+
+``POST /api/jobs`` adds a row to the ``jobs`` table and returns at once.
+A runner per worker process, a thread beside the app, polls the table
+and runs jobs on a pool of ``workers`` threads. No broker is involved:
+the database is the queue and the coordination point between runners.
+
+A runner claims a job by leasing it: status ``running``, its owner id and
+``leased_until``. Claims are serialised (BEGIN IMMEDIATE on SQLite, an
+advisory lock on PostgreSQL) so that the per-type limits of
+``concurrency`` hold across every runner. Each committed chunk extends
+its job's lease; the runner also renews the leases of its jobs once a
+third of the lease has passed, for chunks slower than that.
+
+Job types work in chunks (internal/handlers/job_types.py). Each chunk is
+committed together with the job's progress and checkpoint, and only while
+the runner still holds the lease. A runner that dies stops renewing; once
+the lease has expired another runner claims the job and it resumes after
+its last committed chunk. A stopping runner hands its jobs back after
+their current chunk. A job that raises is retried with exponential
+backoff, up to ``max_attempts`` attempts in all, abandoned runs included.
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, or_, text, update
+
+from internal.db.database import begin_write_transaction, db
+from internal.models.job import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_STATUSES, JOB_SUCCEEDED, Job
+
+# Advisory lock serialising job claims on PostgreSQL
+JOB_LOCK_KEY = 0x6a6f6273
+
+# Candidate jobs read per claim, enough to look past types at their limit
+CLAIM_SCAN_LIMIT = 100
+
+# Longest delay between two attempts of a failing job
+RETRY_MAX_SECONDS = 300
+
+class JobInterrupted(Exception):
+    """The job's runner is stopping or no longer holds its lease"""
+
+def job_output_path(directory, job_id):
+    """
+    File holding the output of an export or archive job
+
+    Args:
+        directory (str): JOB_OUTPUT_DIR
+        job_id (int): Job ID
+
+    Returns:
+        str: Path of the JSON lines file
+    """
+    return os.path.join(directory, f"job-{job_id}.jsonl")
+
+class JobRun:
+    """
+    One attempt at a job, handed to its job type
+
+    Args:
+        runner (JobRunner): Runner executing the job
+        job (Job): Leased job
+    """
+
+    def __init__(self, runner, job):
+        self.runner = runner
+        self.job_id = job.id
+        self.params = json.loads(job.params)
+        # Resume point committed by the previous chunk, None on a fresh start
+        self.checkpoint = json.loads(job.checkpoint) if job.checkpoint else None
+        self.total = job.progress_total
+        self.batch_size = runner.batch_size
+
+    @property
+    def output_path(self):
+        """Output file of the job, its directory is created"""
+        os.makedirs(self.runner.output_dir, exist_ok=True)
+        return job_output_path(self.runner.output_dir, self.job_id)
+
+    @staticmethod
+    def begin():
+        """Open the write transaction of a chunk before reading its rows"""
+        begin_write_transaction(db.session)
+
+    def report(self, done, checkpoint, total=None):
+        """
+        Commit the current chunk together with the job's progress
+
+        Args:
+            done (int): Units of work done so far
+            checkpoint (dict): Where to resume, JSON-compatible
+            total (int, optional): Units of work in all, when known
+
+        Raises:
+            JobInterrupted: If the lease was lost (the chunk is rolled
+                back) or the runner is stopping (the chunk is committed)
+        """
+        if total is not None:
+            self.total = total
+        now = datetime.utcnow()
+        owned = db.session.execute(
+            update(Job)
+            .where(Job.id == self.job_id, Job.lease_owner == self.runner.owner, Job.status == JOB_RUNNING)
+            .values(
+                progress_done=done,
+                progress_total=self.total,
+                checkpoint=json.dumps(checkpoint),
+                leased_until=now + self.runner.lease,
+                updated_at=now
+            ),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        if not owned:
+            db.session.rollback()
+            raise JobInterrupted(f"Job {self.job_id} is no longer leased by this runner")
+        db.session.commit()
+        self.checkpoint = checkpoint
+        if self.runner.stopping:
+            raise JobInterrupted(f"Job {self.job_id} handed back, the runner is stopping")
+
+class JobRunner:
+    """
+    Runs queued jobs on a thread pool
+
+    Args:
+        app: Flask application instance
+        workers (int): Jobs run at once by this runner
+        concurrency (dict): Most jobs of a type running at once, over every runner
+        batch_size (int): Tasks per chunk
+        lease_seconds (float): Time a runner that stopped renewing keeps its jobs
+        max_attempts (int): Attempts before a job fails for good
+        retry_base (float): Delay before the first retry, doubled per attempt
+        poll_interval (float): Seconds between rounds when nothing wakes the runner
+        output_dir (str): Directory of export and archive files
+    """
+
+    def __init__(self, app, workers, concurrency, batch_size, lease_seconds, max_attempts, retry_base,
+                 poll_interval, output_dir):
+        self.app = app
+        self.workers = workers
+        self.concurrency = dict(concurrency or {})
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.poll_interval = poll_interval
+        self.output_dir = output_dir
+        self.owner = self._new_owner()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._pid = None
+        self._renewed_at = 0.0
+        # Job id -> type of the jobs running here
+        self._running = {}
+        self._stats = {
+            "claimed": 0,
+            "resumed": 0,
+            "succeeded": 0,
+            "retried": 0,
+            "failed": 0,
+            "handed_back": 0,
+        }
+
+    @staticmethod
+    def _new_owner():
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def stopping(self):
+        """True once stop was called"""
+        return self._stopping.is_set()
+
+    def limit(self, job_type):
+        """Most jobs of a type running at once"""
+        return self.concurrency.get(job_type, self.workers)
+
+    def ensure_started(self):
+        """Start the runner thread, again after a fork"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._pid is not None and self._pid != os.getpid():
+                    # Leases of the parent belong to the parent
+                    self.owner = self._new_owner()
+                    self._running = {}
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+                self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Start a round now, called when a job is queued or finishes"""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop claiming jobs and wait for the running ones to hand back or finish"""
+        with self._lock:
+            thread, pool = self._thread, self._pool
+            self._thread = None
+        if thread is not None and self._pid == os.getpid():
+            self._stopping.set()
+            self._wakeup.set()
+            thread.join()
+            pool.shutdown()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = self.run_once(self._pool)
+            except Exception as e:
+                self.app.logger.error(f"Job runner round failed: {str(e)}")
+                claimed = 0
+            if not claimed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def run_once(self, pool=None):
+        """
+        Renew the leases held here, then claim and start the jobs that may run
+
+        Args:
+            pool (Executor, optional): Pool running the jobs; without one
+                they run in the calling thread before this returns
+
+        Returns:
+            int: Jobs claimed
+        """
+        with self.app.app_context():
+            try:
+                self._renew()
+                claimed = self.claim()
+            finally:
+                db.session.remove()
+        for job_id in claimed:
+            if pool is None:
+                self._execute(job_id)
+            else:
+                pool.submit(self._execute, job_id)
+        return len(claimed)
+
+    def claim(self):
+        """
+        Lease the queued and abandoned jobs that may start now
+
+        Returns:
+            list: Ids of the claimed jobs, oldest first
+        """
+        with self._lock:
+            free = self.workers - len(self._running)
+        if free <= 0 or self.stopping:
+            return []
+        now = datetime.utcnow()
+        ready = and_(
+            or_(Job.status == JOB_QUEUED, and_(Job.status == JOB_RUNNING, Job.leased_until < now)),
+            or_(Job.run_after.is_(None), Job.run_after <= now)
+        )
+        # Idle rounds stay out of the way of the chunks being written
+        if db.session.query(Job.id).filter(ready).first() is None:
+            db.session.rollback()
+            return []
+        begin_write_transaction(db.session)
+        if db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": JOB_LOCK_KEY})
+        active = dict(
+            db.session.query(Job.job_type, func.count(Job.id))
+            .filter(Job.status == JOB_RUNNING, Job.leased_until >= now)
+            .group_by(Job.job_type)
+            .all()
+        )
+        candidates = (
+            Job.query
+            .filter(ready)
+            .order_by(Job.id)
+            .limit(CLAIM_SCAN_LIMIT)
+            .all()
+        )
+        claimed = []
+        resumed = 0
+        for job in candidates:
+            if len(claimed) == free:
+                break
+            if active.get(job.job_type, 0) >= self.limit(job.job_type):
+                continue
+            abandoned = job.status == JOB_RUNNING
+            if abandoned and job.attempts >= self.max_attempts:
+                # Its runner died on every attempt
+                job.status = JOB_FAILED
+                job.error = f"Runner stopped responding on all {job.attempts} attempts"
+                job.lease_owner = job.leased_until = None
+                job.finished_at = now
+                continue
+            job.status = JOB_RUNNING
+            job.lease_owner = self.owner
+            job.leased_until = now + self.lease
+            job.attempts += 1
+            job.run_after = None
+            job.started_at = job.started_at or now
+            active[job.job_type] = active.get(job.job_type, 0) + 1
+            resumed += abandoned
+            claimed.append(job)
+        db.session.commit()
+        with self._lock:
+            self._running.update((job.id, job.job_type) for job in claimed)
+            self._stats["claimed"] += len(claimed)
+            self._stats["resumed"] += resumed
+        return [job.id for job in claimed]
+
+    def _renew(self):
+        """Extend the leases of the jobs running here, once a third of the lease has passed"""
+        with self._lock:
+            running = list(self._running)
+        if not running or time.monotonic() - self._renewed_at < self.lease.total_seconds() / 3:
+            return
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_(running), Job.lease_owner == self.owner, Job.status == JOB_RUNNING)
+            .values(leased_until=datetime.utcnow() + self.lease),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.commit()
+        self._renewed_at = time.monotonic()
+
+    def _execute(self, job_id):
+        """Run a claimed job and record how it ended"""
+        # Imported here: the job types import the task service
+        from internal.handlers.job_types import JOB_HANDLERS
+
+        with self.app.app_context():
+            try:
+                job = db.session.get(Job, job_id)
+                run = JobRun(self, job)
+                result = JOB_HANDLERS[job.job_type](run)
+                self._settle(job_id, status=JOB_SUCCEEDED, result=json.dumps(result), error=None,
+                             finished_at=datetime.utcnow())
+                self._count("succeeded")
+            except JobInterrupted as e:
+                db.session.rollback()
+                current_app.logger.info(str(e))
+                if self.stopping:
+                    # Not a failed attempt, the next runner starts from the checkpoint
+                    self._settle(job_id, status=JOB_QUEUED, attempts=Job.attempts - 1)
+                    self._count("handed_back")
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Job {job_id} failed: {str(e)}")
+                self._fail(job_id, str(e) or type(e).__name__)
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._running.pop(job_id, None)
+                self.wake()
+
+    def _fail(self, job_id, error):
+        """Schedule a retry, or give up after max_attempts"""
+        job = db.session.get(Job, job_id)
+        if job is None or job.lease_owner != self.owner:
+            return
+        now = datetime.utcnow()
+        if job.attempts >= self.max_attempts:
+            self._settle(job_id, status=JOB_FAILED, error=error[:2000], finished_at=now)
+            self._count("failed")
+        else:
+            delay = min(RETRY_MAX_SECONDS, self.retry_base * 2 ** (job.attempts - 1))
+            self._settle(job_id, status=JOB_QUEUED, error=error[:2000],
+                         run_after=now + timedelta(seconds=delay / 2 + random.uniform(0, delay / 2)))
+            self._count("retried")
+
+    def _settle(self, job_id, **values):
+        """Release the lease of a job held here, setting its outcome"""
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.lease_owner == self.owner)
+            .values(lease_owner=None, leased_until=None, updated_at=datetime.utcnow(), **values),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.commit()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Snapshot of job counters
+
+        Returns:
+            dict: Counters of this runner, jobs running here and jobs per status
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["running_here"] = len(self._running)
+        by_status = dict(db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        snapshot["jobs"] = {status: by_status.get(status, 0) for status in JOB_STATUSES}
+        return snapshot
+
+def get_job_runner():
+    """
+    Job runner of the current app
+
+    Returns:
+        JobRunner: The runner, or None when jobs are disabled
+    """
+    return current_app.extensions.get("jobs")
+
+def init_jobs(app):
+    """
+    Enable background jobs when configured
+
+    Args:
+        app: Flask application instance
+
+    Raises:
+        ValueError: If tasks live in a task store, jobs work on the database
+    """
+    if not app.config.get("JOBS_ENABLED"):
+        return
+    store = app.extensions.get("task_store")
+    if store is not None:
+        raise ValueError(f"Cannot use background jobs together with {store.name}")
+    runner = JobRunner(
+        app,
+        workers=app.config["JOB_WORKERS"],
+        concurrency=app.config["JOB_CONCURRENCY"],
+        batch_size=app.config["JOB_BATCH_SIZE"],
+        lease_seconds=app.config["JOB_LEASE_SECONDS"],
+        max_attempts=app.config["JOB_MAX_ATTEMPTS"],
+        retry_base=app.config["JOB_RETRY_BASE_SECONDS"],
+        poll_interval=app.config["JOB_POLL_SECONDS"],
+        output_dir=app.config["JOB_OUTPUT_DIR"],
+    )
+    app.extensions["jobs"] = runner
+    app.extensions.setdefault("stats", {})["jobs"] = runner.stats
+    if app.config["JOB_RUNNER_EMBEDDED"]:
+        # Started by the first request, in the serving process
+        app.before_request(runner.ensure_started)
@@ -0,0 +1,478 @@
+"""
+Versioned cache of serialised list responses
+
+Entries are stored as the encoded response body together with the cache
+generation current when the underlying query started. Every committed
+task mutation bumps the generation, which invalidates every entry in
+O(1): an entry from an older generation is a miss and is dropped when it
+is next looked up, or evicted like any other entry.
+
+Two backends are available. ``memory`` keeps entries in the worker
+process, so with several workers a write only invalidates the entries of
+the worker that served it (``RESULT_CACHE_TTL_SECONDS`` then bounds how
+stale a page can get). ``sqlite`` keeps the generation and the entries
+in a SQLite file shared by every worker on the host.
+"""
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context, jsonify
+
+EVICTION_LRU = "lru"
+EVICTION_FIFO = "fifo"
+EVICTION_POLICIES = (EVICTION_LRU, EVICTION_FIFO)
+
+class MemoryResultCache:
+    """
+    Bounded result cache held in process memory
+
+    Args:
+        max_entries (int): Largest number of entries
+        max_bytes (int): Largest total size of the cached bodies
+        eviction (str): EVICTION_LRU or EVICTION_FIFO
+        ttl (float): Seconds an entry stays valid, 0 for no limit
+    """
+
+    def __init__(self, max_entries, max_bytes, eviction=EVICTION_LRU, ttl=0):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = _new_counters()
+
+    def generation(self):
+        """
+        Current generation, to be read before running the query
+
+        Returns:
+            int: Generation
+        """
+        return self._generation
+
+    def bump(self):
+        """Invalidate every cached entry"""
+        with self._lock:
+            self._generation += 1
+
+    def get(self, key):
+        """
+        Look up a cached body
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bytes: The body, or None on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            generation, body, stored_at = entry
+            if generation != self._generation or (self.ttl and now - stored_at > self.ttl):
+                self._discard(key)
+                self._counters["misses"] += 1
+                self._counters["invalidated"] += 1
+                return None
+            if self.eviction == EVICTION_LRU:
+                self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return body
+
+    def put(self, key, generation, body):
+        """
+        Store a body computed while ``generation`` was current
+
+        Bodies computed before a mutation committed are not stored.
+
+        Args:
+            key (str): Cache key
+            generation (int): Generation read before the query ran
+            body (bytes): Encoded response body
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._discard(key)
+            self._entries[key] = (generation, body, time.monotonic())
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._counters["evictions"] += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+
+        Returns:
+            dict: Counters, size and generation
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot.update(entries=len(self._entries), bytes=self._bytes, generation=self._generation)
+        return snapshot
+
+class SQLiteResultCache:
+    """
+    Bounded result cache in a SQLite file shared by all local workers
+
+    The generation lives in the same file, so a write served by any
+    worker invalidates the entries of all of them. Wall clock time is
+    used for expiry and recency because monotonic clocks are not
+    comparable across processes.
+
+    The file is locked by each write for a moment. A lookup or store that
+    cannot get the lock within a second is skipped, the response is then
+    built and served uncached. A bump that cannot be recorded must not
+    fail the write that committed, so it is logged and the cache is not
+    used by this worker until a later bump goes through.
+
+    Args:
+        path (str): Cache file
+        max_entries (int): Largest number of entries
+        max_bytes (int): Largest total size of the cached bodies
+        eviction (str): EVICTION_LRU or EVICTION_FIFO
+        ttl (float): Seconds an entry stays valid, 0 for no limit
+    """
+
+    def __init__(self, path, max_entries, max_bytes, eviction=EVICTION_LRU, ttl=0):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction}")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = _new_counters()
+        self._bump_pending = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache_entries ("
+            "key TEXT PRIMARY KEY, generation INTEGER NOT NULL, body BLOB NOT NULL, "
+            "size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache_generation ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO result_cache_generation (id, value) VALUES (0, 0)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._counters[name] += value
+
+    def _unusable(self):
+        """Retry a bump that failed, True while it still cannot be recorded"""
+        if self._bump_pending:
+            self.bump()
+        return self._bump_pending
+
+    def generation(self):
+        """
+        Current generation, to be read before running the query
+
+        Returns:
+            int: Generation, or None when the result must not be cached
+        """
+        if self._unusable():
+            return None
+        try:
+            return self._connection().execute(
+                "SELECT value FROM result_cache_generation WHERE id = 0"
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            self._count(unavailable=1)
+            return None
+
+    def bump(self):
+        """
+        Invalidate every cached entry of every worker
+
+        Never raises, it runs after the mutation committed.
+        """
+        try:
+            self._connection().execute("UPDATE result_cache_generation SET value = value + 1 WHERE id = 0")
+        except sqlite3.OperationalError as e:
+            self._count(unavailable=1)
+            self._bump_pending = True
+            if has_app_context():
+                current_app.logger.error(f"Result cache bump failed, cache disabled until the next bump: {str(e)}")
+        else:
+            self._bump_pending = False
+
+    def get(self, key):
+        """
+        Look up a cached body
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bytes: The body, or None on a miss
+        """
+        if self._unusable():
+            self._count(misses=1)
+            return None
+        now = time.time()
+        conn = self._connection()
+        try:
+            row = conn.execute(
+                "SELECT e.body, e.generation = g.value, e.stored_at FROM result_cache_entries e, "
+                "result_cache_generation g WHERE e.key = ? AND g.id = 0", (key,)
+            ).fetchone()
+            if row is None:
+                self._count(misses=1)
+                return None
+            body, current, stored_at = row
+            if not current or (self.ttl and now - stored_at > self.ttl):
+                conn.execute("DELETE FROM result_cache_entries WHERE key = ?", (key,))
+                self._count(misses=1, invalidated=1)
+                return None
+            if self.eviction == EVICTION_LRU:
+                conn.execute("UPDATE result_cache_entries SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.OperationalError:
+            self._count(misses=1, unavailable=1)
+            return None
+        self._count(hits=1)
+        return bytes(body)
+
+    def put(self, key, generation, body):
+        """
+        Store a body computed while ``generation`` was current
+
+        Bodies computed before a mutation committed are not stored, nor
+        are bodies the file could not be locked for.
+
+        Args:
+            key (str): Cache key
+            generation (int): Generation read before the query ran
+            body (bytes): Encoded response body
+        """
+        if len(body) > self.max_bytes or self._unusable():
+            return
+        now = time.time()
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute(
+                "SELECT value FROM result_cache_generation WHERE id = 0"
+            ).fetchone()[0]
+            if generation != current:
+                conn.execute("COMMIT")
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache_entries "
+                "(key, generation, body, size, stored_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, generation, body, len(body), now, now)
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._count(unavailable=1)
+            return
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._count(evictions=evicted)
+
+    def _evict(self, conn):
+        """Delete the oldest entries until the cache fits its bounds"""
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache_entries"
+        ).fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return 0
+        order = "used_at" if self.eviction == EVICTION_LRU else "stored_at"
+        victims = []
+        for key, entry_size in conn.execute(
+            f"SELECT key, size FROM result_cache_entries ORDER BY {order}"
+        ):
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            victims.append((key,))
+            entries -= 1
+            size -= entry_size
+        conn.executemany("DELETE FROM result_cache_entries WHERE key = ?", victims)
+        return len(victims)
+
+    def stats(self):
+        """
+        Snapshot of cache counters
+
+        Hits and misses are counted per worker, size and generation are
+        those of the shared file.
+
+        Returns:
+            dict: Counters, size and generation
+        """
+        with self._lock:
+            snapshot = dict(self._counters)
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache_entries"
+        ).fetchone()
+        snapshot.update(entries=entries, bytes=size, generation=self.generation())
+        return snapshot
+
+def _new_counters():
+    return {"hits": 0, "misses": 0, "invalidated": 0, "evictions": 0, "unavailable": 0}
+
+def cache_key(*parts):
+    """
+    Build a cache key from normalised request parameters
+
+    Args:
+        *parts: JSON serialisable parameters
+
+    Returns:
+        str: Cache key
+    """
+    return json.dumps(parts, separators=(",", ":"))
+
+def cached_response(key, build, encode=jsonify, mimetype=None):
+    """
+    Serve a response from the result cache
+
+    On a hit the stored bytes are returned as they are. On a miss
+    ``build`` produces the payload, which is encoded once with
+    ``encode`` and stored. The key must tell apart every format the
+    same payload is encoded to.
+
+    Args:
+        key (str): Cache key, see cache_key
+        build (callable): Returns the payload
+        encode (callable): Turns the payload into a response
+        mimetype (str, optional): Mimetype of the encoded body, JSON by default
+
+    Returns:
+        Response: Encoded response
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return encode(build())
+
+    body = cache.get(key)
+    if body is not None:
+        response = current_app.response_class(body, mimetype=mimetype or current_app.json.mimetype)
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+    generation = cache.generation()
+    response = encode(build())
+    if generation is not None:
+        cache.put(key, generation, response.get_data())
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+def get_result_cache():
+    """
+    Result cache of the current app
+
+    Returns:
+        The cache, or None when result caching is disabled
+    """
+    return current_app.extensions.get("result_cache")
+
+def notify_tasks_changed():
+    """
+    Tell the read caches that task changes were committed
+
+    Every callable in ``app.extensions["task_change_listeners"]`` is
+    called, the result cache registers its generation bump there.
+    """
+    if not has_app_context():
+        return
+    for listener in current_app.extensions.get("task_change_listeners", ()):
+        listener()
+
+def invalidates(func):
+    """
+    Invalidate cached results after a successful TaskService mutation
+
+    Calls with ``commit=False`` are part of a larger transaction, whose
+    owner calls notify_tasks_changed once it commits. Calls that return
+    None or False changed nothing.
+
+    Args:
+        func (callable): Mutation
+
+    Returns:
+        callable: Wrapped mutation
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if kwargs.get("commit", True) and result is not None and result is not False:
+            notify_tasks_changed()
+        return result
+    return wrapper
+
+def create_result_cache(app):
+    """Build the result cache selected by configuration"""
+    kind = app.config["RESULT_CACHE_BACKEND"]
+    options = {
+        "max_entries": app.config["RESULT_CACHE_MAX_ENTRIES"],
+        "max_bytes": app.config["RESULT_CACHE_MAX_BYTES"],
+        "eviction": app.config["RESULT_CACHE_EVICTION"],
+        "ttl": app.config["RESULT_CACHE_TTL_SECONDS"],
+    }
+    if kind == "memory":
+        return MemoryResultCache(**options)
+    if kind == "sqlite":
+        path = app.config["RESULT_CACHE_PATH"]
+        if not os.path.isabs(path):
+            path = os.path.join(app.root_path, "..", path)
+        return SQLiteResultCache(os.path.normpath(path), **options)
+    raise ValueError(f"Unknown result cache backend: {kind}")
+
+def init_result_cache(app):
+    """
+    Enable the result cache when configured
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get("RESULT_CACHE_ENABLED"):
+        return
+    cache = create_result_cache(app)
+    app.extensions["result_cache"] = cache
+    app.extensions.setdefault("task_change_listeners", []).append(cache.bump)
+    app.extensions.setdefault("stats", {})["result_cache"] = cache.stats
@@ -0,0 +1,193 @@
+"""
+Single-flight coalescing of identical concurrent reads
+
+When several threads of a worker ask for the same task or the same list
+page at once, only the first one (the leader) queries the database. The
+others wait for the leader and share its result. Results are shared,
+never stored: once the leader finishes, the next identical call queries
+again.
+
+A committed write forgets every in-flight call, so a read starting after
+a write never joins a query that began before it. Before waking its
+followers, the leader copies the loaded state of its tasks into plain
+snapshots. Each follower rebuilds its own instances from them and merges
+those into its session without loading (``Session.merge(load=False)``),
+so no task instance is used by two sessions, and followers never read an
+instance the leader's session may be expiring.
+"""
+import functools
+import threading
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from internal.db.database import db
+
+class _Call:
+    """A query in flight, waited on by its followers"""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _Snapshot:
+    """Loaded state of a mapped instance, owned by no session"""
+    __slots__ = ("mapper", "columns", "relations")
+
+    def __init__(self, mapper, columns, relations):
+        self.mapper = mapper
+        self.columns = columns
+        self.relations = relations
+
+class SingleFlight:
+    """Coalesces identical calls running at the same time"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "failed": 0,
+            "forgotten": 0,
+        }
+
+    def do(self, key, func, share=None):
+        """
+        Run func, or wait for the identical call already in flight
+
+        Args:
+            key (hashable): Identifies identical calls
+            func (callable): Produces the result
+            share (callable, optional): Turns the leader's result into the
+                value handed to followers, called by the leader before
+                they wake
+
+        Returns:
+            tuple: (result, shared) where shared is True for followers
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            result = func()
+            call.result = result if share is None else share(result)
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return result, False
+
+    def forget(self):
+        """Let new calls start fresh queries instead of joining running ones"""
+        with self._lock:
+            self._stats["forgotten"] += len(self._calls)
+            self._calls = {}
+
+    def stats(self):
+        """
+        Snapshot of coalescing counters
+
+        Returns:
+            dict: Counters and the number of calls in flight
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = len(self._calls)
+        return snapshot
+
+def _snapshot(value):
+    """Copy the leader's tasks, with their loaded relationships, for followers"""
+    if isinstance(value, (list, tuple)):
+        return type(value)(_snapshot(item) for item in value)
+    if getattr(value, "_sa_instance_state", None) is None:
+        return value
+    state = inspect(value)
+    # Reading the columns loads any that are expired, in the leader's session
+    columns = {attr.key: getattr(value, attr.key) for attr in state.mapper.column_attrs}
+    relations = {
+        rel.key: _snapshot(state.dict[rel.key])
+        for rel in state.mapper.relationships if rel.key in state.dict
+    }
+    return _Snapshot(state.mapper, columns, relations)
+
+def _adopt(value):
+    """Give a follower its own instances of the leader's tasks"""
+    if isinstance(value, (list, tuple)):
+        return type(value)(_adopt(item) for item in value)
+    if not isinstance(value, _Snapshot):
+        return value
+    instance = value.mapper.class_manager.new_instance()
+    for key, column in value.columns.items():
+        set_committed_value(instance, key, column)
+    for key, related in value.relations.items():
+        set_committed_value(instance, key, _adopt(related))
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+def get_single_flight():
+    """
+    Single-flight group of the current app
+
+    Returns:
+        SingleFlight: The group, or None when coalescing is disabled
+    """
+    return current_app.extensions.get("single_flight")
+
+def coalesced(func):
+    """
+    Coalesce identical concurrent calls of a TaskService read method
+
+    Args:
+        func (callable): Read method
+
+    Returns:
+        callable: Wrapped method
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        flights = get_single_flight()
+        if flights is None:
+            return func(*args, **kwargs)
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        result, shared = flights.do(key, lambda: func(*args, **kwargs), share=_snapshot)
+        return _adopt(result) if shared else result
+    return wrapper
+
+def init_single_flight(app):
+    """
+    Enable single-flight coalescing when configured
+
+    Args:
+        app: Flask application instance
+    """
+    if not app.config.get("SINGLE_FLIGHT_ENABLED"):
+        return
+    flights = SingleFlight()
+    app.extensions["single_flight"] = flights
+    app.extensions.setdefault("task_change_listeners", []).append(flights.forget)
+    app.extensions.setdefault("stats", {})["single_flight"] = flights.stats
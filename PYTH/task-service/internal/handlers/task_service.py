@@ -1,30 +1,57 @@
 """
 Task service for handling business logic
 """
+from internal.api.tracing import traced
 from internal.db.database import db
-from internal.models.task import Task
-from sqlalchemy import desc
+from internal.db.queries import apply_task_filters, count_tags, task_ordering
+from internal.db.store import PARENT_CYCLE, PARENT_NOT_FOUND, get_task_store
+from internal.handlers.group_commit import get_group_committer
+from internal.handlers.result_cache import invalidates
+from internal.handlers.single_flight import coalesced
+from internal.handlers.webhooks import get_webhook_dispatcher, record_task_event
+from internal.models.tag import TAG_MODE_ALL, resolve_tags, task_tags
+from internal.models.task import DEFAULT_TASK_SORT, SORT_DESC, Task, TaskClosure, TaskStatus
+from internal.models.webhook import EVENT_TASK_CREATED, EVENT_TASK_DELETED, EVENT_TASK_UPDATED
+from marshmallow import ValidationError
+from sqlalchemy import case, delete, desc, func, select
 
 class TaskService:
     """Service for task management operations"""
     
     @staticmethod
-    def create_task(task_data):
+    @traced
+    @invalidates
+    def create_task(task_data, commit=True):
         """
         Create a new task
         
         Args:
             task_data (dict): Task data
+            commit (bool): Commit, or only flush when part of a larger transaction
             
         Returns:
             Task: Created task
         """
-        task = Task(**task_data)
+        store = get_task_store()
+        if store:
+            TaskService._reject_parent(store, task_data)
+            return store.create_task(task_data)
+        
+        committer = get_group_committer() if commit else None
+        if committer:
+            return committer.submit(TaskService.create_task, task_data)
+        
+        TaskService._check_parent(None, task_data.get("parent_id"))
+        task = Task()
+        TaskService._assign(task, task_data)
         db.session.add(task)
-        db.session.commit()
+        record_task_event(EVENT_TASK_CREATED, task)
+        TaskService._finish(commit)
         return task
     
     @staticmethod
+    @traced
+    @coalesced
     def get_task_by_id(task_id):
         """
         Get task by ID
@@ -35,10 +62,17 @@ class TaskService:
         Returns:
             Task: Task if found, None otherwise
         """
+        store = get_task_store()
+        if store:
+            return store.get_task_by_id(task_id)
+        
         return Task.query.get(task_id)
     
     @staticmethod
-    def list_tasks(page=1, per_page=20, status=None, priority=None):
+    @traced
+    @coalesced
+    def list_tasks(page=1, per_page=20, status=None, priority=None, tags=None,
+                   tag_mode=TAG_MODE_ALL, sort=DEFAULT_TASK_SORT, order=SORT_DESC):
         """
         List tasks with pagination and filters
         
@@ -47,21 +81,23 @@ class TaskService:
             per_page (int): Items per page
             status (str, optional): Filter by status
             priority (str, optional): Filter by priority
+            tags (tuple, optional): Filter by normalised tag names
+            tag_mode (str): Require all tags (TAG_MODE_ALL) or any of them (TAG_MODE_ANY)
+            sort (str): Sort by created_at, priority or due_date
+            order (str): SORT_ASC or SORT_DESC
             
         Returns:
             tuple: (tasks, total_pages, total_items)
         """
-        query = Task.query
+        store = get_task_store()
+        if store:
+            return store.list_tasks(page, per_page, status, priority, tags, tag_mode, sort, order)
         
         # Apply filters if provided
-        if status:
-            query = query.filter(Task.status == status)
+        query = apply_task_filters(Task.query, status, priority, tags, tag_mode)
         
-        if priority:
-            query = query.filter(Task.priority == priority)
-        
-        # Order by created date, newest first
-        query = query.order_by(desc(Task.created_at))
+        # Order by the requested key, newest first by default
+        query = query.order_by(*task_ordering(sort, order))
         
         # Apply pagination
         pagination = query.paginate(page=page, per_page=per_page)
@@ -69,65 +105,282 @@ class TaskService:
         return pagination.items, pagination.pages, pagination.total
     
     @staticmethod
-    def update_task(task_id, task_data):
+    @traced
+    @invalidates
+    def update_task(task_id, task_data, commit=True):
         """
         Update an existing task
         
         Args:
             task_id (int): Task ID
             task_data (dict): Updated task data
+            commit (bool): Commit, or only flush when part of a larger transaction
             
         Returns:
             Task: Updated task or None if not found
         """
+        store = get_task_store()
+        if store:
+            TaskService._reject_parent(store, task_data)
+            return store.update_task(task_id, task_data)
+        
+        committer = get_group_committer() if commit else None
+        if committer:
+            return committer.submit(TaskService.update_task, task_id, task_data)
+        
         task = Task.query.get(task_id)
         
         if not task:
             return None
+        
+        if "parent_id" in task_data:
+            TaskService._check_parent(task_id, task_data["parent_id"])
             
-        for key, value in task_data.items():
-            setattr(task, key, value)
+        TaskService._assign(task, task_data)
+        record_task_event(EVENT_TASK_UPDATED, task)
             
-        db.session.commit()
+        TaskService._finish(commit)
         return task
     
     @staticmethod
-    def update_task_status(task_id, status):
+    @traced
+    @invalidates
+    def update_task_status(task_id, status, commit=True):
         """
         Update task status
         
         Args:
             task_id (int): Task ID
             status (str): New status
+            commit (bool): Commit, or only flush when part of a larger transaction
             
         Returns:
             Task: Updated task or None if not found
         """
+        store = get_task_store()
+        if store:
+            return store.update_task_status(task_id, status)
+        
+        committer = get_group_committer() if commit else None
+        if committer:
+            return committer.submit(TaskService.update_task_status, task_id, status)
+        
         task = Task.query.get(task_id)
         
         if not task:
             return None
             
         task.status = status
-        db.session.commit()
+        record_task_event(EVENT_TASK_UPDATED, task)
+        TaskService._finish(commit)
         return task
     
     @staticmethod
-    def delete_task(task_id):
+    @traced
+    @invalidates
+    def delete_task(task_id, commit=True):
         """
-        Delete a task
+        Delete a task together with its subtasks
         
         Args:
             task_id (int): Task ID
+            commit (bool): Commit, or only flush when part of a larger transaction
             
         Returns:
             bool: True if task was deleted, False otherwise
         """
+        store = get_task_store()
+        if store:
+            return store.delete_task(task_id)
+        
         task = Task.query.get(task_id)
         
         if not task:
             return False
-            
+        
+        # Subtasks first, in two statements whatever the size of the subtree
+        subtasks = select(TaskClosure.descendant_id).where(
+            TaskClosure.ancestor_id == task_id, TaskClosure.depth > 0
+        )
+        if get_webhook_dispatcher():
+            for deleted_id in [task_id, *db.session.scalars(subtasks)]:
+                record_task_event(EVENT_TASK_DELETED, task_id=deleted_id)
+        db.session.execute(
+            delete(task_tags).where(task_tags.c.task_id.in_(subtasks))
+        )
+        db.session.execute(
+            delete(Task).where(Task.id.in_(subtasks)),
+            execution_options={"synchronize_session": "fetch"}
+        )
+        db.session.execute(
+            delete(TaskClosure).where(TaskClosure.descendant_id.in_(subtasks)),
+            execution_options={"synchronize_session": False}
+        )
         db.session.delete(task)
-        db.session.commit()
+        TaskService._finish(commit)
         return True
+    
+    @staticmethod
+    @traced
+    def get_tag_counts(status=None, priority=None, tags=None, tag_mode=TAG_MODE_ALL):
+        """
+        Count the tasks carrying each tag
+        
+        Args:
+            status (str, optional): Only count tasks with this status
+            priority (str, optional): Only count tasks with this priority
+            tags (tuple, optional): Only count tasks matching these tags
+            tag_mode (str): TAG_MODE_ALL or TAG_MODE_ANY
+            
+        Returns:
+            list: (name, count) pairs, most used first
+        """
+        filters = {"status": status, "priority": priority, "tags": tags, "tag_mode": tag_mode}
+        store = get_task_store()
+        if store:
+            return store.tag_counts(**filters)
+        
+        return count_tags(db.session, **filters)
+    
+    @staticmethod
+    @traced
+    def get_subtree(task_id, max_depth=None):
+        """
+        Get a task and all of its subtasks with one query
+        
+        Args:
+            task_id (int): Root task ID
+            max_depth (int, optional): Deepest level to include, 0 for the root only
+            
+        Returns:
+            list: (task, depth) pairs ordered by depth, None if the task does not exist
+        """
+        store = get_task_store()
+        if store:
+            return store.get_subtree(task_id, max_depth)
+        
+        query = (
+            db.session.query(Task, TaskClosure.depth)
+            .join(TaskClosure, TaskClosure.descendant_id == Task.id)
+            .filter(TaskClosure.ancestor_id == task_id)
+        )
+        if max_depth is not None:
+            query = query.filter(TaskClosure.depth <= max_depth)
+        rows = query.order_by(TaskClosure.depth, Task.id).all()
+        return [(task, depth) for task, depth in rows] or None
+    
+    @staticmethod
+    @traced
+    def get_ancestors(task_id):
+        """
+        Get the chain of parents of a task with one query
+        
+        Args:
+            task_id (int): Task ID
+            
+        Returns:
+            list: Ancestors from the root down to the direct parent,
+            None if the task does not exist
+        """
+        store = get_task_store()
+        if store:
+            return store.get_ancestors(task_id)
+        
+        rows = (
+            db.session.query(Task, TaskClosure.depth)
+            .join(TaskClosure, TaskClosure.ancestor_id == Task.id)
+            .filter(TaskClosure.descendant_id == task_id)
+            .order_by(desc(TaskClosure.depth))
+            .all()
+        )
+        if not rows:
+            return None
+        return [task for task, depth in rows if depth > 0]
+    
+    @staticmethod
+    @traced
+    def get_progress(task_id):
+        """
+        Roll up the status of a task and all of its subtasks with one query
+        
+        Args:
+            task_id (int): Task ID
+            
+        Returns:
+            dict: Task counts per status and the completion percentage,
+            None if the task does not exist
+        """
+        store = get_task_store()
+        if store:
+            return store.get_progress(task_id)
+        
+        counts = [
+            func.coalesce(func.sum(case((Task.status == status.value, 1), else_=0)), 0)
+            for status in TaskStatus
+        ]
+        row = (
+            db.session.query(func.count(Task.id), *counts)
+            .select_from(TaskClosure)
+            .join(Task, Task.id == TaskClosure.descendant_id)
+            .filter(TaskClosure.ancestor_id == task_id)
+            .one()
+        )
+        total = row[0]
+        if not total:
+            return None
+        by_status = {status.value: count for status, count in zip(TaskStatus, row[1:])}
+        return {
+            "task_id": task_id,
+            "total": total,
+            "by_status": by_status,
+            "completion": round(100.0 * by_status[TaskStatus.COMPLETED.value] / total, 1)
+        }
+    
+    @staticmethod
+    def _assign(task, task_data):
+        """
+        Set task attributes, replacing tag names by tags
+        
+        Args:
+            task (Task): Task to change
+            task_data (dict): Validated task data
+        """
+        for key, value in task_data.items():
+            if key == "tags":
+                value = resolve_tags(db.session, value)
+            setattr(task, key, value)
+    
+    @staticmethod
+    def _check_parent(task_id, parent_id):
+        """
+        Make sure parent_id can become the parent of task_id
+        
+        Args:
+            task_id (int): Task being moved, None for a new task
+            parent_id (int): Requested parent, None for a top-level task
+        """
+        if parent_id is None:
+            return
+        if db.session.get(Task, parent_id) is None:
+            raise ValidationError({"parent_id": [PARENT_NOT_FOUND]})
+        if task_id is not None and db.session.get(TaskClosure, (task_id, parent_id)) is not None:
+            raise ValidationError({"parent_id": [PARENT_CYCLE]})
+    
+    @staticmethod
+    def _reject_parent(store, task_data):
+        """Refuse parent_id when the task store has no subtasks"""
+        if not store.supports_subtasks and task_data.get("parent_id") is not None:
+            raise ValidationError({"parent_id": [f"Subtasks are not available with {store.name}."]})
+    
+    @staticmethod
+    def _finish(commit):
+        """
+        Commit the session, or flush it so database errors surface now
+        
+        Args:
+            commit (bool): Whether to commit
+        """
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
@@ -0,0 +1,89 @@
+"""
+Webhook service managing subscriptions
+"""
+from sqlalchemy import func
+
+from internal.db.database import db
+from internal.models.webhook import WebhookEvent, WebhookSubscription
+
+class WebhookService:
+    """Service for webhook subscription operations"""
+
+    @staticmethod
+    def create_subscription(data):
+        """
+        Subscribe an endpoint to task events
+
+        The subscription starts after the newest event in the outbox, it
+        only receives changes committed from now on.
+
+        Args:
+            data (dict): Validated subscription data
+
+        Returns:
+            WebhookSubscription: Created subscription
+        """
+        events = data.get("events")
+        subscription = WebhookSubscription(
+            url=data["url"],
+            event_types=",".join(dict.fromkeys(events)) if events else None,
+            secret=data.get("secret"),
+            last_event_id=db.session.query(func.max(WebhookEvent.id)).scalar() or 0
+        )
+        db.session.add(subscription)
+        db.session.commit()
+        return subscription
+
+    @staticmethod
+    def list_subscriptions():
+        """
+        List every subscription
+
+        Returns:
+            list: Subscriptions by id
+        """
+        return WebhookSubscription.query.order_by(WebhookSubscription.id).all()
+
+    @staticmethod
+    def get_subscription(subscription_id):
+        """
+        Get a subscription
+
+        Args:
+            subscription_id (int): Subscription ID
+
+        Returns:
+            WebhookSubscription: Subscription if found, None otherwise
+        """
+        return db.session.get(WebhookSubscription, subscription_id)
+
+    @staticmethod
+    def pending_events(subscription):
+        """
+        Count the events a subscription has not acknowledged yet
+
+        Args:
+            subscription (WebhookSubscription): Subscription
+
+        Returns:
+            int: Events after its cursor, including types it skips
+        """
+        return WebhookEvent.query.filter(WebhookEvent.id > subscription.last_event_id).count()
+
+    @staticmethod
+    def delete_subscription(subscription_id):
+        """
+        Unsubscribe an endpoint
+
+        Args:
+            subscription_id (int): Subscription ID
+
+        Returns:
+            bool: True if deleted, False if it does not exist
+        """
+        subscription = db.session.get(WebhookSubscription, subscription_id)
+        if not subscription:
+            return False
+        db.session.delete(subscription)
+        db.session.commit()
+        return True
@@ -0,0 +1,362 @@
+"""
+Webhook delivery through a transactional outbox
+
+``TaskService`` writes one event per task change to the outbox table in
+the transaction of the change, so requests never wait for an HTTP call
+and an event is recorded exactly when its change commits.
+
+A dispatcher thread per worker delivers the outbox. Each subscription
+reads it in id order from its own cursor. A round takes every due
+subscription, leases it with a conditional UPDATE so that other workers
+leave it alone, and posts up to ``batch_size`` events in one request.
+The requests of a round run on a pool of ``max_concurrency`` threads. A
+2xx answer moves the cursor past the batch; anything else keeps it and
+retries later with exponential backoff. Delivery is therefore at least
+once and in order per endpoint. Events acknowledged by every
+subscription are deleted.
+
+The request body is ``{"events": [{"id", "type", "created_at", "data"}]}``.
+With a secret, ``X-Webhook-Signature`` carries ``sha256=`` and the
+HMAC-SHA256 of the body.
+
+``urllib.request`` is imported by the first delivery.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, or_, text, update
+
+from internal.db.database import db
+from internal.models.webhook import EVENT_TASK_UPDATED, WebhookEvent, WebhookSubscription
+
+# Advisory lock ordering outbox writes on PostgreSQL
+OUTBOX_LOCK_KEY = 0x7461736b
+
+class WebhookDispatcher:
+    """
+    Background delivery of outbox events to webhook subscriptions
+
+    Args:
+        app: Flask application instance
+        batch_size (int): Most events per request
+        max_concurrency (int): Most requests in flight
+        timeout (float): Seconds to wait for an endpoint
+        retry_base (float): Delay before the first retry, doubled per failure
+        retry_max (float): Longest delay between retries
+        poll_interval (float): Seconds between rounds when nothing wakes the dispatcher
+    """
+
+    def __init__(self, app, batch_size, max_concurrency, timeout, retry_base, retry_max, poll_interval):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        # A lease outlives the slowest possible round
+        self.lease = timedelta(seconds=timeout * 2 + 5)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._pid = None
+        self._stats = {
+            "rounds": 0,
+            "requests": 0,
+            "delivered_events": 0,
+            "failed_requests": 0,
+        }
+
+    def ensure_started(self):
+        """Start the dispatcher thread, again after a fork"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._pool = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="webhook")
+                self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Start a round now, called once task changes are committed"""
+        self._wakeup.set()
+
+    def stop(self):
+        """Stop the dispatcher thread after its current round"""
+        with self._lock:
+            thread, pool = self._thread, self._pool
+            self._thread = None
+        if thread is not None and self._pid == os.getpid():
+            self._stopping.set()
+            self._wakeup.set()
+            thread.join()
+            pool.shutdown()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                backlog = self.run_once(self._pool)
+            except Exception as e:
+                self.app.logger.error(f"Webhook dispatch failed: {str(e)}")
+                backlog = False
+            if not backlog:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def run_once(self, pool=None):
+        """
+        Deliver one batch to every due subscription
+
+        Args:
+            pool (Executor, optional): Pool running the requests, a
+                temporary one when omitted
+
+        Returns:
+            bool: True if a batch was full, so more events are waiting
+        """
+        with self.app.app_context():
+            try:
+                batches = self._claim_batches()
+                if not batches:
+                    return False
+                if pool is None:
+                    with ThreadPoolExecutor(self.max_concurrency) as temporary:
+                        outcomes = list(temporary.map(self._deliver, batches))
+                else:
+                    outcomes = list(pool.map(self._deliver, batches))
+                self._record(batches, outcomes)
+                self._prune()
+            finally:
+                db.session.remove()
+        with self._lock:
+            self._stats["rounds"] += 1
+        return any(batch["full"] for batch in batches)
+
+    def _claim_batches(self):
+        """Lease the due subscriptions and read their next events"""
+        newest = db.session.query(func.max(WebhookEvent.id)).scalar()
+        if newest is None:
+            return []
+        now = datetime.utcnow()
+        available = or_(WebhookSubscription.leased_until.is_(None), WebhookSubscription.leased_until < now)
+        due = WebhookSubscription.query.filter(
+            WebhookSubscription.last_event_id < newest,
+            available,
+            or_(WebhookSubscription.next_attempt_at.is_(None), WebhookSubscription.next_attempt_at <= now)
+        ).all()
+        batches = []
+        for subscription in due:
+            claimed = db.session.execute(
+                update(WebhookSubscription)
+                .where(WebhookSubscription.id == subscription.id, available)
+                .values(leased_until=now + self.lease),
+                execution_options={"synchronize_session": False}
+            ).rowcount
+            if not claimed:
+                continue
+            # Another worker may have delivered since the subscription was read
+            db.session.refresh(subscription)
+            events = (
+                WebhookEvent.query
+                .filter(WebhookEvent.id > subscription.last_event_id)
+                .order_by(WebhookEvent.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            wanted = [event for event in events if subscription.wants(event.event_type)]
+            batches.append({
+                "id": subscription.id,
+                "url": subscription.url,
+                "secret": subscription.secret,
+                "failures": subscription.failures,
+                # Unwanted events are skipped along with the delivered ones
+                "cursor": events[-1].id if events else subscription.last_event_id,
+                "body": _encode_events(wanted) if wanted else None,
+                "events": len(wanted),
+                "full": len(events) == self.batch_size,
+            })
+        db.session.commit()
+        return batches
+
+    def _deliver(self, batch):
+        """
+        Post a batch, on a pool thread
+
+        Returns:
+            str: Error message, None on success
+        """
+        if batch["body"] is None:
+            return None
+        # Only needed once there is something to deliver
+        import urllib.error
+        import urllib.request
+        headers = {"Content-Type": "application/json", "User-Agent": "task-service-webhooks"}
+        if batch["secret"]:
+            digest = hmac.new(batch["secret"].encode(), batch["body"], hashlib.sha256).hexdigest()
+            headers["X-Webhook-Signature"] = f"sha256={digest}"
+        request = urllib.request.Request(batch["url"], data=batch["body"], headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            return None
+        except urllib.error.HTTPError as e:
+            return f"HTTP {e.code}"
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    def _record(self, batches, outcomes):
+        """Move cursors past delivered batches, schedule retries for the others"""
+        now = datetime.utcnow()
+        requests = delivered = failed = 0
+        for batch, error in zip(batches, outcomes):
+            requests += batch["body"] is not None
+            if error is None:
+                values = {
+                    "last_event_id": batch["cursor"], "failures": 0,
+                    "next_attempt_at": None, "last_error": None
+                }
+                delivered += batch["events"]
+            else:
+                failures = batch["failures"] + 1
+                values = {
+                    "failures": failures,
+                    "next_attempt_at": now + timedelta(seconds=self.retry_delay(failures)),
+                    "last_error": error[:500]
+                }
+                failed += 1
+                current_app.logger.warning(f"Webhook delivery to {batch['url']} failed: {error}")
+            db.session.execute(
+                update(WebhookSubscription)
+                .where(WebhookSubscription.id == batch["id"])
+                .values(leased_until=None, **values),
+                execution_options={"synchronize_session": False}
+            )
+        db.session.commit()
+        with self._lock:
+            self._stats["requests"] += requests
+            self._stats["delivered_events"] += delivered
+            self._stats["failed_requests"] += failed
+
+    def retry_delay(self, failures):
+        """
+        Seconds to wait before the next attempt
+
+        Args:
+            failures (int): Consecutive failures so far
+
+        Returns:
+            float: Between half and all of ``retry_base * 2 ** (failures - 1)``,
+            capped at retry_max
+        """
+        delay = min(self.retry_max, self.retry_base * 2 ** (failures - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _prune(self):
+        """Delete the events every subscription has acknowledged"""
+        floor = db.session.query(func.min(WebhookSubscription.last_event_id)).scalar()
+        if floor is None:
+            # Nobody listens; subscriptions start after the newest event anyway
+            floor = db.session.query(func.max(WebhookEvent.id)).scalar()
+        if floor:
+            db.session.execute(delete(WebhookEvent).where(WebhookEvent.id <= floor))
+            db.session.commit()
+
+    def stats(self):
+        """
+        Snapshot of delivery counters
+
+        Returns:
+            dict: Counters, subscriptions and events waiting in the outbox
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["subscriptions"] = WebhookSubscription.query.count()
+        snapshot["outbox_events"] = WebhookEvent.query.count()
+        return snapshot
+
+def _encode_events(events):
+    """Request body of a batch, the payloads are already JSON"""
+    items = [
+        f'{{"id": {event.id}, "type": {json.dumps(event.event_type)}, '
+        f'"created_at": "{event.created_at.isoformat()}", "data": {event.payload}}}'
+        for event in events
+    ]
+    return ('{"events": [' + ", ".join(items) + "]}").encode()
+
+def get_webhook_dispatcher():
+    """
+    Webhook dispatcher of the current app
+
+    Returns:
+        WebhookDispatcher: The dispatcher, or None when webhooks are disabled
+    """
+    return current_app.extensions.get("webhooks")
+
+def record_task_event(event_type, task=None, task_id=None):
+    """
+    Add a task event to the outbox, in the current transaction
+
+    Does nothing when webhooks are disabled, or for an update that
+    changed nothing.
+
+    Args:
+        event_type (str): One of EVENT_TYPES
+        task (Task, optional): Changed task, its state is the event data
+        task_id (int, optional): Id of a deleted task, the data is only the id
+    """
+    if get_webhook_dispatcher() is None:
+        return
+    if event_type == EVENT_TASK_UPDATED and not db.session.is_modified(task):
+        return
+    if task is not None:
+        # Ids, defaults and updated_at are assigned by the flush
+        db.session.flush()
+        task_id, payload = task.id, task.to_dict()
+    else:
+        payload = {"id": task_id}
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Concurrent transactions would otherwise commit outbox ids out of
+        # order and a cursor could move past an id committed later. SQLite
+        # already serialises writers
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": OUTBOX_LOCK_KEY})
+    db.session.add(WebhookEvent(event_type=event_type, task_id=task_id, payload=current_app.json.dumps(payload)))
+
+def init_webhooks(app):
+    """
+    Enable webhooks when configured
+
+    Args:
+        app: Flask application instance
+
+    Raises:
+        ValueError: If tasks live in a task store, whose writes are not
+            database transactions the outbox could join
+    """
+    if not app.config.get("WEBHOOKS_ENABLED"):
+        return
+    store = app.extensions.get("task_store")
+    if store is not None:
+        raise ValueError(f"Cannot use webhooks together with {store.name}")
+    dispatcher = WebhookDispatcher(
+        app,
+        batch_size=app.config["WEBHOOK_BATCH_SIZE"],
+        max_concurrency=app.config["WEBHOOK_MAX_CONCURRENCY"],
+        timeout=app.config["WEBHOOK_TIMEOUT_SECONDS"],
+        retry_base=app.config["WEBHOOK_RETRY_BASE_SECONDS"],
+        retry_max=app.config["WEBHOOK_RETRY_MAX_SECONDS"],
+        poll_interval=app.config["WEBHOOK_POLL_SECONDS"],
+    )
+    app.extensions["webhooks"] = dispatcher
+    app.extensions.setdefault("task_change_listeners", []).append(dispatcher.wake)
+    app.extensions.setdefault("stats", {})["webhooks"] = dispatcher.stats
+    # Started by the first request, in the serving process
+    app.before_request(dispatcher.ensure_started)
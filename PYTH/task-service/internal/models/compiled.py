@@ -0,0 +1,269 @@
+"""
+Precompiled fast-path loaders for marshmallow schemas
+
+``compile_schema`` reads the declared fields, validators and ``@validates``
+hooks of a schema once and builds a flat loader that skips marshmallow's
+per-call machinery (error store, getter closures, hook lookups, ``And``
+wrapping). The marshmallow schema stays the reference implementation:
+
+* plain strings, ISO datetimes, ``Length`` and ``OneOf`` are checked
+  inline; anything else is delegated to the field itself
+* when an inline check fails, the original field validators are run to
+  produce the error, so messages are identical by construction
+* ``@validates`` hooks are the schema's own bound methods
+
+Schemas using features the loader does not model (pre/post-load
+processors, schema-level validators, custom error handling, ``many``
+or ``partial``) are returned unchanged by ``compile_schema``.
+"""
+import re
+from collections.abc import Mapping
+from datetime import datetime
+
+from marshmallow import EXCLUDE, INCLUDE, RAISE, Schema, ValidationError, fields, validate
+from marshmallow.decorators import POST_LOAD, PRE_LOAD, VALIDATES, VALIDATES_SCHEMA
+from marshmallow.error_store import merge_errors
+from marshmallow.exceptions import SCHEMA
+from marshmallow.utils import from_iso_datetime, missing
+
+from internal.api.tracing import span
+
+# Naive ISO 8601 strings as produced by ``datetime.isoformat()``. For these
+# ``datetime.fromisoformat`` returns exactly what marshmallow's regex parser
+# returns, at a fraction of the cost; every other shape takes the reference
+# parser.
+_CANONICAL_ISO_DATETIME = re.compile(
+    r"[0-9]{4}-[0-9]{2}-[0-9]{2}[T ][0-9]{2}:[0-9]{2}(?::[0-9]{2}(?:\.[0-9]{6})?)?"
+)
+
+class CompiledSchema:
+    """
+    Fast-path loader equivalent to ``Schema.load`` for simple flat schemas
+
+    Args:
+        schema (Schema): Schema instance to compile
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._name = type(schema).__name__
+        self._unknown = schema.unknown
+        self._type_error = schema.error_messages["type"]
+        self._unknown_error = schema.error_messages["unknown"]
+        self._fields = []
+        self._known_keys = set()
+        for attr_name, field_obj in schema.load_fields.items():
+            data_key = field_obj.data_key if field_obj.data_key is not None else attr_name
+            self._fields.append((
+                data_key,
+                field_obj.attribute or attr_name,
+                _compile_field(field_obj, data_key, schema.partial)
+            ))
+            self._known_keys.add(data_key)
+        self._hooks = []
+        for hook_name in schema._hooks[VALIDATES]:
+            hook = getattr(schema, hook_name)
+            field_name = hook.__marshmallow_hook__[VALIDATES]["field_name"]
+            field_obj = schema.fields.get(field_name)
+            if field_obj is None:
+                if field_name in schema.declared_fields:
+                    continue
+                raise ValueError(f'"{field_name}" field does not exist.')
+            data_key = field_obj.data_key if field_obj.data_key is not None else field_name
+            self._hooks.append((hook, field_obj.attribute or field_name, data_key))
+
+    def load(self, data):
+        """
+        Deserialize and validate data
+
+        Args:
+            data (dict): Raw input data
+
+        Returns:
+            dict: Deserialized data
+
+        Raises:
+            ValidationError: With the same messages marshmallow would report
+        """
+        with span("validation", schema=self._name):
+            return self._load(data)
+
+    def _load(self, data):
+        if not isinstance(data, Mapping):
+            raise ValidationError({SCHEMA: [self._type_error]}, data=data, valid_data={})
+
+        result = {}
+        errors = None
+        for data_key, attr_key, load_field in self._fields:
+            try:
+                value = load_field(data.get(data_key, missing), data)
+            except ValidationError as err:
+                errors = _store(errors, data_key, err.messages)
+                continue
+            if value is not missing:
+                result[attr_key] = value
+
+        if self._unknown != EXCLUDE:
+            for key in set(data) - self._known_keys:
+                if self._unknown == INCLUDE:
+                    result[key] = data[key]
+                elif self._unknown == RAISE:
+                    errors = _store(errors, key, [self._unknown_error])
+
+        for hook, attr_key, data_key in self._hooks:
+            if attr_key in result:
+                try:
+                    hook(result[attr_key])
+                except ValidationError as err:
+                    errors = _store(errors, data_key, err.messages)
+                    result.pop(attr_key, None)
+
+        if errors:
+            raise ValidationError(errors, data=data, valid_data=result)
+        return result
+
+def _store(errors, key, messages):
+    """Merge field messages into the error dict the way ErrorStore does"""
+    return merge_errors(errors or {}, {key: messages})
+
+def _compile_field(field_obj, data_key, partial):
+    """
+    Build a loader for one field
+
+    Returns:
+        callable: ``load(value, data)`` returning the deserialized value or
+        ``missing``, raising ValidationError like ``Field.deserialize``
+    """
+    required = field_obj.required
+    allow_none = field_obj.allow_none
+    load_default = field_obj.load_default
+    required_error = field_obj.error_messages["required"]
+    null_error = field_obj.error_messages["null"]
+    convert = _compile_conversion(field_obj, data_key, partial)
+    check = _compile_validators(field_obj)
+
+    def load(value, data):
+        if value is missing:
+            if required:
+                raise ValidationError(required_error)
+            return load_default() if callable(load_default) else load_default
+        if value is None:
+            if allow_none:
+                return None
+            raise ValidationError(null_error)
+        output = convert(value, data)
+        if not check(output):
+            field_obj._validate(output)
+        return output
+
+    return load
+
+def _compile_conversion(field_obj, data_key, partial):
+    """Pick the cheapest conversion equivalent to ``field._deserialize``"""
+    field_type = type(field_obj)
+    if field_type is fields.String:
+        invalid = field_obj.error_messages["invalid"]
+
+        def convert_string(value, data):
+            if type(value) is str:
+                return value
+            if isinstance(value, (str, bytes)):
+                return field_obj._deserialize(value, data_key, data)
+            raise ValidationError(invalid)
+
+        return convert_string
+
+    if field_type is fields.DateTime and field_obj.format in (None, "iso", "iso8601"):
+        invalid = field_obj.error_messages["invalid"].format(
+            obj_type=field_obj.OBJ_TYPE
+        )
+
+        def convert_datetime(value, data):
+            if not value:
+                raise ValidationError(invalid)
+            if type(value) is str and _CANONICAL_ISO_DATETIME.fullmatch(value):
+                try:
+                    return datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+            try:
+                return from_iso_datetime(value)
+            except (TypeError, AttributeError, ValueError) as error:
+                raise ValidationError(invalid) from error
+
+        return convert_datetime
+
+    def convert_generic(value, data):
+        return field_obj._deserialize(value, data_key, data, partial=partial)
+
+    return convert_generic
+
+def _compile_validators(field_obj):
+    """
+    Build a predicate that is True when every field validator would pass
+
+    A False result only means "not known to pass"; the caller then runs
+    the real validators to raise the reference error.
+    """
+    checks = []
+    for validator in field_obj.validators:
+        if type(validator) is validate.Length:
+            checks.append(_length_check(validator))
+        elif type(validator) is validate.OneOf:
+            checks.append(_one_of_check(validator))
+        else:
+            return lambda value: False
+
+    if not checks:
+        return lambda value: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda value: all(check(value) for check in checks)
+
+def _length_check(validator):
+    low, high, equal = validator.min, validator.max, validator.equal
+
+    def check(value):
+        try:
+            length = len(value)
+        except TypeError:
+            return False
+        if equal is not None:
+            return length == equal
+        return (low is None or length >= low) and (high is None or length <= high)
+
+    return check
+
+def _one_of_check(validator):
+    try:
+        choices = frozenset(validator.choices)
+    except TypeError:
+        return lambda value: False
+
+    def check(value):
+        try:
+            return value in choices
+        except TypeError:
+            return False
+
+    return check
+
+def compile_schema(schema):
+    """
+    Compile a schema instance into a fast-path loader
+
+    Args:
+        schema (Schema): Schema instance
+
+    Returns:
+        CompiledSchema or Schema: The compiled loader, or the schema itself
+        when it uses features the fast path does not support
+    """
+    if (
+        any(schema._has_processors(tag) for tag in (PRE_LOAD, POST_LOAD, VALIDATES_SCHEMA))
+        or type(schema).handle_error is not Schema.handle_error
+        or schema.many or schema.partial
+        or any(isinstance(f, fields.Nested) for f in schema.load_fields.values())
+    ):
+        return schema
+    return CompiledSchema(schema)
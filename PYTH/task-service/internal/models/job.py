@@ -0,0 +1,85 @@
+"""
+Background job model
+"""
+import json
+from datetime import datetime
+from internal.db.database import db
+
+# Job types, see internal/handlers/job_types.py
+JOB_EXPORT = "export"
+JOB_IMPORT = "import"
+JOB_BULK_DELETE = "bulk_delete"
+JOB_ARCHIVE = "archive"
+JOB_TYPES = (JOB_EXPORT, JOB_IMPORT, JOB_BULK_DELETE, JOB_ARCHIVE)
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED)
+
+class Job(db.Model):
+    """
+    Long-running operation queued in the database
+
+    A runner leases a queued job, runs it and renews the lease while it
+    works. The job commits its ``checkpoint`` with each chunk of work, in
+    the transaction of the chunk, so a job whose runner died is taken
+    over once the lease expires and resumes after its last chunk.
+    """
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=JOB_QUEUED)
+    # JSON documents: validated parameters, resume point and outcome
+    params = db.Column(db.Text, nullable=False)
+    checkpoint = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    progress_done = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Runner holding the job, until leased_until unless renewed
+    lease_owner = db.Column(db.String(100), nullable=True)
+    leased_until = db.Column(db.DateTime, nullable=True)
+    # Earliest start of a retry after a failure
+    run_after = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_jobs_status_type", "status", "job_type"),
+    )
+
+    def to_dict(self):
+        """
+        Convert job to dictionary
+
+        Dates are left as datetime objects for the response encoder
+
+        Returns:
+            dict: Dictionary representation of job
+        """
+        total = self.progress_total
+        return {
+            "id": self.id,
+            "type": self.job_type,
+            "status": self.status,
+            "params": json.loads(self.params),
+            "progress": {
+                "done": self.progress_done,
+                "total": total,
+                "percent": round(100.0 * min(self.progress_done / total, 1), 1) if total else None
+            },
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at
+        }
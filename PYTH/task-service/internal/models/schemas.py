@@ -1,9 +1,12 @@
 """
 Schemas for request validation and serialization
 """
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
 from datetime import datetime
+from internal.models.job import JOB_TYPES
+from internal.models.tag import TAG_MODE_ALL, TAG_MODES
 from internal.models.task import TaskStatus, TaskPriority
+from internal.models.webhook import EVENT_TYPES
 
 class TaskCreateSchema(Schema):
     """Schema for task creation validation"""
@@ -15,6 +18,12 @@ class TaskCreateSchema(Schema):
         validate=validate.OneOf([p.value for p in TaskPriority]),
         default=TaskPriority.MEDIUM.value
     )
+    parent_id = fields.Int(required=False, allow_none=True, strict=True)
+    tags = fields.List(
+        fields.Str(validate=validate.Length(min=1, max=50)),
+        required=False,
+        validate=validate.Length(max=20)
+    )
     
     @validates('due_date')
     def validate_due_date(self, value):
@@ -35,6 +44,12 @@ class TaskUpdateSchema(Schema):
         required=False,
         validate=validate.OneOf([s.value for s in TaskStatus])
     )
+    parent_id = fields.Int(required=False, allow_none=True, strict=True)
+    tags = fields.List(
+        fields.Str(validate=validate.Length(min=1, max=50)),
+        required=False,
+        validate=validate.Length(max=20)
+    )
     
     @validates('due_date')
     def validate_due_date(self, value):
@@ -48,3 +63,74 @@ class TaskStatusUpdateSchema(Schema):
         required=True,
         validate=validate.OneOf([s.value for s in TaskStatus])
     )
+
+class BatchOperationSchema(Schema):
+    """Schema for a single operation of a batch request"""
+    op = fields.Str(
+        required=True,
+        validate=validate.OneOf(["create", "update", "update_status", "delete"])
+    )
+    id = fields.Int(required=False, strict=True)
+    data = fields.Dict(required=False)
+
+class BatchRequestSchema(Schema):
+    """Schema for batch request validation"""
+    mode = fields.Str(
+        required=False,
+        validate=validate.OneOf(["atomic", "best_effort"]),
+        load_default="atomic"
+    )
+    operations = fields.List(
+        fields.Nested(BatchOperationSchema),
+        required=True,
+        validate=validate.Length(min=1)
+    )
+
+class WebhookSubscriptionSchema(Schema):
+    """Schema for webhook subscription validation"""
+    url = fields.Url(required=True, schemes={"http", "https"}, require_tld=False,
+                     validate=validate.Length(max=2048))
+    events = fields.List(
+        fields.Str(validate=validate.OneOf(EVENT_TYPES)),
+        required=False,
+        allow_none=True,
+        validate=validate.Length(min=1)
+    )
+    secret = fields.Str(required=False, allow_none=True, validate=validate.Length(min=1, max=255))
+
+class JobRequestSchema(Schema):
+    """Schema for job submission validation, params are checked per type"""
+    type = fields.Str(required=True, validate=validate.OneOf(JOB_TYPES))
+    params = fields.Dict(required=False, load_default=dict)
+
+class TaskFilterSchema(Schema):
+    """Schema for the task filters of export and bulk delete jobs"""
+    status = fields.Str(required=False, validate=validate.OneOf([s.value for s in TaskStatus]))
+    priority = fields.Str(required=False, validate=validate.OneOf([p.value for p in TaskPriority]))
+    tags = fields.List(
+        fields.Str(validate=validate.Length(min=1, max=50)),
+        required=False,
+        validate=validate.Length(min=1, max=20)
+    )
+    tag_mode = fields.Str(required=False, load_default=TAG_MODE_ALL, validate=validate.OneOf(TAG_MODES))
+
+class BulkDeleteJobSchema(TaskFilterSchema):
+    """Schema for bulk delete parameters, refusing to delete every task"""
+
+    @validates_schema
+    def validate_filters(self, data, **kwargs):
+        if not any(data.get(key) for key in ("status", "priority", "tags")):
+            raise ValidationError("At least one of status, priority or tags is required.")
+
+class ImportJobSchema(Schema):
+    """Schema for import parameters, tasks are checked with TaskCreateSchema"""
+    tasks = fields.List(fields.Dict(), required=True, validate=validate.Length(min=1))
+
+class ArchiveJobSchema(Schema):
+    """Schema for archive parameters"""
+    status = fields.Str(
+        required=False,
+        load_default=TaskStatus.COMPLETED.value,
+        validate=validate.OneOf([s.value for s in TaskStatus])
+    )
+    older_than_days = fields.Int(required=False, load_default=30, strict=True, validate=validate.Range(min=0))
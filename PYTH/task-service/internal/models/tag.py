@@ -0,0 +1,97 @@
+"""
+Tag model definition
+"""
+from sqlalchemy import intersect, select, union
+from sqlalchemy.exc import IntegrityError
+from internal.db.database import db
+
+# How ``?tags=`` combines several tags
+TAG_MODE_ALL = "all"
+TAG_MODE_ANY = "any"
+TAG_MODES = (TAG_MODE_ALL, TAG_MODE_ANY)
+
+# Association between tasks and tags. The primary key serves lookups by
+# task, the reverse index drives filtering and counting by tag.
+task_tags = db.Table(
+    "task_tags",
+    db.Column("task_id", db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_task_tags_tag_task", "tag_id", "task_id"),
+)
+
+class Tag(db.Model):
+    """Tag model for database"""
+    __tablename__ = "tags"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+def normalize_tag_names(names):
+    """
+    Normalise tag names: trimmed, lower case, without duplicates
+
+    Args:
+        names (iterable): Tag names
+
+    Returns:
+        tuple: Normalised names in their original order
+    """
+    normalized = []
+    for name in names:
+        name = name.strip().lower()
+        if name and name not in normalized:
+            normalized.append(name)
+    return tuple(normalized)
+
+def tagged_task_ids(names, mode=TAG_MODE_ALL):
+    """
+    Select the ids of the tasks carrying the given tags
+
+    Each tag becomes one range scan of ``ix_task_tags_tag_task``; the
+    scans are combined with INTERSECT (all tags) or UNION (any tag) in
+    the database.
+
+    Args:
+        names (tuple): Normalised tag names
+        mode (str): TAG_MODE_ALL or TAG_MODE_ANY
+
+    Returns:
+        Select: Task ids, usable with ``Task.id.in_()``
+    """
+    scans = [
+        select(task_tags.c.task_id).where(
+            task_tags.c.tag_id == select(Tag.id).where(Tag.name == name).scalar_subquery()
+        )
+        for name in names
+    ]
+    if len(scans) == 1:
+        return scans[0]
+    return (intersect if mode == TAG_MODE_ALL else union)(*scans)
+
+def resolve_tags(session, names):
+    """
+    Get the tags with the given names, creating missing ones
+
+    Args:
+        session: Session to use
+        names (iterable): Tag names
+
+    Returns:
+        list: Tags in the order of names
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return []
+    found = {tag.name: tag for tag in session.query(Tag).filter(Tag.name.in_(names))}
+    for name in names:
+        if name in found:
+            continue
+        try:
+            # A concurrent writer may create the same tag first
+            with session.begin_nested():
+                tag = Tag(name=name)
+                session.add(tag)
+            found[name] = tag
+        except IntegrityError:
+            found[name] = session.query(Tag).filter(Tag.name == name).one()
+    return [found[name] for name in names]
@@ -3,7 +3,13 @@ Task model definition
 """
 from datetime import datetime
 from enum import Enum
+from sqlalchemy import event, inspect, literal, or_, select, true
+from sqlalchemy.types import SmallInteger, TypeDecorator
 from internal.db.database import db
+from internal.models.tag import Tag, task_tags
+
+# Both enums are stored by position (see EnumCode): add new members at
+# the end, never reorder or remove them without a migration.
 
 class TaskStatus(str, Enum):
     """Task status enum"""
@@ -12,38 +18,191 @@ class TaskStatus(str, Enum):
     COMPLETED = "completed"
 
 class TaskPriority(str, Enum):
-    """Task priority enum"""
+    """Task priority enum, lowest to highest"""
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
 
+# Orderings of task lists, with the direction used when none is given.
+# Ties are broken by id in the same direction.
+SORT_ASC = "asc"
+SORT_DESC = "desc"
+SORT_ORDERS = (SORT_ASC, SORT_DESC)
+TASK_SORTS = {
+    "created_at": SORT_DESC,
+    "priority": SORT_DESC,
+    "due_date": SORT_ASC,
+}
+DEFAULT_TASK_SORT = "created_at"
+
+class EnumCode(TypeDecorator):
+    """
+    Store a string enum as a SMALLINT code
+    
+    Member n (from 1) of the enum is stored as n, so codes sort in the
+    order the members are declared. Values are converted at the model
+    edge: attributes, filters and results keep using the string values.
+    Strings that are not members bind as NULL and match nothing.
+    """
+    impl = SmallInteger
+    cache_ok = True
+    
+    def __init__(self, enum):
+        super().__init__()
+        self.enum = enum
+        self._codes = {member.value: code for code, member in enumerate(enum, 1)}
+        self._values = {code: value for value, code in self._codes.items()}
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self._codes.get(value)
+    
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._values[value]
+    
+    def code(self, value):
+        """
+        Get the code stored for an enum value
+        
+        Args:
+            value (str): Enum value
+            
+        Returns:
+            int: Stored code
+        """
+        return self._codes[value]
+    
+    def value_of(self, code):
+        """
+        Get the enum value stored as a code
+        
+        Args:
+            code (int): Stored code
+            
+        Returns:
+            str: Enum value
+        """
+        return self._values[code]
+
 class Task(db.Model):
     """Task model for database"""
     __tablename__ = "tasks"
+    # One index per list ordering (see TASK_SORTS); the composite ones
+    # also serve a status or priority filter sorted by creation date
+    __table_args__ = (
+        db.Index("ix_tasks_created_at", "created_at"),
+        db.Index("ix_tasks_status_created_at", "status", "created_at"),
+        db.Index("ix_tasks_priority_created_at", "priority", "created_at"),
+        db.Index("ix_tasks_due_date", "due_date"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey("tasks.id"), nullable=True, index=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    status = db.Column(db.String(20), default=TaskStatus.PENDING.value)
-    priority = db.Column(db.String(20), default=TaskPriority.MEDIUM.value)
+    status = db.Column(EnumCode(TaskStatus), default=TaskStatus.PENDING.value)
+    priority = db.Column(EnumCode(TaskPriority), default=TaskPriority.MEDIUM.value)
     due_date = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Loaded for a whole page in one extra query
+    tags = db.relationship(Tag, secondary=task_tags, lazy="selectin", order_by=Tag.name)
+    
+    def __init__(self, **kwargs):
+        # A new task has no tags, so its collection never needs loading,
+        # not even once the task is detached from its session
+        kwargs.setdefault("tags", [])
+        super().__init__(**kwargs)
+    
     def to_dict(self):
         """
         Convert task to dictionary
         
+        Dates are left as datetime objects for the response encoder, see
+        internal.api.negotiation
+        
         Returns:
             dict: Dictionary representation of task
         """
         return {
             "id": self.id,
+            "parent_id": self.parent_id,
             "title": self.title,
             "description": self.description,
             "status": self.status,
             "priority": self.priority,
-            "due_date": self.due_date.isoformat() if self.due_date else None,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat()
+            "due_date": self.due_date,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "tags": [tag.name for tag in self.tags]
         }
+
+class TaskClosure(db.Model):
+    """
+    Closure table of the task hierarchy
+    
+    Holds one row per (ancestor, descendant) pair, including each task
+    paired with itself at depth 0, so a whole subtree or ancestor chain
+    is read with a single indexed lookup.
+    """
+    __tablename__ = "task_closure"
+    __table_args__ = (
+        db.Index("ix_task_closure_descendant_depth", "descendant_id", "depth"),
+    )
+    
+    ancestor_id = db.Column(
+        db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id = db.Column(
+        db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth = db.Column(db.Integer, nullable=False)
+
+task_closure = TaskClosure.__table__
+
+@event.listens_for(Task, "after_insert")
+def _link_inserted_task(mapper, connection, task):
+    """Add the closure rows of a new task: itself and its parent's ancestors"""
+    rows = select(literal(task.id), literal(task.id), literal(0))
+    if task.parent_id is not None:
+        rows = rows.union_all(
+            select(task_closure.c.ancestor_id, literal(task.id), task_closure.c.depth + 1)
+            .where(task_closure.c.descendant_id == task.parent_id)
+        )
+    connection.execute(
+        task_closure.insert().from_select(["ancestor_id", "descendant_id", "depth"], rows)
+    )
+
+@event.listens_for(Task, "after_update")
+def _move_updated_task(mapper, connection, task):
+    """Re-link the subtree of a task whose parent changed"""
+    if not inspect(task).attrs.parent_id.history.has_changes():
+        return
+    subtree = select(task_closure.c.descendant_id).where(task_closure.c.ancestor_id == task.id)
+    connection.execute(
+        task_closure.delete().where(
+            task_closure.c.descendant_id.in_(subtree),
+            task_closure.c.ancestor_id.not_in(subtree)
+        )
+    )
+    if task.parent_id is not None:
+        above = task_closure.alias("above")
+        below = task_closure.alias("below")
+        connection.execute(
+            task_closure.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+                # Every ancestor of the new parent times every task of the subtree
+                .select_from(above.join(below, true()))
+                .where(above.c.descendant_id == task.parent_id, below.c.ancestor_id == task.id)
+            )
+        )
+
+@event.listens_for(Task, "after_delete")
+def _unlink_deleted_task(mapper, connection, task):
+    """Drop the closure rows of a deleted task"""
+    connection.execute(
+        task_closure.delete().where(
+            or_(task_closure.c.ancestor_id == task.id, task_closure.c.descendant_id == task.id)
+        )
+    )
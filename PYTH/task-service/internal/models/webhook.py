@@ -0,0 +1,92 @@
+"""
+Webhook subscription and outbox models
+"""
+from datetime import datetime
+from internal.db.database import db
+
+# Events recorded for task changes
+EVENT_TASK_CREATED = "task.created"
+EVENT_TASK_UPDATED = "task.updated"
+EVENT_TASK_DELETED = "task.deleted"
+EVENT_TYPES = (EVENT_TASK_CREATED, EVENT_TASK_UPDATED, EVENT_TASK_DELETED)
+
+class WebhookSubscription(db.Model):
+    """
+    Endpoint notified of task events
+
+    Every subscription reads the outbox in id order: ``last_event_id`` is
+    the last event it has acknowledged. Failed deliveries are retried from
+    there after ``next_attempt_at``, so events reach an endpoint in order
+    and at least once.
+    """
+    __tablename__ = "webhook_subscriptions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(2048), nullable=False)
+    # Comma-separated event types, NULL for every event
+    event_types = db.Column(db.String(255), nullable=True)
+    # Signs request bodies when set, see X-Webhook-Signature
+    secret = db.Column(db.String(255), nullable=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    # Held by the dispatcher delivering to the subscription, so several
+    # workers never send the same batch
+    leased_until = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def events(self):
+        """Subscribed event types, None for every event"""
+        return self.event_types.split(",") if self.event_types else None
+
+    def wants(self, event_type):
+        """
+        Check whether the subscription receives an event type
+
+        Args:
+            event_type (str): Event type
+
+        Returns:
+            bool: True if it is subscribed to
+        """
+        return not self.event_types or event_type in self.events
+
+    def to_dict(self):
+        """
+        Convert subscription to dictionary, without the secret
+
+        Dates are left as datetime objects for the response encoder
+
+        Returns:
+            dict: Dictionary representation of subscription
+        """
+        return {
+            "id": self.id,
+            "url": self.url,
+            "events": self.events,
+            "signed": self.secret is not None,
+            "last_event_id": self.last_event_id,
+            "failures": self.failures,
+            "next_attempt_at": self.next_attempt_at,
+            "last_error": self.last_error,
+            "created_at": self.created_at
+        }
+
+class WebhookEvent(db.Model):
+    """
+    Task event waiting in the outbox
+
+    Written in the transaction of the change it describes, so an event
+    exists exactly when its change was committed. Events every
+    subscription has acknowledged are deleted.
+    """
+    __tablename__ = "webhook_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    task_id = db.Column(db.Integer, nullable=False)
+    # JSON document sent as the event's "data"
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
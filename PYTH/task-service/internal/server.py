@@ -0,0 +1,236 @@
+"""
+Pre-fork production server built on gunicorn
+
+The master process imports the code and builds the app with ``create_app``
+once (``preload_app``), configures the SQLAlchemy mappers and disposes of
+any pooled connection before forking. Each worker then disposes its
+inherited engine pool again with ``close=False`` so a socket opened in the
+parent is never shared between processes.
+
+Rolling restarts use gunicorn's signals: ``HUP`` replaces the workers one
+generation at a time from the preloaded master, ``USR2`` followed by
+``WINCH`` and ``QUIT`` on the old master upgrades to new code without
+dropping connections. Workers are also recycled after ``max_requests``
+(with jitter) so they do not all restart at once.
+"""
+import logging
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+from sqlalchemy.orm import configure_mappers
+
+from internal.db.database import db
+
+logger = logging.getLogger("gunicorn.error")
+
+# Fallback start mark; entry points pass their own, taken before imports
+PROCESS_STARTED = time.perf_counter()
+
+def available_cpus():
+    """
+    Number of CPUs this process may run on
+
+    Returns:
+        int: CPU count, honouring affinity masks set by container runtimes
+    """
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+def default_workers(cpus):
+    """
+    Worker processes for a host with the given CPU count
+
+    Args:
+        cpus (int): Available CPUs
+
+    Returns:
+        int: ``2 * cpus + 1``, the gunicorn recommendation
+    """
+    return 2 * cpus + 1
+
+def default_threads(cpus):
+    """
+    Threads per worker for a host with the given CPU count
+
+    Small hosts get more threads per worker so that requests waiting on the
+    database still overlap; large hosts already have many workers.
+
+    Args:
+        cpus (int): Available CPUs
+
+    Returns:
+        int: Threads per worker, between 2 and 8
+    """
+    return max(2, min(8, 16 // cpus))
+
+def memory_usage():
+    """
+    Memory used by the current process
+
+    Returns:
+        dict: ``rss_bytes`` and, on Linux, ``private_bytes`` (memory not
+        shared copy-on-write with the master)
+    """
+    usage = {}
+    try:
+        with open("/proc/self/statm") as statm:
+            usage["rss_bytes"] = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        with open("/proc/self/smaps_rollup") as smaps:
+            private = 0
+            for line in smaps:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    private += int(line.split()[1]) * 1024
+            usage["private_bytes"] = private
+    except OSError:
+        import resource
+        usage["rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return usage
+
+def _mib(value):
+    return f"{value / (1024 * 1024):.1f} MiB" if value is not None else "n/a"
+
+def build_options(environ=None, cpus=None):
+    """
+    Gunicorn settings derived from the environment
+
+    Args:
+        environ (dict, optional): Environment to read, defaults to os.environ
+        cpus (int, optional): CPU count, detected when omitted
+
+    Returns:
+        dict: Gunicorn settings
+    """
+    environ = os.environ if environ is None else environ
+    cpus = available_cpus() if cpus is None else cpus
+    threads = int(environ.get("GUNICORN_THREADS", default_threads(cpus)))
+    max_requests = int(environ.get("GUNICORN_MAX_REQUESTS", 10000))
+    options = {
+        "bind": environ.get("BIND", f"0.0.0.0:{environ.get('PORT', '8000')}"),
+        "workers": int(environ.get("WEB_CONCURRENCY", default_workers(cpus))),
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": True,
+        "timeout": int(environ.get("GUNICORN_TIMEOUT", 30)),
+        "graceful_timeout": int(environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30)),
+        "keepalive": int(environ.get("GUNICORN_KEEPALIVE", 5)),
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "accesslog": environ.get("GUNICORN_ACCESS_LOG"),
+        "errorlog": "-",
+    }
+    # The memory store lives in one process: a single worker, never
+    # recycled, that builds the app itself so a restart replays the log
+    if environ.get("STORAGE_BACKEND") == "memory":
+        options.update(workers=1, preload_app=False, max_requests=0, max_requests_jitter=0)
+    return options
+
+def dispose_engines(app, close=True):
+    """
+    Drop every pooled connection of the app's engines
+
+    Args:
+        app: Flask application instance
+        close (bool): Close the connections. Workers pass False so they
+            only forget connections inherited from the master instead of
+            closing sockets the master still owns.
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+        shards = app.extensions.get("shards")
+        if shards:
+            engines.extend(shards.engines)
+        for engine in engines:
+            engine.dispose(close=close)
+
+class TaskServiceApplication(BaseApplication):
+    """
+    Gunicorn application serving the task service
+
+    Args:
+        options (dict): Gunicorn settings, see ``build_options``
+        config_name (str): Configuration passed to ``create_app``
+        started (float, optional): ``time.perf_counter()`` at process start
+    """
+
+    def __init__(self, options, config_name="production", started=None):
+        self.options = options
+        self.config_name = config_name
+        self.started = PROCESS_STARTED if started is None else started
+        self.application = None
+        self.cold_start = {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+        self.cfg.set("when_ready", self.when_ready)
+        self.cfg.set("post_fork", self.post_fork)
+        self.cfg.set("post_worker_init", self.post_worker_init)
+
+    def load(self):
+        if self.application is None:
+            load_started = time.perf_counter()
+            from internal.app import create_app
+            app = create_app(self.config_name)
+            with app.app_context():
+                configure_mappers()
+            dispose_engines(app)
+            loaded = time.perf_counter()
+            self.cold_start = {
+                "import_seconds": round(load_started - self.started, 4),
+                "create_app_seconds": round(loaded - load_started, 4),
+                "cold_start_seconds": round(loaded - self.started, 4),
+            }
+            app.extensions.setdefault("stats", {})["server"] = self.process_stats
+            self.application = app
+        return self.application
+
+    def process_stats(self):
+        """
+        Cold-start timings and memory of the serving process
+
+        Returns:
+            dict: Process statistics
+        """
+        stats = {"pid": os.getpid()}
+        stats.update(self.cold_start)
+        stats.update(memory_usage())
+        return stats
+
+    def when_ready(self, server):
+        usage = memory_usage()
+        logger.info(
+            "Cold start %.3fs (imports %.3fs, create_app %.3fs), master RSS %s",
+            self.cold_start.get("cold_start_seconds", 0.0),
+            self.cold_start.get("import_seconds", 0.0),
+            self.cold_start.get("create_app_seconds", 0.0),
+            _mib(usage.get("rss_bytes")),
+        )
+
+    def post_fork(self, server, worker):
+        if self.application is not None:
+            dispose_engines(self.application, close=False)
+
+    def post_worker_init(self, worker):
+        usage = memory_usage()
+        logger.info(
+            "Worker %s ready, RSS %s, private %s",
+            worker.pid, _mib(usage.get("rss_bytes")), _mib(usage.get("private_bytes")),
+        )
+
+def run(options=None, config_name="production", started=None):
+    """
+    Start the pre-fork server and block until it exits
+
+    Args:
+        options (dict, optional): Gunicorn settings overriding build_options()
+        config_name (str): Configuration passed to ``create_app``
+        started (float, optional): ``time.perf_counter()`` at process start
+    """
+    settings = build_options()
+    settings.update(options or {})
+    TaskServiceApplication(settings, config_name, started).run()
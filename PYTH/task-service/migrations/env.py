@@ -5,6 +5,8 @@ from flask import current_app
 
 from alembic import context
 
+from internal.db.online_migrations import CHECKPOINT_TABLE
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -45,6 +47,11 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Checkpoints of online backfills, maintained outside the models
+    return not (type_ == 'table' and name == CHECKPOINT_TABLE)
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +72,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object, transaction_per_migration=True
     )
 
     with context.begin_transaction():
@@ -97,6 +105,10 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
+            # Online backfills and index builds commit the revision they
+            # run in, so every revision gets its own transaction
+            transaction_per_migration=True,
             **current_app.extensions['migrate'].configure_args
         )
 
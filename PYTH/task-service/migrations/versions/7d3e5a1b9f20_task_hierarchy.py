@@ -0,0 +1,46 @@
+"""Task hierarchy with closure table
+
+Revision ID: 7d3e5a1b9f20
+Revises: c4aacb0bca03
+Create Date: 2026-10-19 10:12:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3e5a1b9f20'
+down_revision = 'c4aacb0bca03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_tasks_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_foreign_key('fk_tasks_parent_id_tasks', 'tasks', ['parent_id'], ['id'])
+
+    op.create_table('task_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_task_closure_descendant_depth', 'task_closure', ['descendant_id', 'depth'], unique=False)
+
+    # Every existing task is a top-level task: it is only its own ancestor
+    op.execute("INSERT INTO task_closure (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM tasks")
+
+
+def downgrade():
+    op.drop_index('ix_task_closure_descendant_depth', table_name='task_closure')
+    op.drop_table('task_closure')
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_tasks_parent_id_tasks', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_tasks_parent_id'))
+        batch_op.drop_column('parent_id')
@@ -0,0 +1,39 @@
+"""Task tags
+
+Revision ID: 9b41c6e2d7a8
+Revises: 7d3e5a1b9f20
+Create Date: 2026-10-19 14:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b41c6e2d7a8'
+down_revision = '7d3e5a1b9f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('task_tags',
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('task_id', 'tag_id')
+    )
+    op.create_index('ix_task_tags_tag_task', 'task_tags', ['tag_id', 'task_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_tags_tag_task', table_name='task_tags')
+    op.drop_table('task_tags')
+    op.drop_table('tags')
@@ -0,0 +1,45 @@
+"""Webhook subscriptions and outbox
+
+Revision ID: b7d2f4a9c1e5
+Revises: e2f8a4c61d93
+Create Date: 2026-10-19 16:12:48.205117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f4a9c1e5'
+down_revision = 'e2f8a4c61d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('webhook_subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=2048), nullable=False),
+    sa.Column('event_types', sa.String(length=255), nullable=True),
+    sa.Column('secret', sa.String(length=255), nullable=True),
+    sa.Column('last_event_id', sa.Integer(), nullable=False),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('leased_until', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('webhook_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('webhook_outbox')
+    op.drop_table('webhook_subscriptions')
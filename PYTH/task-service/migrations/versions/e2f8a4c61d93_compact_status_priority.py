@@ -0,0 +1,82 @@
+"""Store status and priority as SMALLINT codes, add list ordering indexes
+
+Revision ID: e2f8a4c61d93
+Revises: 9b41c6e2d7a8
+Create Date: 2026-10-19 16:41:09.275530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f8a4c61d93'
+down_revision = '9b41c6e2d7a8'
+branch_labels = None
+depends_on = None
+
+# Codes as of this revision, frozen here rather than imported from the model
+STATUS_CODES = {'pending': 1, 'in_progress': 2, 'completed': 3}
+PRIORITY_CODES = {'low': 1, 'medium': 2, 'high': 3}
+
+INDEXES = [
+    ('ix_tasks_created_at', ['created_at']),
+    ('ix_tasks_status_created_at', ['status', 'created_at']),
+    ('ix_tasks_priority_created_at', ['priority', 'created_at']),
+    ('ix_tasks_due_date', ['due_date']),
+]
+
+
+def _case(column, mapping):
+    whens = ' '.join(f"WHEN {key!r} THEN {value!r}" for key, value in mapping.items())
+    return f"CASE {column} {whens} ELSE NULL END"
+
+
+def _backfill(assignments):
+    """
+    Run ``UPDATE tasks SET <assignments>`` as one statement
+
+    The swap that follows rewrites the table in the same transaction, so
+    splitting the update into id ranges would not shorten any lock.
+    """
+    op.execute(f"UPDATE tasks SET {assignments}")
+
+
+def _swap_columns(new_type):
+    """Replace status and priority by the status_new and priority_new columns"""
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_column('status')
+        batch_op.drop_column('priority')
+        batch_op.alter_column('status_new', new_column_name='status', existing_type=new_type)
+        batch_op.alter_column('priority_new', new_column_name='priority', existing_type=new_type)
+
+
+def upgrade():
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_new', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('priority_new', sa.SmallInteger(), nullable=True))
+
+    _backfill(
+        f"status_new = {_case('status', STATUS_CODES)}, "
+        f"priority_new = {_case('priority', PRIORITY_CODES)}"
+    )
+    _swap_columns(sa.SmallInteger())
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'tasks', columns, unique=False)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='tasks')
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_new', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('priority_new', sa.String(length=20), nullable=True))
+
+    invert = lambda mapping: {code: value for value, code in mapping.items()}
+    _backfill(
+        f"status_new = {_case('status', invert(STATUS_CODES))}, "
+        f"priority_new = {_case('priority', invert(PRIORITY_CODES))}"
+    )
+    _swap_columns(sa.String(length=20))
@@ -0,0 +1,197 @@
+"""
+Tests for admission control and load shedding
+"""
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from internal.app import create_app
+from internal.db.database import db
+from internal.api.admission import (
+    ConcurrencyLimiter, MemoryBucketBackend, SQLiteBucketBackend,
+    PRIORITY_CHEAP, PRIORITY_EXPENSIVE
+)
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture with admission control enabled
+    """
+    app = create_app(
+        'testing',
+        ADMISSION_ENABLED=True,
+        RATE_LIMIT_PER_SECOND=1,
+        RATE_LIMIT_BURST=3,
+        MAX_CONCURRENT_REQUESTS=1,
+        MAX_QUEUED_REQUESTS=0,
+        QUEUE_TIMEOUT_SECONDS=0.05
+    )
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def test_rate_limit_returns_429(client):
+    """Requests beyond the bucket burst are rejected with Retry-After"""
+    statuses = [client.get('/api/tasks/1').status_code for _ in range(4)]
+
+    assert statuses[:3] == [404, 404, 404]
+    assert statuses[3] == 429
+
+    response = client.get('/api/tasks/1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_rate_limit_is_per_client(client):
+    """Each client address has its own bucket"""
+    for _ in range(3):
+        client.get('/api/tasks/1')
+
+    assert client.get('/api/tasks/1').status_code == 429
+    response = client.get('/api/tasks/1', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 404
+
+def test_overload_returns_503(app, client):
+    """A request is shed when every slot is busy and the queue is full"""
+    limiter = app.extensions['admission'].limiter
+    assert limiter.acquire() == ConcurrencyLimiter.ADMITTED
+    try:
+        response = client.get('/api/tasks/1')
+    finally:
+        limiter.release()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/api/tasks/1').status_code == 404
+
+def test_stats_endpoint(client):
+    """Admission counters are exported"""
+    for _ in range(4):
+        client.get('/api/tasks/1')
+
+    response = client.get('/api/stats')
+    stats = json.loads(response.data)['admission']
+    assert stats['admitted'] == 3
+    assert stats['rate_limited'] == 1
+    assert stats['admitted_by_class']['cheap'] == 3
+
+def test_unguarded_routes_skip_admission(client):
+    """The stats endpoint itself is never throttled"""
+    for _ in range(10):
+        assert client.get('/api/stats').status_code == 200
+
+def test_memory_bucket_refills():
+    """Tokens come back at the configured rate"""
+    backend = MemoryBucketBackend()
+    assert backend.consume('c', rate=2, burst=1, now=0.0) == (True, 0.0)
+    allowed, retry_after = backend.consume('c', rate=2, burst=1, now=0.1)
+    assert not allowed
+    assert retry_after == pytest.approx(0.4)
+    assert backend.consume('c', rate=2, burst=1, now=0.6)[0]
+
+def test_sqlite_bucket_is_shared(tmp_path):
+    """Two backends on the same file see the same buckets, like two workers"""
+    path = str(tmp_path / 'admission.db')
+    worker_a = SQLiteBucketBackend(path)
+    worker_b = SQLiteBucketBackend(path)
+
+    assert worker_a.consume('c', rate=0.001, burst=2, now=100.0)[0]
+    assert worker_b.consume('c', rate=0.001, burst=2, now=100.0)[0]
+    assert not worker_a.consume('c', rate=0.001, burst=2, now=100.0)[0]
+    assert not worker_b.consume('c', rate=0.001, burst=2, now=100.0)[0]
+
+def test_limiter_serves_cheap_requests_first():
+    """Queued cheap reads are admitted before queued expensive calls"""
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=10, queue_timeout=2)
+    assert limiter.acquire() == ConcurrencyLimiter.ADMITTED
+
+    order = []
+
+    def worker(name, priority):
+        if limiter.acquire(priority) == ConcurrencyLimiter.ADMITTED:
+            order.append(name)
+            limiter.release()
+
+    expensive = threading.Thread(target=worker, args=('expensive', PRIORITY_EXPENSIVE))
+    expensive.start()
+    while limiter.queued < 1:
+        time.sleep(0.001)
+    cheap = threading.Thread(target=worker, args=('cheap', PRIORITY_CHEAP))
+    cheap.start()
+    while limiter.queued < 2:
+        time.sleep(0.001)
+
+    limiter.release()
+    expensive.join()
+    cheap.join()
+
+    assert order == ['cheap', 'expensive']
+    assert limiter.active == 0
+
+def test_limiter_evicts_lower_priority_when_full():
+    """A cheap read displaces a queued expensive call from a full queue"""
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=2)
+    assert limiter.acquire() == ConcurrencyLimiter.ADMITTED
+
+    outcomes = {}
+
+    def worker(name, priority):
+        outcomes[name] = limiter.acquire(priority)
+        if outcomes[name] == ConcurrencyLimiter.ADMITTED:
+            limiter.release()
+
+    expensive = threading.Thread(target=worker, args=('expensive', PRIORITY_EXPENSIVE))
+    expensive.start()
+    while limiter.queued < 1:
+        time.sleep(0.001)
+
+    assert limiter.acquire(PRIORITY_EXPENSIVE, timeout=0) == ConcurrencyLimiter.QUEUE_FULL
+
+    cheap = threading.Thread(target=worker, args=('cheap', PRIORITY_CHEAP))
+    cheap.start()
+    expensive.join()
+    limiter.release()
+    cheap.join()
+
+    assert outcomes == {
+        'expensive': ConcurrencyLimiter.EVICTED,
+        'cheap': ConcurrencyLimiter.ADMITTED
+    }
+
+def test_locked_bucket_file_sheds_requests(tmp_path):
+    """A bucket file locked past the timeout gives a 503, not an error"""
+    path = str(tmp_path / 'admission.db')
+    app = create_app('testing', ADMISSION_ENABLED=True, ADMISSION_BACKEND='sqlite', ADMISSION_STATE_PATH=path)
+    controller = app.extensions['admission']
+    controller.backend = SQLiteBucketBackend(path, timeout=0.05)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        response = client.get('/api/tasks/1')
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert controller.stats()['bucket_unavailable'] == 1
+    assert client.get('/api/tasks/1').status_code == 404
+
+def test_rate_must_refill():
+    """A zero rate would never refill, and is refused at startup"""
+    with pytest.raises(ValueError, match="RATE_LIMIT_PER_SECOND"):
+        create_app('testing', ADMISSION_ENABLED=True, RATE_LIMIT_PER_SECOND=0)
@@ -6,14 +6,15 @@ import json
 from datetime import datetime, timedelta
 from internal.app import create_app
 from internal.db.database import db
-from internal.models.task import Task, TaskStatus, TaskPriority
+from internal.handlers.task_service import TaskService
+from internal.models.task import TaskStatus, TaskPriority
 
-@pytest.fixture
-def app():
+@pytest.fixture(params=["database", "memory"])
+def app(request):
     """
-    Flask app fixture for tests
+    Flask app fixture for tests, once per storage backend
     """
-    app = create_app('testing')
+    app = create_app('testing', STORAGE_BACKEND=request.param)
     
     with app.app_context():
         db.create_all()
@@ -56,7 +57,7 @@ def test_create_task_endpoint(app, client):
     
     # Verify in database
     with app.app_context():
-        task = Task.query.get(response_data["id"])
+        task = TaskService.get_task_by_id(response_data["id"])
         assert task is not None
         assert task.title == "Test Task"
 
@@ -64,9 +65,7 @@ def test_get_task_endpoint(app, client):
     """Test getting a task by ID via API"""
     # Create a task first
     with app.app_context():
-        task = Task(title="Get Task Test")
-        db.session.add(task)
-        db.session.commit()
+        task = TaskService.create_task({"title": "Get Task Test"})
         task_id = task.id
     
     # Make API request
@@ -90,16 +89,13 @@ def test_list_tasks_endpoint(app, client):
     """Test listing tasks via API"""
     # Create some tasks
     with app.app_context():
-        tasks = [
-            Task(
-                title=f"API Task {i}", 
-                status=TaskStatus.PENDING.value if i % 3 == 0 else 
-                      TaskStatus.IN_PROGRESS.value if i % 3 == 1 else 
-                      TaskStatus.COMPLETED.value
-            ) for i in range(10)
-        ]
-        db.session.add_all(tasks)
-        db.session.commit()
+        for i in range(10):
+            TaskService.create_task({
+                "title": f"API Task {i}",
+                "status": TaskStatus.PENDING.value if i % 3 == 0 else 
+                          TaskStatus.IN_PROGRESS.value if i % 3 == 1 else 
+                          TaskStatus.COMPLETED.value
+            })
     
     # Make API request
     response = client.get('/api/tasks')
@@ -125,9 +121,7 @@ def test_update_task_endpoint(app, client):
     """Test updating a task via API"""
     # Create a task first
     with app.app_context():
-        task = Task(title="Original Title", description="Original Description")
-        db.session.add(task)
-        db.session.commit()
+        task = TaskService.create_task({"title": "Original Title", "description": "Original Description"})
         task_id = task.id
     
     # Prepare update data
@@ -151,7 +145,7 @@ def test_update_task_endpoint(app, client):
     
     # Verify in database
     with app.app_context():
-        updated_task = Task.query.get(task_id)
+        updated_task = TaskService.get_task_by_id(task_id)
         assert updated_task.title == "Updated Title"
         assert updated_task.description == "Updated Description"
 
@@ -159,9 +153,7 @@ def test_update_task_status_endpoint(app, client):
     """Test updating a task status via API"""
     # Create a task first
     with app.app_context():
-        task = Task(title="Status Test", status=TaskStatus.PENDING.value)
-        db.session.add(task)
-        db.session.commit()
+        task = TaskService.create_task({"title": "Status Test", "status": TaskStatus.PENDING.value})
         task_id = task.id
     
     # Prepare status update data
@@ -183,16 +175,14 @@ def test_update_task_status_endpoint(app, client):
     
     # Verify in database
     with app.app_context():
-        updated_task = Task.query.get(task_id)
+        updated_task = TaskService.get_task_by_id(task_id)
         assert updated_task.status == TaskStatus.COMPLETED.value
 
 def test_delete_task_endpoint(app, client):
     """Test deleting a task via API"""
     # Create a task first
     with app.app_context():
-        task = Task(title="Delete Test")
-        db.session.add(task)
-        db.session.commit()
+        task = TaskService.create_task({"title": "Delete Test"})
         task_id = task.id
     
     # Make API request
@@ -203,7 +193,7 @@ def test_delete_task_endpoint(app, client):
     
     # Verify in database
     with app.app_context():
-        deleted_task = Task.query.get(task_id)
+        deleted_task = TaskService.get_task_by_id(task_id)
         assert deleted_task is None
 
 def test_validation_errors(client):
@@ -238,3 +228,67 @@ def test_validation_errors(client):
         content_type='application/json'
     )
     assert response.status_code == 400
+
+def test_list_tasks_sorting(app, client):
+    """Test sorting the task list by priority rank, due date and creation date"""
+    created = datetime(2025, 1, 1)
+    with app.app_context():
+        for task_data in (
+            dict(title="low", priority=TaskPriority.LOW.value, created_at=created,
+                 due_date=created + timedelta(days=3)),
+            dict(title="high", priority=TaskPriority.HIGH.value, created_at=created + timedelta(hours=1)),
+            dict(title="medium", priority=TaskPriority.MEDIUM.value, created_at=created + timedelta(hours=2),
+                 due_date=created + timedelta(days=1)),
+            dict(title="high 2", priority=TaskPriority.HIGH.value, created_at=created + timedelta(hours=3),
+                 due_date=created + timedelta(days=2)),
+        ):
+            TaskService.create_task(task_data)
+    
+    def titles(query):
+        response = client.get(f'/api/tasks?{query}')
+        assert response.status_code == 200
+        return [task["title"] for task in json.loads(response.data)["tasks"]]
+    
+    assert titles('') == ["high 2", "medium", "high", "low"]
+    assert titles('sort=created_at&order=asc') == ["low", "high", "medium", "high 2"]
+    # By rank, not alphabetically; newest first within a priority
+    assert titles('sort=priority') == ["high 2", "high", "medium", "low"]
+    assert titles('sort=priority&order=asc') == ["low", "medium", "high", "high 2"]
+    # Soonest first, tasks without a due date last in both directions
+    assert titles('sort=due_date') == ["medium", "high 2", "low", "high"]
+    assert titles('sort=due_date&order=desc') == ["low", "high 2", "medium", "high"]
+    assert titles('sort=priority&per_page=1&page=2') == ["high"]
+    
+    response = client.get('/api/tasks?sort=title')
+    assert response.status_code == 400
+    assert "sort" in json.loads(response.data)["details"]
+    response = client.get('/api/tasks?sort=priority&order=up')
+    assert response.status_code == 400
+    assert "order" in json.loads(response.data)["details"]
+
+def test_status_and_priority_stored_as_codes(app, client):
+    """Test that status and priority are stored as small integer codes"""
+    if app.config["STORAGE_BACKEND"] != "database":
+        pytest.skip("checks the tasks table")
+    response = client.post(
+        '/api/tasks',
+        data=json.dumps({"title": "Coded", "priority": TaskPriority.HIGH.value}),
+        content_type='application/json'
+    )
+    task_id = json.loads(response.data)["id"]
+    
+    with app.app_context():
+        row = db.session.execute(
+            db.text("SELECT status, priority FROM tasks WHERE id = :id"), {"id": task_id}
+        ).one()
+        assert tuple(row) == (1, 3)
+    
+    body = json.loads(client.get(f'/api/tasks/{task_id}').data)
+    assert (body["status"], body["priority"]) == (TaskStatus.PENDING.value, TaskPriority.HIGH.value)
+    
+    # Filters take the string values; unknown values match nothing
+    response = client.get(f'/api/tasks?priority={TaskPriority.HIGH.value}')
+    assert len(json.loads(response.data)["tasks"]) == 1
+    response = client.get('/api/tasks?priority=urgent')
+    assert response.status_code == 200
+    assert json.loads(response.data)["tasks"] == []
@@ -0,0 +1,134 @@
+"""
+Tests for the batch endpoint
+"""
+import pytest
+import json
+from datetime import datetime, timedelta
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.task import Task, TaskStatus
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture backed by a file database, so savepoints and
+    commits behave as in production
+    """
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'batch.db'}")
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def post_batch(client, operations, mode=None):
+    payload = {"operations": operations}
+    if mode:
+        payload["mode"] = mode
+    response = client.post('/api/batch', data=json.dumps(payload), content_type='application/json')
+    return response, json.loads(response.data)
+
+def titles(app):
+    with app.app_context():
+        db.session.expire_all()
+        return sorted(task.title for task in Task.query.all())
+
+def test_batch_executes_all_operations(app, client):
+    """Operations run in order and report per-operation results"""
+    with app.app_context():
+        task = Task(title="Existing")
+        db.session.add(task)
+        db.session.commit()
+        task_id = task.id
+
+    response, body = post_batch(client, [
+        {"op": "create", "data": {"title": "First", "priority": "high"}},
+        {"op": "update", "id": task_id, "data": {"title": "Renamed"}},
+        {"op": "update_status", "id": task_id, "data": {"status": TaskStatus.COMPLETED.value}},
+        {"op": "create", "data": {"title": "Second"}},
+        {"op": "delete", "id": task_id}
+    ])
+
+    assert response.status_code == 200
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 200, 200, 201, 200]
+    assert body["results"][0]["body"]["priority"] == "high"
+    assert body["results"][2]["body"]["status"] == TaskStatus.COMPLETED.value
+    assert titles(app) == ["First", "Second"]
+
+def test_atomic_batch_rolls_back_on_failure(app, client):
+    """In atomic mode one failure discards every operation"""
+    response, body = post_batch(client, [
+        {"op": "create", "data": {"title": "Kept?"}},
+        {"op": "update", "id": 9999, "data": {"title": "Missing"}},
+        {"op": "create", "data": {"title": "Never run"}}
+    ])
+
+    assert response.status_code == 404
+    assert body["committed"] is False
+    assert [result["status"] for result in body["results"]] == [424, 404, 424]
+    assert body["results"][1]["body"] == {"error": "Task not found"}
+    assert titles(app) == []
+
+def test_best_effort_batch_keeps_successes(app, client):
+    """In best-effort mode failures are isolated and reported"""
+    yesterday = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    response, body = post_batch(client, [
+        {"op": "create", "data": {"title": "One"}},
+        {"op": "create", "data": {"title": "Late", "due_date": yesterday}},
+        {"op": "delete", "id": 9999},
+        {"op": "create", "data": {"title": "Two"}}
+    ], mode="best_effort")
+
+    assert response.status_code == 200
+    assert body["committed"] is True
+    assert [result["status"] for result in body["results"]] == [201, 400, 404, 201]
+    assert body["results"][1]["body"]["details"] == {"due_date": ["Due date cannot be in the past"]}
+    assert titles(app) == ["One", "Two"]
+
+def test_best_effort_isolates_database_errors(app, client, monkeypatch):
+    """A failing write is rolled back to its savepoint only"""
+    from internal.handlers import batch_service
+
+    original = batch_service.TaskService.create_task
+
+    def create_task(task_data, commit=True):
+        if task_data["title"] == "Boom":
+            task_data = dict(task_data, title=None)
+        return original(task_data, commit=commit)
+
+    monkeypatch.setattr(batch_service.TaskService, "create_task", staticmethod(create_task))
+
+    response, body = post_batch(client, [
+        {"op": "create", "data": {"title": "Before"}},
+        {"op": "create", "data": {"title": "Boom"}},
+        {"op": "create", "data": {"title": "After"}}
+    ], mode="best_effort")
+
+    assert [result["status"] for result in body["results"]] == [201, 500, 201]
+    assert titles(app) == ["After", "Before"]
+
+def test_batch_validation_errors(client):
+    """Malformed envelopes are rejected before anything runs"""
+    response, body = post_batch(client, [])
+    assert response.status_code == 400
+
+    response, body = post_batch(client, [{"op": "explode"}])
+    assert response.status_code == 400
+    assert body["details"]["operations"]["0"]["op"] == ["Must be one of: create, update, update_status, delete."]
+
+    response, body = post_batch(client, [{"op": "delete"}])
+    assert response.status_code == 400
+    assert body["results"][0]["body"]["details"] == {"id": ["Missing data for required field."]}
+
+    response, body = post_batch(client, [{"op": "delete", "id": 1}] * 101)
+    assert response.status_code == 400
+    assert body["details"] == {"operations": ["Longer than maximum length 100."]}
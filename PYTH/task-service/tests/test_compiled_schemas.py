@@ -0,0 +1,81 @@
+"""
+Differential tests between the compiled loaders and marshmallow
+"""
+import random
+from datetime import datetime, timedelta
+import pytest
+from marshmallow import Schema, ValidationError, fields, pre_load
+from internal.models.compiled import CompiledSchema, compile_schema
+from internal.models.schemas import TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema
+
+FUTURE = (datetime.utcnow() + timedelta(days=30)).isoformat()
+PAST = (datetime.utcnow() - timedelta(days=30)).isoformat()
+
+# Values exercising every branch: missing, null, wrong types, bounds,
+# enum members and near misses, valid and invalid datetimes
+VALUE_POOL = [
+    None, "", "x", "a" * 255, "a" * 256, b"bytes", b"\xff", 0, 1, 1.5, True, [], {}, ["low"],
+    "low", "medium", "high", "HIGH", "pending", "in_progress", "completed", "done",
+    FUTURE, PAST, "2999-01-01", "2999-01-01T00:00:00Z", "not a date", "2999-13-01T00:00:00",
+    "2999-01-01T00:00", "2999-01-01 00:00:00.5", "2999-01-01T00:00:00.123456789",
+    "2999-1-1T0:0", "2999-02-30T00:00:00", "2999-01-01T00:00:00+05:30",
+]
+
+FIELD_NAMES = ["title", "description", "due_date", "priority", "status", "parent_id", "tags", "extra", "id"]
+
+def run(loader, data):
+    """Normalise a load outcome so two implementations can be compared"""
+    try:
+        return ("ok", loader.load(data))
+    except ValidationError as err:
+        return ("invalid", err.messages, err.valid_data)
+    except Exception as err:
+        return ("raised", type(err))
+
+def random_payload(rng):
+    payload = {}
+    for name in FIELD_NAMES:
+        if rng.random() < 0.5:
+            payload[name] = rng.choice(VALUE_POOL)
+    return payload
+
+@pytest.mark.parametrize("schema_cls", [TaskCreateSchema, TaskUpdateSchema, TaskStatusUpdateSchema])
+def test_compiled_matches_marshmallow(schema_cls):
+    """Random payloads produce the same data and the same errors"""
+    reference = schema_cls()
+    compiled = compile_schema(schema_cls())
+    assert isinstance(compiled, CompiledSchema)
+
+    rng = random.Random(1234)
+    payloads = [random_payload(rng) for _ in range(3000)]
+    payloads += [None, [], "string", 42, {}]
+    payloads += [{name: value} for name in FIELD_NAMES for value in VALUE_POOL]
+
+    for payload in payloads:
+        assert run(compiled, payload) == run(reference, payload), payload
+
+def test_compiled_error_messages():
+    """Spot-check the messages clients actually see"""
+    loader = compile_schema(TaskCreateSchema())
+
+    with pytest.raises(ValidationError) as excinfo:
+        loader.load({"priority": "urgent", "due_date": PAST, "colour": "red"})
+
+    assert excinfo.value.messages == {
+        "title": ["Missing data for required field."],
+        "priority": ["Must be one of: low, medium, high."],
+        "colour": ["Unknown field."],
+        "due_date": ["Due date cannot be in the past"]
+    }
+
+def test_unsupported_schema_falls_back():
+    """Schemas with processors are returned unchanged"""
+    class ProcessedSchema(Schema):
+        name = fields.Str()
+
+        @pre_load
+        def strip(self, data, **kwargs):
+            return data
+
+    schema = ProcessedSchema()
+    assert compile_schema(schema) is schema
@@ -0,0 +1,140 @@
+"""
+Tests for request deadlines and statement timeouts
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import msgpack
+import pytest
+from sqlalchemy import text
+from internal.app import create_app
+from internal.api.deadlines import current_deadline, with_deadline
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task
+
+# Runs for many seconds unless interrupted
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT COUNT(*) FROM c"
+)
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture with the default deadlines
+    """
+    app = create_app('testing', ROUTE_DEADLINES={"tasks.list_tasks": 1})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+@pytest.fixture
+def slow_list(monkeypatch):
+    """Make listing tasks run a query that never finishes in time"""
+    def list_tasks(**filters):
+        db.session.execute(SLOW_QUERY)
+        return [], 0, 0
+    monkeypatch.setattr(TaskService, "list_tasks", staticmethod(list_tasks))
+
+def stats(client):
+    return json.loads(client.get('/api/stats').data)["deadlines"]
+
+def test_slow_query_is_interrupted(app, client, slow_list):
+    """The statement is interrupted at the route's deadline and the request answers 504"""
+    started = time.monotonic()
+    response = client.get('/api/tasks')
+    assert time.monotonic() - started < 1.5
+
+    assert response.status_code == 504
+    assert json.loads(response.data) == {"error": "Request deadline exceeded", "budget_seconds": 1}
+    counters = stats(client)
+    assert counters["cancelled_statements"] == 1
+    assert counters["exceeded_by_endpoint"] == {"tasks.list_tasks": 1}
+
+    # The connection is usable again and other requests run unbounded by the old deadline
+    TaskService.create_task({"title": "After"})
+    assert client.get('/api/tasks/1').status_code == 200
+    assert db.session.execute(text("SELECT COUNT(*) FROM tasks")).scalar() == 1
+
+def test_client_can_shorten_the_budget(app, client, slow_list):
+    """X-Request-Timeout lowers the budget but cannot raise it"""
+    started = time.monotonic()
+    response = client.get('/api/tasks', headers={"X-Request-Timeout": "0.1"})
+    assert time.monotonic() - started < 0.6
+    assert json.loads(response.data)["budget_seconds"] == 0.1
+
+    response = client.get('/api/tasks', headers={"X-Request-Timeout": "60"})
+    assert json.loads(response.data)["budget_seconds"] == 1
+    assert stats(client)["shortened_by_client"] == 1
+
+    for value in ("soon", "0", "-1"):
+        response = client.get('/api/tasks', headers={"X-Request-Timeout": value})
+        assert response.status_code == 400
+
+def test_rejections_honour_accept(client, slow_list):
+    """The 504 and the 400 for a bad header are encoded like any other response"""
+    headers = {"Accept": "application/msgpack", "X-Request-Timeout": "0.1"}
+    response = client.get('/api/tasks', headers=headers)
+    assert response.status_code == 504
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.data) == {"error": "Request deadline exceeded", "budget_seconds": 0.1}
+    assert "Accept" in response.headers["Vary"]
+
+    response = client.get('/api/tasks', headers={**headers, "X-Request-Timeout": "soon"})
+    assert response.status_code == 400
+    assert response.mimetype == "application/msgpack"
+    assert "X-Request-Timeout" in msgpack.unpackb(response.data)["error"]
+
+def test_no_statement_starts_after_the_deadline(app, client, monkeypatch):
+    """Work that overruns outside the database still stops at the next statement"""
+    def get_task_by_id(task_id):
+        time.sleep(0.15)
+        return db.session.get(Task, task_id)
+    monkeypatch.setattr(TaskService, "get_task_by_id", staticmethod(get_task_by_id))
+
+    response = client.get('/api/tasks/1', headers={"X-Request-Timeout": "0.1"})
+    assert response.status_code == 504
+    assert stats(client)["skipped_statements"] == 1
+
+def test_deadline_bounds_admission_queueing():
+    """A queued request gives up when its deadline expires"""
+    app = create_app('testing', ADMISSION_ENABLED=True, MAX_CONCURRENT_REQUESTS=1, QUEUE_TIMEOUT_SECONDS=5)
+    with app.app_context():
+        db.create_all()
+    limiter = app.extensions['admission'].limiter
+    assert limiter.acquire() == limiter.ADMITTED
+
+    started = time.monotonic()
+    response = app.test_client().get('/api/tasks/1', headers={"X-Request-Timeout": "0.1"})
+    assert response.status_code == 503
+    assert time.monotonic() - started < 1
+    limiter.release()
+
+def test_deadline_follows_work_to_other_threads(app):
+    """with_deadline hands the caller's deadline to pool threads"""
+    with app.test_request_context('/api/tasks'):
+        app.preprocess_request()
+        deadline = current_deadline()
+        with ThreadPoolExecutor(2) as pool:
+            assert list(pool.map(lambda _: current_deadline(), range(2))) == [None, None]
+            assert list(pool.map(with_deadline(lambda _: current_deadline()), range(2))) == [deadline, deadline]
+        assert deadline.budget == 1
+
+def test_deadlines_can_be_disabled():
+    """Without deadlines nothing is bounded or counted"""
+    app = create_app('testing', DEADLINES_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        assert app.test_client().get('/api/tasks', headers={"X-Request-Timeout": "soon"}).status_code == 200
+    assert "deadlines" not in app.extensions
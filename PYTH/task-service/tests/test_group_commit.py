@@ -0,0 +1,130 @@
+"""
+Tests for group commit of task writes
+"""
+import json
+import threading
+import pytest
+from sqlalchemy.exc import IntegrityError
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task, TaskStatus
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture with group commit enabled on a file database
+    """
+    app = create_app(
+        'testing',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'group.db'}",
+        GROUP_COMMIT_ENABLED=True,
+        GROUP_COMMIT_WINDOW_MS=50,
+        GROUP_COMMIT_MAX_BATCH=16
+    )
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        app.extensions['group_commit'].stop()
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def run_concurrently(app, calls):
+    """Run each call in its own thread and app context, like request workers"""
+    results = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def worker(index, call):
+        with app.app_context():
+            barrier.wait()
+            try:
+                results[index] = call()
+            except Exception as e:
+                results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_creates_share_transactions(app):
+    """Concurrent creates are coalesced but each caller gets its own task"""
+    calls = [
+        (lambda i=i: TaskService.create_task({"title": f"Task {i}"}))
+        for i in range(16)
+    ]
+
+    tasks = run_concurrently(app, calls)
+
+    assert sorted(task.title for task in tasks) == sorted(f"Task {i}" for i in range(16))
+    assert len({task.id for task in tasks}) == 16
+    assert all(task.to_dict()["created_at"] for task in tasks)
+
+    stats = app.extensions['group_commit'].stats()
+    assert stats["operations"] == 16
+    assert stats["transactions"] < 16
+    assert Task.query.count() == 16
+
+def test_failures_are_isolated(app):
+    """A failing write does not affect the other writes of its batch"""
+    task = Task(title="Existing")
+    db.session.add(task)
+    db.session.commit()
+    task_id = task.id
+
+    results = run_concurrently(app, [
+        lambda: TaskService.create_task({"title": "Good"}),
+        lambda: TaskService.create_task({"title": None}),
+        lambda: TaskService.update_task_status(task_id, TaskStatus.COMPLETED.value),
+        lambda: TaskService.update_task(9999, {"title": "Missing"})
+    ])
+
+    assert results[0].title == "Good"
+    assert isinstance(results[1], IntegrityError)
+    assert results[2].status == TaskStatus.COMPLETED.value
+    assert results[3] is None
+
+    db.session.expire_all()
+    assert sorted(t.title for t in Task.query.all()) == ["Existing", "Good"]
+    assert Task.query.get(task_id).status == TaskStatus.COMPLETED.value
+
+def test_api_writes_go_through_group_commit(app, client):
+    """The endpoints return the same responses with group commit enabled"""
+    response = client.post(
+        '/api/tasks',
+        data=json.dumps({"title": "Via API"}),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    task_id = json.loads(response.data)["id"]
+
+    response = client.patch(
+        f'/api/tasks/{task_id}/status',
+        data=json.dumps({"status": TaskStatus.IN_PROGRESS.value}),
+        content_type='application/json'
+    )
+    assert response.status_code == 200
+    assert json.loads(response.data)["status"] == TaskStatus.IN_PROGRESS.value
+
+    assert app.extensions['group_commit'].stats()["operations"] == 2
+
+def test_batch_endpoint_bypasses_group_commit(app, client):
+    """Writes inside an explicit transaction are not handed to the writer"""
+    response = client.post(
+        '/api/batch',
+        data=json.dumps({"operations": [{"op": "create", "data": {"title": "Batched"}}]}),
+        content_type='application/json'
+    )
+
+    assert response.status_code == 200
+    assert app.extensions['group_commit'].stats()["operations"] == 0
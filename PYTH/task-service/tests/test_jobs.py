@@ -0,0 +1,218 @@
+"""
+Tests for background jobs
+"""
+import json
+import time
+from datetime import datetime, timedelta
+import pytest
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers import job_types
+from internal.handlers.jobs import JobRun, JobRunner
+from internal.handlers.task_service import TaskService
+from internal.models.job import Job
+from internal.models.task import Task
+
+class Crash(BaseException):
+    """Stands in for the worker process dying"""
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture with jobs enabled on a file database, run by the tests
+    """
+    app = create_app(
+        'testing',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'jobs.db'}",
+        JOBS_ENABLED=True,
+        JOB_RUNNER_EMBEDDED=False,
+        JOB_BATCH_SIZE=3,
+        JOB_OUTPUT_DIR=str(tmp_path / 'jobs'),
+        JOB_RETRY_BASE_SECONDS=0
+    )
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+@pytest.fixture
+def runner(app):
+    """The app's runner, run synchronously with run_once"""
+    return app.extensions['jobs']
+
+def submit(client, job_type, **params):
+    response = client.post('/api/jobs', data=json.dumps({"type": job_type, "params": params}),
+                           content_type='application/json')
+    assert response.status_code == 202, response.data
+    assert response.headers["Location"] == f"/api/jobs/{json.loads(response.data)['id']}"
+    return json.loads(response.data)["id"]
+
+def job(client, job_id):
+    return json.loads(client.get(f'/api/jobs/{job_id}').data)
+
+def add_tasks(count, **fields):
+    return [TaskService.create_task({"title": f"Task {i}", **fields}).id for i in range(count)]
+
+def test_export_runs_beside_the_app(tmp_path):
+    """The embedded runner picks up a queued export; progress and output are served"""
+    app = create_app(
+        'testing',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'embedded.db'}",
+        JOBS_ENABLED=True, JOB_BATCH_SIZE=4, JOB_POLL_SECONDS=0.05, JOB_OUTPUT_DIR=str(tmp_path / 'jobs')
+    )
+    with app.app_context():
+        db.create_all()
+        add_tasks(10)
+        add_tasks(2, priority="high")
+    client = app.test_client()
+    try:
+        job_id = submit(client, "export", priority="medium")
+        deadline = time.monotonic() + 5
+        while job(client, job_id)["status"] != "succeeded" and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        app.extensions['jobs'].stop()
+
+    done = job(client, job_id)
+    assert done["status"] == "succeeded"
+    assert done["progress"] == {"done": 10, "total": 10, "percent": 100.0}
+    assert done["result"]["tasks"] == 10
+    response = client.get(f'/api/jobs/{job_id}/output')
+    assert response.mimetype == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [task["title"] for task in exported] == [f"Task {i}" for i in range(10)]
+
+def test_invalid_jobs_are_rejected(client):
+    """Parameters are validated per type before anything is queued"""
+    for body in (
+        {"type": "reindex"},
+        {"type": "bulk_delete", "params": {}},
+        {"type": "export", "params": {"status": "lost"}},
+        {"type": "import", "params": {"tasks": [{"title": "Fine"}, {"title": ""}]}},
+        {"type": "archive", "params": {"older_than_days": -1}},
+    ):
+        response = client.post('/api/jobs', data=json.dumps(body), content_type='application/json')
+        assert response.status_code == 400, body
+    details = json.loads(response.data)["details"]
+    assert list(details) == ["params"]
+    assert client.get('/api/jobs/1').status_code == 404
+    assert json.loads(client.get('/api/jobs').data) == {"jobs": []}
+
+def test_import_and_bulk_delete(client, runner):
+    """Imports skip tasks that fail; bulk deletes only touch matching tasks"""
+    parent = TaskService.create_task({"title": "Parent"})
+    tasks = [{"title": f"Imported {i}", "priority": "low"} for i in range(7)]
+    tasks[4]["parent_id"] = 999
+    tasks[5]["parent_id"] = parent.id
+    import_id = submit(client, "import", tasks=tasks)
+    assert runner.run_once() == 1
+
+    result = job(client, import_id)["result"]
+    assert (result["created"], result["failed"]) == (6, 1)
+    assert result["errors"] == [{"index": 4, "details": {"parent_id": ["Parent task not found."]}}]
+    assert Task.query.filter_by(priority="low").count() == 6
+
+    delete_id = submit(client, "bulk_delete", priority="low")
+    runner.run_once()
+    assert job(client, delete_id)["result"] == {"deleted": 6}
+    assert [task.title for task in Task.query.all()] == ["Parent"]
+
+def test_archive_moves_old_tasks_to_a_file(app, client, runner):
+    """Old tasks in the status are written out then deleted; parents wait for their subtasks"""
+    old = add_tasks(4)
+    for task_id in old:
+        TaskService.update_task_status(task_id, "completed")
+    parent = TaskService.create_task({"title": "Parent"})
+    child = TaskService.create_task({"title": "Child", "parent_id": parent.id})
+    TaskService.update_task_status(parent.id, "completed")
+    recent = TaskService.create_task({"title": "Recent"})
+    TaskService.update_task_status(recent.id, "completed")
+    long_ago = datetime.utcnow() - timedelta(days=60)
+    Task.query.filter(Task.id != recent.id).update({"updated_at": long_ago})
+    db.session.commit()
+
+    job_id = submit(client, "archive", older_than_days=30)
+    runner.run_once()
+
+    assert job(client, job_id)["result"]["archived"] == 4
+    archived = client.get(f'/api/jobs/{job_id}/output').data.decode().splitlines()
+    assert sorted(json.loads(line)["id"] for line in archived) == old
+    assert {task.id for task in Task.query.all()} == {parent.id, child.id, recent.id}
+
+def test_crashed_job_resumes_after_its_last_chunk(app, client, runner, monkeypatch):
+    """A job whose runner died is taken over once the lease expires, without redoing chunks"""
+    job_id = submit(client, "import", tasks=[{"title": f"Imported {i}"} for i in range(10)])
+
+    report = JobRun.report
+    calls = []
+    def crash_after_two_chunks(run, done, checkpoint, total=None):
+        report(run, done, checkpoint, total)
+        calls.append(done)
+        if len(calls) == 3:
+            raise Crash()
+    monkeypatch.setattr(JobRun, "report", crash_after_two_chunks)
+    with pytest.raises(Crash):
+        runner.run_once()
+    monkeypatch.setattr(JobRun, "report", report)
+
+    assert calls == [0, 3, 6]
+    assert job(client, job_id)["status"] == "running"
+    assert Task.query.count() == 6
+
+    # Another runner waits for the lease to expire
+    other = JobRunner(app, workers=2, concurrency={}, batch_size=3, lease_seconds=60, max_attempts=3,
+                      retry_base=0, poll_interval=1, output_dir=app.config["JOB_OUTPUT_DIR"])
+    assert other.run_once() == 0
+    Job.query.filter_by(id=job_id).update({"leased_until": datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    assert other.run_once() == 1
+
+    done = job(client, job_id)
+    assert (done["status"], done["attempts"], done["result"]["created"]) == ("succeeded", 2, 10)
+    assert sorted(task.title for task in Task.query.all()) == sorted(f"Imported {i}" for i in range(10))
+    assert other.stats()["resumed"] == 1
+
+def test_concurrency_is_limited_per_type(app, client, runner):
+    """Jobs of a type at its limit wait while other types start"""
+    runner.concurrency = {"export": 1}
+    first, second = submit(client, "export"), submit(client, "export")
+    imported = submit(client, "import", tasks=[{"title": "One"}])
+    assert runner.claim() == [first, imported]
+    # The limit holds for every runner sharing the database
+    other = JobRunner(app, workers=2, concurrency={"export": 1}, batch_size=3, lease_seconds=60, max_attempts=3,
+                      retry_base=0, poll_interval=1, output_dir=app.config["JOB_OUTPUT_DIR"])
+    assert other.claim() == []
+    assert job(client, second)["status"] == "queued"
+
+def test_failing_job_is_retried_then_fails(client, runner, monkeypatch):
+    """Errors are retried up to JOB_MAX_ATTEMPTS attempts"""
+    def broken(run):
+        raise RuntimeError("disk full")
+    monkeypatch.setitem(job_types.JOB_HANDLERS, "export", broken)
+    job_id = submit(client, "export")
+
+    runner.run_once()
+    retried = job(client, job_id)
+    assert (retried["status"], retried["attempts"], retried["error"]) == ("queued", 1, "disk full")
+    runner.run_once()
+    runner.run_once()
+    failed = job(client, job_id)
+    assert (failed["status"], failed["attempts"]) == ("failed", 3)
+    assert failed["finished_at"] is not None
+    assert runner.stats()["jobs"]["failed"] == 1
+
+def test_jobs_can_be_disabled():
+    """Without jobs the endpoints answer 501"""
+    app = create_app('testing')
+    response = app.test_client().post('/api/jobs', data=json.dumps({"type": "export"}), content_type='application/json')
+    assert response.status_code == 501
+    assert "jobs" not in app.extensions
@@ -0,0 +1,153 @@
+"""
+Tests for the in-memory task store
+"""
+import json
+import pytest
+from datetime import datetime, timedelta
+from internal.app import create_app
+from internal.db.memory_store import MemoryTaskStore
+from internal.models.task import TaskStatus, TaskPriority
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture keeping tasks in memory, without a database
+    """
+    app = create_app('testing', STORAGE_BACKEND="memory")
+
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def create(client, **data):
+    response = client.post('/api/tasks', data=json.dumps(data), content_type='application/json')
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+def listed(client, query=''):
+    response = client.get(f'/api/tasks?{query}')
+    assert response.status_code == 200
+    body = json.loads(response.data)
+    return [task["title"] for task in body["tasks"]], body["pagination"]["total_items"]
+
+def test_filters_use_the_indexes(client):
+    """Status, priority and tag filters combine with every ordering"""
+    priorities = [TaskPriority.LOW.value, TaskPriority.MEDIUM.value, TaskPriority.HIGH.value]
+    for i in range(9):
+        create(client, title=f"t{i}", priority=priorities[i % 3], tags=["even"] if i % 2 == 0 else [])
+    for i in (1, 4, 7):
+        client.patch(f'/api/tasks/{i}/status', data=json.dumps({"status": TaskStatus.COMPLETED.value}),
+                     content_type='application/json')
+
+    assert listed(client, 'status=completed') == (["t6", "t3", "t0"], 3)
+    assert listed(client, 'status=completed&priority=low') == (["t6", "t3", "t0"], 3)
+    assert listed(client, 'status=pending&sort=priority&per_page=2&page=2') == (["t2", "t7"], 6)
+    assert listed(client, 'tags=even&priority=high&order=asc') == (["t2", "t8"], 2)
+    assert listed(client, 'tags=even,missing&tag_mode=any&sort=priority') == (["t8", "t2", "t4", "t6", "t0"], 5)
+    assert listed(client, 'tags=even,missing') == ([], 0)
+    assert listed(client, 'priority=urgent') == ([], 0)
+
+    response = client.get('/api/tags?status=completed')
+    assert json.loads(response.data)["tags"] == [{"name": "even", "count": 2}]
+
+def test_updates_move_tasks_between_indexes(client):
+    """Changed status, priority, due date and tags are found under their new values"""
+    task = create(client, title="Moving", tags=["a"])
+    create(client, title="Staying", tags=["a"])
+    due = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0)
+
+    response = client.put(
+        f'/api/tasks/{task["id"]}',
+        data=json.dumps({"priority": "high", "due_date": due.isoformat(), "tags": ["B", "c"]}),
+        content_type='application/json'
+    )
+    body = json.loads(response.data)
+    assert body["tags"] == ["b", "c"]
+    assert body["due_date"] == due.isoformat()
+
+    assert listed(client, 'priority=high') == (["Moving"], 1)
+    assert listed(client, 'priority=medium') == (["Staying"], 1)
+    assert listed(client, 'tags=a') == (["Staying"], 1)
+    assert listed(client, 'sort=due_date') == (["Moving", "Staying"], 2)
+
+def test_subtasks_and_batches(client):
+    """Subtasks are supported, batches need database transactions"""
+    root = create(client, title="Root")
+    child = create(client, title="Child", parent_id=root["id"])
+    grandchild = create(client, title="Grandchild", parent_id=child["id"])
+    client.patch(f'/api/tasks/{grandchild["id"]}/status', data=json.dumps({"status": TaskStatus.COMPLETED.value}),
+                 content_type='application/json')
+
+    subtree = json.loads(client.get(f'/api/tasks/{root["id"]}/subtree').data)
+    assert [(task["title"], task["depth"]) for task in subtree["tasks"]] == [
+        ("Root", 0), ("Child", 1), ("Grandchild", 2)
+    ]
+    progress = json.loads(client.get(f'/api/tasks/{root["id"]}/progress').data)
+    assert (progress["total"], progress["by_status"]["completed"]) == (3, 1)
+
+    response = client.put(
+        f'/api/tasks/{root["id"]}', data=json.dumps({"parent_id": child["id"]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+
+    assert client.delete(f'/api/tasks/{root["id"]}').status_code == 200
+    assert listed(client) == ([], 0)
+
+    response = client.post(
+        '/api/batch', data=json.dumps({"operations": [{"op": "create", "data": {"title": "x"}}]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 501
+
+def test_log_is_replayed(tmp_path):
+    """Changes survive a restart through the log, which is compacted on load"""
+    path = tmp_path / "tasks.log"
+    due = datetime(2030, 1, 2, 3, 4, 5, 678901)
+
+    store = MemoryTaskStore(str(path))
+    kept = store.create_task({"title": "Kept", "due_date": due, "tags": ["x"]})
+    removed = store.create_task({"title": "Removed"})
+    child = store.create_task({"title": "Child", "parent_id": kept.id})
+    store.update_task_status(kept.id, TaskStatus.IN_PROGRESS.value)
+    store.delete_task(removed.id)
+    store.close()
+    # A record cut short by a crash is ignored
+    with open(path, "a") as log:
+        log.write('{"put": {"id"')
+
+    store = MemoryTaskStore(str(path))
+    assert store.get_task_by_id(kept.id).to_dict() == kept.to_dict() | {
+        "status": TaskStatus.IN_PROGRESS.value,
+        "updated_at": store.get_task_by_id(kept.id).updated_at
+    }
+    assert store.get_task_by_id(kept.id).due_date == due
+    assert store.get_task_by_id(removed.id) is None
+    assert [task.id for task in store.get_ancestors(child.id)] == [kept.id]
+    # Ids are not reused
+    assert store.create_task({"title": "New"}).id == child.id + 1
+    assert store.stats()["log_records"] == 4
+    store.close()
+
+    assert len(path.read_text().splitlines()) == 4
+
+def test_configuration(tmp_path):
+    """The memory store is exclusive with sharding and reports its counters"""
+    with pytest.raises(ValueError):
+        create_app('testing', STORAGE_BACKEND="memory", SHARD_DATABASE_URLS=["sqlite://"])
+    with pytest.raises(ValueError):
+        create_app('testing', STORAGE_BACKEND="redis")
+
+    app = create_app('testing', STORAGE_BACKEND="memory", MEMORY_STORE_LOG_PATH=str(tmp_path / "log"))
+    client = app.test_client()
+    create(client, title="Counted")
+    stats = json.loads(client.get('/api/stats').data)["memory_store"]
+    assert stats["tasks"] == 1
+    assert stats["log_records"] == 1
+    app.extensions["task_store"].close()
@@ -0,0 +1,149 @@
+"""
+Tests for MessagePack and CBOR content negotiation
+"""
+import pytest
+import json
+from datetime import datetime, timedelta, timezone
+import cbor2
+import msgpack
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.task import TaskPriority, TaskStatus
+
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+DECODERS = {
+    MSGPACK: lambda data: msgpack.unpackb(data, timestamp=3),
+    CBOR: cbor2.loads,
+}
+ENCODERS = {
+    MSGPACK: lambda payload: msgpack.packb(payload, datetime=True),
+    CBOR: lambda payload: cbor2.dumps(payload, datetime_as_timestamp=True),
+}
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture with the result cache enabled
+    """
+    app = create_app('testing', RESULT_CACHE_ENABLED=True)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def create_json(client, **data):
+    response = client.post('/api/tasks', data=json.dumps(data), content_type='application/json')
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+def utc(iso):
+    return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc)
+
+@pytest.mark.parametrize("mimetype", [MSGPACK, CBOR])
+def test_get_with_native_timestamps(client, mimetype):
+    """Binary responses carry the JSON fields, with timestamps as native types"""
+    due = (datetime.utcnow() + timedelta(days=1)).replace(microsecond=0)
+    task = create_json(client, title="Binary", due_date=due.isoformat(), tags=["x"])
+
+    response = client.get(f'/api/tasks/{task["id"]}', headers={"Accept": mimetype})
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert "Accept" in response.headers["Vary"]
+
+    body = DECODERS[mimetype](response.data)
+    for field in ("created_at", "updated_at", "due_date"):
+        assert isinstance(body[field], datetime)
+        assert body[field] == utc(task[field])
+    assert {key: value for key, value in body.items() if not isinstance(value, datetime)} == {
+        key: value for key, value in task.items() if key not in ("created_at", "updated_at", "due_date")
+    }
+
+    missing = client.get('/api/tasks/9999', headers={"Accept": mimetype})
+    assert missing.status_code == 404
+    assert DECODERS[mimetype](missing.data) == {"error": "Task not found"}
+
+def test_json_stays_the_default(client):
+    """Without a preference, or with an unsupported one, responses are JSON"""
+    task = create_json(client, title="Plain")
+
+    for accept in (None, "*/*", "text/html", f"application/json, {MSGPACK};q=0.5"):
+        headers = {"Accept": accept} if accept else {}
+        response = client.get(f'/api/tasks/{task["id"]}', headers=headers)
+        assert response.mimetype == "application/json"
+        assert json.loads(response.data)["created_at"] == task["created_at"]
+
+    response = client.get(f'/api/tasks/{task["id"]}', headers={"Accept": "application/x-msgpack"})
+    assert response.mimetype == MSGPACK
+
+def test_list_is_cached_per_format(client):
+    """Cached list pages are kept apart by format"""
+    create_json(client, title="Listed")
+
+    for mimetype in ("application/json", MSGPACK, CBOR, MSGPACK):
+        response = client.get('/api/tasks', headers={"Accept": mimetype})
+        assert response.mimetype == mimetype
+        if mimetype == "application/json":
+            body = json.loads(response.data)
+        else:
+            body = DECODERS[mimetype](response.data)
+        assert body["tasks"][0]["title"] == "Listed"
+        assert body["pagination"]["total_items"] == 1
+
+    assert response.headers["X-Cache"] == "HIT"
+
+@pytest.mark.parametrize("mimetype", [MSGPACK, CBOR])
+def test_binary_request_bodies(client, mimetype):
+    """POST, PUT and PATCH accept bodies in the binary formats"""
+    due = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=2)
+    response = client.post(
+        '/api/tasks',
+        data=ENCODERS[mimetype]({"title": "Packed", "due_date": due, "priority": TaskPriority.HIGH.value}),
+        content_type=mimetype,
+        headers={"Accept": mimetype}
+    )
+    assert response.status_code == 201
+    task = DECODERS[mimetype](response.data)
+    assert task["due_date"] == due
+    assert task["priority"] == TaskPriority.HIGH.value
+
+    response = client.put(
+        f'/api/tasks/{task["id"]}',
+        data=ENCODERS[mimetype]({"title": "Repacked"}),
+        content_type=mimetype
+    )
+    assert json.loads(response.data)["title"] == "Repacked"
+
+    response = client.patch(
+        f'/api/tasks/{task["id"]}/status',
+        data=ENCODERS[mimetype]({"status": TaskStatus.COMPLETED.value}),
+        content_type=mimetype
+    )
+    assert json.loads(response.data)["status"] == TaskStatus.COMPLETED.value
+
+@pytest.mark.parametrize("mimetype", [MSGPACK, CBOR])
+def test_invalid_binary_bodies(client, mimetype):
+    """Undecodable and invalid binary bodies are validation errors"""
+    response = client.post('/api/tasks', data=b"\xc1\xff\x00", content_type=mimetype)
+    assert response.status_code == 400
+    assert "_schema" in json.loads(response.data)["details"]
+
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+    response = client.post(
+        '/api/tasks',
+        data=ENCODERS[mimetype]({"title": "Late", "due_date": past}),
+        content_type=mimetype,
+        headers={"Accept": mimetype}
+    )
+    assert response.status_code == 400
+    assert "due_date" in DECODERS[mimetype](response.data)["details"]
@@ -0,0 +1,148 @@
+"""
+Tests for online backfills and index builds
+"""
+import io
+import os
+import shutil
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.migrations import init_migrations
+from internal.db.online_migrations import (
+    backfill, create_index_online, drop_index_online, list_checkpoints
+)
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+class Interrupted(Exception):
+    pass
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture on a file database holding a table to backfill
+    """
+    app = create_app(
+        'testing',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'online.db'}",
+        MIGRATION_PAUSE_SECONDS=0
+    )
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(sa.text("CREATE TABLE items (id INTEGER PRIMARY KEY, kind TEXT, score INTEGER)"))
+            # Gaps in the ids must not produce empty chunks
+            connection.execute(sa.text("INSERT INTO items (id, kind) VALUES (:id, :kind)"), [
+                {"id": i * 7, "kind": "odd" if i % 2 else "even"} for i in range(1, 101)
+            ])
+        yield app
+        db.engine.dispose()
+
+def run(operation, **kwargs):
+    """Run a helper as a revision script would, returning its result"""
+    with db.engine.connect() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            return operation(**kwargs)
+
+def scores(kind=None):
+    query = "SELECT score FROM items" + (" WHERE kind = :kind" if kind else "")
+    with db.engine.connect() as connection:
+        return [row[0] for row in connection.execute(sa.text(query), {"kind": kind})]
+
+def test_backfill_in_checkpointed_chunks(app):
+    """Each chunk is committed with its checkpoint and reported"""
+    seen = []
+    result = run(backfill, name="items_score", table="items", assignments="score = id * 2",
+                 batch_size=30, progress=lambda state: seen.append((state["last_key"], scores().count(None))))
+
+    assert scores() == [i * 7 * 2 for i in range(1, 101)]
+    assert [last_key for last_key, _ in seen] == [210, 420, 630, 700]
+    # Every chunk was visible to other connections as soon as it was done
+    assert [pending for _, pending in seen] == [70, 40, 10, 0]
+    assert (result["rows_done"], result["rows_total"]) == (100, 100)
+    assert result["completed_at"] is not None
+
+def test_backfill_stops_at_the_last_key_it_started_with(app):
+    """Rows inserted meanwhile are left to the application"""
+    def insert(state):
+        with db.engine.begin() as connection:
+            connection.execute(sa.text("INSERT INTO items (kind) VALUES ('new')"))
+
+    result = run(backfill, name="items_score", table="items", assignments="score = 1",
+                 batch_size=30, progress=insert)
+    assert result["last_key"] == 700
+    assert scores("new") == [None] * 4
+
+def test_interrupted_backfill_resumes(app):
+    """A rerun continues after the last checkpoint and skips once completed"""
+    def interrupt(state):
+        if state["last_key"] >= 420:
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        run(backfill, name="items_score", table="items", assignments="score = :value",
+            where="kind = :kind", params={"value": 1, "kind": "odd"}, batch_size=30, progress=interrupt)
+    assert scores("odd").count(1) == 30
+
+    seen = []
+    result = run(backfill, name="items_score", table="items", assignments="score = :value",
+                 where="kind = :kind", params={"value": 1, "kind": "odd"}, batch_size=30,
+                 progress=lambda state: seen.append(state["last_key"]))
+    assert seen == [630, 700]
+    assert scores("odd") == [1] * 50 and scores("even") == [None] * 50
+    assert (result["rows_done"], result["rows_total"]) == (50, 50)
+
+    with db.engine.connect() as connection:
+        connection.execute(sa.text("UPDATE items SET score = NULL"))
+        connection.commit()
+    run(backfill, name="items_score", table="items", assignments="score = :value", params={"value": 1})
+    assert scores() == [None] * 100
+
+    with db.engine.connect() as connection:
+        assert [checkpoint["name"] for checkpoint in list_checkpoints(connection)] == ["items_score"]
+
+def test_online_indexes_can_be_rerun(app):
+    """Index builds and drops skip work already done"""
+    def index_names():
+        return {index["name"] for index in sa.inspect(db.engine).get_indexes("items")}
+
+    run(create_index_online, name="ix_items_kind", table="items", columns=["kind"])
+    run(create_index_online, name="ix_items_kind", table="items", columns=["kind"])
+    assert index_names() == {"ix_items_kind"}
+
+    run(drop_index_online, name="ix_items_kind", table="items")
+    run(drop_index_online, name="ix_items_kind", table="items")
+    assert index_names() == set()
+
+def test_postgresql_sql_builds_concurrently_outside_transactions():
+    """Offline scripts commit before CONCURRENTLY and emit one UPDATE per backfill"""
+    output = io.StringIO()
+    context = MigrationContext.configure(
+        dialect_name="postgresql", opts={"as_sql": True, "output_buffer": output}
+    )
+    with Operations.context(context):
+        context.impl.emit_begin()
+        backfill(name="tasks_score", table="tasks", assignments="score = 0", where="score IS NULL")
+        create_index_online(name="ix_tasks_score", table="tasks", columns=["score"])
+
+    sql = " ".join(output.getvalue().split())
+    assert "UPDATE tasks SET score = 0 WHERE score IS NULL;" in sql
+    assert "COMMIT; CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_score ON tasks (score); BEGIN;" in sql
+
+def test_upgrade_runs_with_the_online_environment(tmp_path):
+    """Every revision still applies, and autogenerate ignores the checkpoints"""
+    from flask_migrate import migrate, upgrade
+
+    directory = shutil.copytree(MIGRATIONS, tmp_path / 'migrations', ignore=shutil.ignore_patterns('__pycache__'))
+    revisions = set(os.listdir(directory / 'versions'))
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'upgraded.db'}")
+    with app.app_context():
+        init_migrations(app)
+        upgrade(directory=str(directory))
+        run(backfill, name="noop", table="tasks", assignments="title = title")
+
+        migrate(directory=str(directory))
+        assert set(os.listdir(directory / 'versions')) == revisions
@@ -0,0 +1,165 @@
+"""
+Tests for the versioned result cache
+"""
+import json
+import sqlite3
+import pytest
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.result_cache import MemoryResultCache, SQLiteResultCache
+from internal.models.task import Task
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture with the memory result cache enabled
+    """
+    app = create_app('testing', RESULT_CACHE_ENABLED=True)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def test_bump_invalidates_every_entry():
+    """Entries of an older generation are misses"""
+    cache = MemoryResultCache(max_entries=10, max_bytes=1024)
+    cache.put("a", cache.generation(), b"A")
+    cache.put("b", cache.generation(), b"B")
+    assert cache.get("a") == b"A"
+
+    cache.bump()
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.stats()["invalidated"] == 2
+
+def test_results_computed_before_a_write_are_not_stored():
+    """A page read under the old generation is dropped on put"""
+    cache = MemoryResultCache(max_entries=10, max_bytes=1024)
+    generation = cache.generation()
+    cache.bump()
+    cache.put("a", generation, b"stale")
+    assert cache.get("a") is None
+
+@pytest.mark.parametrize("eviction, survivor", [("lru", "a"), ("fifo", "b")])
+def test_eviction_policy(eviction, survivor):
+    """LRU keeps recently read entries, FIFO the recently stored ones"""
+    cache = MemoryResultCache(max_entries=2, max_bytes=1024, eviction=eviction)
+    generation = cache.generation()
+    cache.put("a", generation, b"A")
+    cache.put("b", generation, b"B")
+    cache.get("a")
+    cache.put("c", generation, b"C")
+
+    assert cache.get(survivor) is not None
+    assert cache.get("c") == b"C"
+    assert cache.stats()["evictions"] == 1
+
+def test_memory_is_bounded_by_bytes():
+    """Entries are evicted once the bodies exceed max_bytes"""
+    cache = MemoryResultCache(max_entries=100, max_bytes=10)
+    generation = cache.generation()
+    cache.put("a", generation, b"x" * 6)
+    cache.put("b", generation, b"y" * 6)
+    cache.put("huge", generation, b"z" * 11)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == 6
+    assert cache.get("b") == b"y" * 6
+
+def test_sqlite_cache_is_shared(tmp_path):
+    """A write in one worker invalidates the entries seen by another"""
+    path = str(tmp_path / "cache.db")
+    first = SQLiteResultCache(path, max_entries=2, max_bytes=1024)
+    second = SQLiteResultCache(path, max_entries=2, max_bytes=1024)
+
+    first.put("a", first.generation(), b"A")
+    assert second.get("a") == b"A"
+
+    second.bump()
+    assert first.get("a") is None
+
+    generation = first.generation()
+    for key in ("a", "b", "c"):
+        first.put(key, generation, key.encode())
+    assert second.stats()["entries"] == 2
+    assert second.get("c") == b"c"
+
+def test_locked_sqlite_cache_is_skipped(tmp_path):
+    """Lock timeouts skip the cache; a lost bump disables it until one goes through"""
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteResultCache(path, max_entries=2, max_bytes=1024)
+    cache.put("a", cache.generation(), b"A")
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+
+    cache.put("b", cache.generation(), b"B")
+    cache.bump()
+    assert cache.get("a") is None
+    assert cache.generation() is None
+    assert cache.stats()["unavailable"] >= 3
+
+    holder.execute("ROLLBACK")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    cache.put("a", cache.generation(), b"A")
+    assert cache.get("a") == b"A"
+    assert cache.stats()["generation"] == 1
+
+def test_list_is_served_from_cache(app, client, monkeypatch):
+    """Repeated pages are byte-identical and skip serialisation"""
+    db.session.add(Task(title="Cached"))
+    db.session.commit()
+
+    first = client.get('/api/tasks?status=pending&page=1')
+    assert first.headers["X-Cache"] == "MISS"
+
+    def fail(self):
+        raise AssertionError("to_dict called on a cache hit")
+    monkeypatch.setattr(Task, "to_dict", fail)
+
+    second = client.get('/api/tasks?page=1&status=pending')
+    assert second.status_code == 200
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.data == first.data
+    assert second.mimetype == "application/json"
+
+def test_tag_order_shares_an_entry(client):
+    """Tags listed in another order select the same tasks, so hit the same entry"""
+    assert client.get('/api/tasks?tags=work,home').headers["X-Cache"] == "MISS"
+    assert client.get('/api/tasks?tags=home,work').headers["X-Cache"] == "HIT"
+    assert client.get('/api/tasks?tags=home,work&tag_mode=any').headers["X-Cache"] == "MISS"
+
+def test_writes_invalidate_cached_pages(app, client):
+    """Every committed write, including batches, invalidates the cache"""
+    assert json.loads(client.get('/api/tasks').data)["pagination"]["total_items"] == 0
+
+    client.post('/api/tasks', data=json.dumps({"title": "New"}), content_type='application/json')
+    response = client.get('/api/tasks')
+    assert response.headers["X-Cache"] == "MISS"
+    assert json.loads(response.data)["pagination"]["total_items"] == 1
+
+    client.post(
+        '/api/batch',
+        data=json.dumps({"operations": [{"op": "create", "data": {"title": "Batched"}}]}),
+        content_type='application/json'
+    )
+    assert json.loads(client.get('/api/tasks').data)["pagination"]["total_items"] == 2
+
+    # Writes that change nothing keep the cache
+    client.get('/api/tasks')
+    client.delete('/api/tasks/9999')
+    assert client.get('/api/tasks').headers["X-Cache"] == "HIT"
+
+    stats = json.loads(client.get('/api/stats').data)["result_cache"]
+    assert stats["generation"] == 2
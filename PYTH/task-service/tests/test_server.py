@@ -0,0 +1,73 @@
+"""
+Tests for the pre-fork production server setup
+"""
+from internal.db.database import db
+from internal.server import (
+    TaskServiceApplication, build_options, default_threads, default_workers, dispose_engines
+)
+
+def test_sizing_from_cpu_count():
+    """Workers and threads scale with the CPU count"""
+    assert default_workers(1) == 3
+    assert default_workers(4) == 9
+    assert default_threads(1) == 8
+    assert default_threads(4) == 4
+    assert default_threads(32) == 2
+
+def test_build_options_defaults():
+    """Defaults preload the app and use threaded workers"""
+    options = build_options(environ={}, cpus=2)
+
+    assert options["bind"] == "0.0.0.0:8000"
+    assert options["workers"] == 5
+    assert options["threads"] == 8
+    assert options["worker_class"] == "gthread"
+    assert options["preload_app"] is True
+    assert options["max_requests_jitter"] == options["max_requests"] // 10
+
+def test_build_options_from_environment():
+    """Platform variables override the computed sizes"""
+    options = build_options(
+        environ={"PORT": "9000", "WEB_CONCURRENCY": "3", "GUNICORN_THREADS": "1"},
+        cpus=8
+    )
+
+    assert options["bind"] == "0.0.0.0:9000"
+    assert options["workers"] == 3
+    assert options["worker_class"] == "sync"
+
+def test_build_options_for_memory_store():
+    """The memory store is served by one worker that is never recycled"""
+    options = build_options(environ={"STORAGE_BACKEND": "memory", "WEB_CONCURRENCY": "4"}, cpus=8)
+
+    assert options["workers"] == 1
+    assert options["preload_app"] is False
+    assert options["max_requests"] == 0
+
+def test_preload_builds_app_once():
+    """The master builds the app once and reports cold-start timings"""
+    server = TaskServiceApplication({"workers": 1, "bind": "127.0.0.1:0"}, "testing")
+
+    app = server.load()
+
+    assert server.load() is app
+    stats = server.process_stats()
+    assert stats["cold_start_seconds"] >= stats["create_app_seconds"] >= 0
+    assert stats["rss_bytes"] > 0
+    assert app.extensions["stats"]["server"] == server.process_stats
+
+def test_post_fork_replaces_inherited_pool():
+    """A forked worker never reuses connections pooled by the master"""
+    server = TaskServiceApplication({"workers": 1}, "testing")
+    app = server.load()
+
+    with app.app_context():
+        engine = db.engine
+        inherited_pool = engine.pool
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+
+    server.post_fork(None, None)
+
+    assert engine.pool is not inherited_pool
+    dispose_engines(app)
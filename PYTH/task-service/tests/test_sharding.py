@@ -0,0 +1,179 @@
+"""
+Tests for horizontal sharding of tasks
+"""
+import json
+import pytest
+from internal.app import create_app
+from internal.db.database import db
+from internal.db.sharding import (
+    ShardRouter, decode_task_id, encode_task_id, plan_rebalance, rebalance
+)
+from internal.models.task import Task, TaskStatus, TaskPriority
+
+SHARDS = 3
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture spreading tasks over three SQLite files
+    """
+    app = create_app(
+        'testing',
+        SHARD_DATABASE_URLS=[f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(SHARDS)]
+    )
+
+    with app.app_context():
+        db.create_all()
+        app.extensions['shards'].create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        app.extensions['shards'].dispose()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def create(client, **data):
+    response = client.post('/api/tasks', data=json.dumps(data), content_type='application/json')
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+def test_ids_encode_the_shard():
+    """Public ids round-trip to (shard, local id)"""
+    assert decode_task_id(encode_task_id(5, 42)) == (5, 42)
+    assert encode_task_id(0, 1) != encode_task_id(1, 1)
+
+def test_crud_is_routed_by_id(app, client):
+    """Writes are spread over shards and reads find them again by id"""
+    created = [create(client, title=f"Task {i}") for i in range(6)]
+
+    assert sorted(decode_task_id(task["id"])[0] for task in created) == [0, 0, 1, 1, 2, 2]
+    assert app.extensions['shards'].shard_counts() == [2, 2, 2]
+    # Nothing is written to the default database
+    assert Task.query.count() == 0
+
+    task_id = created[4]["id"]
+    response = client.get(f'/api/tasks/{task_id}')
+    assert json.loads(response.data)["title"] == "Task 4"
+
+    response = client.put(
+        f'/api/tasks/{task_id}',
+        data=json.dumps({"title": "Renamed"}),
+        content_type='application/json'
+    )
+    assert json.loads(response.data)["title"] == "Renamed"
+    assert json.loads(response.data)["id"] == task_id
+
+    response = client.patch(
+        f'/api/tasks/{task_id}/status',
+        data=json.dumps({"status": TaskStatus.COMPLETED.value}),
+        content_type='application/json'
+    )
+    assert json.loads(response.data)["status"] == TaskStatus.COMPLETED.value
+
+    assert client.delete(f'/api/tasks/{task_id}').status_code == 200
+    assert client.get(f'/api/tasks/{task_id}').status_code == 404
+    # Ids pointing at a shard that does not exist are simply not found
+    assert client.get(f'/api/tasks/{encode_task_id(SHARDS, 1)}').status_code == 404
+
+def test_list_merges_shards_newest_first(app, client):
+    """Listing pages through all shards in created_at order"""
+    created = [
+        create(client, title=f"Task {i}", priority=TaskPriority.HIGH.value if i % 2 else TaskPriority.LOW.value)
+        for i in range(10)
+    ]
+    newest_first = [task["id"] for task in reversed(created)]
+
+    pages = []
+    for page in (1, 2, 3):
+        response = client.get(f'/api/tasks?page={page}&per_page=4')
+        body = json.loads(response.data)
+        assert body["pagination"]["total_items"] == 10
+        assert body["pagination"]["total_pages"] == 3
+        pages.extend(task["id"] for task in body["tasks"])
+    assert pages == newest_first
+
+    response = client.get(f'/api/tasks?priority={TaskPriority.HIGH.value}&per_page=3&page=2')
+    body = json.loads(response.data)
+    assert body["pagination"]["total_items"] == 5
+    assert [task["id"] for task in body["tasks"]] == [created[3]["id"], created[1]["id"]]
+
+def test_list_merges_shards_in_requested_order(client):
+    """Sorted listings merge the shards on the same key as each shard"""
+    priorities = [TaskPriority.LOW, TaskPriority.HIGH, TaskPriority.MEDIUM] * 3
+    created = [create(client, title=f"Task {i}", priority=p.value) for i, p in enumerate(priorities)]
+
+    pages = []
+    for page in (1, 2, 3):
+        response = client.get(f'/api/tasks?sort=priority&per_page=4&page={page}')
+        pages.extend(task["id"] for task in json.loads(response.data)["tasks"])
+    rank = {TaskPriority.HIGH.value: 0, TaskPriority.MEDIUM.value: 1, TaskPriority.LOW.value: 2}
+    expected = sorted(reversed(created), key=lambda task: rank[task["priority"]])
+    assert pages == [task["id"] for task in expected]
+
+    response = client.get('/api/tasks?sort=due_date&per_page=3')
+    assert [task["id"] for task in json.loads(response.data)["tasks"]] == [
+        task["id"] for task in created[:3]
+    ]
+
+def test_tags_are_filtered_and_counted_across_shards(client):
+    """Tag filters and counts cover every shard"""
+    for i in range(6):
+        create(client, title=f"Task {i}", tags=["even" if i % 2 == 0 else "odd", "all"])
+
+    response = client.get('/api/tasks?tags=even,all')
+    body = json.loads(response.data)
+    assert body["pagination"]["total_items"] == 3
+    assert sorted(task["title"] for task in body["tasks"]) == ["Task 0", "Task 2", "Task 4"]
+
+    body = json.loads(client.get('/api/tags').data)
+    assert body["tags"] == [
+        {"name": "all", "count": 6},
+        {"name": "even", "count": 3},
+        {"name": "odd", "count": 3},
+    ]
+
+def test_batch_is_rejected(client):
+    """A batch cannot be one transaction across shards"""
+    response = client.post(
+        '/api/batch',
+        data=json.dumps({"operations": [{"op": "create", "data": {"title": "Batched"}}]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 501
+
+def test_plan_rebalance():
+    """Surplus is moved to the emptiest shards until counts differ by one at most"""
+    assert plan_rebalance([6, 6, 0]) == [(0, 2, 2), (1, 2, 2)]
+    assert plan_rebalance([3, 3, 3]) == []
+    assert plan_rebalance([10, 0, 0, 1]) == [(0, 1, 3), (0, 2, 3), (0, 3, 1)]
+
+def test_rebalance_onto_new_shard(tmp_path):
+    """Tasks moved to an added shard keep their data under new ids"""
+    urls = [f"sqlite:///{tmp_path / f'old{i}.db'}" for i in range(2)]
+    before = ShardRouter(urls)
+    before.create_all()
+    titles = {before.create_task({"title": f"Task {i}"}).id: f"Task {i}" for i in range(12)}
+    before.dispose()
+
+    after = ShardRouter(urls + [f"sqlite:///{tmp_path / 'new.db'}"])
+    after.create_all()
+    mapping = {}
+    moves = rebalance(after, batch_size=3, on_move=mapping.__setitem__)
+
+    assert moves == [(0, 2, 2), (1, 2, 2)]
+    assert after.shard_counts() == [4, 4, 4]
+    assert len(mapping) == 4
+    for old_id, new_id in mapping.items():
+        assert after.get_task_by_id(old_id) is None
+        assert decode_task_id(new_id)[0] == 2
+        assert after.get_task_by_id(new_id).title == titles[old_id]
+
+    tasks, _, total = after.list_tasks(per_page=20)
+    assert total == 12
+    assert sorted(task.title for task in tasks) == sorted(titles.values())
+    after.dispose()
@@ -0,0 +1,202 @@
+"""
+Tests for single-flight coalescing of reads
+"""
+import json
+import threading
+import time
+import pytest
+from sqlalchemy import event, inspect
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.single_flight import SingleFlight, _adopt, _snapshot
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task
+
+READERS = 8
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture on a file database, shared by the reader threads
+    """
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'flight.db'}")
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Task(title=f"Task {i}") for i in range(3))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def statements(app):
+    """
+    Record every SELECT on the tasks table, slowed down so that all
+    readers arrive while the first query is still running
+    """
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM tasks" in statement:
+            executed.append(statement)
+            time.sleep(0.2)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def run_concurrently(app, call, count=READERS):
+    """Run the same call from several threads, each in its own app context"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        with app.app_context():
+            barrier.wait()
+            try:
+                results[index] = call()
+            except Exception as e:
+                results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def single_call_statements(app, statements, call):
+    """Statements issued by one uncontended call"""
+    with app.app_context():
+        call()
+    count = len(statements)
+    statements.clear()
+    return count
+
+def test_identical_gets_run_once(app, statements):
+    """N concurrent identical get_task_by_id calls issue the statements of one call"""
+    call = lambda: TaskService.get_task_by_id(1).to_dict()
+    # The task row, then its tags
+    assert single_call_statements(app, statements, call) == 2
+
+    results = run_concurrently(app, call)
+
+    assert len(statements) == 2
+    assert all(result["title"] == "Task 0" for result in results)
+
+    stats = app.extensions['single_flight'].stats()
+    assert stats["executions"] == 2
+    assert stats["coalesced"] == READERS - 1
+    assert stats["in_flight"] == 0
+
+def test_identical_lists_share_one_query(app, statements):
+    """Concurrent identical list calls share the page and its count"""
+    call = lambda: [task.to_dict() for task in TaskService.list_tasks(per_page=2)[0]]
+    # The count, the page and the tags of the page
+    assert single_call_statements(app, statements, call) == 3
+
+    results = run_concurrently(app, call)
+
+    assert len(statements) == 3
+    assert all(result == results[0] for result in results)
+    assert len(results[0]) == 2
+
+def wait_until(condition, timeout=5):
+    """Poll condition, failing the test instead of hanging on a bug"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+def test_followers_get_their_own_instances(app):
+    """Followers rebuild the leader's tasks in their own session, from a snapshot"""
+    flights = SingleFlight()
+    leader_task = Task.query.get(1)
+    leader_task.tags
+    release = threading.Event()
+    expired = threading.Event()
+    seen = {}
+
+    def slow():
+        release.wait(5)
+        return leader_task
+
+    def follower():
+        with app.app_context():
+            result, shared = flights.do("key", slow, share=_snapshot)
+            if not expired.wait(5):
+                return
+            adopted = _adopt(result)
+            seen["shared"] = shared
+            seen["own"] = adopted is not leader_task and adopted in db.session
+            seen["loaded"] = {"title", "tags"} <= set(inspect(adopted).dict)
+            seen["task"] = adopted.to_dict()
+
+    leader = threading.Thread(target=lambda: flights.do("key", slow, share=_snapshot))
+    leader.start()
+    wait_until(lambda: flights.stats()["in_flight"] == 1)
+    thread = threading.Thread(target=follower)
+    thread.start()
+    wait_until(lambda: flights.stats()["coalesced"] == 1)
+    release.set()
+    leader.join(5)
+    # The leader's request commits, expiring its instances before the follower reads
+    db.session.expire(leader_task)
+    expired.set()
+    thread.join(5)
+
+    assert not leader.is_alive() and not thread.is_alive()
+    assert "title" not in inspect(leader_task).dict
+    assert seen["task"] == leader_task.to_dict()
+    assert {key: seen[key] for key in ("shared", "own", "loaded")} == {"shared": True, "own": True, "loaded": True}
+
+def test_errors_are_shared():
+    """Followers see the leader's exception"""
+    flights = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait()
+        raise RuntimeError("boom")
+
+    def call():
+        try:
+            flights.do("key", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()["calls"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert flights.stats()["failed"] == 1
+
+def test_writes_forget_in_flight_reads(app):
+    """A read starting after a write does not join an older query"""
+    from internal.handlers.result_cache import notify_tasks_changed
+
+    flights = app.extensions['single_flight']
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flights.do("key", lambda: release.wait() and "old"))
+    leader.start()
+    while flights.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+
+    notify_tasks_changed()
+    result, shared = flights.do("key", lambda: "new")
+    release.set()
+    leader.join()
+
+    assert (result, shared) == ("new", False)
+    stats = json.loads(app.test_client().get('/api/stats').data)["single_flight"]
+    assert stats["executions"] == 2
+    assert stats["forgotten"] == 1
@@ -0,0 +1,74 @@
+"""
+Tests for startup import cost
+"""
+import json
+import os
+import subprocess
+import sys
+import click
+from benchmarks.bench_startup import budget_failures, load_budget, time_to_first_request
+from internal.app import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(snippet):
+    """Run snippet in a fresh interpreter and return its sys.modules"""
+    output = subprocess.run(
+        [sys.executable, "-c", snippet + "\nimport sys, json; print(json.dumps(sorted(sys.modules)))"],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return set(json.loads(output.splitlines()[-1]))
+
+def test_serving_does_not_import_migration_tooling():
+    """Alembic and Flask-Migrate stay out of request-serving processes"""
+    modules = imported_modules(
+        "from internal.app import create_app\n"
+        "app = create_app('testing')\n"
+        "app.test_client().get('/api/stats')"
+    )
+
+    assert "internal.app" in modules
+    assert "flask_migrate" not in modules
+    assert "alembic" not in modules
+
+def test_startup_stays_within_module_budget():
+    """Serving the first request loads no more modules than startup_budget.json allows"""
+    # Time is left to bench_startup, wall clock is too noisy for a unit test
+    _, modules = time_to_first_request()
+
+    assert budget_failures(load_budget(), None, modules) == []
+
+def test_disabled_extensions_are_not_imported():
+    """Optional subsystems are only loaded when their flag enables them"""
+    modules = imported_modules(
+        "from internal.app import create_app\n"
+        "app = create_app('testing')\n"
+        "app.test_client().get('/api/tasks')"
+    )
+
+    for name in (
+        "internal.api.admission",
+        "internal.db.memory_store",
+        "internal.db.sharding",
+    ):
+        assert name not in modules
+
+def test_cors_is_only_imported_when_enabled():
+    """flask_cors is an optional extension"""
+    modules = imported_modules(
+        "from internal.app import create_app\n"
+        "create_app('testing', CORS_ENABLED=False)"
+    )
+
+    assert "flask_cors" not in modules
+
+def test_db_command_loads_flask_migrate_on_demand():
+    """The flask db group still exposes every Flask-Migrate subcommand"""
+    app = create_app('testing')
+    group = app.cli.get_command(None, 'db')
+
+    with click.Context(group) as ctx:
+        assert {'upgrade', 'migrate', 'downgrade'} <= set(group.list_commands(ctx))
+
+    assert 'migrate' in app.extensions
+    assert app.extensions['migrate'].directory == 'migrations'
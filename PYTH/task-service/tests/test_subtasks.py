@@ -0,0 +1,188 @@
+"""
+Tests for subtasks and the closure table behind them
+"""
+import pytest
+import json
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.models.task import Task, TaskClosure, TaskStatus
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture for tests
+    """
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def create(client, title, parent_id=None):
+    payload = {"title": title}
+    if parent_id is not None:
+        payload["parent_id"] = parent_id
+    response = client.post('/api/tasks', data=json.dumps(payload), content_type='application/json')
+    return response, json.loads(response.data)
+
+def build_tree(client):
+    """
+    root
+    ├── a
+    │   ├── a1
+    │   └── a2
+    │       └── a2x
+    └── b
+    """
+    ids = {}
+    for title, parent in [("root", None), ("a", "root"), ("b", "root"),
+                          ("a1", "a"), ("a2", "a"), ("a2x", "a2")]:
+        response, body = create(client, title, ids.get(parent))
+        assert response.status_code == 201
+        ids[title] = body["id"]
+    return ids
+
+def expected_closure():
+    """Closure rows recomputed from parent_id, to compare with the table"""
+    parents = {task.id: task.parent_id for task in Task.query.all()}
+    rows = set()
+    for task_id in parents:
+        node, depth = task_id, 0
+        while node is not None:
+            rows.add((node, task_id, depth))
+            node, depth = parents[node], depth + 1
+    return rows
+
+def closure_rows():
+    return {(row.ancestor_id, row.descendant_id, row.depth) for row in TaskClosure.query.all()}
+
+def test_subtree_in_depth_order(app, client):
+    """The subtree endpoint returns every descendant with its depth"""
+    ids = build_tree(client)
+
+    response = client.get(f'/api/tasks/{ids["a"]}/subtree')
+    assert response.status_code == 200
+    tasks = json.loads(response.data)["tasks"]
+    assert [(task["title"], task["depth"]) for task in tasks] == [
+        ("a", 0), ("a1", 1), ("a2", 1), ("a2x", 2)
+    ]
+    assert tasks[3]["parent_id"] == ids["a2"]
+
+    response = client.get(f'/api/tasks/{ids["root"]}/subtree?max_depth=1')
+    assert [task["title"] for task in json.loads(response.data)["tasks"]] == ["root", "a", "b"]
+
+    assert client.get('/api/tasks/9999/subtree').status_code == 404
+    for max_depth in ("deep", "-1"):
+        response = client.get(f'/api/tasks/{ids["root"]}/subtree?max_depth={max_depth}')
+        assert response.status_code == 400
+        assert list(json.loads(response.data)["details"]) == ["max_depth"]
+    assert closure_rows() == expected_closure()
+
+def test_subtree_errors_are_not_reported_as_bad_input(client, monkeypatch):
+    """A ValueError from the service is a server error, not a bad max_depth"""
+    def broken(task_id, max_depth=None):
+        raise ValueError("corrupt closure")
+    monkeypatch.setattr(TaskService, "get_subtree", staticmethod(broken))
+
+    assert client.get('/api/tasks/1/subtree').status_code == 500
+
+def test_ancestors_root_first(client):
+    """The ancestor chain runs from the root down to the direct parent"""
+    ids = build_tree(client)
+
+    response = client.get(f'/api/tasks/{ids["a2x"]}/ancestors')
+    assert [task["title"] for task in json.loads(response.data)["ancestors"]] == ["root", "a", "a2"]
+
+    response = client.get(f'/api/tasks/{ids["root"]}/ancestors')
+    assert json.loads(response.data)["ancestors"] == []
+    assert client.get('/api/tasks/9999/ancestors').status_code == 404
+
+def test_progress_rolls_up_subtasks(client):
+    """Completion counts the task and every subtask"""
+    ids = build_tree(client)
+    for title in ("a1", "a2x"):
+        client.patch(
+            f'/api/tasks/{ids[title]}/status',
+            data=json.dumps({"status": TaskStatus.COMPLETED.value}),
+            content_type='application/json'
+        )
+
+    body = json.loads(client.get(f'/api/tasks/{ids["a"]}/progress').data)
+    assert body["total"] == 4
+    assert body["by_status"] == {"pending": 2, "in_progress": 0, "completed": 2}
+    assert body["completion"] == 50.0
+
+    body = json.loads(client.get(f'/api/tasks/{ids["root"]}/progress').data)
+    assert body["completion"] == round(100 * 2 / 6, 1)
+    assert client.get('/api/tasks/9999/progress').status_code == 404
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_moving_a_subtree(app, client):
+    """Changing parent_id re-links the whole subtree"""
+    ids = build_tree(client)
+
+    response = client.put(
+        f'/api/tasks/{ids["a2"]}',
+        data=json.dumps({"parent_id": ids["b"]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 200
+    assert json.loads(response.data)["parent_id"] == ids["b"]
+
+    response = client.get(f'/api/tasks/{ids["a2x"]}/ancestors')
+    assert [task["title"] for task in json.loads(response.data)["ancestors"]] == ["root", "b", "a2"]
+    assert closure_rows() == expected_closure()
+
+    # Detach to the top level
+    client.put(
+        f'/api/tasks/{ids["a2"]}',
+        data=json.dumps({"parent_id": None}),
+        content_type='application/json'
+    )
+    response = client.get(f'/api/tasks/{ids["root"]}/subtree')
+    assert [task["title"] for task in json.loads(response.data)["tasks"]] == ["root", "a", "b", "a1"]
+    assert closure_rows() == expected_closure()
+
+def test_invalid_parents_are_rejected(client):
+    """Unknown parents and cycles are validation errors"""
+    ids = build_tree(client)
+
+    response, body = create(client, "orphan", 9999)
+    assert response.status_code == 400
+    assert body["details"] == {"parent_id": ["Parent task not found."]}
+
+    for parent in ("a", "a2x"):
+        response = client.put(
+            f'/api/tasks/{ids["a"]}',
+            data=json.dumps({"parent_id": ids[parent]}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+        assert json.loads(response.data)["details"] == {
+            "parent_id": ["A task cannot be a subtask of itself or of its subtasks."]
+        }
+
+def test_delete_removes_the_subtree(app, client):
+    """Deleting a task deletes its subtasks and their closure rows"""
+    ids = build_tree(client)
+
+    assert client.delete(f'/api/tasks/{ids["a"]}').status_code == 200
+
+    db.session.expire_all()
+    assert sorted(task.title for task in Task.query.all()) == ["b", "root"]
+    assert closure_rows() == expected_closure()
+
+    # New tasks may reuse the freed ids without clashing with old rows
+    response, body = create(client, "c", ids["b"])
+    assert response.status_code == 201
+    assert closure_rows() == expected_closure()
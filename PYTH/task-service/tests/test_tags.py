@@ -0,0 +1,143 @@
+"""
+Tests for task tags, multi-tag filtering and tag counts
+"""
+import pytest
+import json
+from sqlalchemy import select, text
+from internal.app import create_app
+from internal.db.database import db
+from internal.models.tag import TAG_MODE_ANY, Tag, tagged_task_ids
+
+@pytest.fixture
+def app():
+    """
+    Flask app fixture for tests
+    """
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def create(client, title, tags, **fields):
+    response = client.post(
+        '/api/tasks',
+        data=json.dumps({"title": title, "tags": tags, **fields}),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    return json.loads(response.data)
+
+@pytest.fixture
+def tagged(client):
+    """
+    Tasks with overlapping tags
+    """
+    return {
+        "a": create(client, "a", ["backend", "urgent"], priority="high"),
+        "b": create(client, "b", ["backend"]),
+        "c": create(client, "c", ["frontend", "urgent"]),
+        "d": create(client, "d", []),
+    }
+
+def titles(client, query):
+    response = client.get(f'/api/tasks?{query}')
+    assert response.status_code == 200
+    return sorted(task["title"] for task in json.loads(response.data)["tasks"])
+
+def test_tags_are_normalised(client):
+    """Tag names are trimmed, lower-cased, deduplicated and shared"""
+    task = create(client, "a", [" Backend", "backend", "URGENT"])
+    assert task["tags"] == ["backend", "urgent"]
+
+    create(client, "b", ["urgent"])
+    assert Tag.query.count() == 2
+
+def test_update_replaces_tags(client, tagged):
+    """PUT with tags replaces the task's tags, without tags keeps them"""
+    task_id = tagged["a"]["id"]
+
+    response = client.put(
+        f'/api/tasks/{task_id}',
+        data=json.dumps({"tags": ["review"]}),
+        content_type='application/json'
+    )
+    assert json.loads(response.data)["tags"] == ["review"]
+
+    response = client.put(
+        f'/api/tasks/{task_id}',
+        data=json.dumps({"title": "renamed"}),
+        content_type='application/json'
+    )
+    assert json.loads(response.data)["tags"] == ["review"]
+    assert titles(client, "tags=urgent") == ["c"]
+
+def test_filter_all_and_any(client, tagged):
+    """tag_mode=all requires every tag, tag_mode=any at least one"""
+    assert titles(client, "tags=backend") == ["a", "b"]
+    assert titles(client, "tags=backend,urgent") == ["a"]
+    assert titles(client, "tags=backend,urgent&tag_mode=any") == ["a", "b", "c"]
+    assert titles(client, "tags=Urgent&priority=high") == ["a"]
+    assert titles(client, "tags=unknown") == []
+    assert titles(client, "tags=unknown,backend&tag_mode=any") == ["a", "b"]
+
+    response = client.get('/api/tasks?tags=backend&tag_mode=some')
+    assert response.status_code == 400
+    assert "tag_mode" in json.loads(response.data)["details"]
+
+def test_invalid_tags_are_rejected(client):
+    """Empty and over-long tag names are validation errors"""
+    response = client.post(
+        '/api/tasks',
+        data=json.dumps({"title": "a", "tags": ["x" * 51]}),
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+    assert "tags" in json.loads(response.data)["details"]
+
+def test_tag_counts(client, tagged):
+    """The tag endpoint counts tasks per tag over the filtered tasks"""
+    body = json.loads(client.get('/api/tags').data)
+    assert body["tags"] == [
+        {"name": "backend", "count": 2},
+        {"name": "urgent", "count": 2},
+        {"name": "frontend", "count": 1},
+    ]
+
+    body = json.loads(client.get('/api/tags?tags=urgent').data)
+    assert body["tags"] == [
+        {"name": "urgent", "count": 2},
+        {"name": "backend", "count": 1},
+        {"name": "frontend", "count": 1},
+    ]
+
+    body = json.loads(client.get('/api/tags?priority=high&limit=1').data)
+    assert body["tags"] == [{"name": "backend", "count": 1}]
+
+def test_delete_removes_tag_links(app, client, tagged):
+    """Deleting a task drops its tag links but keeps the tags"""
+    assert client.delete(f'/api/tasks/{tagged["a"]["id"]}').status_code == 200
+
+    links = db.session.execute(text("SELECT COUNT(*) FROM task_tags")).scalar()
+    assert links == 3
+    assert Tag.query.count() == 3
+
+def test_filter_uses_tag_index(app, tagged):
+    """Each tag of a filter is a range scan of the reverse index"""
+    statement = tagged_task_ids(("backend", "urgent"), TAG_MODE_ANY)
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    plan = " ".join(
+        row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    )
+
+    assert "ix_task_tags_tag_task" in plan
+    assert "SCAN task_tags" not in plan
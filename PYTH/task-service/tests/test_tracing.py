@@ -0,0 +1,176 @@
+"""
+Tests for request tracing
+"""
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from cmd.traces import format_trace, load_traces, make_collector
+from internal.app import create_app
+from internal.api.tracing import NOOP_SPAN, Span, SpanExporter, Trace, current_span, span, with_span
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-{flags}"
+
+def make_app(**overrides):
+    app = create_app('testing', TRACING_ENABLED=True, **overrides)
+    with app.app_context():
+        db.create_all()
+    return app
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """
+    Path the file exporter writes to
+    """
+    return tmp_path / 'traces.jsonl'
+
+@pytest.fixture
+def app(trace_file):
+    """
+    Flask app fixture tracing every request to a file
+    """
+    app = make_app(TRACE_SAMPLE_RATE=1, TRACE_FILE_PATH=str(trace_file))
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def recorded(app, trace_file):
+    """Spans written so far, by trace id"""
+    assert app.extensions['tracing'].exporter.flush()
+    with open(trace_file) as lines:
+        return load_traces(lines)
+
+def by_name(spans):
+    return {span["name"]: span for span in spans}
+
+def attributes(span):
+    return {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+
+def test_sampled_request_records_span_tree(app, trace_file):
+    """Routing, the service call with its statements, to_dict and serialisation are nested under the request"""
+    TaskService.create_task({"title": "Traced"})
+    response = app.test_client().get('/api/tasks?status=pending')
+    assert response.status_code == 200
+
+    traces = recorded(app, trace_file)
+    spans = traces[response.headers["X-Trace-Id"]]
+    named = by_name(spans)
+    root = named["GET /api/tasks"]
+    assert attributes(root)["http.status_code"] == "200"
+    assert "parentSpanId" not in root
+
+    service = named["TaskService.list_tasks"]
+    for name in ("routing", "TaskService.list_tasks", "to_dict", "serialize"):
+        assert named[name]["parentSpanId"] == root["spanId"]
+    statements = [span for span in spans if span["name"] == "sql SELECT"]
+    assert statements and all(span["parentSpanId"] == service["spanId"] for span in statements)
+    # Statement text is kept, parameter values never are
+    texts = [attributes(span)["db.statement"] for span in statements]
+    assert any("FROM tasks" in text for text in texts)
+    assert not any("pending" in text for text in texts)
+    assert attributes(named["to_dict"])["tasks"] == "1"
+    assert int(root["startTimeUnixNano"]) <= int(service["startTimeUnixNano"])
+    assert int(service["endTimeUnixNano"]) <= int(root["endTimeUnixNano"])
+
+def test_request_body_spans(app, trace_file):
+    """Decoding and validation are timed, failures mark the span"""
+    client = app.test_client()
+    response = client.post('/api/tasks', json={"title": "New"})
+    named = by_name(recorded(app, trace_file)[response.headers["X-Trace-Id"]])
+    assert "POST /api/tasks" in named
+    assert attributes(named["validation"]) == {"schema": "TaskCreateSchema"}
+    assert attributes(named["decode"]) == {"format": "application/json"}
+    assert "TaskService.create_task" in named
+
+    response = client.post('/api/tasks', json={"title": ""})
+    assert response.status_code == 400
+    named = by_name(recorded(app, trace_file)[response.headers["X-Trace-Id"]])
+    assert named["validation"]["status"]["code"] == 2
+    assert "TaskService.create_task" not in named
+
+def test_sampling_follows_rate_and_traceparent(trace_file):
+    """Unsampled requests record nothing; a traceparent header decides for the request"""
+    app = make_app(TRACE_SAMPLE_RATE=0, TRACE_FILE_PATH=str(trace_file))
+    client = app.test_client()
+    assert "X-Trace-Id" not in client.get('/api/tasks').headers
+
+    response = client.get('/api/tasks', headers={"traceparent": TRACEPARENT.format(flags="01")})
+    trace_id = response.headers["X-Trace-Id"]
+    assert trace_id == "0af7651916cd43dd8448eb211c80319c"
+    root = by_name(recorded(app, trace_file)[trace_id])["GET /api/tasks"]
+    assert root["parentSpanId"] == "b7ad6b7169203331"
+
+    sampled = make_app(TRACE_SAMPLE_RATE=1, TRACE_FILE_PATH=str(trace_file))
+    response = sampled.test_client().get('/api/tasks', headers={"traceparent": TRACEPARENT.format(flags="00")})
+    assert "X-Trace-Id" not in response.headers
+    assert "X-Trace-Id" in sampled.test_client().get('/api/tasks', headers={"traceparent": "garbage"}).headers
+
+    stats = json.loads(client.get('/api/stats').data)["tracing"]
+    assert (stats["sampled_requests"], stats["exported_traces"], stats["sample_rate"]) == (1, 1, 0)
+
+def test_export_to_collector():
+    """The OTLP exporter posts batches the stand-in collector records"""
+    output, echo = io.StringIO(), io.StringIO()
+    server = make_collector(output, port=0, echo=echo)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        app = make_app(
+            TRACE_SAMPLE_RATE=1, TRACE_EXPORTER="otlp",
+            TRACE_OTLP_ENDPOINT=f"http://127.0.0.1:{server.server_port}/v1/traces"
+        )
+        client = app.test_client()
+        trace_ids = [client.get('/api/tasks/1').headers["X-Trace-Id"] for _ in range(3)]
+        assert app.extensions['tracing'].exporter.flush()
+    finally:
+        server.shutdown()
+
+    documents = [json.loads(line) for line in output.getvalue().splitlines()]
+    resource = documents[0]["resourceSpans"][0]["resource"]
+    assert resource["attributes"] == [{"key": "service.name", "value": {"stringValue": "task-service"}}]
+    traces = load_traces(output.getvalue().splitlines())
+    assert list(traces) == trace_ids
+    lines = format_trace(traces[trace_ids[0]])
+    assert lines[0].startswith("GET /api/tasks/<int:task_id>")
+    assert lines[1].strip().startswith("routing")
+    assert any(line.strip().startswith("sql SELECT") for line in lines)
+    assert len(echo.getvalue().splitlines()) == 3
+
+def test_slow_exporter_drops_traces():
+    """A full queue drops traces instead of holding requests"""
+    release = threading.Event()
+
+    class Stuck(SpanExporter):
+        def export(self, traces):
+            release.wait(5)
+
+    exporter = Stuck("test", queue_size=1)
+    for _ in range(4):
+        exporter.submit(Trace("0" * 32))
+    release.set()
+    assert exporter.flush()
+    stats = exporter.stats()
+    assert stats["dropped_traces"] >= 2
+    assert stats["dropped_traces"] + stats["exported_traces"] == 4
+
+def test_spans_follow_work_to_other_threads(app):
+    """with_span hands the caller's span to pool threads"""
+    with app.test_request_context('/api/tasks'):
+        assert span("anything") is NOOP_SPAN
+    root = Trace("1" * 32)
+    with ThreadPoolExecutor(2) as pool:
+        with Span(root, "request") as parent:
+            assert list(pool.map(lambda _: current_span(), range(2))) == [None, None]
+            assert list(pool.map(with_span(lambda _: current_span()), range(2))) == [parent, parent]
+
+def test_tracing_can_be_disabled():
+    """Without tracing no middleware, header or stats are installed"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    response = app.test_client().get('/api/tasks')
+    assert "X-Trace-Id" not in response.headers
+    assert "tracing" not in app.extensions
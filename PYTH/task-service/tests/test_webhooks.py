@@ -0,0 +1,217 @@
+"""
+Tests for webhook delivery through the outbox
+"""
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from internal.app import create_app
+from internal.db.database import db
+from internal.handlers.task_service import TaskService
+from internal.handlers.webhook_service import WebhookService
+from internal.models.webhook import WebhookEvent, WebhookSubscription
+
+class Receiver:
+    """
+    Local HTTP endpoint standing in for a subscriber
+
+    Records every request; answers with the queued status codes, then 200.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.delay = 0
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(receiver.delay)
+                receiver.requests.append((dict(self.headers), json.loads(body), body))
+                self.send_response(receiver.statuses.pop(0) if receiver.statuses else 200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events(self):
+        return [event for _, body, _ in self.requests for event in body["events"]]
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.events()) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.events()
+
+@pytest.fixture
+def receiver():
+    """
+    Receiver fixture
+    """
+    receiver = Receiver()
+    yield receiver
+    receiver.server.shutdown()
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    Flask app fixture with webhooks enabled on a file database
+    """
+    app = create_app(
+        'testing',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'webhooks.db'}",
+        WEBHOOKS_ENABLED=True,
+        WEBHOOK_BATCH_SIZE=3,
+        WEBHOOK_POLL_SECONDS=0.05,
+        WEBHOOK_TIMEOUT_SECONDS=2
+    )
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        app.extensions['webhooks'].stop()
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """
+    Test client fixture
+    """
+    return app.test_client()
+
+def test_changes_are_delivered_in_order(app, client, receiver):
+    """Task changes made through the API reach the endpoint in commit order"""
+    response = client.post('/api/webhooks', data=json.dumps({"url": receiver.url}), content_type='application/json')
+    assert response.status_code == 201
+
+    task = json.loads(client.post('/api/tasks', data=json.dumps({"title": "Hooked"}),
+                                  content_type='application/json').data)
+    client.patch(f'/api/tasks/{task["id"]}/status', data=json.dumps({"status": "completed"}),
+                 content_type='application/json')
+    client.delete(f'/api/tasks/{task["id"]}')
+
+    events = receiver.wait_for(3)
+    assert [event["type"] for event in events] == ["task.created", "task.updated", "task.deleted"]
+    assert [event["id"] for event in events] == sorted(event["id"] for event in events)
+    assert events[0]["data"] == task
+    assert events[1]["data"]["status"] == "completed"
+    assert events[2]["data"] == {"id": task["id"]}
+
+def test_batches_per_endpoint(app, receiver):
+    """Each round posts up to the batch size per subscription, filtered by type"""
+    dispatcher = app.extensions['webhooks']
+    everything = WebhookService.create_subscription({"url": receiver.url})
+    WebhookService.create_subscription({"url": receiver.url + "?deleted", "events": ["task.deleted"]})
+    tasks = [TaskService.create_task({"title": f"Task {i}"}) for i in range(4)]
+    TaskService.delete_task(tasks[0].id)
+    # An update that changes nothing is not an event
+    TaskService.update_task(tasks[1].id, {"title": "Task 1"})
+
+    assert dispatcher.run_once() is True
+    assert sorted(len(body["events"]) for _, body, _ in receiver.requests) == [3]
+    assert dispatcher.run_once() is False
+    assert dispatcher.run_once() is False
+
+    # The second round posted to both endpoints concurrently
+    assert len(receiver.requests) == 3
+    assert sorted(event["type"] for event in receiver.events()) == ["task.created"] * 4 + ["task.deleted"] * 2
+    assert db.session.get(WebhookSubscription, everything.id).last_event_id == 5
+    # Acknowledged by every subscription
+    assert WebhookEvent.query.count() == 0
+
+def test_failures_back_off_and_retry(app, receiver):
+    """A failed batch keeps the cursor and is retried after a growing delay"""
+    dispatcher = app.extensions['webhooks']
+    subscription = WebhookService.create_subscription({"url": receiver.url, "secret": "s3cret"})
+    TaskService.create_task({"title": "Retried"})
+    receiver.statuses = [500]
+
+    dispatcher.run_once()
+    subscription = db.session.get(WebhookSubscription, subscription.id)
+    assert (subscription.failures, subscription.last_event_id) == (1, 0)
+    assert subscription.last_error == "HTTP 500"
+    assert subscription.next_attempt_at > datetime.utcnow()
+    assert dispatcher.run_once() is False
+    assert len(receiver.requests) == 1
+
+    subscription.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    dispatcher.run_once()
+    subscription = db.session.get(WebhookSubscription, subscription.id)
+    assert (subscription.failures, subscription.last_event_id) == (0, 1)
+    headers, body, raw = receiver.requests[-1]
+    assert body["events"][0]["data"]["title"] == "Retried"
+    digest = hmac.new(b"s3cret", raw, hashlib.sha256).hexdigest()
+    assert headers["X-Webhook-Signature"] == f"sha256={digest}"
+
+    delays = [dispatcher.retry_delay(failures) for failures in (1, 2, 3, 30)]
+    assert 0.5 <= delays[0] <= 1 and 1 <= delays[1] <= 2 and 2 <= delays[2] <= 4
+    assert delays[3] <= app.config["WEBHOOK_RETRY_MAX_SECONDS"]
+
+def test_slow_endpoints_do_not_slow_writes(app, client, receiver):
+    """Requests return before delivery, whatever the endpoint's latency"""
+    receiver.delay = 0.5
+    client.post('/api/webhooks', data=json.dumps({"url": receiver.url}), content_type='application/json')
+
+    started = time.perf_counter()
+    for i in range(5):
+        response = client.post('/api/tasks', data=json.dumps({"title": f"Fast {i}"}),
+                               content_type='application/json')
+        assert response.status_code == 201
+    assert time.perf_counter() - started < 0.5
+
+    assert len(receiver.wait_for(5)) == 5
+
+def test_outbox_follows_the_transaction(app, client):
+    """Rolled back changes leave no event behind"""
+    WebhookService.create_subscription({"url": "http://127.0.0.1:9/unused"})
+    response = client.post('/api/batch', data=json.dumps({"operations": [
+        {"op": "create", "data": {"title": "Rolled back"}},
+        {"op": "update", "id": 9999, "data": {"title": "Missing"}},
+    ]}), content_type='application/json')
+    assert json.loads(response.data)["committed"] is False
+    assert WebhookEvent.query.count() == 0
+
+    TaskService.create_task({"title": "Kept"})
+    assert WebhookEvent.query.count() == 1
+
+def test_subscription_endpoints(app, client):
+    """Subscriptions are validated, listed with their backlog and deleted"""
+    response = client.post('/api/webhooks', data=json.dumps({"url": "ftp://example.com", "events": ["task.moved"]}),
+                           content_type='application/json')
+    assert response.status_code == 400
+    assert set(json.loads(response.data)["details"]) == {"url", "events"}
+
+    created = json.loads(client.post('/api/webhooks', data=json.dumps({
+        "url": "http://localhost:9/hook", "events": ["task.created"], "secret": "x"
+    }), content_type='application/json').data)
+    assert created["events"] == ["task.created"]
+    assert created["signed"] is True
+    assert "secret" not in created
+
+    TaskService.create_task({"title": "Pending"})
+    body = json.loads(client.get(f'/api/webhooks/{created["id"]}').data)
+    assert body["pending_events"] == 1
+    assert len(json.loads(client.get('/api/webhooks').data)["webhooks"]) == 1
+    assert "webhooks" in json.loads(client.get('/api/stats').data)
+
+    assert client.delete(f'/api/webhooks/{created["id"]}').status_code == 200
+    assert client.get(f'/api/webhooks/{created["id"]}').status_code == 404
+
+def test_disabled_and_unsupported_configurations():
+    """Webhook endpoints answer 501 when disabled; task stores cannot join the outbox"""
+    app = create_app('testing')
+    assert app.test_client().get('/api/webhooks').status_code == 501
+
+    with pytest.raises(ValueError):
+        create_app('testing', WEBHOOKS_ENABLED=True, STORAGE_BACKEND="memory")